@@ -3,18 +3,19 @@
 Application Flask pour l'interface de gestion du scraping
 """
 
-from flask import Flask, render_template, jsonify, request, send_file, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for
 from flask_cors import CORS
 from sqlalchemy import func, case
-from database import init_db, get_session, Site, ScrapingJob, SiteStatus, safe_commit
+from database import init_db, get_engine, get_session, Site, ScrapingJob, SiteStatus, LookupState, safe_commit
+from site_stats import daily_activity, site_counters
+from site_listing import InvalidListingRequest, ListingFilters, MAX_PER_PAGE, iter_csv, list_sites
 from campaign_database import get_campaign_session, Unsubscribe
+from db_engine import pool_status
 from datetime import datetime, timedelta
 from pathlib import Path
 import json
-import csv
 import logging
 import threading
-from io import StringIO, BytesIO
 from scenario_routes import register_scenario_routes
 from segment_routes import register_segment_routes
 from distributed_crawl_api import crawl_api
@@ -166,102 +167,47 @@ def compute_stats_background():
 
 
 def compute_stats_data():
-    """Calculer les stats depuis la DB (fonction lourde)"""
+    """Calculer les stats depuis la DB (compteurs de site_stats.py: table site_counters ou un seul parcours)"""
     session = get_session()
     try:
-        # Total de sites
-        total_sites = session.query(Site).count()
+        counters = site_counters(session)
+        total_sites = counters['total']
 
         # Sites par statut
-        status_counts = {}
-        for status in SiteStatus:
-            count = session.query(Site).filter(Site.status == status).count()
-            status_counts[status.value] = count
+        status_counts = {status.value: counters['status_counts'].get(status.name, 0) for status in SiteStatus}
 
-        # Sites avec emails
-        sites_with_email = session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
-        ).count()
-
-        # Sites avec SIRET
-        sites_with_siret = session.query(Site).filter(
-            Site.siret.isnot(None),
-            Site.siret != '',
-            Site.siret != 'NON TROUVÉ'
-        ).count()
-
-        # Sites avec dirigeants
-        sites_with_leaders = session.query(Site).filter(
-            Site.leaders.isnot(None),
-            Site.leaders != '',
-            Site.leaders != '[]',
-            Site.leaders != 'NON TROUVÉ'
-        ).count()
-
-        # Sites complets (email + SIRET + dirigeants)
-        sites_complete = session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND',
-            Site.siret.isnot(None),
-            Site.siret != '',
-            Site.siret != 'NON TROUVÉ',
-            Site.leaders.isnot(None),
-            Site.leaders != '',
-            Site.leaders != 'NON TROUVÉ'
-        ).count()
-
-        # Sites avec erreurs
-        sites_with_errors = session.query(Site).filter(Site.status == SiteStatus.ERROR).count()
+        sites_with_email = counters['with_email']
+        sites_with_siret = counters['with_siret']
+        sites_with_leaders = counters['with_leaders']
+        sites_complete = counters['complete']  # email + SIRET + dirigeants
+        sites_with_errors = status_counts[SiteStatus.ERROR.value]
 
-        # Activité récente (dernières 24h)
+        # Activité récente (dernières 24h, index sur created_at)
         yesterday = datetime.utcnow() - timedelta(days=1)
-        recent_activity = session.query(Site).filter(Site.created_at >= yesterday).count()
+        recent_activity = session.query(func.count(Site.id)).filter(Site.created_at >= yesterday).scalar()
 
         # Jobs en cours
         running_jobs = session.query(ScrapingJob).filter(ScrapingJob.status == 'running').count()
 
-        # Emails par source
-        emails_from_scraping = session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND',
-            Site.email_source == 'scraping'
-        ).count()
-
-        emails_from_siret = session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND',
-            Site.email_source == 'siret'
-        ).count()
+        # Emails par source et validation
+        emails_from_scraping = counters['emails_from_scraping']
+        emails_from_siret = counters['emails_from_siret']
+        emails_validated = counters['emails_validated']
+        emails_valid = counters['emails_valid']
+        emails_invalid = counters['emails_invalid']
+        emails_risky = counters['emails_risky']
+        emails_deliverable = counters['emails_deliverable']
 
-        # Stats de validation d'emails
-        emails_validated = session.query(Site).filter(Site.email_validated == True).count()
-        emails_valid = session.query(Site).filter(Site.email_validation_status == 'valid').count()
-        emails_invalid = session.query(Site).filter(Site.email_validation_status == 'invalid').count()
-        emails_risky = session.query(Site).filter(Site.email_validation_status == 'risky').count()
-
-        # Stats CMS (exclure NONE et vide)
-        sites_with_cms = session.query(Site).filter(
-            Site.cms.isnot(None),
-            Site.cms != '',
-            Site.cms != 'NONE'
-        ).count()
-        cms_counts = {}
-        cms_results = session.query(Site.cms, func.count(Site.id)).filter(Site.cms.isnot(None)).group_by(Site.cms).all()
-        for cms, count in cms_results:
-            cms_counts[cms] = count
-        emails_deliverable = session.query(Site).filter(Site.email_deliverable == True).count()
+        # Stats CMS (sites_with_cms exclut NONE et vide)
+        sites_with_cms = counters['with_cms']
+        cms_counts = counters['cms_counts']
 
         # Stats Blacklist
-        sites_blacklisted = session.query(Site).filter(Site.blacklisted == True).count()
+        sites_blacklisted = counters['blacklisted']
 
         # Stats Sites Vendeurs LinkAvista et Acheteurs
-        total_sellers = session.query(Site).filter(Site.is_link_seller == True).count()
-        total_buyers = session.query(Site).filter(Site.purchased_from.isnot(None)).count()
+        total_sellers = counters['sellers']
+        total_buyers = counters['buyers']
 
         # Stats Campagnes - Désinscrits
         campaign_session = get_campaign_session()
@@ -274,29 +220,11 @@ def compute_stats_data():
             campaign_session.close()
 
         # Stats Scraping Backlinks - Utiliser is_link_seller pour les vrais vendeurs
-        backlinks_scraped = session.query(Site).filter(
-            Site.is_link_seller == True,
-            Site.backlinks_crawled == True
-        ).count()
-        backlinks_not_scraped = session.query(Site).filter(
-            Site.is_link_seller == True,
-            (Site.backlinks_crawled == False) | (Site.backlinks_crawled.is_(None))
-        ).count()
-        # Sites vendeurs LinkAvista scrappés
-        sellers_scraped = session.query(Site).filter(
-            Site.is_link_seller == True,
-            Site.backlinks_crawled == True
-        ).count()
-        sellers_not_scraped = session.query(Site).filter(
-            Site.is_link_seller == True,
-            (Site.backlinks_crawled == False) | (Site.backlinks_crawled.is_(None))
-        ).count()
+        backlinks_scraped = sellers_scraped = counters['sellers_scraped']
+        backlinks_not_scraped = sellers_not_scraped = counters['sellers_not_scraped']
 
         # Stats Contacts extraits
-        sites_with_contacts = session.query(Site).filter(
-            Site.contact_firstname.isnot(None),
-            Site.contact_lastname.isnot(None)
-        ).count()
+        sites_with_contacts = counters['with_contacts']
 
         return {
             'total_sites': total_sites,
@@ -468,18 +396,15 @@ def get_scraping_live():
 @app.route('/api/scraping-state')
 def get_scraping_state():
     """Obtenir l'état en temps réel des crawlers actifs (pages en cours de crawling)"""
-    from pathlib import Path
     from datetime import datetime, timedelta
+    from distributed_crawl_api import load_workers
 
-    workers_file = Path('/var/www/Scrap_Email/crawl_workers.json')
     WORKER_TIMEOUT = 300  # 5 minutes
 
     try:
         sites = []
-        if workers_file.exists():
-            with open(workers_file, 'r') as f:
-                workers_data = json.load(f)
-
+        workers_data = load_workers(clean_inactive=False)
+        if workers_data.get('workers'):
             # Parcourir tous les workers actifs et collecter leurs sites en cours
             for worker_id, worker in workers_data.get('workers', {}).items():
                 # Vérifier si le worker est encore actif
@@ -1023,90 +948,31 @@ def compute_daily_stats_background():
 
 
 def compute_daily_stats_data():
-    """Calculer les stats daily depuis la DB (fonction lourde)"""
+    """Calculer les stats daily depuis la DB (table site_daily_rollup: une lecture d'intervalle)"""
     session = get_session()
     try:
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        daily_data = []
-
-        for i in range(30, -1, -1):
-            date = datetime.utcnow() - timedelta(days=i)
-            date_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-            date_end = date_start + timedelta(days=1)
-
-            # Sites crawlés ce jour (vendeurs ET acheteurs avec backlinks_crawled_at)
-            sellers_crawled = session.query(Site).filter(
-                Site.backlinks_crawled == True,
-                Site.backlinks_crawled_at >= date_start,
-                Site.backlinks_crawled_at < date_end
-            ).count()
-
-            # Acheteurs découverts ce jour (created_at pour les nouveaux)
-            buyers_found = session.query(Site).filter(
-                Site.purchased_from.isnot(None),
-                Site.created_at >= date_start,
-                Site.created_at < date_end
-            ).count()
-
-            emails_found = session.query(Site).filter(
-                Site.email_found_at >= date_start,
-                Site.email_found_at < date_end,
-                Site.emails.isnot(None),
-                Site.emails != '',
-                Site.emails != 'NO EMAIL FOUND'
-            ).count()
-
-            siret_found = session.query(Site).filter(
-                Site.updated_at >= date_start,
-                Site.updated_at < date_end,
-                Site.siret.isnot(None),
-                Site.siret != '',
-                Site.siret != 'NON TROUVÉ'
-            ).count()
-
-            leaders_found = session.query(Site).filter(
-                Site.leaders_found_at >= date_start,
-                Site.leaders_found_at < date_end,
-                Site.leaders.isnot(None),
-                Site.leaders != ''
-            ).count()
-
-            daily_data.append({
-                'date': date_start.strftime('%Y-%m-%d'),
-                'sellers_crawled': sellers_crawled,
-                'buyers_found': buyers_found,
-                'siret_found': siret_found,
-                'leaders_found': leaders_found,
-                'emails_found': emails_found
-            })
+        activity = daily_activity(session, days=31)
+        daily_data = [
+            {
+                'date': day,
+                'sellers_crawled': counts['sellers_crawled'],
+                'buyers_found': counts['buyers_found'],
+                'siret_found': counts['siret_found'],
+                'leaders_found': counts['leaders_found'],
+                'emails_found': counts['emails_found'],
+                'emails_validated': counts['emails_validated']
+            }
+            for day, counts in sorted(activity.items())
+        ]
 
-        # Total sites crawlés dans les 30 derniers jours (vendeurs ET acheteurs)
-        total_sellers_crawled = session.query(Site).filter(
-            Site.backlinks_crawled == True,
-            Site.backlinks_crawled_at >= thirty_days_ago
-        ).count()
-        # Total acheteurs découverts dans les 30 derniers jours (created_at)
-        total_buyers = session.query(Site).filter(
-            Site.purchased_from.isnot(None),
-            Site.created_at >= thirty_days_ago
-        ).count()
-        total_siret = session.query(Site).filter(
-            Site.updated_at >= thirty_days_ago,
-            Site.siret.isnot(None),
-            Site.siret != '',
-            Site.siret != 'NON TROUVÉ'
-        ).count()
-        total_leaders = session.query(Site).filter(
-            Site.leaders_found_at >= thirty_days_ago,
-            Site.leaders.isnot(None),
-            Site.leaders != ''
-        ).count()
-        total_emails = session.query(Site).filter(
-            Site.email_found_at >= thirty_days_ago,
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
-        ).count()
+        # Totaux des 30 derniers jours (aujourd'hui compris)
+        last_30_days = daily_data[-30:]
+        total_sellers_crawled = sum(d['sellers_crawled'] for d in last_30_days)
+        total_buyers = sum(d['buyers_found'] for d in last_30_days)
+        total_siret = sum(d['siret_found'] for d in last_30_days)
+        total_leaders = sum(d['leaders_found'] for d in last_30_days)
+        total_emails = sum(d['emails_found'] for d in last_30_days)
+        total_validated = sum(d['emails_validated'] for d in last_30_days)
 
         return {
             'daily': daily_data,
@@ -1116,11 +982,13 @@ def compute_daily_stats_data():
                 'total_siret_found': total_siret,
                 'total_leaders_found': total_leaders,
                 'total_emails_found': total_emails,
+                'total_emails_validated': total_validated,
                 'avg_sellers_per_day': round(total_sellers_crawled / 30, 1),
                 'avg_buyers_per_day': round(total_buyers / 30, 1),
                 'avg_siret_per_day': round(total_siret / 30, 1),
                 'avg_leaders_per_day': round(total_leaders / 30, 1),
-                'avg_emails_per_day': round(total_emails / 30, 1)
+                'avg_emails_per_day': round(total_emails / 30, 1),
+                'avg_validated_per_day': round(total_validated / 30, 1)
             }
         }
     finally:
@@ -1172,104 +1040,29 @@ def get_daily_stats():
 
 @app.route('/api/sites')
 def get_sites():
-    """Obtenir la liste des sites avec pagination et filtres"""
+    """Obtenir la liste des sites avec pagination par curseur et filtres (site_listing.py)"""
     session = get_session()
 
     try:
-        # Paramètres de pagination
+        # Paramètres de pagination: `cursor` (next_cursor de la page précédente),
+        # `page` seul reste accepté pour les anciens clients (OFFSET)
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 50, type=int)
+        cursor = request.args.get('cursor') or None
 
-        # Filtres
-        status_filter = request.args.get('status')
-        search_query = request.args.get('search', '').strip()
-        email_search = request.args.get('email_search', '').strip()
-        has_email = request.args.get('has_email')
-        has_siret = request.args.get('has_siret')
-        has_leaders = request.args.get('has_leaders')
-        cms_filter = request.args.get('cms')
-        include_blacklisted = request.args.get('include_blacklisted', 'false').lower() == 'true'
-
-        # Construire la requête
-        query = session.query(Site)
-
-        # Exclure les sites blacklistés par défaut
-        if not include_blacklisted:
-            query = query.filter(Site.blacklisted == False)
-
-        # Filtre par statut
-        if status_filter:
-            query = query.filter(Site.status == SiteStatus(status_filter))
-
-        # Recherche par domaine
-        if search_query:
-            query = query.filter(Site.domain.like(f'%{search_query}%'))
-
-        # Recherche par email
-        if email_search:
-            query = query.filter(Site.emails.ilike(f'%{email_search}%'))
-
-        # Filtre email
-        if has_email == 'true':
-            query = query.filter(
-                Site.emails.isnot(None),
-                Site.emails != '',
-                Site.emails != 'NO EMAIL FOUND'
-            )
-        elif has_email == 'false':
-            query = query.filter(
-                (Site.emails.is_(None)) | (Site.emails == '') | (Site.emails == 'NO EMAIL FOUND')
-            )
-
-        # Filtre SIRET
-        if has_siret == 'true':
-            query = query.filter(
-                Site.siret.isnot(None),
-                Site.siret != '',
-                Site.siret != 'NON TROUVÉ'
-            )
-        elif has_siret == 'false':
-            query = query.filter(
-                (Site.siret.is_(None)) | (Site.siret == '') | (Site.siret == 'NON TROUVÉ')
-            )
-
-        # Filtre dirigeants
-        if has_leaders == 'true':
-            query = query.filter(
-                Site.leaders.isnot(None),
-                Site.leaders != '',
-                Site.leaders != 'NON TROUVÉ'
-            )
-        elif has_leaders == 'false':
-            query = query.filter(
-                (Site.leaders.is_(None)) | (Site.leaders == '') | (Site.leaders == 'NON TROUVÉ')
-            )
-
-        # Filtre CMS
-        if cms_filter:
-            if cms_filter == 'no_cms':
-                query = query.filter(
-                    (Site.cms.is_(None)) | (Site.cms == '')
-                )
-            else:
-                query = query.filter(Site.cms == cms_filter)
-
-        # Total
-        total = query.count()
-
-        # Tri par date de découverte d'email (plus récents en premier), puis date de mise à jour
-        query = query.order_by(Site.email_found_at.desc().nullslast(), Site.updated_at.desc())
-
-        # Pagination
-        offset = (page - 1) * per_page
-        sites = query.limit(per_page).offset(offset).all()
+        try:
+            filters = ListingFilters.from_args(request.args)
+            listing = list_sites(session, filters, cursor=cursor, per_page=per_page,
+                                 offset=0 if cursor else (page - 1) * per_page)
+        except InvalidListingRequest as e:
+            return jsonify({'error': str(e)}), 400
 
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
         return jsonify({
-            'sites': [site.to_dict() for site in sites],
-            'total': total,
+            **listing,
             'page': page,
             'per_page': per_page,
-            'total_pages': (total + per_page - 1) // per_page
+            'total_pages': (listing['total'] + per_page - 1) // per_page
         })
 
     finally:
@@ -1487,9 +1280,23 @@ def get_database_health():
         'database_locked_errors': 0,
         'last_check': datetime.utcnow().isoformat(),
         'wal_size_mb': 0,
-        'active_connections': 0
+        'active_connections': 0,
+        'pool': pool_status(get_engine()),
     }
 
+    if health['pool']['backend'] == 'postgresql':
+        # Ni fichier WAL ni verrou de fichier: état du pool de ce process
+        pool = health['pool']
+        health['active_connections'] = pool['checked_out']
+        if pool['checked_out'] >= pool['limit']:
+            health['status'] = 'warning'
+            health['alerts'].append({
+                'type': 'warning',
+                'message': f"Pool de connexions saturé ({pool['checked_out']} connexions prêtées)",
+                'icon': 'plug'
+            })
+        return jsonify(health)
+
     try:
         # Vérifier la taille du fichier WAL
         wal_path = os.path.join(os.path.dirname(__file__), 'scrap_email.db-wal')
@@ -1583,6 +1390,9 @@ def force_wal_checkpoint():
     import sqlite3
     import os
 
+    if get_engine().dialect.name != 'sqlite':
+        return jsonify({'success': False, 'error': 'Checkpoint WAL: base SQLite uniquement'}), 400
+
     try:
         db_path = os.path.join(os.path.dirname(__file__), 'scrap_email.db')
         conn = sqlite3.connect(db_path)
@@ -1691,48 +1501,30 @@ def update_job(job_id):
 
 @app.route('/api/export/csv')
 def export_csv():
-    """Exporter les sites en CSV"""
-    session = get_session()
-
+    """
+    Exporter les sites en CSV, en flux (site_listing.iter_csv). Mêmes filtres
+    que /api/sites (blacklistés compris par défaut); `gzip=true` télécharge
+    un .csv.gz, sinon le flux est compressé si le client accepte gzip.
+    """
     try:
-        sites = session.query(Site).all()
-
-        # Créer le CSV
-        output = StringIO()
-        writer = csv.writer(output)
-
-        # En-tête
-        writer.writerow([
-            'ID', 'Domaine', 'Statut', 'Emails', 'SIRET', 'SIREN',
-            'Dirigeants', 'Source', 'Créé le', 'Mis à jour le'
-        ])
-
-        # Données
-        for site in sites:
-            writer.writerow([
-                site.id,
-                site.domain,
-                site.status.value if site.status else '',
-                site.emails or '',
-                site.siret or '',
-                site.siren or '',
-                site.leaders or '',
-                site.source_url or '',
-                site.created_at.strftime('%Y-%m-%d %H:%M:%S') if site.created_at else '',
-                site.updated_at.strftime('%Y-%m-%d %H:%M:%S') if site.updated_at else '',
-            ])
-
-        # Retourner le fichier
-        output.seek(0)
-        return send_file(
-            BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'sites_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        )
+        filters = ListingFilters.from_args(request.args)
+    except InvalidListingRequest as e:
+        return jsonify({'error': str(e)}), 400
+    if 'include_blacklisted' not in request.args:
+        filters.include_blacklisted = True
+
+    filename = f'sites_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    if request.args.get('gzip', 'false').lower() == 'true':
+        mimetype, filename, headers = 'application/gzip', filename + '.gz', {}
+        compress = True
+    else:
+        mimetype, headers = 'text/csv', {'Vary': 'Accept-Encoding'}
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
 
-    finally:
-        session.close()
+    headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return Response(iter_csv(get_session, filters, gzip=compress), mimetype=mimetype, headers=headers)
 
 
 # ============================================================================
@@ -1782,9 +1574,7 @@ def get_validation_stats():
 
         # Total avec emails
         total_with_email = session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
+            Site.has_email == True
         ).count()
 
         # Stats validation
@@ -1805,9 +1595,7 @@ def get_validation_stats():
             Site.email_source,
             func.count(Site.id)
         ).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
+            Site.has_email == True
         ).group_by(Site.email_source).order_by(func.count(Site.id).desc()).all()
 
         sources_stats = [{'source': s or 'unknown', 'count': c} for s, c in email_sources[:10]]
@@ -1816,7 +1604,7 @@ def get_validation_stats():
         duplicates_result = session.execute(text("""
             SELECT COUNT(*) as dup_count FROM (
                 SELECT emails FROM sites
-                WHERE emails IS NOT NULL AND emails != '' AND emails != 'NO EMAIL FOUND'
+                WHERE has_email = 1
                 GROUP BY emails
                 HAVING COUNT(*) > 1
             ) t
@@ -1827,7 +1615,7 @@ def get_validation_stats():
         top_duplicates_result = session.execute(text("""
             SELECT emails, COUNT(*) as cnt
             FROM sites
-            WHERE emails IS NOT NULL AND emails != '' AND emails != 'NO EMAIL FOUND'
+            WHERE has_email = 1
             GROUP BY emails
             HAVING COUNT(*) > 1
             ORDER BY cnt DESC
@@ -1838,7 +1626,7 @@ def get_validation_stats():
         # Emails uniques vs total
         unique_emails_result = session.execute(text("""
             SELECT COUNT(DISTINCT emails) FROM sites
-            WHERE emails IS NOT NULL AND emails != '' AND emails != 'NO EMAIL FOUND'
+            WHERE has_email = 1
         """))
         unique_emails = unique_emails_result.scalar() or 0
 
@@ -1897,9 +1685,7 @@ def get_cms_stats():
         with_email_and_cms = session.query(Site).filter(
             Site.cms.isnot(None),
             Site.cms != '',
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
+            Site.has_email == True
         ).count()
 
         return jsonify({
@@ -3299,9 +3085,7 @@ def get_scripts_progress():
         # Sites avec email trouvé
         sites_with_email = session.query(Site).filter(
             Site.email_checked == True,
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
+            Site.has_email == True
         ).count()
 
         # Sites avec email vérifié (checked)
@@ -3312,9 +3096,7 @@ def get_scripts_progress():
         # Sites avec SIRET trouvé
         sites_with_siret = session.query(Site).filter(
             Site.siret_checked == True,
-            Site.siret.isnot(None),
-            Site.siret != '',
-            Site.siret != 'NON TROUVÉ'
+            Site.siret_state == LookupState.FOUND.value
         ).count()
 
         # Sites avec SIRET vérifié (checked)
@@ -3325,9 +3107,7 @@ def get_scripts_progress():
         # Sites avec leaders trouvés
         sites_with_leaders = session.query(Site).filter(
             Site.leaders_checked == True,
-            Site.leaders.isnot(None),
-            Site.leaders != '',
-            Site.leaders != 'NON TROUVÉ'
+            Site.leaders_state == LookupState.FOUND.value
         ).count()
 
         # Sites avec leaders vérifié (checked)
@@ -3387,9 +3167,7 @@ def get_scripts_progress():
 
         # Sites avec email qui peuvent avoir un contact extrait
         sites_with_email_total = session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND',
+            Site.has_email == True,
             Site.is_active == True
         ).count()
 
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Écritures par lots pour les scripts d'enrichissement (SIRET, CMS, Pappers, re-scraping)
+
+Ces scripts commitaient site par site, certains en recréant un engine et un
+sessionmaker à chaque site: la construction des connexions et les commits
+unitaires prenaient plus de temps que le travail lui-même, et chaque commit
+reprenait le verrou d'écriture de SQLite face aux daemons.
+
+BatchWriter garde en mémoire les mises à jour par id ({colonne: valeur},
+fusionnées si un même site revient) et les écrit en une transaction:
+
+- tous les `flush_every` sites ou toutes les `flush_interval` secondes
+  (vérifié à chaque ajout), et à la sortie du bloc `with`;
+- un UPDATE par clé primaire en executemany, groupé par jeu de colonnes;
+- sur une erreur de verrou (database is locked, deadlock), rollback puis
+  nouvelle tentative du lot entier après une attente croissante: les valeurs
+  sont des données, pas des objets ORM, donc rien n'est perdu au rollback.
+
+Chaque lot utilise sa propre session courte (get_session, fabrique partagée
+du process): aucune transaction ne reste ouverte entre deux lots.
+
+Usage:
+    with BatchWriter(flush_every=50) as writer:
+        for site_id, domain in sites:
+            writer.update(site_id, cms=cms, cms_detected_at=datetime.utcnow())
+"""
+
+import logging
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import update
+
+from database import Site, get_session, is_lock_error
+
+logger = logging.getLogger(__name__)
+
+FLUSH_EVERY = 100  # sites par transaction
+FLUSH_INTERVAL = 30.0  # secondes au plus entre deux écritures (travail perdu si le script est tué)
+MAX_RETRIES = 5
+RETRY_DELAY = 1.0  # secondes, multipliées par le numéro de tentative
+
+
+class BatchWriter:
+    """Mises à jour par clé primaire, bufferisées et écrites par lots"""
+
+    def __init__(self, model=Site, flush_every: int = FLUSH_EVERY, flush_interval: float = FLUSH_INTERVAL,
+                 max_retries: int = MAX_RETRIES, retry_delay: float = RETRY_DELAY, session_factory=get_session):
+        self.model = model
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.session_factory = session_factory
+
+        self._pending: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.stats = {'rows': 0, 'batches': 0, 'retries': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.flush()
+        except Exception as e:
+            if exc_type is None:
+                raise
+            # L'erreur d'origine reste celle qui remonte
+            logger.error(f"❌ Écriture finale impossible ({len(self._pending)} sites perdus): {e}")
+
+    def __len__(self):
+        return len(self._pending)
+
+    def update(self, row_id: int, **values):
+        """Ajouter (ou fusionner) la mise à jour d'une ligne; écrit le lot si un seuil est atteint"""
+        if not values:
+            return
+        with self._lock:
+            self._pending.setdefault(row_id, {}).update(values)
+            due = (len(self._pending) >= self.flush_every
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Écrire toutes les mises à jour en attente; retourne le nombre de lignes écrites"""
+        with self._lock:
+            if not self._pending:
+                self._last_flush = time.monotonic()
+                return 0
+            pending = self._pending
+            self._pending = {}
+
+        try:
+            self._write(pending)
+        except Exception:
+            # Remises en tête du buffer (les valeurs arrivées entretemps restent prioritaires)
+            with self._lock:
+                for row_id, values in self._pending.items():
+                    pending.setdefault(row_id, {}).update(values)
+                self._pending = pending
+            raise
+
+        with self._lock:
+            self._last_flush = time.monotonic()
+            self.stats['rows'] += len(pending)
+            self.stats['batches'] += 1
+        return len(pending)
+
+    def _write(self, pending: Dict[int, Dict]):
+        # Un executemany par jeu de colonnes
+        groups: Dict[tuple, list] = {}
+        for row_id, values in pending.items():
+            groups.setdefault(tuple(sorted(values)), []).append({'id': row_id, **values})
+
+        for attempt in range(1, self.max_retries + 1):
+            session = self.session_factory()
+            try:
+                for rows in groups.values():
+                    session.execute(update(self.model), rows)
+                session.commit()
+                return
+            except Exception as e:
+                session.rollback()
+                if not is_lock_error(e) or attempt == self.max_retries:
+                    raise
+                self.stats['retries'] += 1
+                logger.warning(f"⏳ Base verrouillée ({len(pending)} sites en attente), "
+                               f"tentative {attempt}/{self.max_retries}")
+                time.sleep(self.retry_delay * attempt)
+            finally:
+                session.close()
@@ -4,12 +4,14 @@ Base de données pour les campagnes d'emails
 """
 
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, Enum, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Enum, Float, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import enum
 import json
 
+from db_engine import create_database_engine, database_url
+
 Base = declarative_base()
 
 
@@ -591,20 +593,30 @@ class EmailBlacklist(Base):
     campaign_id = Column(Integer, nullable=True)  # Dernière campagne où l'email a bounce
 
 
-# Configuration de la base de données
+# Configuration de la base de données: SQLite par défaut, PostgreSQL si CAMPAIGN_DATABASE_URL (db_engine.py)
 import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_URL = f'sqlite:///{BASE_DIR}/campaigns.db'
+DATABASE_URL = database_url('CAMPAIGN_DATABASE_URL', f'{BASE_DIR}/campaigns.db')
+
+# Engine partagé par process (un engine par appel ouvrait un nouveau pool à chaque session)
+_engine = None
+
+def get_campaign_engine():
+    """Obtenir ou créer l'engine des campagnes"""
+    global _engine
+    if _engine is None:
+        _engine = create_database_engine(DATABASE_URL)
+    return _engine
 
 def init_campaign_db():
     """Initialiser la base de données des campagnes"""
-    engine = create_engine(DATABASE_URL)
+    engine = get_campaign_engine()
     Base.metadata.create_all(engine)
     return engine
 
 def get_campaign_session():
     """Obtenir une session de base de données"""
-    engine = create_engine(DATABASE_URL)
+    engine = get_campaign_engine()
     Session = sessionmaker(bind=engine)
     return Session()
 
@@ -612,4 +624,4 @@ def get_campaign_session():
 if __name__ == '__main__':
     print("Création de la base de données des campagnes...")
     init_campaign_db()
-    print("✓ Base de données créée avec succès : campaigns.db")
+    print(f"✓ Base de données créée avec succès : {get_campaign_engine().url.render_as_string(hide_password=True)}")
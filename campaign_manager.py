@@ -140,9 +140,7 @@ class CampaignManager:
     def _build_generic_query(self, campaign: Campaign):
         """Construire une requête générique sans segment"""
         query = self.site_session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND',
+            Site.has_email == True,
             Site.email_validated == True,
             Site.email_validation_score >= campaign.min_validation_score,
             Site.is_active == True
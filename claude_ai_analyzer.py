@@ -157,12 +157,12 @@ class ClaudeAIAnalyzer:
 
         try:
             # Stats workers
-            workers_file = os.path.join(PROJECT_PATH, 'crawl_workers.json')
-            if os.path.exists(workers_file):
-                with open(workers_file, 'r') as f:
-                    workers_data = json.load(f)
-                    metrics['active_workers'] = len([w for w in workers_data.values()
-                                                    if isinstance(w, dict) and w.get('last_heartbeat')])
+            workers_db = os.path.join(PROJECT_PATH, 'crawl_workers.db')
+            if os.path.exists(workers_db):
+                from worker_registry import WorkerRegistry
+                workers_data = WorkerRegistry(workers_db).load(clean_inactive=False)
+                metrics['active_workers'] = len([w for w in workers_data['workers'].values()
+                                                if w.get('last_heartbeat')])
         except Exception as e:
             logger.warning(f"Erreur collecte métriques workers: {e}")
 
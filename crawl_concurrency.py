@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Contrôle de la concurrence pour les workers de crawl
+
+Utilisé par crawl_worker_multi.py (à déployer avec lui dans le dossier du
+worker).
+
+AdaptiveConcurrencyLimiter remplace le asyncio.Semaphore fixe par site: la limite augmente
+de 1 (additive) tant que la latence et le taux d'erreur restent sains, et
+est divisée par 2 (multiplicative) sur timeout, 429 ou 503. Un petit
+WordPress mutualisé descend vite à quelques requêtes simultanées, un site
+derrière un CDN monte jusqu'à max_limit.
+
+Usage:
+    limiter = AdaptiveConcurrencyLimiter(initial=25)
+    async with limiter:
+        started = time.monotonic()
+        ...
+    limiter.record(time.monotonic() - started, response.status)
+
+FairSlotPool est le pool global de requêtes en vol du worker, partagé par
+tous les sites en cours: quand un créneau se libère il est attribué au site
+suivant en round-robin, pour qu'un gros site ne monopolise pas la connexion
+pendant que les petits attendent. Son taux d'occupation indique au worker
+quand demander de nouveaux sites au coordinateur.
+
+    pool = FairSlotPool(200)
+    async with pool.slot(site_id):
+        ...
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable, Optional, Union
+
+# Bornes par défaut
+DEFAULT_MIN_LIMIT = 2
+DEFAULT_MAX_LIMIT = 100
+
+# Réglages AIMD
+BACKOFF_FACTOR = 0.5  # Réduction multiplicative sur surcharge
+MIN_WINDOW = 10  # Requêtes minimum observées avant d'augmenter la limite
+HEALTHY_ERROR_RATE = 0.05  # En dessous: on peut augmenter
+MAX_ERROR_RATE = 0.25  # Au-dessus: on réduit même sans 429/503
+LATENCY_TOLERANCE = 2.0  # Latence saine = moins de 2x la meilleure latence observée
+LATENCY_ALPHA = 0.2  # Lissage de la moyenne mobile exponentielle
+DECREASE_COOLDOWN = 1.0  # secondes minimum entre deux réductions
+
+OVERLOAD_STATUSES = {429, 503}
+
+Outcome = Union[int, str]  # code HTTP, 'timeout' ou 'error'
+
+
+class AdaptiveConcurrencyLimiter:
+    """Sémaphore asyncio dont la limite suit un contrôle AIMD"""
+
+    def __init__(self, initial: int, min_limit: int = DEFAULT_MIN_LIMIT,
+                 max_limit: int = DEFAULT_MAX_LIMIT, latency_budget: Optional[float] = None):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        # Au-delà de ce budget (ex: moitié du timeout), la latence n'est jamais saine
+        self.latency_budget = latency_budget
+        self.in_flight = 0
+        self._waiters = deque()
+
+        # Fenêtre d'observation courante
+        self.window_requests = 0
+        self.window_errors = 0
+
+        self.latency_ewma: Optional[float] = None
+        self.latency_floor: Optional[float] = None
+        self.last_decrease = 0.0
+
+        # Compteurs cumulés (heartbeat)
+        self.requests = 0
+        self.errors = 0
+        self.overloads = 0
+        self.increases = 0
+        self.decreases = 0
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _wake_waiters(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    @property
+    def batch_size(self) -> int:
+        """Nombre d'URLs à lancer d'un coup pour remplir la limite courante"""
+        return max(1, int(self.limit))
+
+    def record(self, latency: float, outcome: Outcome):
+        """Enregistrer le résultat d'une requête et ajuster la limite"""
+        overloaded = outcome == 'timeout' or outcome in OVERLOAD_STATUSES
+        failed = overloaded or outcome == 'error' or (isinstance(outcome, int) and outcome >= 500)
+
+        self.requests += 1
+        self.window_requests += 1
+        if failed:
+            self.errors += 1
+            self.window_errors += 1
+
+        if outcome != 'timeout':
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += LATENCY_ALPHA * (latency - self.latency_ewma)
+            if self.latency_floor is None or self.latency_ewma < self.latency_floor:
+                self.latency_floor = self.latency_ewma
+
+        if overloaded:
+            self.overloads += 1
+            self._decrease()
+            return
+
+        if self.window_requests < max(MIN_WINDOW, int(self.limit)):
+            return
+
+        error_rate = self.window_errors / self.window_requests
+        if error_rate > MAX_ERROR_RATE:
+            self._decrease()
+        elif error_rate <= HEALTHY_ERROR_RATE and self._latency_is_healthy():
+            if self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1)
+                self.increases += 1
+                self._wake_waiters()
+            self._reset_window()
+        else:
+            self._reset_window()
+
+    def _latency_is_healthy(self) -> bool:
+        if self.latency_ewma is None:
+            return True
+        if self.latency_budget is not None and self.latency_ewma > self.latency_budget:
+            return False
+        return self.latency_ewma <= self.latency_floor * LATENCY_TOLERANCE
+
+    def _decrease(self):
+        now = time.monotonic()
+        # Les requêtes déjà en vol échouent en rafale: une seule réduction par aller-retour
+        if now - self.last_decrease < max(DECREASE_COOLDOWN, self.latency_ewma or 0):
+            return
+        self.limit = max(float(self.min_limit), self.limit * BACKOFF_FACTOR)
+        self.last_decrease = now
+        self.decreases += 1
+        self._reset_window()
+
+    def _reset_window(self):
+        self.window_requests = 0
+        self.window_errors = 0
+
+    def snapshot(self) -> Dict:
+        """État courant, pour le heartbeat (sites_in_progress)"""
+        return {
+            'limit': int(self.limit),
+            'in_flight': self.in_flight,
+            'latency_ms': int(self.latency_ewma * 1000) if self.latency_ewma is not None else None,
+            'error_rate': round(self.errors / self.requests, 3) if self.requests else 0,
+            'overloads': self.overloads,
+            'increases': self.increases,
+            'decreases': self.decreases,
+        }
+
+
+class FairSlotPool:
+    """Pool global de créneaux de requêtes, distribués en round-robin entre sites"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.in_flight = 0
+        self._waiting: "OrderedDict[Hashable, deque]" = OrderedDict()
+
+    async def acquire(self, key: Hashable):
+        if self.in_flight < self.size and not self._waiting:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(key, deque()).append(waiter)
+        try:
+            # Le créneau est transféré par release(): in_flight est déjà incrémenté
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(key, waiter)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._grant()
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable):
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _grant(self):
+        while self.in_flight < self.size and self._waiting:
+            key, queue = next(iter(self._waiting.items()))
+            waiter = queue.popleft()
+            # Le site servi repasse en fin de tour
+            del self._waiting[key]
+            if queue:
+                self._waiting[key] = queue
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _discard(self, key: Hashable, waiter):
+        queue = self._waiting.get(key)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._waiting[key]
+
+    @property
+    def free(self) -> int:
+        return max(0, self.size - self.in_flight)
+
+    @property
+    def waiting_sites(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def utilization(self) -> float:
+        return self.in_flight / self.size if self.size else 1.0
+
+    def snapshot(self) -> Dict:
+        """État courant, pour le heartbeat"""
+        return {
+            'slots': self.size,
+            'in_flight': self.in_flight,
+            'utilization': round(self.utilization, 2),
+            'waiting_sites': self.waiting_sites,
+        }
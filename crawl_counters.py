@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Compteurs journaliers du crawl distribué (pages, vendeurs, emails par worker)
+
+Remplace crawl_daily_pages.json / crawl_daily_emails.json, qui étaient relus
+et réécrits à chaque résultat. Chaque process accumule les compteurs en
+mémoire; un thread les écrit toutes les COUNTERS_FLUSH_INTERVAL secondes
+par incréments atomiques (`pages = pages + :delta`) dans la table
+crawl_daily_counters (une ligne par jour et par worker), qui sert ensuite
+directement /api/crawl/daily-stats et /api/crawl/email-stats. Les lectures
+n'écrivent rien: elles ajoutent aux lignes de la table les deltas pas encore
+écrits du process.
+
+Les anciens compteurs (crawl_daily_stats, fichiers JSON) sont repris à la
+première écriture, en INSERT ... ON CONFLICT DO NOTHING: deux process qui
+démarrent en même temps ne les comptent pas deux fois.
+
+Usage:
+    counters = DailyCounters(get_session)
+    counters.add(worker_id, pages=150, sellers=1)
+    counters.load(days=14)  # {'2025-12-02': {'pages': ..., 'workers': {...}}, ...}
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_FLUSH_INTERVAL = 10  # secondes entre deux écritures
+COUNTER_NAMES = ('pages', 'sellers', 'emails', 'email_sites')
+UNATTRIBUTED_WORKER = ''  # Part des anciens totaux sans détail par worker
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS crawl_daily_counters (
+        date VARCHAR(10) NOT NULL,
+        worker_id VARCHAR(255) NOT NULL,
+        pages INTEGER NOT NULL DEFAULT 0,
+        sellers INTEGER NOT NULL DEFAULT 0,
+        emails INTEGER NOT NULL DEFAULT 0,
+        email_sites INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (date, worker_id)
+    )
+    """,
+]
+
+UPSERT_SQL = text("""
+    INSERT INTO crawl_daily_counters (date, worker_id, pages, sellers, emails, email_sites, updated_at)
+    VALUES (:date, :worker_id, :pages, :sellers, :emails, :email_sites, CURRENT_TIMESTAMP)
+    ON CONFLICT (date, worker_id) DO UPDATE SET
+        pages = crawl_daily_counters.pages + excluded.pages,
+        sellers = crawl_daily_counters.sellers + excluded.sellers,
+        emails = crawl_daily_counters.emails + excluded.emails,
+        email_sites = crawl_daily_counters.email_sites + excluded.email_sites,
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+# Reprise des anciens compteurs: une ligne déjà présente (reprise par un autre process) est laissée telle quelle
+SEED_SQL = text("""
+    INSERT INTO crawl_daily_counters (date, worker_id, pages, sellers, emails, email_sites, updated_at)
+    VALUES (:date, :worker_id, :pages, :sellers, :emails, :email_sites, CURRENT_TIMESTAMP)
+    ON CONFLICT (date, worker_id) DO NOTHING
+""")
+
+
+class DailyCounters:
+    """Compteurs par (jour, worker) agrégés en mémoire puis écrits par delta"""
+
+    def __init__(self, session_factory: Callable, legacy_pages_json: Optional[Path] = None,
+                 legacy_emails_json: Optional[Path] = None):
+        self.session_factory = session_factory
+        self.legacy_pages_json = legacy_pages_json
+        self.legacy_emails_json = legacy_emails_json
+        self._lock = threading.Lock()
+        self._pending: Dict[tuple, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTER_NAMES, 0))
+        self._pid = None
+        self._initialized = False
+
+    def add(self, worker_id: str, **deltas):
+        """Ajouter des deltas (pages, sellers, emails, email_sites) au compteur du jour"""
+        key = (datetime.utcnow().strftime('%Y-%m-%d'), worker_id or 'unknown')
+        with self._lock:
+            counters = self._pending[key]
+            for name, delta in deltas.items():
+                counters[name] += int(delta or 0)
+        self._ensure_flusher()
+
+    def flush(self):
+        """Écrire les deltas en attente de ce process en une transaction"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(COUNTER_NAMES, 0))
+
+        rows = [{'date': date, 'worker_id': worker_id, **counters}
+                for (date, worker_id), counters in pending.items()]
+        session = self.session_factory()
+        try:
+            self._initialize(session)
+            session.execute(UPSERT_SQL, rows)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"❌ Erreur flush compteurs journaliers: {e}")
+            # Remettre les deltas pour le prochain flush
+            with self._lock:
+                for key, counters in pending.items():
+                    for name, delta in counters.items():
+                        self._pending[key][name] += delta
+        finally:
+            session.close()
+
+    def load(self, days: int = 30) -> Dict[str, Dict]:
+        """
+        Compteurs des `days` derniers jours, deltas non écrits de ce process compris
+        (lecture seule): {date: {'pages', 'sellers', 'emails', 'email_sites', 'workers': {worker_id: {...}}}}
+        """
+        since = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        rows = defaultdict(lambda: dict.fromkeys(COUNTER_NAMES, 0))
+        session = self.session_factory()
+        try:
+            result = session.execute(text("""
+                SELECT date, worker_id, pages, sellers, emails, email_sites
+                FROM crawl_daily_counters
+                WHERE date >= :since
+            """), {'since': since})
+            for date, worker_id, pages, sellers, emails, email_sites in result:
+                values = {'pages': pages, 'sellers': sellers, 'emails': emails, 'email_sites': email_sites}
+                for name, value in values.items():
+                    rows[(date, worker_id)][name] += value or 0
+        except Exception as e:
+            # Table créée au premier flush
+            logger.debug(f"Compteurs journaliers illisibles: {e}")
+        finally:
+            session.close()
+
+        with self._lock:
+            for key, counters in self._pending.items():
+                if key[0] >= since:
+                    for name, delta in counters.items():
+                        rows[key][name] += delta
+
+        data = {}
+        for (date, worker_id), values in rows.items():
+            day = data.setdefault(date, {**dict.fromkeys(COUNTER_NAMES, 0), 'workers': {}})
+            for name, value in values.items():
+                day[name] += value
+            if worker_id != UNATTRIBUTED_WORKER:
+                day['workers'][worker_id] = values
+        return data
+
+    # ------------------------------------------------------------------
+    # Création de la table et reprise des anciens compteurs
+    # ------------------------------------------------------------------
+
+    def _initialize(self, session):
+        if self._initialized:
+            return
+        for statement in SCHEMA:
+            session.execute(text(statement))
+        empty = session.execute(text("SELECT 1 FROM crawl_daily_counters LIMIT 1")).first() is None
+        if empty:
+            rows = self._legacy_rows(session)
+            if rows:
+                session.execute(SEED_SQL, rows)
+                logger.info(f"📥 {len(rows)} compteurs journaliers repris des anciens fichiers")
+        session.commit()
+        self._initialized = True
+
+    def _legacy_rows(self, session):
+        """Lignes (jour, worker) depuis crawl_daily_stats et les fichiers JSON"""
+        pages_days = {}
+        try:
+            result = session.execute(text("SELECT date, pages_crawled, sellers_crawled, workers_data FROM crawl_daily_stats"))
+            for date, pages, sellers, workers_raw in result:
+                date_str = date.strftime('%Y-%m-%d') if hasattr(date, 'strftime') else str(date)
+                workers = json.loads(workers_raw) if isinstance(workers_raw, str) else (workers_raw or {})
+                pages_days[date_str] = {'total': pages or 0, 'sellers': sellers or 0, 'workers': workers}
+        except Exception:
+            session.rollback()
+            for statement in SCHEMA:
+                session.execute(text(statement))
+        for date_str, day in _read_json(self.legacy_pages_json).items():
+            if isinstance(day, int):
+                day = {'total': day, 'workers': {}}
+            if day.get('total', 0) > pages_days.get(date_str, {}).get('total', 0):
+                pages_days[date_str] = day
+
+        rows = defaultdict(lambda: dict.fromkeys(COUNTER_NAMES, 0))
+        for date_str, day in pages_days.items():
+            for worker_id, w in day.get('workers', {}).items():
+                rows[(date_str, worker_id)]['pages'] += w.get('pages', 0)
+                rows[(date_str, worker_id)]['sellers'] += w.get('sellers', 0)
+            workers = day.get('workers', {}).values()
+            rows[(date_str, UNATTRIBUTED_WORKER)]['pages'] += max(
+                0, day.get('total', 0) - sum(w.get('pages', 0) for w in workers))
+            rows[(date_str, UNATTRIBUTED_WORKER)]['sellers'] += max(
+                0, day.get('sellers', 0) - sum(w.get('sellers', 0) for w in workers))
+
+        for date_str, day in _read_json(self.legacy_emails_json).items():
+            if not isinstance(day, dict):
+                continue
+            for worker_id, w in day.get('workers', {}).items():
+                rows[(date_str, worker_id)]['emails'] += w.get('emails', 0)
+                rows[(date_str, worker_id)]['email_sites'] += w.get('sites', 0)
+            attributed = [sum(w.get(k, 0) for w in day.get('workers', {}).values()) for k in ('emails', 'sites')]
+            rows[(date_str, UNATTRIBUTED_WORKER)]['emails'] += max(0, day.get('emails', 0) - attributed[0])
+            rows[(date_str, UNATTRIBUTED_WORKER)]['email_sites'] += max(0, day.get('sites', 0) - attributed[1])
+
+        return [{'date': date, 'worker_id': worker_id, **counters}
+                for (date, worker_id), counters in rows.items() if any(counters.values())]
+
+    # ------------------------------------------------------------------
+    # Thread de flush (un par process, recréé après un fork gunicorn)
+    # ------------------------------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='daily-counters-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(COUNTERS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Erreur thread compteurs journaliers: {e}")
+
+
+def _read_json(path: Optional[Path]) -> Dict:
+    if not path or not Path(path).exists():
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f) or {}
+    except Exception:
+        return {}
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Frontière d'URLs pour le crawl des sites vendeurs
+
+Utilisée par crawl_worker.py et crawl_worker_multi.py (à déployer avec eux
+dans le dossier du worker sur les serveurs distants).
+
+- Déduplication par empreinte 64 bits dans un filtre de Bloom extensible:
+  quelques octets par URL au lieu de la chaîne complète dans un set.
+- File de priorité: les pages d'articles et les pages peu profondes passent
+  en premier, les pages tag/auteur/flux en dernier.
+- Checkpoint sur disque (JSON gzip) pour qu'un worker tué reprenne le site
+  là où il en était au lieu de recommencer depuis la page d'accueil.
+
+Usage:
+    frontier = URLFrontier.load_checkpoint(path) or URLFrontier()
+    frontier.add('https://example.fr/')
+    while frontier:
+        batch = frontier.pop_batch(25)
+        ...
+        frontier.task_done()
+        if frontier.checkpoint_due():
+            frontier.save_checkpoint(path)
+"""
+
+import base64
+import gzip
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+# Configuration par défaut
+DEFAULT_CHECKPOINT_DIR = Path(os.environ.get(
+    'CRAWL_CHECKPOINT_DIR',
+    Path(__file__).resolve().parent / 'crawl_checkpoints'
+))
+CHECKPOINT_INTERVAL = 60  # secondes entre deux checkpoints
+CHECKPOINT_MAX_AGE = 24 * 3600  # Un checkpoint plus vieux est ignoré
+BLOOM_INITIAL_CAPACITY = 4096
+BLOOM_ERROR_RATE = 0.0001  # Probabilité de sauter une URL jamais vue
+DEFAULT_MAX_QUEUE = 50000  # URLs en attente max (les moins prioritaires sont abandonnées)
+
+# Scoring des URLs (score bas = crawlé en premier)
+DEPTH_WEIGHT = 10
+INTERESTING_BONUS = 25
+LOW_VALUE_PENALTY = 30
+
+# Pages susceptibles de contenir des liens sortants (articles, partenaires...)
+INTERESTING_PATTERN = re.compile(
+    r'/(blog|articles?|actus?|actualites?|news|posts?|partenaires?|partenariats?|'
+    r'guides?|conseils?|dossiers?|magazine|chroniques?|tribunes?)(/|$)'
+    r'|/\d{4}/\d{2}/'
+    r'|\.html?$',
+    re.IGNORECASE
+)
+
+# Pages qui ne font que lister ou dupliquer du contenu
+LOW_VALUE_PATTERN = re.compile(
+    r'/(tag|tags|author|auteur|feed|rss|wp-json|comments?|panier|cart|checkout|'
+    r'mon-compte|my-account|login|connexion|wp-login\.php|xmlrpc\.php)(/|$)',
+    re.IGNORECASE
+)
+
+
+def url_fingerprint(url: str) -> int:
+    """Empreinte 64 bits d'une URL (blake2b)"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8', 'replace'), digest_size=8).digest(), 'big')
+
+
+def score_url(url: str) -> int:
+    """Priorité d'une URL interne: profondeur du chemin, bonus/malus selon le type de page"""
+    path = urlparse(url).path
+    depth = len([segment for segment in path.split('/') if segment])
+    score = depth * DEPTH_WEIGHT
+    if INTERESTING_PATTERN.search(path):
+        score -= INTERESTING_BONUS
+    if LOW_VALUE_PATTERN.search(path):
+        score += LOW_VALUE_PENALTY
+    return score
+
+
+class BloomFilter:
+    """Filtre de Bloom à capacité fixe (double hachage sur une empreinte 64 bits)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, fingerprint: int):
+        h1 = fingerprint >> 32
+        h2 = (fingerprint & 0xFFFFFFFF) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def __contains__(self, fingerprint: int) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fingerprint))
+
+    def add(self, fingerprint: int):
+        bits = self.bits
+        for pos in self._positions(fingerprint):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def to_dict(self) -> Dict:
+        return {
+            'capacity': self.capacity,
+            'error_rate': self.error_rate,
+            'count': self.count,
+            'bits': base64.b64encode(bytes(self.bits)).decode('ascii'),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BloomFilter':
+        bloom = cls(data['capacity'], data['error_rate'])
+        bloom.bits = bytearray(base64.b64decode(data['bits']))
+        bloom.count = data['count']
+        return bloom
+
+
+class ScalableBloomFilter:
+    """
+    Filtre de Bloom extensible: un nouvel étage (2x plus grand, taux d'erreur
+    divisé par 2) est ajouté quand le dernier est plein, ce qui borne le taux
+    de faux positifs global sans connaître le nombre d'URLs à l'avance.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, initial_capacity: int = BLOOM_INITIAL_CAPACITY,
+                 error_rate: float = BLOOM_ERROR_RATE):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.stages: List[BloomFilter] = []
+
+    def __contains__(self, fingerprint: int) -> bool:
+        return any(fingerprint in stage for stage in self.stages)
+
+    def __len__(self) -> int:
+        return sum(stage.count for stage in self.stages)
+
+    def add(self, fingerprint: int) -> bool:
+        """Ajouter une empreinte. Retourne False si elle était (probablement) déjà présente"""
+        if fingerprint in self:
+            return False
+        if not self.stages or self.stages[-1].is_full():
+            n = len(self.stages)
+            self.stages.append(BloomFilter(
+                self.initial_capacity * (self.GROWTH ** n),
+                self.error_rate * (1 - self.TIGHTENING) * (self.TIGHTENING ** n)
+            ))
+        self.stages[-1].add(fingerprint)
+        return True
+
+    def to_dict(self) -> Dict:
+        return {
+            'initial_capacity': self.initial_capacity,
+            'error_rate': self.error_rate,
+            'stages': [stage.to_dict() for stage in self.stages],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ScalableBloomFilter':
+        bloom = cls(data['initial_capacity'], data['error_rate'])
+        bloom.stages = [BloomFilter.from_dict(stage) for stage in data['stages']]
+        return bloom
+
+
+class URLFrontier:
+    """File de priorité d'URLs internes avec déduplication et checkpoint"""
+
+    def __init__(self, max_queue: int = DEFAULT_MAX_QUEUE):
+        self.max_queue = max_queue
+        self.seen = ScalableBloomFilter()
+        self.queue = []  # heap de (score, seq, url)
+        self.seq = 0
+        self.in_flight: List[str] = []
+        self.pages_crawled = 0
+        self.meta: Dict = {}  # Données libres du worker sauvegardées avec le checkpoint
+        self.last_checkpoint = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def __bool__(self) -> bool:
+        return bool(self.queue)
+
+    def add(self, url: str, score: Optional[int] = None) -> bool:
+        """Ajouter une URL si elle n'a jamais été vue. Retourne True si ajoutée"""
+        if not self.seen.add(url_fingerprint(url)):
+            return False
+        self._push(url, score_url(url) if score is None else score)
+        return True
+
+    def _push(self, url: str, score: int):
+        heapq.heappush(self.queue, (score, self.seq, url))
+        self.seq += 1
+        if len(self.queue) > self.max_queue * 2:
+            # Abandonner les URLs les moins prioritaires (elles restent marquées vues)
+            self.queue = heapq.nsmallest(self.max_queue, self.queue)
+            heapq.heapify(self.queue)
+
+    def pop(self) -> Optional[str]:
+        """Prendre l'URL la plus prioritaire (comptée comme crawlée, en vol jusqu'à task_done)"""
+        if not self.queue:
+            return None
+        url = heapq.heappop(self.queue)[2]
+        self.in_flight.append(url)
+        self.pages_crawled += 1
+        return url
+
+    def pop_batch(self, size: int) -> List[str]:
+        """Prendre les `size` URLs les plus prioritaires"""
+        batch = []
+        while self.queue and len(batch) < size:
+            batch.append(self.pop())
+        return batch
+
+    def task_done(self, url: Optional[str] = None):
+        """Une URL (ou toutes celles en vol) est traitée: elle ne sera plus rejouée après une reprise"""
+        if url is None:
+            self.in_flight = []
+        elif url in self.in_flight:
+            self.in_flight.remove(url)
+
+    def checkpoint_due(self) -> bool:
+        return time.monotonic() - self.last_checkpoint >= CHECKPOINT_INTERVAL
+
+    def to_dict(self) -> Dict:
+        return {
+            'saved_at': time.time(),
+            'pages_crawled': self.pages_crawled - len(self.in_flight),
+            'max_queue': self.max_queue,
+            # Le batch en vol est remis en tête de file à la reprise
+            'queue': [[-1, url] for url in self.in_flight] + [[score, url] for score, _, url in self.queue],
+            'seen': self.seen.to_dict(),
+            'meta': self.meta,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'URLFrontier':
+        frontier = cls(max_queue=data.get('max_queue', DEFAULT_MAX_QUEUE))
+        frontier.seen = ScalableBloomFilter.from_dict(data['seen'])
+        frontier.pages_crawled = data.get('pages_crawled', 0)
+        frontier.meta = data.get('meta', {})
+        for score, url in data.get('queue', []):
+            frontier._push(url, score)
+        return frontier
+
+    def save_checkpoint(self, path: Path):
+        """Écrire le checkpoint de façon atomique (fichier temporaire + rename)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+        self.last_checkpoint = time.monotonic()
+
+    @classmethod
+    def load_checkpoint(cls, path: Path, max_age: int = CHECKPOINT_MAX_AGE) -> Optional['URLFrontier']:
+        """Recharger un checkpoint récent, ou None s'il est absent, périmé ou illisible"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            if time.time() - data.get('saved_at', 0) > max_age:
+                remove_checkpoint(path)
+                return None
+            return cls.from_dict(data)
+        except Exception:
+            remove_checkpoint(path)
+            return None
+
+
+def checkpoint_path(domain: str, checkpoint_dir: Path = DEFAULT_CHECKPOINT_DIR) -> Path:
+    """Chemin du checkpoint d'un site vendeur"""
+    safe_domain = re.sub(r'[^a-z0-9.-]', '_', (domain or 'unknown').lower())
+    return Path(checkpoint_dir) / f'{safe_domain}.frontier.json.gz'
+
+
+def remove_checkpoint(path: Path):
+    """Supprimer un checkpoint (site terminé)"""
+    try:
+        Path(path).unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+File d'attente des tâches du crawl distribué (baux par worker)
+
+Remplace la sélection directe dans `sites` (filtres + FOR UPDATE SKIP LOCKED,
+qui n'a aucun effet sous SQLite, + filtrage de la blacklist en Python à
+chaque demande) par une table crawl_queue alimentée par lots:
+
+- une ligne par (file, site) avec la priorité précalculée, le domaine et l'URL;
+- une réservation = un seul UPDATE ... RETURNING qui pose un bail
+  (lease_owner, lease_expires_at) sur les lignes libres les plus prioritaires
+  et compte la tentative (attempts);
+- les heartbeats prolongent les baux du worker, les baux expirés
+  (worker mort) sont libérés automatiquement;
+- après MAX_ATTEMPTS baux sans résultat, la ligne n'est plus réservée
+  (site qui fait planter ou expirer les workers); elle reste dans la file
+  pour ne pas être réinsérée et apparaît dans stats() ('exhausted');
+- le résultat d'un site supprime sa ligne (dans la même transaction);
+- l'éligibilité (ELIGIBLE_SQL, reprise des critères de sélection) est
+  revérifiée à chaque réservation: un site qui a trouvé son email, été
+  blacklisté, désactivé ou crawlé entretemps n'est plus distribué, et sa
+  ligne est supprimée au remplissage suivant. Le payload 'missing' de la
+  file 'enrich' est recalculé à la réservation;
+- les candidats blacklistés par domain_policy sont marqués blacklisted dans
+  `sites` au remplissage (sinon re-sélectionnés à chaque remplissage).
+
+La table et ses index sont créés par migrate_add_crawl_queue.py.
+
+Trois files: 'crawl' (/api/crawl/task), 'email' (/api/crawl/email-task)
+et 'enrich' (/api/crawl/enrich-buyers-task).
+
+Usage:
+    queue = CrawlQueue(policy_loader=domain_policy.current)
+    tasks = queue.claim(session, 'crawl', worker_id, limit=10)
+    queue.complete(session, 'crawl', [site_id])
+    session.commit()
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, inspect, or_, text, update
+
+from database import Site
+from domain_policy import DomainPolicy
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5  # baux posés sur un site avant de l'écarter de la file
+REFILL_INTERVAL = 30  # secondes min entre deux remplissages d'une file (par process)
+REAP_INTERVAL = 30  # secondes min entre deux libérations des baux expirés
+RENEW_INTERVAL = 60  # secondes min entre deux prolongations des baux d'un worker
+
+# Bail initial (= ancien délai avant réattribution) et taille des remplissages
+QUEUES = {
+    'crawl': {'lease': timedelta(minutes=10), 'low_watermark': 500, 'refill_batch': 2000},
+    'email': {'lease': timedelta(minutes=30), 'low_watermark': 1000, 'refill_batch': 5000},
+    'enrich': {'lease': timedelta(minutes=30), 'low_watermark': 1000, 'refill_batch': 5000},
+}
+
+# Ordres de réservation possibles (jamais construits depuis la requête HTTP)
+CLAIM_ORDERS = {
+    'priority': 'q.priority, q.site_id',
+    'alt_priority': 'q.alt_priority, q.site_id',
+    'site_id': 'q.site_id',
+}
+
+# Critères des candidats (_*_candidates) revérifiés sur `sites` à la réservation
+# (hors exclusions de domaines, fixes). :retry_threshold = maintenant - bail de la file
+ELIGIBLE_SQL = {
+    'crawl': """
+        sites.is_link_seller = true AND sites.backlinks_crawled = false
+        AND sites.blacklisted = false AND sites.is_active = true
+    """,
+    'email': """
+        sites.has_email = false AND sites.blacklisted = false
+        AND (sites.email_crawl_at IS NULL OR sites.email_crawl_at < :retry_threshold)
+    """,
+    'enrich': """
+        sites.purchased_from IS NOT NULL AND sites.blacklisted = false AND sites.is_active = true
+        AND (sites.emails IS NULL OR sites.emails = '' OR sites.language IS NULL OR sites.cms IS NULL)
+        AND (sites.email_crawl_at IS NULL OR sites.email_crawl_at < :retry_threshold)
+    """,
+}
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS crawl_queue (
+        queue VARCHAR(20) NOT NULL,
+        site_id INTEGER NOT NULL,
+        domain VARCHAR(255) NOT NULL,
+        url TEXT,
+        priority INTEGER NOT NULL DEFAULT 0,
+        alt_priority INTEGER NOT NULL DEFAULT 0,
+        payload TEXT,
+        lease_owner VARCHAR(255),
+        lease_expires_at TIMESTAMP,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        enqueued_at TIMESTAMP,
+        PRIMARY KEY (queue, site_id)
+    )
+    """,
+    # Lignes réservables uniquement (index partiels)
+    "CREATE INDEX IF NOT EXISTS ix_crawl_queue_claimable ON crawl_queue (queue, priority, site_id) WHERE lease_owner IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_crawl_queue_claimable_alt ON crawl_queue (queue, alt_priority, site_id) WHERE lease_owner IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_crawl_queue_leases ON crawl_queue (lease_owner, lease_expires_at) WHERE lease_owner IS NOT NULL",
+]
+
+ENQUEUE_SQL = text("""
+    INSERT INTO crawl_queue (queue, site_id, domain, url, priority, alt_priority, payload, enqueued_at)
+    VALUES (:queue, :site_id, :domain, :url, :priority, :alt_priority, :payload, :enqueued_at)
+    ON CONFLICT (queue, site_id) DO NOTHING
+""")
+
+BLACKLIST_REASON = "Blacklist du crawl distribué (domain_policy)"
+
+NOT_QUEUED = "NOT EXISTS (SELECT 1 FROM crawl_queue q WHERE q.queue = :queue AND q.site_id = sites.id)"
+
+
+def _site_url(site) -> str:
+    if site.source_url and site.source_url.startswith('http'):
+        return site.source_url
+    return f"https://{site.domain}"
+
+
+# ============================================================================
+# Sites éligibles par file (mêmes critères que l'ancienne sélection directe)
+# ============================================================================
+
+def _crawl_candidates(session, limit: int):
+    # Note: Un site peut être vendeur ET acheteur, donc on filtre sur is_link_seller, pas purchased_from
+    priority = case((Site.domain.like('%.fr'), 0), else_=1)
+    query = session.query(Site).filter(
+        Site.is_link_seller == True,
+        Site.backlinks_crawled == False,
+        Site.blacklisted == False,
+        Site.is_active == True,
+        ~Site.domain.like('%.gouv.fr'),
+        ~Site.domain.like('%.senat.fr'),
+        ~Site.domain.like('%.assemblee-nationale.fr'),
+    ).order_by(priority, Site.id)
+    for site in query.filter(text(NOT_QUEUED)).params(queue='crawl').limit(limit):
+        yield site, {
+            'priority': 0 if site.domain.endswith('.fr') else 1,
+            'alt_priority': 0,
+            'payload': {},
+        }
+
+
+def _email_candidates(session, limit: int):
+    # Sellers d'abord, puis .fr; pas traités pour email depuis 30 minutes
+    priority = case((Site.purchased_from.is_(None), 0), (Site.domain.like('%.fr'), 1), else_=2)
+    retry_threshold = datetime.utcnow() - QUEUES['email']['lease']
+    query = session.query(Site).filter(
+        Site.has_email == False,
+        Site.blacklisted == False,
+        or_(Site.email_crawl_at.is_(None), Site.email_crawl_at < retry_threshold)
+    ).order_by(priority, Site.id)
+    for site in query.filter(text(NOT_QUEUED)).params(queue='email').limit(limit):
+        is_seller = site.purchased_from is None
+        yield site, {
+            'priority': 0 if is_seller else (1 if site.domain.endswith('.fr') else 2),
+            'alt_priority': 0,
+            'payload': {'is_seller': is_seller},
+        }
+
+
+def _enrich_candidates(session, limit: int):
+    # Acheteurs auxquels il manque email, langue ou CMS; pas traités depuis 30 minutes
+    priority = case((or_(Site.emails.is_(None), Site.emails == ''), 0), (Site.language.is_(None), 1), else_=2)
+    retry_threshold = datetime.utcnow() - QUEUES['enrich']['lease']
+    query = session.query(Site).filter(
+        Site.purchased_from.isnot(None),
+        Site.blacklisted == False,
+        Site.is_active == True,
+        or_(Site.emails.is_(None), Site.emails == '', Site.language.is_(None), Site.cms.is_(None)),
+        or_(Site.email_crawl_at.is_(None), Site.email_crawl_at < retry_threshold)
+    ).order_by(priority, Site.id)
+    for site in query.filter(text(NOT_QUEUED)).params(queue='enrich').limit(limit):
+        yield site, {
+            # priority: email d'abord (défaut), alt_priority: langue d'abord
+            'priority': 0 if not site.emails else (1 if not site.language else 2),
+            'alt_priority': 0 if not site.language else (1 if not site.emails else 2),
+            'payload': {'purchased_from': site.purchased_from, 'missing': _enrich_missing(site)},
+        }
+
+
+def _enrich_missing(site) -> List[str]:
+    """Informations à chercher pour un acheteur (payload 'missing' de la file 'enrich')"""
+    missing = []
+    if not site.emails:
+        missing.append('email')
+    if not site.language:
+        missing.append('language')
+    if not site.cms:
+        missing.append('cms')
+    if site.domain.endswith('.fr') and not site.siret:
+        missing.append('siret')
+    return missing
+
+
+CANDIDATES = {
+    'crawl': _crawl_candidates,
+    'email': _email_candidates,
+    'enrich': _enrich_candidates,
+}
+
+
+class CrawlQueue:
+    """Files de tâches avec baux, partagées par tous les process de l'API"""
+
+    def __init__(self, policy_loader: Optional[Callable[[], DomainPolicy]] = None):
+        self.policy_loader = policy_loader
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._last_refill: Dict[str, float] = {}
+        self._last_reap = 0.0
+        self._last_renew: Dict[str, float] = {}
+
+    def claim(self, session, queue: str, owner: str, limit: int, order: str = 'priority') -> List[Dict]:
+        """
+        Réserver jusqu'à `limit` sites pour `owner`.
+
+        Retourne [{'id', 'domain', 'url', **payload}] par ordre de priorité.
+        Le commit est fait par l'appelant.
+        """
+        self._initialize(session)
+        self._reap(session)
+        self._refill(session, queue)
+
+        now = datetime.utcnow()
+        lock = ' FOR UPDATE OF q SKIP LOCKED' if session.bind.dialect.name == 'postgresql' else ''
+        rows = session.execute(text(f"""
+            UPDATE crawl_queue
+            SET lease_owner = :owner, lease_expires_at = :expires_at, attempts = attempts + 1
+            WHERE queue = :queue AND lease_owner IS NULL AND site_id IN (
+                SELECT q.site_id FROM crawl_queue q
+                JOIN sites ON sites.id = q.site_id
+                WHERE q.queue = :queue AND q.lease_owner IS NULL AND q.attempts < :max_attempts
+                  AND {ELIGIBLE_SQL[queue]}
+                ORDER BY {CLAIM_ORDERS[order]}
+                LIMIT :limit{lock}
+            )
+            RETURNING site_id, domain, url, priority, alt_priority, payload
+        """), {
+            'queue': queue,
+            'owner': owner,
+            'expires_at': now + QUEUES[queue]['lease'],
+            'max_attempts': MAX_ATTEMPTS,
+            'limit': limit,
+            **self._eligible_params(queue, now),
+        }).fetchall()
+
+        sort_keys = {
+            'priority': lambda row: (row.priority, row.site_id),
+            'alt_priority': lambda row: (row.alt_priority, row.site_id),
+            'site_id': lambda row: row.site_id,
+        }
+        tasks = []
+        for row in sorted(rows, key=sort_keys[order]):
+            task = {'id': row.site_id, 'domain': row.domain, 'url': row.url}
+            task.update(json.loads(row.payload) if row.payload else {})
+            tasks.append(task)
+
+        if queue == 'enrich' and tasks:
+            # Payload calculé au remplissage: ce qui manque a pu être trouvé depuis
+            sites = {site.id: site for site in session.query(Site).filter(Site.id.in_([t['id'] for t in tasks]))}
+            for task in tasks:
+                if task['id'] in sites:
+                    task['missing'] = _enrich_missing(sites[task['id']])
+        return tasks
+
+    @staticmethod
+    def _eligible_params(queue: str, now: datetime) -> Dict:
+        if ':retry_threshold' not in ELIGIBLE_SQL[queue]:
+            return {}
+        return {'retry_threshold': now - QUEUES[queue]['lease']}
+
+    def complete(self, session, queue: str, site_ids: Iterable[int]):
+        """Retirer de la file les sites dont le résultat a été reçu"""
+        params = [{'queue': queue, 'site_id': site_id} for site_id in site_ids if site_id]
+        if not params:
+            return
+        self._initialize(session)
+        session.execute(text("DELETE FROM crawl_queue WHERE queue = :queue AND site_id = :site_id"), params)
+
+    def renew(self, session, owner: str) -> bool:
+        """Prolonger les baux de `owner` (appelé depuis les heartbeats, au plus toutes les RENEW_INTERVAL s)"""
+        now_ts = time.monotonic()
+        with self._lock:
+            if now_ts - self._last_renew.get(owner, 0) < RENEW_INTERVAL:
+                return False
+            self._last_renew[owner] = now_ts
+
+        self._initialize(session)
+        now = datetime.utcnow()
+        for name, spec in QUEUES.items():
+            session.execute(text("""
+                UPDATE crawl_queue SET lease_expires_at = :expires_at
+                WHERE lease_owner = :owner AND queue = :queue
+            """), {'owner': owner, 'queue': name, 'expires_at': now + spec['lease']})
+        return True
+
+    def release(self, session, owner: str):
+        """Libérer tous les baux de `owner` (worker supprimé)"""
+        self._initialize(session)
+        session.execute(text("""
+            UPDATE crawl_queue SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE lease_owner = :owner
+        """), {'owner': owner})
+        with self._lock:
+            self._last_renew.pop(owner, None)
+
+    def stats(self, session) -> Dict[str, Dict[str, int]]:
+        """{file: {'pending': lignes libres, 'leased': lignes réservées, 'exhausted': tentatives épuisées}}"""
+        self._initialize(session)
+        result = {name: {'pending': 0, 'leased': 0, 'exhausted': 0} for name in QUEUES}
+        rows = session.execute(text("""
+            SELECT queue,
+                   SUM(CASE WHEN lease_owner IS NULL AND attempts < :max_attempts THEN 1 ELSE 0 END),
+                   COUNT(lease_owner),
+                   SUM(CASE WHEN lease_owner IS NULL AND attempts >= :max_attempts THEN 1 ELSE 0 END)
+            FROM crawl_queue GROUP BY queue
+        """), {'max_attempts': MAX_ATTEMPTS})
+        for name, pending, leased, exhausted in rows:
+            result[name] = {'pending': pending or 0, 'leased': leased or 0, 'exhausted': exhausted or 0}
+        return result
+
+    # ------------------------------------------------------------------
+    # Remplissage et libération des baux expirés
+    # ------------------------------------------------------------------
+
+    def _reap(self, session):
+        now_ts = time.monotonic()
+        with self._lock:
+            if now_ts - self._last_reap < REAP_INTERVAL:
+                return
+            self._last_reap = now_ts
+        result = session.execute(text("""
+            UPDATE crawl_queue SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE lease_owner IS NOT NULL AND lease_expires_at < :now
+        """), {'now': datetime.utcnow()})
+        if result.rowcount:
+            logger.info(f"♻️ {result.rowcount} baux expirés libérés")
+
+    def _refill(self, session, queue: str):
+        """Ajouter des sites éligibles quand la file passe sous son seuil bas"""
+        now_ts = time.monotonic()
+        with self._lock:
+            if now_ts - self._last_refill.get(queue, 0) < REFILL_INTERVAL:
+                return
+            self._last_refill[queue] = now_ts
+
+        # Lignes libres dont le site n'est plus éligible (email trouvé, blacklisté, crawlé...)
+        now = datetime.utcnow()
+        pruned = session.execute(text(f"""
+            DELETE FROM crawl_queue
+            WHERE queue = :queue AND lease_owner IS NULL AND attempts < :max_attempts
+              AND NOT EXISTS (SELECT 1 FROM sites WHERE sites.id = crawl_queue.site_id AND {ELIGIBLE_SQL[queue]})
+        """), {'queue': queue, 'max_attempts': MAX_ATTEMPTS, **self._eligible_params(queue, now)}).rowcount
+        if pruned:
+            logger.info(f"🧹 File {queue}: {pruned} sites plus éligibles retirés")
+
+        spec = QUEUES[queue]
+        pending = session.execute(text("""
+            SELECT COUNT(*) FROM (
+                SELECT 1 FROM crawl_queue
+                WHERE queue = :queue AND lease_owner IS NULL AND attempts < :max_attempts
+                LIMIT :low
+            ) AS claimable
+        """), {'queue': queue, 'max_attempts': MAX_ATTEMPTS, 'low': spec['low_watermark']}).scalar()
+        if pending >= spec['low_watermark']:
+            return
+
+        policy = self.policy_loader() if self.policy_loader else DomainPolicy()
+        rows = []
+        blacklisted = []
+        for site, values in CANDIDATES[queue](session, spec['refill_batch']):
+            if policy.is_blacklisted(site.domain):
+                blacklisted.append(site.id)
+                continue
+            rows.append({
+                'queue': queue,
+                'site_id': site.id,
+                'domain': site.domain,
+                'url': _site_url(site),
+                'priority': values['priority'],
+                'alt_priority': values['alt_priority'],
+                'payload': json.dumps(values['payload']) if values['payload'] else None,
+                'enqueued_at': now,
+            })
+        if blacklisted:
+            # Écartés des prochains remplissages (toutes les files filtrent sur blacklisted)
+            session.execute(
+                update(Site).where(Site.id.in_(blacklisted)).values(
+                    blacklisted=True, blacklist_reason=BLACKLIST_REASON, blacklisted_at=now),
+                execution_options={'synchronize_session': False},
+            )
+            logger.info(f"🚫 File {queue}: {len(blacklisted)} sites blacklistés écartés")
+        if rows:
+            session.execute(ENQUEUE_SQL, rows)
+            logger.info(f"📥 File {queue}: {len(rows)} sites ajoutés ({pending} en attente)")
+
+    def _initialize(self, session):
+        """
+        Vérifier (une fois par process) que migrate_add_crawl_queue.py a été lancé.
+
+        Lecture seule sur la connexion de l'appelant: pas de DDL ni de commit
+        au milieu de sa transaction.
+        """
+        if self._initialized:
+            return
+        if not inspect(session.connection()).has_table('crawl_queue'):
+            raise RuntimeError("Table crawl_queue absente: lancer migrate_add_crawl_queue.py")
+        self._initialized = True
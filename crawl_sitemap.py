@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Découverte des pages d'un site vendeur via robots.txt et sitemap.xml
+
+Utilisé par crawl_worker_multi.py en mode --crawl-mode sitemap (à déployer
+avec lui dans le dossier du worker). Le module ne fait pas lui-même de
+requêtes HTTP: le worker fournit une coroutine `fetch(url, consume) -> bool`
+qui réutilise sa session, son contexte SSL et sa limite de concurrence, et
+passe la réponse chunk par chunk à `consume(chunk) -> bool` (False: arrêter
+la lecture).
+
+Gère:
+- les directives `Sitemap:` de robots.txt (avec repli sur /sitemap.xml,
+  /sitemap_index.xml et /wp-sitemap.xml)
+- les index de sitemaps (récursifs, en priorisant les sitemaps d'articles)
+- les sitemaps compressés (.xml.gz ou contenu gzip), décompressés et
+  parsés au fil de la réponse: un sitemap n'est jamais entier en mémoire
+- les dates <lastmod> pour privilégier les articles récents
+"""
+
+import re
+import zlib
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from crawl_frontier import INTERESTING_PATTERN, LOW_VALUE_PATTERN
+
+# Limites
+MAX_SITEMAPS = 25  # Nombre max de fichiers sitemap téléchargés par site
+MAX_SITEMAP_ENTRIES = 100000  # Entrées <url> max lues par site
+MAX_SITEMAP_BYTES = 10 * 1024 * 1024  # XML lu au plus par sitemap (décompressé), le reste est ignoré
+MAX_ROBOTS_BYTES = 512 * 1024
+
+FALLBACK_SITEMAP_PATHS = ['/sitemap.xml', '/sitemap_index.xml', '/wp-sitemap.xml']
+
+# Sitemaps d'un index qui contiennent des articles (Yoast, Rank Math, WordPress natif...)
+ARTICLE_SITEMAP_PATTERN = re.compile(r'(post|article|news|blog|actu)', re.IGNORECASE)
+# Sitemaps sans intérêt pour trouver des liens sortants
+SKIPPED_SITEMAP_PATTERN = re.compile(
+    r'(product|produit|category|categor|tag|author|auteur|attachment|image|video|'
+    r'taxonomies|users|wp-sitemap-users)',
+    re.IGNORECASE
+)
+
+Fetcher = Callable[[str, Callable[[bytes], bool]], Awaitable[bool]]
+
+
+@dataclass
+class SitemapResult:
+    """URLs découvertes dans les sitemaps d'un site"""
+    sitemaps: List[str] = field(default_factory=list)  # Fichiers sitemap lus
+    entries: List[Tuple[str, Optional[datetime], bool]] = field(default_factory=list)  # (loc, lastmod, is_article)
+
+    @property
+    def total_urls(self) -> int:
+        return len(self.entries)
+
+    @property
+    def article_urls(self) -> int:
+        return sum(1 for _, _, is_article in self.entries if is_article)
+
+
+def parse_robots_sitemaps(robots_txt: str) -> List[str]:
+    """Extraire les URLs des directives Sitemap: de robots.txt"""
+    sitemaps = []
+    for line in robots_txt.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if line.lower().startswith('sitemap:'):
+            url = line.split(':', 1)[1].strip()
+            if url and url not in sitemaps:
+                sitemaps.append(url)
+    return sitemaps
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parser une date W3C (2024-01-31, 2024-01-31T10:00:00+01:00...) en datetime UTC naïf"""
+    if not value:
+        return None
+    value = value.strip().replace('Z', '+00:00')
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value[:10], '%Y-%m-%d')
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class SitemapParser:
+    """
+    Parser incrémental d'un sitemap: gzip (détecté sur les octets magiques,
+    pas sur l'extension) puis XML en pull-parsing, éléments libérés au fur et
+    à mesure. feed() retourne False quand il est inutile de lire la suite.
+    """
+
+    def __init__(self, max_entries: int = MAX_SITEMAP_ENTRIES, max_bytes: int = MAX_SITEMAP_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.kind = 'urlset'
+        self.entries: List[Tuple[str, Optional[datetime]]] = []
+        self._xml = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+        self._gzip = None  # décompresseur, décidé sur les premiers octets
+        self._head = b''
+        self._size = 0
+        self._loc = None
+        self._lastmod = None
+        self._done = False
+
+    def feed(self, chunk: bytes) -> bool:
+        if self._done:
+            return False
+        if self._gzip is None:
+            self._head += chunk
+            if len(self._head) < 2:
+                return True
+            chunk, self._head = self._head, b''
+            self._gzip = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+        try:
+            if self._gzip:
+                # Sortie bornée: une bombe gzip ne dépasse pas max_bytes
+                chunk = self._gzip.decompress(chunk, self.max_bytes - self._size + 1)
+            chunk = chunk[:self.max_bytes - self._size]
+            self._size += len(chunk)
+            self._xml.feed(chunk)
+            self._read_events()
+        except (zlib.error, ET.ParseError):
+            self._done = True
+        if self._size >= self.max_bytes:
+            self._done = True
+        return not self._done
+
+    def close(self) -> Tuple[str, List[Tuple[str, Optional[datetime]]]]:
+        """
+        Returns:
+            ('index', [(sitemap_url, lastmod), ...]) pour un index de sitemaps,
+            ('urlset', [(page_url, lastmod), ...]) pour une liste de pages
+        """
+        if not self._done:
+            if self._head:
+                self.feed(b'\n')  # fichier de moins de 2 octets
+            try:
+                self._xml.close()
+                self._read_events()
+            except ET.ParseError:
+                pass
+        self._done = True
+        return self.kind, self.entries
+
+    def _read_events(self):
+        for event, elem in self._xml.read_events():
+            tag = elem.tag.rsplit('}', 1)[-1].lower()
+            if event == 'start':
+                if self._root is None:
+                    self._root = elem
+                    if tag == 'sitemapindex':
+                        self.kind = 'index'
+                continue
+            if tag == 'loc':
+                self._loc = (elem.text or '').strip()
+            elif tag == 'lastmod':
+                self._lastmod = parse_lastmod(elem.text)
+            elif tag in ('url', 'sitemap'):
+                if self._loc:
+                    self.entries.append((self._loc, self._lastmod))
+                self._loc = None
+                self._lastmod = None
+                self._root.clear()  # <url> terminés libérés, la racine ne grossit pas
+                if len(self.entries) >= self.max_entries:
+                    self._done = True
+                    return
+
+
+def parse_sitemap(data: bytes, max_entries: int = MAX_SITEMAP_ENTRIES) -> Tuple[str, List[Tuple[str, Optional[datetime]]]]:
+    """Parser un sitemap déjà en mémoire (voir SitemapParser)"""
+    parser = SitemapParser(max_entries)
+    parser.feed(data)
+    return parser.close()
+
+
+def sitemap_priority(sitemap_url: str) -> int:
+    """Ordre de lecture des sitemaps d'un index (articles d'abord, produits/tags jamais)"""
+    name = urlparse(sitemap_url).path.rsplit('/', 1)[-1]
+    if SKIPPED_SITEMAP_PATTERN.search(name):
+        return 2
+    if ARTICLE_SITEMAP_PATTERN.search(name):
+        return 0
+    return 1
+
+
+async def discover_sitemap_urls(fetch: Fetcher, base_url: str,
+                                max_sitemaps: int = MAX_SITEMAPS,
+                                max_entries: int = MAX_SITEMAP_ENTRIES) -> SitemapResult:
+    """Lire robots.txt puis les sitemaps (index récursifs) d'un site"""
+    result = SitemapResult()
+    parsed = urlparse(base_url)
+    root = f"{parsed.scheme or 'https'}://{parsed.netloc}"
+
+    robots = bytearray()
+
+    def read_robots(chunk: bytes) -> bool:
+        robots.extend(chunk[:MAX_ROBOTS_BYTES - len(robots)])
+        return len(robots) < MAX_ROBOTS_BYTES
+
+    to_fetch = []
+    if await fetch(urljoin(root, '/robots.txt'), read_robots) and robots:
+        to_fetch = parse_robots_sitemaps(robots.decode('utf-8', 'replace'))
+    fallback_urls = []
+    if not to_fetch:
+        fallback_urls = [urljoin(root, path) for path in FALLBACK_SITEMAP_PATHS]
+        to_fetch = list(fallback_urls)
+
+    seen = set()
+    while to_fetch and len(result.sitemaps) < max_sitemaps and len(result.entries) < max_entries:
+        sitemap_url = to_fetch.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+
+        parser = SitemapParser(max_entries - len(result.entries))
+        if not await fetch(sitemap_url, parser.feed):
+            continue
+        kind, entries = parser.close()
+        if not entries:
+            continue
+        result.sitemaps.append(sitemap_url)
+
+        if fallback_urls:
+            # Les chemins de repli désignent souvent le même sitemap: garder le premier trouvé
+            to_fetch = [url for url in to_fetch if url not in fallback_urls]
+            fallback_urls = []
+
+        if kind == 'index':
+            children = [loc for loc, _ in entries if sitemap_priority(loc) < 2]
+            children.sort(key=sitemap_priority)
+            to_fetch = children + to_fetch
+        else:
+            from_article_sitemap = sitemap_priority(sitemap_url) == 0
+            result.entries.extend(
+                (loc, lastmod, from_article_sitemap or is_article_url(loc))
+                for loc, lastmod in entries
+            )
+
+    return result
+
+
+def is_article_url(url: str) -> bool:
+    """URL susceptible de porter des liens sortants (article, partenaire...)"""
+    path = urlparse(url).path
+    return bool(INTERESTING_PATTERN.search(path)) and not LOW_VALUE_PATTERN.search(path)
+
+
+def rank_sitemap_entries(entries: List[Tuple[str, Optional[datetime], bool]]) -> List[Tuple[str, bool]]:
+    """
+    Trier les URLs d'un sitemap: articles d'abord, puis pages profondes
+    (la page d'accueil et les listes en dernier), du plus récent au plus ancien.
+
+    Returns:
+        [(url, is_article), ...] sans doublons
+    """
+    def sort_key(entry):
+        url, lastmod, is_article = entry
+        path = urlparse(url).path
+        depth = len([segment for segment in path.split('/') if segment])
+        timestamp = lastmod.timestamp() if lastmod else 0
+        return (
+            0 if is_article else 1,
+            1 if LOW_VALUE_PATTERN.search(path) else 0,
+            0 if depth > 0 else 1,
+            -timestamp,
+        )
+
+    ranked = []
+    seen = set()
+    for url, _, is_article in sorted(entries, key=sort_key):
+        if url not in seen:
+            seen.add(url)
+            ranked.append((url, is_article))
+    return ranked
@@ -37,9 +37,10 @@ import sys
 from pathlib import Path
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
-from collections import deque
 from typing import Set, List, Dict, Optional, Tuple
 
+from crawl_frontier import URLFrontier, checkpoint_path, remove_checkpoint
+
 # Configuration par défaut
 DEFAULT_API_URL = "https://admin.perfect-cocon-seo.fr"
 DEFAULT_BATCH_SIZE = 30
@@ -242,56 +243,76 @@ class CrawlWorker:
         print(f"  🔍 Crawling {domain}...")
 
         semaphore = asyncio.Semaphore(self.max_concurrent)
-        visited = set()
-        to_visit = deque([url])
         buyer_domains = set()
         seller_domain = extract_domain(url)
 
-        while to_visit and len(visited) < self.max_pages and running:
-            batch_urls = []
-            while to_visit and len(batch_urls) < self.max_concurrent:
-                next_url = to_visit.popleft()
-                if next_url not in visited:
-                    batch_urls.append(next_url)
-                    visited.add(next_url)
-
-            if not batch_urls:
-                break
+        # Frontière persistante: reprise du site après un redémarrage du worker
+        frontier_path = checkpoint_path(seller_domain or domain)
+        frontier = URLFrontier.load_checkpoint(frontier_path)
+        if frontier:
+            buyer_domains.update(frontier.meta.get('buyer_domains', []))
+            print(f"    ♻️  Reprise à {frontier.pages_crawled} pages ({len(frontier)} URLs en attente)")
+        else:
+            frontier = URLFrontier()
+            frontier.add(url)
 
-            # Crawler le batch en parallèle
-            tasks = [self.fetch_page(session, u, semaphore) for u in batch_urls]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            while frontier and frontier.pages_crawled < self.max_pages and running:
+                batch_urls = frontier.pop_batch(
+                    min(self.max_concurrent, self.max_pages - frontier.pages_crawled)
+                )
 
-            for url_crawled, html in zip(batch_urls, results):
-                pages_crawled += 1
+                if not batch_urls:
+                    break
 
-                if isinstance(html, Exception) or not html:
-                    continue
+                # Crawler le batch en parallèle
+                tasks = [self.fetch_page(session, u, semaphore) for u in batch_urls]
+                results = await asyncio.gather(*tasks, return_exceptions=True)
 
-                # Extraire les liens
-                links = await self.extract_links(html)
+                for url_crawled, html in zip(batch_urls, results):
+                    pages_crawled += 1
 
-                for link in links:
-                    normalized = normalize_url(url_crawled, link)
-                    if not normalized:
+                    if isinstance(html, Exception) or not html:
                         continue
 
-                    link_domain = extract_domain(normalized)
+                    # Extraire les liens
+                    links = await self.extract_links(html)
+
+                    for link in links:
+                        normalized = normalize_url(url_crawled, link)
+                        if not normalized:
+                            continue
+
+                        link_domain = extract_domain(normalized)
+
+                        # Lien interne -> ajouter à la frontière
+                        if link_domain == seller_domain:
+                            frontier.add(normalized)
+
+                        # Domaine .fr externe -> acheteur potentiel
+                        elif is_valid_fr_domain(link_domain):
+                            buyer_domains.add(link_domain)
 
-                    # Lien interne -> ajouter à la queue
-                    if link_domain == seller_domain:
-                        if normalized not in visited:
-                            to_visit.append(normalized)
+                frontier.task_done()
+                if frontier.checkpoint_due():
+                    frontier.meta['buyer_domains'] = sorted(buyer_domains)
+                    frontier.save_checkpoint(frontier_path)
 
-                    # Domaine .fr externe -> acheteur potentiel
-                    elif is_valid_fr_domain(link_domain):
-                        buyer_domains.add(link_domain)
+                # Progress
+                if frontier.pages_crawled % 100 == 0:
+                    print(f"    📄 {frontier.pages_crawled} pages, {len(buyer_domains)} acheteurs...")
+        except asyncio.CancelledError:
+            frontier.meta['buyer_domains'] = sorted(buyer_domains)
+            frontier.save_checkpoint(frontier_path)
+            raise
 
-            # Progress
-            if len(visited) % 100 == 0:
-                print(f"    📄 {len(visited)} pages, {len(buyer_domains)} acheteurs...")
+        if running:
+            remove_checkpoint(frontier_path)
+        else:
+            frontier.meta['buyer_domains'] = sorted(buyer_domains)
+            frontier.save_checkpoint(frontier_path)
 
-        print(f"    ✓ {len(visited)} pages crawlées, {len(buyer_domains)} acheteurs")
+        print(f"    ✓ {frontier.pages_crawled} pages crawlées, {len(buyer_domains)} acheteurs")
 
         # Chercher les emails des acheteurs
         buyers = []
@@ -304,14 +325,14 @@ class CrawlWorker:
             if email:
                 self.stats['emails_found'] += 1
 
-        self.stats['pages_crawled'] += len(visited)
+        self.stats['pages_crawled'] += frontier.pages_crawled
         self.stats['buyers_found'] += len(buyers)
 
         return {
             'site_id': site_id,
             'domain': domain,
             'buyers': buyers,
-            'pages_crawled': len(visited),
+            'pages_crawled': frontier.pages_crawled,
             'error': None
         }
 
@@ -18,6 +18,8 @@ sys.stdout = sys.stderr = open(sys.stdout.fileno(), 'w', buffering=1)
 
 import asyncio
 import aiohttp
+import codecs
+import math
 import ssl
 import socket
 import time
@@ -28,38 +30,69 @@ import signal
 import sys
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
-from collections import deque
-from typing import Set, List, Dict, Optional, Tuple
+from typing import Callable, Set, List, Dict, Optional, Tuple
+
+from crawl_frontier import URLFrontier, checkpoint_path, remove_checkpoint
+from crawl_sitemap import discover_sitemap_urls, rank_sitemap_entries
+from crawl_concurrency import AdaptiveConcurrencyLimiter, FairSlotPool
+from known_domains import KnownDomainsSet
+from domain_policy import DomainPolicy, BLACKLISTED_DOMAINS, EXCLUDED_PATTERNS, SOCIAL_DOMAINS
+from language_ngrams import PageSample, page_language
+import wire_format
+from wire_format import WireNegotiation
 
 # Configuration par défaut
 DEFAULT_API_URL = "https://admin.perfect-cocon-seo.fr"
-DEFAULT_PARALLEL_SITES = 4  # Nombre de sites crawlés en parallèle
-DEFAULT_CONCURRENT = 25  # Requêtes simultanées par site
+DEFAULT_PARALLEL_SITES = 16  # Plafond de sites en parallèle (le nombre réel suit l'occupation des créneaux)
+DEFAULT_MAX_INFLIGHT = 200  # Créneaux de requêtes en vol partagés par tous les sites du worker
+DEFAULT_CONCURRENT = 25  # Requêtes simultanées par site (valeur de départ, ajustée par AIMD)
+MIN_CONCURRENT_PER_SITE = 2  # Plancher du contrôle adaptatif
+MAX_CONCURRENT_FACTOR = 2  # Plafond = --concurrent x 2
 DEFAULT_MAX_PAGES = 5000
+DEFAULT_CRAWL_MODE = 'links'  # 'links' ou 'sitemap' (URLs du sitemap d'abord, puis liens internes)
 HEARTBEAT_INTERVAL = 30
+KNOWN_DOMAINS_SYNC_INTERVAL = 300  # secondes entre deux deltas des domaines déjà connus (et de la blacklist)
 REQUEST_TIMEOUT = 10
 PAUSE_BETWEEN_BATCHES = 2
 
-# Patterns pour extraction
-SOCIAL_DOMAINS = {
-    'facebook.com', 'twitter.com', 'instagram.com', 'linkedin.com',
-    'youtube.com', 'tiktok.com', 'pinterest.com', 'google.com',
-    'apple.com', 'microsoft.com', 'amazon.com', 'amazon.fr'
-}
-
-EXCLUDED_PATTERNS = {
-    'google.com', 'apple.com', 'microsoft.com', 'mozilla.org',
-    'amazon.com', 'amazon.es', 'amazon.fr', 'amzn.to',
-    'uecdn.es', 'cloudflare.com', 'akamai.net'
-}
-
-BLACKLISTED_DOMAINS = {
-    'cnil.fr', 'gouv.fr', 'diplomatie.gouv.fr', 'education.gouv.fr',
-    'economie.gouv.fr', 'interieur.gouv.fr', 'service-public.fr',
-    'legifrance.gouv.fr', 'senat.fr', 'assemblee-nationale.fr'
-}
+# Ordonnanceur: nouveaux sites demandés dès que les créneaux ne sont plus saturés
+SCHEDULER_TICK = 1  # secondes entre deux vérifications de l'occupation
+SLOT_UTILIZATION_TARGET = 0.8  # En dessous, le worker demande de nouveaux sites
+EMPTY_QUEUE_RETRY = 30  # secondes avant de redemander si le coordinateur n'a rien
+
+# Lecture en streaming des pages
+STREAM_CHUNK_SIZE = 64 * 1024  # Taille des chunks lus sur le socket
+MAX_BODY_BYTES = 2 * 1024 * 1024  # Au-delà, on arrête de lire la page
+MAX_HREF_TAIL = 4096  # Fin de buffer conservée entre deux chunks (href coupé)
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Recherche des emails acheteurs, en parallèle du crawl vendeur
+BUYERS_BATCH_SIZE = 20  # Acheteurs par envoi à /api/crawl/buyers_batch
+BUYERS_FLUSH_INTERVAL = 5  # secondes max avant l'envoi d'un batch incomplet
+BUYERS_FINAL_FLUSH_ATTEMPTS = 3  # Envois du dernier batch en fin de site avant de garder le checkpoint
+EMAIL_QUEUE_SIZE = 200  # File bornée: le crawl ralentit si la recherche d'emails prend du retard
+EMAIL_CONSUMERS = 10  # Acheteurs traités simultanément par site
+EMAIL_PAGES = ['/', '/contact', '/contact-us', '/mentions-legales', '/a-propos']
+
+# Canal multiplexé avec le coordinateur (/api/crawl/channel)
+CHANNEL_FLUSH_INTERVAL = 1  # secondes entre deux échanges (group commit côté coordinateur)
+CHANNEL_MAX_BATCH = 200  # Messages max par échange (au-delà, envoi immédiat)
+CHANNEL_EMPTY_RETRY = 5  # secondes avant de redemander des tâches si le coordinateur n'a rien
+CHANNEL_TIMEOUT = 120  # secondes max par échange (envoi + réponse du coordinateur)
+CHANNEL_MAX_ATTEMPTS = 5  # Échanges ratés avant d'abandonner un message (acheteurs, résultat)
+API_TIMEOUT = 120  # secondes max par appel aux endpoints séparés (résultat, acheteurs, tâches)
+
+# Mode sitemap: les URLs du sitemap passent avant tout lien découvert
+SITEMAP_SEED_SCORE = -1000000
+
+# Blacklist et patterns exclus: valeurs par défaut, remplacées par celles du
+# coordinateur (/api/crawl/domain-policy, qui inclut blacklist.txt)
+domain_policy = DomainPolicy(BLACKLISTED_DOMAINS, EXCLUDED_PATTERNS | SOCIAL_DOMAINS)
 
+# Patterns pour extraction
 EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+HREF_PATTERN = re.compile(r'href=["\']([^"\']+)["\']', re.IGNORECASE)
+BODY_END_PATTERN = re.compile(r'</body\s*>', re.IGNORECASE)
 IGNORE_EMAILS = {
     'example@example.com', 'email@example.com', 'contact@example.com',
     'test@test.com', 'noreply@example.com', 'vous@domaine.com',
@@ -108,28 +141,11 @@ def extract_domain(url: str) -> Optional[str]:
 
 
 def is_blacklisted_domain(domain: str) -> bool:
-    if not domain:
-        return True
-    if domain in BLACKLISTED_DOMAINS:
-        return True
-    for blacklisted in BLACKLISTED_DOMAINS:
-        if domain.endswith('.' + blacklisted):
-            return True
-    return False
+    return domain_policy.is_blacklisted(domain)
 
 
 def is_valid_fr_domain(domain: str) -> bool:
-    if not domain or not domain.endswith('.fr'):
-        return False
-    if is_blacklisted_domain(domain):
-        return False
-    for excluded in EXCLUDED_PATTERNS:
-        if excluded in domain:
-            return False
-    for social in SOCIAL_DOMAINS:
-        if social in domain:
-            return False
-    return True
+    return domain_policy.is_valid_fr_domain(domain)
 
 
 def normalize_url(base: str, url: str) -> Optional[str]:
@@ -156,18 +172,371 @@ def normalize_url(base: str, url: str) -> Optional[str]:
     return parsed.scheme + '://' + parsed.netloc + parsed.path
 
 
+def is_html_response(response: aiohttp.ClientResponse) -> bool:
+    """Vérifier le Content-Type avant de lire le corps (pas de header = on tente)"""
+    content_type = response.headers.get('Content-Type', '').lower()
+    if not content_type:
+        return True
+    return content_type.startswith(HTML_CONTENT_TYPES)
+
+
+def get_incremental_decoder(charset: Optional[str]):
+    """Décodeur incrémental pour le charset annoncé (utf-8 si inconnu)"""
+    try:
+        return codecs.getincrementaldecoder(charset or 'utf-8')(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+class StreamingLinkExtractor:
+    """
+    Extraction incrémentale des href d'une page HTML lue par chunks.
+
+    Le texte décodé n'est jamais conservé en entier: seule la fin du buffer
+    (un éventuel href coupé entre deux chunks) est gardée, plus le début de
+    la page si un PageSample est fourni (détection de langue de l'accueil).
+    L'extraction s'arrête à la balise </body>.
+    """
+
+    def __init__(self, charset: Optional[str] = None, sample: Optional[PageSample] = None):
+        self.decoder = get_incremental_decoder(charset)
+        self.sample = sample
+        self.tail = ''
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """Ajouter un chunk et retourner les href complets trouvés"""
+        if self.done:
+            return []
+        return self._scan(self.tail + self._decode(chunk), final=False)
+
+    def close(self) -> List[str]:
+        """Vider le décodeur et retourner les derniers href"""
+        if self.done:
+            return []
+        return self._scan(self.tail + self._decode(b'', final=True), final=True)
+
+    def _decode(self, chunk: bytes, final: bool = False) -> str:
+        text = self.decoder.decode(chunk, final=final)
+        if self.sample is not None:
+            self.sample.feed(text)
+        return text
+
+    def _scan(self, text: str, final: bool) -> List[str]:
+        body_end = BODY_END_PATTERN.search(text)
+        if body_end:
+            text = text[:body_end.start()]
+            final = True
+            self.done = True
+
+        links = []
+        last_end = 0
+        for match in HREF_PATTERN.finditer(text):
+            links.append(match.group(1))
+            last_end = match.end()
+
+        if final:
+            self.tail = ''
+        else:
+            # Garder la fin non analysée (href potentiellement coupé), bornée
+            self.tail = text[max(last_end, len(text) - MAX_HREF_TAIL):]
+        return links
+
+
+class BuyerEmailPipeline:
+    """
+    Recherche des emails acheteurs pendant le crawl du vendeur.
+
+    Les acheteurs sont envoyés à /api/crawl/buyers_batch dès leur découverte
+    (par batch, sans attendre leur email) et entrent dans une file bornée; un
+    pool de tâches cherche leurs emails en parallèle et renvoie ce qu'il
+    trouve (email, langue): le coordinateur complète alors l'acheteur.
+    """
+
+    def __init__(self, worker: 'MultiSiteCrawlWorker', session: aiohttp.ClientSession,
+                 site_id: int, seller_domain: str, consumers: int = EMAIL_CONSUMERS):
+        self.worker = worker
+        self.session = session
+        self.site_id = site_id
+        self.seller_domain = seller_domain
+        self.queue = asyncio.Queue(maxsize=EMAIL_QUEUE_SIZE)
+        # Les pages des acheteurs passent par le pool global, à part du site vendeur
+        self.slot_key = ('emails', site_id)
+        self.semaphore = asyncio.Semaphore(consumers)  # Une page à la fois par acheteur
+        self.results = []  # Acheteurs découverts ou traités, pas encore envoyés
+        self.unsent: Set[str] = set()  # Recherche d'email en file, en cours ou pas encore envoyée
+        self.uploaded: Set[str] = set()
+        self.emails_found = 0
+        self.ready = asyncio.Event()  # Batch complet à envoyer
+        self.consumers = [asyncio.create_task(self._consume()) for _ in range(consumers)]
+        self.consumers.append(asyncio.create_task(self._flush_loop()))
+
+    async def put(self, buyer_domain: str):
+        """Ajouter un acheteur: envoi au prochain batch, puis recherche d'email (attend si la file est pleine)"""
+        if buyer_domain not in self.uploaded:
+            self._submit({'domain': buyer_domain})
+        self.unsent.add(buyer_domain)
+        await self.queue.put(buyer_domain)
+
+    def _submit(self, buyer: Dict):
+        self.results.append(buyer)
+        if len(self.results) >= BUYERS_BATCH_SIZE:
+            self.ready.set()
+
+    async def _consume(self):
+        while True:
+            buyer_domain = await self.queue.get()
+            try:
+                buyer = await self.worker.inspect_buyer(self.session, buyer_domain, self.semaphore, self.slot_key)
+                if buyer['email']:
+                    self.emails_found += 1
+                    self.worker.stats['emails_found'] += 1
+                if buyer['email'] or set(buyer) - {'domain', 'email'}:  # email, langue ou text_sample
+                    self._submit(buyer)
+                else:
+                    # Rien à compléter: l'acheteur est déjà envoyé (ou dans le batch en attente)
+                    self.unsent.discard(buyer_domain)
+            except Exception as e:
+                print(f"  ⚠️  Email {buyer_domain}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _flush_loop(self):
+        """Envoyer chaque batch complet, et les acheteurs en attente toutes les BUYERS_FLUSH_INTERVAL secondes"""
+        while True:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout=BUYERS_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.ready.clear()
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """
+        Envoyer les acheteurs en attente. Seul un envoi accepté les marque uploadés:
+        en cas d'échec ils repartent au batch suivant (et restent à reprendre
+        dans le checkpoint si le worker s'arrête avant).
+        """
+        batch, self.results = self.results, []
+        if not batch:
+            return True
+        try:
+            accepted = await self.worker.submit_buyers_batch(self.session, self.site_id, self.seller_domain, batch)
+        except asyncio.CancelledError:
+            self.results = batch + self.results
+            raise
+        if not accepted:
+            self.results = batch + self.results
+            return False
+        for b in batch:
+            if b['domain'] not in self.uploaded:
+                self.uploaded.add(b['domain'])
+                self.worker.stats['buyers_found'] += 1
+            if 'email' in b:
+                self.unsent.discard(b['domain'])  # Résultat de la recherche d'email
+        return True
+
+    async def close(self) -> bool:
+        """Attendre la fin de la file puis envoyer le dernier batch (False: acheteurs restés non envoyés)"""
+        await self.queue.join()
+        await self.cancel()
+        for attempt in range(BUYERS_FINAL_FLUSH_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(BUYERS_FLUSH_INTERVAL)
+            if await self.flush():
+                return True
+        return False
+
+    async def cancel(self):
+        for consumer in self.consumers:
+            consumer.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+
+    def pending(self) -> List[str]:
+        """Acheteurs pas encore envoyés ou sans recherche d'email terminée (à reprendre après un arrêt)"""
+        return sorted(self.unsent | {b['domain'] for b in self.results})
+
+
+class ChannelUnavailable(Exception):
+    """Coordinateur sans /api/crawl/channel: repli sur les endpoints séparés"""
+
+
+class CoordinatorChannel:
+    """
+    Échanges avec le coordinateur regroupés sur /api/crawl/channel.
+
+    Heartbeats, batches d'acheteurs, résultats et demandes de tâches
+    s'accumulent dans une boîte d'envoi, envoyée en un seul POST NDJSON
+    toutes les CHANNEL_FLUSH_INTERVAL secondes sur la connexion keep-alive
+    de la session. Le coordinateur applique l'échange en une transaction et
+    renvoie les tâches attribuées dans la réponse (plus d'attente de 60s).
+
+    Un échange raté (timeout, erreur HTTP ou réseau) renvoie ses messages au
+    suivant, au plus CHANNEL_MAX_ATTEMPTS fois: au-delà, le message est
+    abandonné et son appelant reçoit {"ok": false}, comme pour un message
+    rejeté par le coordinateur, un message resté sans réponse dans un
+    échange réussi ou un batch impossible à encoder.
+    """
+
+    def __init__(self, worker: 'MultiSiteCrawlWorker', session: aiohttp.ClientSession):
+        self.worker = worker
+        self.session = session
+        self.url = f"{worker.api_url}/api/crawl/channel?worker_id={worker.worker_id}"
+        self.available = True
+        self.outbox: List[Dict] = []
+        self.waiters: Dict[int, asyncio.Future] = {}
+        self.attempts: Dict[int, int] = {}  # Échanges ratés par message
+        self.seq = 0
+        self.tasks: asyncio.Queue = asyncio.Queue()  # Tâches attribuées, pas encore démarrées
+        self.tasks_wanted = 0
+        self.next_task_request = 0.0
+        self.next_heartbeat = 0.0
+        self.wake = asyncio.Event()
+
+    async def request(self, kind: str, data: Dict) -> Dict:
+        """Envoyer un message au prochain échange et attendre sa réponse"""
+        if not self.available:
+            raise ChannelUnavailable()
+        self.seq += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[self.seq] = future
+        self.outbox.append({'seq': self.seq, 'type': kind, 'data': data})
+        if len(self.outbox) >= CHANNEL_MAX_BATCH:
+            self.wake.set()
+        return await future
+
+    def fail(self, seq: int, error: str):
+        """Abandonner un message: son appelant reçoit une réponse en échec"""
+        self.attempts.pop(seq, None)
+        future = self.waiters.pop(seq, None)
+        if future and not future.done():
+            future.set_result({'seq': seq, 'ok': False, 'error': error})
+
+    def want_tasks(self, count: int):
+        """Capacité libre du worker, demandée au prochain échange"""
+        self.tasks_wanted = count
+        if count and time.monotonic() >= self.next_task_request:
+            self.wake.set()
+
+    async def run(self):
+        while running and self.available:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=CHANNEL_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            await self.exchange()
+
+    async def exchange(self):
+        """Envoyer la boîte d'envoi (+ heartbeat et demande de tâches si dus)"""
+        now = time.monotonic()
+        messages, self.outbox = self.outbox[:CHANNEL_MAX_BATCH], self.outbox[CHANNEL_MAX_BATCH:]
+        send_heartbeat = now >= self.next_heartbeat
+        if send_heartbeat:
+            messages.append({'type': 'heartbeat', 'data': self.worker.heartbeat_data()})
+        tasks_asked = self.tasks_wanted if now >= self.next_task_request else 0
+        if tasks_asked:
+            messages.append({'type': 'tasks', 'data': {'count': tasks_asked}})
+        if not messages:
+            return
+
+        wire = self.worker.wire
+        try:
+            body, headers = wire.encode(messages, stream=True)
+        except Exception as e:
+            # Erreur d'encodage: le même batch échouerait à chaque échange
+            error = str(e) or e.__class__.__name__
+            print(f"❌ Encodage de l'échange impossible: {error}")
+            for message in messages:
+                if message.get('seq') is not None:
+                    self.fail(message['seq'], error)
+            return
+        try:
+            async with self.session.post(self.url, data=body, ssl=self.worker.ssl_context, headers=headers,
+                                         timeout=aiohttp.ClientTimeout(total=CHANNEL_TIMEOUT)) as response:
+                if response.status == 404:
+                    print("⚠️  Coordinateur sans canal multiplexé, repli sur les endpoints séparés")
+                    self.close(ChannelUnavailable())
+                    return
+                if response.status == 415 and wire.negotiated:
+                    print("⚠️  Format refusé par le coordinateur, retour au JSON non compressé")
+                    wire.reset()
+                    raise RuntimeError("HTTP 415")
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+                wire.update(response.headers)
+                replies = wire_format.deserialize(await response.read(), response.content_type) or []
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            print(f"⚠️  Erreur canal coordinateur: {error}")
+            # Acheteurs et résultats repartent au prochain échange, dans la limite des tentatives
+            retry = []
+            for message in messages:
+                seq = message.get('seq')
+                if seq is None:
+                    continue
+                self.attempts[seq] = self.attempts.get(seq, 0) + 1
+                if self.attempts[seq] >= CHANNEL_MAX_ATTEMPTS:
+                    print(f"❌ Message {message['type']} #{seq} abandonné après {CHANNEL_MAX_ATTEMPTS} échanges ratés")
+                    self.fail(seq, error)
+                else:
+                    retry.append(message)
+            self.outbox[:0] = retry
+            return
+
+        if send_heartbeat:
+            self.next_heartbeat = now + HEARTBEAT_INTERVAL
+        for reply in replies:
+            if reply.get('type') == 'tasks':
+                sites = reply.get('sites', [])
+                for site in sites:
+                    self.tasks.put_nowait(site)
+                self.tasks_wanted = max(0, self.tasks_wanted - len(sites))
+                if not sites:
+                    self.next_task_request = now + CHANNEL_EMPTY_RETRY
+                continue
+            self.attempts.pop(reply.get('seq'), None)
+            future = self.waiters.pop(reply.get('seq'), None)
+            if future and not future.done():
+                future.set_result(reply)
+        # Message sans réponse (réponse sans seq pour un message invalide): son appelant n'attend pas indéfiniment
+        for message in messages:
+            if message.get('seq') in self.waiters:
+                self.fail(message['seq'], 'Pas de réponse du coordinateur pour ce message')
+
+    def close(self, error: Exception):
+        """Plus d'échanges: les messages en attente échouent (repli sur les endpoints séparés)"""
+        self.available = False
+        self.outbox = []
+        self.attempts = {}
+        for future in self.waiters.values():
+            if not future.done():
+                future.set_exception(error)
+        self.waiters = {}
+
+
 class MultiSiteCrawlWorker:
     """Worker qui crawle plusieurs sites en parallèle"""
 
     def __init__(self, api_url: str, worker_id: str, parallel_sites: int,
-                 concurrent: int, max_pages: int):
+                 concurrent: int, max_pages: int, crawl_mode: str = DEFAULT_CRAWL_MODE,
+                 max_inflight: int = DEFAULT_MAX_INFLIGHT, compress_payloads: bool = True):
         self.api_url = api_url.rstrip('/')
         # Ajouter le PID pour avoir un ID unique par processus
         self.worker_id = f"{worker_id}-{os.getpid()}"
         self.parallel_sites = parallel_sites
         self.concurrent_per_site = concurrent
+        self.max_concurrent_per_site = max(concurrent * MAX_CONCURRENT_FACTOR, MIN_CONCURRENT_PER_SITE)
         self.max_pages = max_pages
+        self.crawl_mode = crawl_mode
+        # Pool global: les sites se partagent les créneaux en round-robin
+        self.slots = FairSlotPool(max_inflight)
+        # Acheteurs qui ont déjà un email (ou blacklistés) côté coordinateur
+        self.known_domains = KnownDomainsSet()
         self.hostname = socket.gethostname()
+        self.channel: Optional[CoordinatorChannel] = None
+        # Corps compressés (zstd/gzip) et msgpack si le coordinateur les annonce
+        self.wire = WireNegotiation(enabled=compress_payloads)
 
         self.ssl_context = ssl.create_default_context()
         self.ssl_context.check_hostname = False
@@ -178,51 +547,172 @@ class MultiSiteCrawlWorker:
             'buyers_found': 0,
             'emails_found': 0,
             'errors': 0,
-            'pages_crawled': 0
+            'pages_crawled': 0,
+            'known_buyers_skipped': 0,
+            'languages_detected': 0,  # Langue trouvée sur le worker (lang HTML ou n-grammes)
+            'language_samples': 0  # Langue incertaine: text_sample envoyé au coordinateur
         }
 
         print(f"🚀 Worker MULTI-SITES initialisé:")
         print(f"   - ID: {self.worker_id}")
         print(f"   - Hostname: {self.hostname}")
         print(f"   - API: {self.api_url}")
-        print(f"   - Sites en parallèle: {self.parallel_sites}")
-        print(f"   - Requêtes/site: {self.concurrent_per_site}")
+        print(f"   - Sites en parallèle: jusqu'à {self.parallel_sites}")
+        print(f"   - Requêtes en vol (tous sites): {self.slots.size}")
+        print(f"   - Requêtes/site: {self.concurrent_per_site} (adaptatif {MIN_CONCURRENT_PER_SITE}-{self.max_concurrent_per_site})")
         print(f"   - Max pages/site: {self.max_pages}")
+        print(f"   - Mode de crawl: {self.crawl_mode}")
 
     async def fetch_page(self, session: aiohttp.ClientSession, url: str,
-                         semaphore: asyncio.Semaphore) -> Optional[str]:
+                         semaphore: asyncio.Semaphore, slot_key=None) -> Optional[str]:
         try:
-            async with semaphore:
+            async with semaphore, self.slots.slot(slot_key):
                 async with session.get(
                     url,
                     timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
                     ssl=self.ssl_context,
                     headers={'User-Agent': DEFAULT_USER_AGENT}
                 ) as response:
-                    if response.status == 200:
-                        return await response.text()
-        except:
+                    if response.status == 200 and is_html_response(response):
+                        return await self.read_body(response)
+        except Exception:
             pass
         return None
 
-    async def extract_links(self, html: str) -> List[str]:
-        links = []
+    async def read_body(self, response: aiohttp.ClientResponse) -> str:
+        """Lire le corps par chunks en s'arrêtant à MAX_BODY_BYTES"""
+        decoder = get_incremental_decoder(response.charset)
+        parts = []
+        size = 0
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            size += len(chunk)
+            parts.append(decoder.decode(chunk))
+            if size >= MAX_BODY_BYTES:
+                break
+        parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts)
+
+    async def fetch_links(self, session: aiohttp.ClientSession, url: str,
+                          semaphore: AdaptiveConcurrencyLimiter,
+                          site_id: Optional[int] = None,
+                          sample: Optional[PageSample] = None) -> Optional[List[str]]:
+        """
+        Récupérer une page en streaming et n'en garder que les href.
+
+        Les réponses non-HTML sont rejetées sur le Content-Type sans lire
+        le corps; la lecture s'arrête après </body> ou MAX_BODY_BYTES.
+        `sample` garde le début de la page décodée (accueil du vendeur).
+        La latence et le statut sont remontés au contrôleur de concurrence.
+        La limite du site est prise avant le créneau global, pour qu'un site
+        ralenti par l'AIMD n'occupe pas de créneau pendant qu'il attend.
+        """
+        started = time.monotonic()
+        outcome = 'error'
         try:
-            href_pattern = re.compile(r'href=["\']([^"\']+)["\']', re.IGNORECASE)
-            links = href_pattern.findall(html)
-        except:
+            async with semaphore, self.slots.slot(site_id):
+                started = time.monotonic()
+                async with session.get(
+                    url,
+                    timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                    ssl=self.ssl_context,
+                    headers={'User-Agent': DEFAULT_USER_AGENT}
+                ) as response:
+                    outcome = response.status
+                    if response.status != 200 or not is_html_response(response):
+                        return None
+
+                    extractor = StreamingLinkExtractor(response.charset, sample)
+                    links = []
+                    size = 0
+                    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                        size += len(chunk)
+                        links.extend(extractor.feed(chunk))
+                        if extractor.done or size >= MAX_BODY_BYTES:
+                            break
+                    links.extend(extractor.close())
+                    return links
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+        except Exception:
             pass
-        return links
+        finally:
+            if isinstance(semaphore, AdaptiveConcurrencyLimiter):
+                semaphore.record(time.monotonic() - started, outcome)
+        return None
 
-    async def find_email(self, session: aiohttp.ClientSession, domain: str,
-                         semaphore: asyncio.Semaphore) -> Optional[str]:
-        pages = ['/', '/contact', '/contact-us', '/mentions-legales', '/a-propos']
-        emails = set()
+    async def stream_bytes(self, session: aiohttp.ClientSession, url: str,
+                           semaphore: asyncio.Semaphore, consume: Callable[[bytes], bool]) -> bool:
+        """
+        Lire un fichier brut (robots.txt, sitemap) quel que soit son Content-Type,
+        chunk par chunk: `consume(chunk)` retourne False pour arrêter la lecture.
+        Retourne False si la réponse n'est pas exploitable (erreur, statut != 200).
+        """
+        try:
+            async with semaphore:
+                async with session.get(
+                    url,
+                    timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT * 3),
+                    ssl=self.ssl_context,
+                    headers={'User-Agent': DEFAULT_USER_AGENT}
+                ) as response:
+                    if response.status != 200:
+                        return False
+                    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                        if not consume(chunk):
+                            break
+                    return True
+        except Exception:
+            pass
+        return False
 
-        for page in pages[:5]:
-            url = f"https://{domain}{page}"
-            html = await self.fetch_page(session, url, semaphore)
+    async def seed_from_sitemap(self, session: aiohttp.ClientSession, frontier: URLFrontier,
+                                url: str, seller_domain: str,
+                                semaphore: asyncio.Semaphore) -> bool:
+        """
+        Alimenter la frontière avec les articles du sitemap (les plus récents d'abord).
+        Les liens internes restent suivis: ils passent après les URLs du sitemap
+        et complètent le budget de pages (ou le remplissent sans sitemap).
+
+        Returns:
+            True si le sitemap a fourni des URLs
+        """
+        sitemap = await discover_sitemap_urls(
+            lambda sitemap_url, consume: self.stream_bytes(session, sitemap_url, semaphore, consume), url
+        )
+        seeds = []
+        for seed_url, is_article in rank_sitemap_entries(sitemap.entries):
+            normalized = normalize_url(url, seed_url)
+            if normalized and extract_domain(normalized) == seller_domain:
+                seeds.append((normalized, is_article))
+        if not seeds:
+            return False
 
+        # La page d'accueil d'abord (liens sitewide), puis les articles dans la limite de pages
+        budget = max(0, self.max_pages - 1)
+        frontier.add(url, score=SITEMAP_SEED_SCORE - 1)
+        for rank, (seed_url, _) in enumerate(seeds[:budget]):
+            frontier.add(seed_url, score=SITEMAP_SEED_SCORE + rank)
+
+        frontier.meta['sitemap_urls'] = len(seeds)
+        frontier.meta['missed_interesting'] = sum(1 for _, is_article in seeds[budget:] if is_article)
+        print(f"  🗺️  {seller_domain}: {len(seeds)} URLs dans {len(sitemap.sitemaps)} sitemap(s), "
+              f"{min(len(seeds), budget)} à crawler")
+        return True
+
+    async def inspect_buyer(self, session: aiohttp.ClientSession, domain: str,
+                            semaphore: asyncio.Semaphore, slot_key=None) -> Dict:
+        """
+        Emails de l'acheteur et langue de sa page d'accueil. Les pages (accueil
+        puis pages de contact) sont demandées une à une, jusqu'à la première
+        qui donne un email.
+        """
+        emails = set()
+        homepage = None
+
+        for page in EMAIL_PAGES:
+            html = await self.fetch_page(session, f"https://{domain}{page}", semaphore, slot_key)
+            if page == EMAIL_PAGES[0]:
+                homepage = html
             if html:
                 matches = EMAIL_PATTERN.findall(html)
                 for email in matches:
@@ -230,131 +720,170 @@ class MultiSiteCrawlWorker:
                     if email not in IGNORE_EMAILS:
                         if not any(ext in email for ext in ['.png', '.jpg', '.gif', '.js', '.css']):
                             emails.add(email)
+            if emails:
+                break
 
-        return '; '.join(sorted(emails)) if emails else None
+        buyer = {'domain': domain, 'email': '; '.join(sorted(emails)) if emails else None}
+        buyer.update(self.page_language(homepage))
+        return buyer
+
+    def page_language(self, page: Optional[str]) -> Dict:
+        """Langue détectée localement, ou text_sample pour le coordinateur si elle est incertaine"""
+        detected = page_language(page)
+        if 'language' in detected:
+            self.stats['languages_detected'] += 1
+        elif 'text_sample' in detected:
+            self.stats['language_samples'] += 1
+        return detected
 
     async def crawl_single_site(self, session: aiohttp.ClientSession,
                                 site_id: int, domain: str, url: str) -> Dict:
         """Crawler un seul site avec upload incrémental des acheteurs"""
         global current_tasks
 
-        current_tasks[site_id] = {'domain': domain, 'pages': 0, 'recent_urls': []}
-
-        semaphore = asyncio.Semaphore(self.concurrent_per_site)
-        visited = set()
-        to_visit = deque([url])
+        # Limite de concurrence adaptative (AIMD) propre à l'hôte du site
+        semaphore = AdaptiveConcurrencyLimiter(
+            initial=self.concurrent_per_site,
+            min_limit=MIN_CONCURRENT_PER_SITE,
+            max_limit=self.max_concurrent_per_site,
+            latency_budget=REQUEST_TIMEOUT / 2
+        )
+        current_tasks[site_id] = {'domain': domain, 'pages': 0, 'recent_urls': [], 'limiter': semaphore}
         buyer_domains = set()
         seller_domain = extract_domain(url)
 
-        # Buffer pour upload incrémental (batch de 20 acheteurs)
-        BATCH_SIZE = 20
-        pending_buyers = []
-        uploaded_domains = set()  # Éviter les doublons
-
-        while to_visit and len(visited) < self.max_pages and running:
-            # Prendre un batch d'URLs
-            batch_urls = []
-            while to_visit and len(batch_urls) < self.concurrent_per_site:
-                next_url = to_visit.popleft()
-                if next_url not in visited:
-                    batch_urls.append(next_url)
-                    visited.add(next_url)
-
-            if not batch_urls:
-                break
-
-            # Crawler le batch
-            tasks = [self.fetch_page(session, u, semaphore) for u in batch_urls]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for url_crawled, html in zip(batch_urls, results):
-                current_tasks[site_id]['pages'] = len(visited)
-                # Ajouter l'URL aux URLs récentes (garder seulement les dernières)
-                recent = current_tasks[site_id]['recent_urls']
-                recent.append(url_crawled)
-                if len(recent) > MAX_RECENT_URLS:
-                    current_tasks[site_id]['recent_urls'] = recent[-MAX_RECENT_URLS:]
-
-                if isinstance(html, Exception) or not html:
-                    continue
+        # Frontière persistante: reprise du site si un worker a été tué en cours de crawl
+        frontier_path = checkpoint_path(seller_domain or domain)
+        frontier = URLFrontier.load_checkpoint(frontier_path)
+        if frontier:
+            buyer_domains.update(frontier.meta.get('buyer_domains', []))
+            buyer_domains.update(frontier.meta.get('pending_buyers', []))
+            print(f"  ♻️  {domain}: reprise à {frontier.pages_crawled} pages ({len(frontier)} URLs en attente)")
+        else:
+            frontier = URLFrontier()
+            if self.crawl_mode == 'sitemap':
+                await self.seed_from_sitemap(session, frontier, url, seller_domain, semaphore)
+            frontier.add(url)
+
+        # Les acheteurs partent vers la recherche d'emails dès leur découverte
+        emails = BuyerEmailPipeline(self, session, site_id, seller_domain)
+        emails.uploaded.update(frontier.meta.get('buyer_domains', []))  # Déjà uploadés avant reprise
+        for buyer_domain in frontier.meta.get('pending_buyers', []):
+            await emails.put(buyer_domain)
+
+        # Début de la page d'accueil, pour la langue du vendeur (pas de nouvelle requête)
+        homepage = PageSample()
+
+        # Requêtes en vol du site: {tâche: url}. Le pipeline est rempli dès qu'une
+        # page se termine, sans attendre la plus lente d'un batch.
+        pending = {}
+        flushed = True
+        try:
+            while running:
+                while (frontier and len(pending) < semaphore.batch_size
+                       and frontier.pages_crawled < self.max_pages):
+                    next_url = frontier.pop()
+                    sample = homepage if next_url == url and not homepage.size else None
+                    fetch_task = asyncio.create_task(self.fetch_links(session, next_url, semaphore, site_id, sample))
+                    pending[fetch_task] = next_url
+
+                if not pending:
+                    break
+
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for fetch_task in done:
+                    url_crawled = pending.pop(fetch_task)
+                    links = None if fetch_task.exception() else fetch_task.result()
+
+                    current_tasks[site_id]['pages'] = frontier.pages_crawled
+                    # Ajouter l'URL aux URLs récentes (garder seulement les dernières)
+                    recent = current_tasks[site_id]['recent_urls']
+                    recent.append(url_crawled)
+                    if len(recent) > MAX_RECENT_URLS:
+                        current_tasks[site_id]['recent_urls'] = recent[-MAX_RECENT_URLS:]
+
+                    for link in links or []:
+                        normalized = normalize_url(url_crawled, link)
+                        if not normalized:
+                            continue
 
-                links = await self.extract_links(html)
-
-                for link in links:
-                    normalized = normalize_url(url_crawled, link)
-                    if not normalized:
-                        continue
-
-                    link_domain = extract_domain(normalized)
-
-                    if link_domain == seller_domain:
-                        if normalized not in visited:
-                            to_visit.append(normalized)
-                    elif is_valid_fr_domain(link_domain):
-                        # Upload incrémental: ajouter au buffer si pas déjà uploadé
-                        if link_domain not in buyer_domains and link_domain not in uploaded_domains:
-                            buyer_domains.add(link_domain)
-                            pending_buyers.append({'domain': link_domain, 'email': None})
-
-                            # Si on atteint BATCH_SIZE, envoyer le batch
-                            if len(pending_buyers) >= BATCH_SIZE:
-                                await self.submit_buyers_batch(session, site_id, seller_domain, pending_buyers)
-                                for b in pending_buyers:
-                                    uploaded_domains.add(b['domain'])
-                                self.stats['buyers_found'] += len(pending_buyers)
-                                pending_buyers = []
-
-        # Envoyer les acheteurs restants (sans email pour l'instant)
-        if pending_buyers:
-            await self.submit_buyers_batch(session, site_id, seller_domain, pending_buyers)
-            for b in pending_buyers:
-                uploaded_domains.add(b['domain'])
-            self.stats['buyers_found'] += len(pending_buyers)
-            pending_buyers = []
-
-        # Chercher les emails des acheteurs et les uploader par batch
-        email_semaphore = asyncio.Semaphore(10)  # Limiter les requêtes email
-        buyers_with_email = []
-        total_emails = 0
-
-        for buyer_domain in buyer_domains:
-            email = await self.find_email(session, buyer_domain, email_semaphore)
-            if email:
-                buyers_with_email.append({'domain': buyer_domain, 'email': email})
-                total_emails += 1
-                self.stats['emails_found'] += 1
-
-                # Uploader les emails par batch de BATCH_SIZE
-                if len(buyers_with_email) >= BATCH_SIZE:
-                    await self.submit_buyers_batch(session, site_id, seller_domain, buyers_with_email)
-                    buyers_with_email = []
-
-        # Envoyer les derniers emails
-        if buyers_with_email:
-            await self.submit_buyers_batch(session, site_id, seller_domain, buyers_with_email)
-
-        self.stats['pages_crawled'] += len(visited)
+                        link_domain = extract_domain(normalized)
+
+                        if link_domain == seller_domain:
+                            frontier.add(normalized)
+                        elif is_valid_fr_domain(link_domain):
+                            if link_domain not in buyer_domains:
+                                buyer_domains.add(link_domain)
+                                # Déjà connu du coordinateur: ni recherche d'email ni upload
+                                if link_domain in self.known_domains:
+                                    self.stats['known_buyers_skipped'] += 1
+                                    continue
+                                await emails.put(link_domain)
+
+                    frontier.task_done(url_crawled)
+
+                if frontier.checkpoint_due():
+                    frontier.meta['buyer_domains'] = sorted(emails.uploaded)
+                    frontier.meta['pending_buyers'] = emails.pending()
+                    frontier.save_checkpoint(frontier_path)
+
+            if running:
+                # Vider la file d'emails et envoyer les derniers acheteurs
+                flushed = await emails.close()
+        except asyncio.CancelledError:
+            await emails.cancel()
+            frontier.meta['buyer_domains'] = sorted(emails.uploaded)
+            frontier.meta['pending_buyers'] = emails.pending()
+            frontier.save_checkpoint(frontier_path)
+            raise
+        finally:
+            # Arrêt en cours de crawl: les URLs encore en vol restent dans le checkpoint
+            for fetch_task in pending:
+                fetch_task.cancel()
+            for consumer in emails.consumers:
+                consumer.cancel()
+
+        if running and flushed:
+            remove_checkpoint(frontier_path)
+        else:
+            # Arrêt demandé ou dernier batch refusé: garder la frontière et les acheteurs
+            # non envoyés pour la reprise
+            await emails.cancel()
+            frontier.meta['buyer_domains'] = sorted(emails.uploaded)
+            frontier.meta['pending_buyers'] = emails.pending()
+            frontier.save_checkpoint(frontier_path)
+
+        self.stats['pages_crawled'] += frontier.pages_crawled
 
         # Retirer de current_tasks
         if site_id in current_tasks:
             del current_tasks[site_id]
 
+        if not flushed:
+            # Pas de résultat final: le site sera repris (depuis le checkpoint) à l'expiration du bail
+            raise RuntimeError(f"{domain}: {len(emails.pending())} acheteur(s) non envoyé(s), checkpoint conservé")
+
         # Retourner un résumé (les données sont déjà uploadées)
         return {
             'site_id': site_id,
             'domain': domain,
             'buyers': [],  # Déjà uploadés de façon incrémentale
-            'pages_crawled': len(visited),
+            'pages_crawled': frontier.pages_crawled,
             'total_buyers': len(buyer_domains),
-            'total_emails': total_emails,
-            'error': None
+            'total_emails': emails.emails_found,
+            'sitemap_urls': frontier.meta.get('sitemap_urls', 0),
+            'missed_interesting': frontier.meta.get('missed_interesting', 0),
+            'error': None,
+            **self.page_language(homepage.text())
         }
 
     async def get_tasks(self, session: aiohttp.ClientSession, count: int) -> List[Dict]:
         """Demander des tâches (1 par site à crawler)"""
         try:
             url = f"{self.api_url}/api/crawl/task?worker_id={self.worker_id}&batch_size={count}"
-            async with session.get(url, ssl=self.ssl_context) as response:
+            async with session.get(url, ssl=self.ssl_context,
+                                   timeout=aiohttp.ClientTimeout(total=API_TIMEOUT)) as response:
                 if response.status == 200:
                     data = await response.json()
                     return data.get('sites', [])
@@ -363,13 +892,52 @@ class MultiSiteCrawlWorker:
         return []
 
     async def submit_result(self, session: aiohttp.ClientSession, result: Dict) -> bool:
+        result['worker_id'] = self.worker_id
+        if self.channel and self.channel.available:
+            try:
+                reply = await self.channel.request('result', result)
+                return reply.get('ok', False)
+            except ChannelUnavailable:
+                pass
         try:
-            url = f"{self.api_url}/api/crawl/result"
-            result['worker_id'] = self.worker_id
-            async with session.post(url, json=result, ssl=self.ssl_context) as response:
-                return response.status == 200
+            return await self.post_payload(session, '/api/crawl/result', result) == 200
         except Exception as e:
             print(f"❌ Erreur submit_result: {e}")
+        return False
+
+    async def report_result(self, session: aiohttp.ClientSession, result: Dict):
+        """Envoyer le résultat d'un site terminé (tâche de fond: le scheduler n'attend pas l'échange)"""
+        try:
+            success = await self.submit_result(session, result)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"  ❌ Erreur envoi {result.get('domain')}: {e}")
+            return
+        if not success:
+            print(f"  ⚠️  Échec envoi {result['domain']}")
+            return
+
+        self.stats['tasks_completed'] += 1
+        print(f"  ✅ {result['domain']}: {len(result['buyers'])} acheteurs, {result['pages_crawled']} pages")
+        # Afficher les stats périodiquement
+        if self.stats['tasks_completed'] % 5 == 0:
+            print(f"\n📊 Stats: {self.stats['tasks_completed']} tâches, "
+                  f"{self.stats['buyers_found']} acheteurs, "
+                  f"{self.stats['emails_found']} emails, "
+                  f"{self.stats['pages_crawled']} pages")
+
+    async def post_payload(self, session: aiohttp.ClientSession, path: str, data: Dict) -> int:
+        """POST au format négocié avec le coordinateur (un 415 ramène au JSON non compressé)"""
+        url = f"{self.api_url}{path}"
+        while True:
+            body, headers = self.wire.encode(data)
+            async with session.post(url, data=body, headers=headers, ssl=self.ssl_context,
+                                    timeout=aiohttp.ClientTimeout(total=API_TIMEOUT)) as response:
+                if response.status == 415 and self.wire.negotiated:
+                    self.wire.reset()
+                    continue
+                self.wire.update(response.headers)
+                return response.status
 
     async def submit_buyers_batch(self, session: aiohttp.ClientSession,
                                    site_id: int, seller_domain: str,
@@ -377,58 +945,126 @@ class MultiSiteCrawlWorker:
         """Envoyer un batch d'acheteurs à l'API (upload incrémental)"""
         if not buyers:
             return True
+        data = {
+            'worker_id': self.worker_id,
+            'site_id': site_id,
+            'seller_domain': seller_domain,
+            'buyers': buyers
+        }
+        if self.channel and self.channel.available:
+            try:
+                reply = await self.channel.request('buyers', data)
+                return reply.get('ok', False)
+            except ChannelUnavailable:
+                pass
         try:
-            url = f"{self.api_url}/api/crawl/buyers_batch"
-            data = {
-                'worker_id': self.worker_id,
-                'site_id': site_id,
-                'seller_domain': seller_domain,
-                'buyers': buyers
-            }
-            async with session.post(url, json=data, ssl=self.ssl_context) as response:
-                return response.status == 200
+            return await self.post_payload(session, '/api/crawl/buyers_batch', data) == 200
         except Exception as e:
             print(f"❌ Erreur submit_buyers_batch: {e}")
         return False
 
-    async def send_heartbeat(self, session: aiohttp.ClientSession):
+    def heartbeat_data(self) -> Dict:
         global current_tasks
-        try:
-            url = f"{self.api_url}/api/crawl/heartbeat"
-
-            # Construire la liste des tâches en cours
-            tasks_info = [f"{t['domain']}({t['pages']}p)" for t in current_tasks.values()]
-            current_task_str = " | ".join(tasks_info) if tasks_info else "idle"
-            total_pages = sum(t['pages'] for t in current_tasks.values())
-
-            # Construire la liste détaillée des sites avec URLs récentes
-            sites_detail = []
-            for site_id, task in current_tasks.items():
-                sites_detail.append({
-                    'domain': task['domain'],
-                    'pages': task['pages'],
-                    'recent_urls': task.get('recent_urls', [])[-MAX_RECENT_URLS:]
-                })
-
-            data = {
-                'worker_id': self.worker_id,
-                'hostname': self.hostname,
-                'status': 'running',
-                'current_task': current_task_str,
-                'pages_crawled': total_pages,
-                'sites_in_progress': sites_detail,  # Nouveau champ avec détail par site
-                'stats': self.stats
+
+        # Construire la liste des tâches en cours
+        tasks_info = [f"{t['domain']}({t['pages']}p)" for t in current_tasks.values()]
+        current_task_str = " | ".join(tasks_info) if tasks_info else "idle"
+        total_pages = sum(t['pages'] for t in current_tasks.values())
+
+        # Construire la liste détaillée des sites avec URLs récentes
+        sites_detail = []
+        for site_id, task in current_tasks.items():
+            site_detail = {
+                'domain': task['domain'],
+                'pages': task['pages'],
+                'recent_urls': task.get('recent_urls', [])[-MAX_RECENT_URLS:]
             }
-            async with session.post(url, json=data, ssl=self.ssl_context) as response:
-                pass
-        except:
+            if task.get('limiter'):
+                site_detail['concurrency'] = task['limiter'].snapshot()
+            sites_detail.append(site_detail)
+
+        return {
+            'worker_id': self.worker_id,
+            'hostname': self.hostname,
+            'status': 'running',
+            'current_task': current_task_str,
+            'pages_crawled': total_pages,
+            'sites_in_progress': sites_detail,  # Nouveau champ avec détail par site
+            'scheduler': self.slots.snapshot(),
+            'stats': self.stats
+        }
+
+    async def send_heartbeat(self, session: aiohttp.ClientSession):
+        try:
+            await self.post_payload(session, '/api/crawl/heartbeat', self.heartbeat_data())
+        except Exception:
             pass
 
+    async def sync_known_domains(self, session: aiohttp.ClientSession) -> bool:
+        """Télécharger les domaines connus (complet au démarrage puis toutes les 6h, sinon delta)"""
+        known = self.known_domains
+        url = f"{self.api_url}/api/crawl/known-domains"
+        if known.version and not known.needs_full_sync():
+            url += f"?since={known.version}"
+        try:
+            async with session.get(url, ssl=self.ssl_context,
+                                   timeout=aiohttp.ClientTimeout(total=120)) as response:
+                if response.status != 200:
+                    return False
+                payload = await response.json()
+            known.apply(payload)
+            if payload.get('full'):
+                print(f"📚 Domaines connus: {len(known)} (version {known.version})")
+            return True
+        except Exception as e:
+            print(f"⚠️  Erreur sync domaines connus: {e}")
+        return False
+
+    async def sync_domain_policy(self, session: aiohttp.ClientSession) -> bool:
+        """Télécharger la blacklist du coordinateur si elle a changé"""
+        global domain_policy
+        url = f"{self.api_url}/api/crawl/domain-policy?version={domain_policy.version}"
+        try:
+            async with session.get(url, ssl=self.ssl_context,
+                                   timeout=aiohttp.ClientTimeout(total=60)) as response:
+                if response.status != 200:
+                    return False
+                payload = await response.json()
+            if not payload.get('unchanged'):
+                domain_policy = DomainPolicy.from_payload(payload)
+                print(f"🚫 Blacklist: {len(domain_policy)} domaines (version {domain_policy.version})")
+            return True
+        except Exception as e:
+            print(f"⚠️  Erreur sync blacklist: {e}")
+        return False
+
+    async def known_domains_loop(self, session: aiohttp.ClientSession):
+        while running:
+            await self.sync_domain_policy(session)
+            await self.sync_known_domains(session)
+            await asyncio.sleep(KNOWN_DOMAINS_SYNC_INTERVAL)
+
     async def heartbeat_loop(self, session: aiohttp.ClientSession):
         while running:
-            await self.send_heartbeat(session)
+            # Avec le canal multiplexé, le heartbeat part avec les autres messages
+            if not (self.channel and self.channel.available):
+                await self.send_heartbeat(session)
             await asyncio.sleep(HEARTBEAT_INTERVAL)
 
+    def needs_more_sites(self, active_sites: int) -> bool:
+        """Le worker a de la capacité libre: aucun site, ou créneaux sous-utilisés sans file d'attente"""
+        if active_sites >= self.parallel_sites:
+            return False
+        if active_sites == 0:
+            return True
+        return (self.slots.utilization < SLOT_UTILIZATION_TARGET
+                and self.slots.waiting_sites == 0)
+
+    def sites_to_request(self, active_sites: int) -> int:
+        """Nombre de sites à demander pour remplir les créneaux libres"""
+        wanted = max(1, math.ceil(self.slots.free / self.concurrent_per_site))
+        return min(self.parallel_sites - active_sites, wanted)
+
     async def run(self):
         global running, current_tasks
 
@@ -437,84 +1073,99 @@ class MultiSiteCrawlWorker:
         print("=" * 60 + "\n")
 
         connector = aiohttp.TCPConnector(
-            limit=200,
-            limit_per_host=30,
+            # Créneaux du pool + marge pour les sitemaps, emails et appels API
+            limit=self.slots.size + 50,
+            limit_per_host=max(30, self.max_concurrent_per_site),
             ttl_dns_cache=300,
             ssl=self.ssl_context
         )
 
         async with aiohttp.ClientSession(connector=connector) as session:
+            self.channel = CoordinatorChannel(self, session)
+            channel_task = asyncio.create_task(self.channel.run())
             heartbeat_task = asyncio.create_task(self.heartbeat_loop(session))
+            known_domains_task = asyncio.create_task(self.known_domains_loop(session))
+            site_tasks = set()
+            submissions = set()  # Envois de résultats en cours
+            retry_at = 0.0
 
             try:
                 while running:
-                    # Calculer combien de sites on peut lancer
-                    active_count = len(current_tasks)
-                    slots_available = self.parallel_sites - active_count
-
-                    if slots_available > 0:
-                        print(f"\n📋 Demande de {slots_available} tâche(s)...")
-                        tasks = await self.get_tasks(session, slots_available)
+                    # Remonter les résultats des sites terminés, en tâche de fond
+                    finished = [t for t in site_tasks if t.done()]
+                    for completed_task in finished:
+                        site_tasks.discard(completed_task)
+                        try:
+                            result = completed_task.result()
+                        except Exception as e:
+                            self.stats['errors'] += 1
+                            print(f"  ❌ Erreur: {e}")
+                            continue
+                        submission = asyncio.create_task(self.report_result(session, result))
+                        submissions.add(submission)
+                        submission.add_done_callback(submissions.discard)
+
+                    # Demander de nouveaux sites dès que les créneaux ne sont plus saturés
+                    if self.channel.available:
+                        # Tâches reçues par le canal, puis capacité libre pour le prochain échange
+                        while not self.channel.tasks.empty():
+                            task = self.channel.tasks.get_nowait()
+                            print(f"  ▶️  {task['domain']}")
+                            site_tasks.add(asyncio.create_task(
+                                self.crawl_single_site(session, task['id'], task['domain'], task['url'])
+                            ))
+                        wants_sites = self.needs_more_sites(len(site_tasks))
+                        self.channel.want_tasks(self.sites_to_request(len(site_tasks)) if wants_sites else 0)
+                    elif self.needs_more_sites(len(site_tasks)) and time.monotonic() >= retry_at:
+                        count = self.sites_to_request(len(site_tasks))
+                        print(f"\n📋 Demande de {count} tâche(s) (créneaux occupés: {self.slots.in_flight}/{self.slots.size})...")
+                        tasks = await self.get_tasks(session, count)
 
                         if not tasks:
-                            if active_count == 0:
+                            if not site_tasks:
                                 print("😴 Aucune tâche, attente 60s...")
                                 await asyncio.sleep(60)
-                            continue
-
-                        print(f"📦 {len(tasks)} tâche(s) reçue(s)")
-
-                        # Lancer les crawls en parallèle
-                        crawl_tasks = []
-                        for task in tasks:
-                            print(f"  ▶️  {task['domain']}")
-                            crawl_task = asyncio.create_task(
-                                self.crawl_single_site(
-                                    session,
-                                    task['id'],
-                                    task['domain'],
-                                    task['url']
-                                )
-                            )
-                            crawl_tasks.append(crawl_task)
-
-                        # Attendre qu'au moins un termine
-                        if crawl_tasks:
-                            done, pending = await asyncio.wait(
-                                crawl_tasks,
-                                return_when=asyncio.FIRST_COMPLETED,
-                                timeout=10  # Check toutes les 10s
-                            )
-
-                            for completed_task in done:
-                                try:
-                                    result = await completed_task
-                                    success = await self.submit_result(session, result)
-                                    if success:
-                                        self.stats['tasks_completed'] += 1
-                                        print(f"  ✅ {result['domain']}: {len(result['buyers'])} acheteurs, {result['pages_crawled']} pages")
-                                    else:
-                                        print(f"  ⚠️  Échec envoi {result['domain']}")
-                                except Exception as e:
-                                    self.stats['errors'] += 1
-                                    print(f"  ❌ Erreur: {e}")
+                                continue
+                            retry_at = time.monotonic() + EMPTY_QUEUE_RETRY
+                        else:
+                            print(f"📦 {len(tasks)} tâche(s) reçue(s)")
+                            for task in tasks:
+                                print(f"  ▶️  {task['domain']}")
+                                site_tasks.add(asyncio.create_task(
+                                    self.crawl_single_site(
+                                        session,
+                                        task['id'],
+                                        task['domain'],
+                                        task['url']
+                                    )
+                                ))
+
+                    if site_tasks:
+                        await asyncio.wait(site_tasks, timeout=SCHEDULER_TICK,
+                                           return_when=asyncio.FIRST_COMPLETED)
                     else:
-                        # Tous les slots sont occupés, attendre
-                        await asyncio.sleep(5)
-
-                    # Afficher les stats périodiquement
-                    if self.stats['tasks_completed'] > 0 and self.stats['tasks_completed'] % 5 == 0:
-                        print(f"\n📊 Stats: {self.stats['tasks_completed']} tâches, "
-                              f"{self.stats['buyers_found']} acheteurs, "
-                              f"{self.stats['emails_found']} emails, "
-                              f"{self.stats['pages_crawled']} pages")
+                        await asyncio.sleep(SCHEDULER_TICK)
 
             finally:
-                heartbeat_task.cancel()
-                try:
-                    await heartbeat_task
-                except asyncio.CancelledError:
-                    pass
+                # Arrêt: les sites en cours sauvegardent leur frontière pour la reprise
+                for site_task in site_tasks:
+                    site_task.cancel()
+                await asyncio.gather(*site_tasks, return_exceptions=True)
+
+                # Dernier échange: acheteurs et résultats encore dans la boîte d'envoi
+                if self.channel.available:
+                    await self.channel.exchange()
+                if submissions:
+                    await asyncio.wait(submissions, timeout=API_TIMEOUT)
+                    for submission in list(submissions):
+                        submission.cancel()
+
+                for background_task in (channel_task, heartbeat_task, known_domains_task):
+                    background_task.cancel()
+                    try:
+                        await background_task
+                    except asyncio.CancelledError:
+                        pass
 
         print("\n✅ Worker arrêté proprement")
 
@@ -524,10 +1175,18 @@ def main():
     parser.add_argument('--api-url', default=os.environ.get('CRAWL_API_URL', DEFAULT_API_URL))
     parser.add_argument('--worker-id', default=os.environ.get('CRAWL_WORKER_ID'))
     parser.add_argument('--parallel-sites', type=int, default=DEFAULT_PARALLEL_SITES,
-                        help=f'Nombre de sites en parallèle (défaut: {DEFAULT_PARALLEL_SITES})')
+                        help=f'Nombre max de sites en parallèle (défaut: {DEFAULT_PARALLEL_SITES})')
     parser.add_argument('--concurrent', type=int, default=DEFAULT_CONCURRENT,
                         help=f'Requêtes simultanées par site (défaut: {DEFAULT_CONCURRENT})')
+    parser.add_argument('--max-inflight', type=int,
+                        default=int(os.environ.get('CRAWL_MAX_INFLIGHT', DEFAULT_MAX_INFLIGHT)),
+                        help=f'Requêtes en vol pour tout le worker, réparties entre les sites (défaut: {DEFAULT_MAX_INFLIGHT})')
     parser.add_argument('--max-pages', type=int, default=DEFAULT_MAX_PAGES)
+    parser.add_argument('--crawl-mode', choices=['sitemap', 'links'],
+                        default=os.environ.get('CRAWL_MODE', DEFAULT_CRAWL_MODE),
+                        help=f'Découverte des pages: sitemap d\'abord ou liens uniquement (défaut: {DEFAULT_CRAWL_MODE})')
+    parser.add_argument('--no-compression', action='store_true',
+                        help='Envoyer les résultats en JSON non compressé (sans zstd/gzip ni msgpack)')
 
     args = parser.parse_args()
 
@@ -541,7 +1200,10 @@ def main():
         worker_id=worker_id,
         parallel_sites=args.parallel_sites,
         concurrent=args.concurrent,
-        max_pages=args.max_pages
+        max_pages=args.max_pages,
+        crawl_mode=args.crawl_mode,
+        max_inflight=args.max_inflight,
+        compress_payloads=not args.no_compression
     )
 
     try:
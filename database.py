@@ -3,14 +3,24 @@
 Base de données pour le suivi des sites et leur état de traitement
 """
 
+import logging
+import os
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, Enum, Float, text
+from sqlalchemy import Column, Computed, Integer, String, Text, DateTime, Boolean, Enum, Float, ForeignKey, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 import enum
 
+from db_engine import create_database_engine, database_url, is_postgres
+
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
+# Configuration de la base de données: SQLite par défaut, PostgreSQL si DATABASE_URL (db_engine.py)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE_URL = database_url('DATABASE_URL', f'{BASE_DIR}/scrap_email.db')
+
 
 class SiteStatus(enum.Enum):
     """Statut général du site"""
@@ -27,6 +37,28 @@ class SiteStatus(enum.Enum):
     ERROR = "error"  # Erreur lors du traitement
 
 
+class LookupState(enum.Enum):
+    """État d'une recherche (SIRET, dirigeants) d'après la valeur stockée"""
+    MISSING = "missing"  # Pas encore de valeur (NULL ou vide)
+    NOT_FOUND = "not_found"  # Cherché sans succès ('NON TROUVÉ', '[]')
+    FOUND = "found"  # Valeur trouvée
+
+
+# Colonnes calculées par la base à partir des valeurs sentinelles: toujours à jour, quel que
+# soit le script qui écrit emails / siret / leaders, et indexables (migrate_add_site_states.py).
+# VIRTUAL sous SQLite; PostgreSQL (avant 18) n'accepte que STORED.
+COMPUTED_PERSISTED = is_postgres(DATABASE_URL)
+HAS_EMAIL_SQL = "emails IS NOT NULL AND emails NOT IN ('', 'NO EMAIL FOUND')"
+SIRET_STATE_SQL = (
+    "CASE WHEN siret IS NULL OR siret = '' THEN 'missing' "
+    "WHEN siret = 'NON TROUVÉ' THEN 'not_found' ELSE 'found' END"
+)
+LEADERS_STATE_SQL = (
+    "CASE WHEN leaders IS NULL OR leaders = '' THEN 'missing' "
+    "WHEN leaders IN ('NON TROUVÉ', '[]') THEN 'not_found' ELSE 'found' END"
+)
+
+
 class Site(Base):
     """Modèle pour les sites web découverts"""
     __tablename__ = 'sites'
@@ -40,7 +72,7 @@ class Site(Base):
 
     # Emails
     email_checked = Column(Boolean, default=False)
-    email_found_at = Column(DateTime, nullable=True)
+    email_found_at = Column(DateTime, nullable=True, index=True)
     emails = Column(Text, nullable=True)  # Stocké en format "email1; email2; email3"
     email_source = Column(String(20), nullable=True)  # "scraping" ou "siret" pour différencier la source
 
@@ -56,6 +88,11 @@ class Site(Base):
     leaders_found_at = Column(DateTime, nullable=True)
     leaders = Column(Text, nullable=True)  # Stocké en format "nom1; nom2; nom3"
 
+    # États calculés (lecture seule): has_email, siret_state / leaders_state (valeurs de LookupState)
+    has_email = Column(Boolean, Computed(HAS_EMAIL_SQL, persisted=COMPUTED_PERSISTED))
+    siret_state = Column(String(10), Computed(SIRET_STATE_SQL, persisted=COMPUTED_PERSISTED))
+    leaders_state = Column(String(10), Computed(LEADERS_STATE_SQL, persisted=COMPUTED_PERSISTED))
+
     # Validation d'email
     email_validated = Column(Boolean, default=False)
     email_validation_score = Column(Integer, default=0)  # Score 0-100
@@ -72,7 +109,7 @@ class Site(Base):
     # Blacklist
     blacklisted = Column(Boolean, default=False, index=True)
     blacklist_reason = Column(Text, nullable=True)
-    blacklisted_at = Column(DateTime, nullable=True)
+    blacklisted_at = Column(DateTime, nullable=True, index=True)
 
     # Activation/Désactivation
     is_active = Column(Boolean, default=True, index=True)  # Permet de désactiver un site sans le supprimer
@@ -132,6 +169,45 @@ class Site(Base):
         }
 
 
+class SiteEmail(Base):
+    """
+    Un email d'un site (table normalisée de Site.emails). Tenue à jour par
+    des triggers (SQLite ou PL/pgSQL) à chaque écriture de Site.emails (site_emails.py,
+    migrate_add_site_emails.py): les scripts continuent d'écrire Site.emails.
+    """
+    __tablename__ = 'site_emails'
+    __table_args__ = (UniqueConstraint('site_id', 'email', name='uq_site_emails_site_email'),)
+
+    id = Column(Integer, primary_key=True)
+    site_id = Column(Integer, ForeignKey('sites.id', ondelete='CASCADE'), nullable=False, index=True)
+    email = Column(String(255), nullable=False, index=True)  # en minuscules
+    email_domain = Column(String(255), nullable=False, index=True)  # partie après @
+    position = Column(Integer, default=0)  # rang dans Site.emails (le plus petit: email principal)
+    source = Column(String(20), nullable=True)  # "scraping" ou "siret" (Site.email_source à la découverte)
+    found_at = Column(DateTime, nullable=True)
+
+    # Validation de cet email
+    validation_status = Column(String(20), nullable=True)  # 'valid', 'invalid', 'risky', 'unknown'
+    validation_score = Column(Integer, nullable=True)  # Score 0-100
+    deliverable = Column(Boolean, nullable=True)
+    validated_at = Column(DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'site_id': self.site_id,
+            'email': self.email,
+            'email_domain': self.email_domain,
+            'position': self.position,
+            'source': self.source,
+            'found_at': self.found_at.isoformat() if self.found_at else None,
+            'validation_status': self.validation_status,
+            'validation_score': self.validation_score,
+            'deliverable': self.deliverable,
+            'validated_at': self.validated_at.isoformat() if self.validated_at else None,
+        }
+
+
 class ScrapingJob(Base):
     """Suivi des jobs de scraping"""
     __tablename__ = 'scraping_jobs'
@@ -166,32 +242,25 @@ class ScrapingJob(Base):
         }
 
 
-# Configuration de la base de données
-import os
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_URL = f'sqlite:///{BASE_DIR}/scrap_email.db'
-
-# Engine global partagé avec configuration optimisée pour la concurrence
+# Engine et fabrique de sessions partagés par process (WAL sous SQLite, QueuePool sous PostgreSQL)
 _engine = None
+_engine_pid = None
+_session_factory = None
+_scoped_session = None
+
+# Erreurs de verrou qu'une nouvelle tentative peut résoudre (SQLite, PostgreSQL)
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'deadlock detected', 'could not serialize access')
 
 def get_engine():
-    """Obtenir ou créer l'engine SQLite avec configuration optimisée"""
-    global _engine
+    """Obtenir ou créer l'engine (SQLite ou PostgreSQL selon DATABASE_URL)"""
+    global _engine, _engine_pid, _session_factory, _scoped_session
+    if _engine is not None and _engine_pid != os.getpid():
+        # Engine hérité d'un fork (gunicorn, multiprocessing): connexions du parent laissées au parent
+        _engine.dispose(close=False)
+        _engine = _session_factory = _scoped_session = None
     if _engine is None:
-        _engine = create_engine(
-            DATABASE_URL,
-            connect_args={
-                'timeout': 30,  # Timeout de 30 secondes pour les verrous
-                'check_same_thread': False,  # Permet l'utilisation multi-thread
-            },
-            pool_pre_ping=True,  # Vérifie la connexion avant utilisation
-            pool_recycle=3600,  # Recycle les connexions après 1h
-        )
-        # Activer le mode WAL pour améliorer la concurrence
-        with _engine.connect() as conn:
-            conn.execute(text("PRAGMA journal_mode=WAL"))
-            conn.execute(text("PRAGMA busy_timeout=30000"))  # 30 secondes
-            conn.commit()
+        _engine = create_database_engine(DATABASE_URL)
+        _engine_pid = os.getpid()
     return _engine
 
 def init_db():
@@ -200,14 +269,51 @@ def init_db():
     Base.metadata.create_all(engine)
     return engine
 
-def get_session():
-    """Obtenir une session de base de données"""
+def get_session_factory():
+    """sessionmaker lié à l'engine, créé une fois par process"""
+    global _session_factory
     engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    if _session_factory is None:
+        _session_factory = sessionmaker(bind=engine)
+    return _session_factory
 
+def get_session():
+    """Obtenir une session de base de données"""
+    return get_session_factory()()
+
+def get_scoped_session():
+    """
+    Registre scoped_session: une session par thread, réutilisée d'un appel à
+    l'autre (Session() la renvoie, Session.remove() la ferme en fin de tâche)
+    """
+    global _scoped_session
+    factory = get_session_factory()
+    if _scoped_session is None:
+        _scoped_session = scoped_session(factory)
+    return _scoped_session
+
+def is_lock_error(error) -> bool:
+    """Erreur de verrou (base occupée, deadlock): l'opération peut être retentée"""
+    return any(marker in str(error).lower() for marker in LOCK_ERRORS)
+
+def safe_commit(session):
+    """
+    Commit de la session, annulée si le COMMIT échoue (la session reste utilisable)
+
+    L'attente sur un verrou est celle de l'engine (busy_timeout de 30 s sous
+    SQLite, voir db_engine.py): un commit raté ne se rejoue pas, l'ORM ayant
+    abandonné la transaction. Pour des écritures rejouables en entier, voir
+    batch_writer.BatchWriter.
+    """
+    try:
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        if is_lock_error(e):
+            logger.warning(f"⏳ Base verrouillée au commit, transaction annulée: {e}")
+        raise
 
 if __name__ == '__main__':
     print("Création de la base de données...")
     init_db()
-    print("✓ Base de données créée avec succès : scrap_email.db")
+    print(f"✓ Base de données créée avec succès : {get_engine().url.render_as_string(hide_password=True)}")
@@ -4,7 +4,7 @@ Helper pour intégrer les scripts existants avec la base de données
 """
 
 from datetime import datetime
-from database import get_session, Site, ScrapingJob, SiteStatus
+from database import get_session, Site, ScrapingJob, SiteStatus, LookupState
 
 
 class DBHelper:
@@ -58,21 +58,28 @@ class DBHelper:
             print(f"⚠ Site non trouvé: {domain}")
             return None
 
-        site.emails = emails
-        site.email_source = email_source
-        site.email_checked = True
-
-        if emails and emails != 'NO EMAIL FOUND':
-            site.email_found_at = datetime.utcnow()
-            site.status = SiteStatus.EMAIL_FOUND
-        else:
-            site.status = SiteStatus.EMAIL_NOT_FOUND
-
-        site.updated_at = datetime.utcnow()
+        for column, value in self.email_values(emails, email_source).items():
+            setattr(site, column, value)
         self.session.commit()
 
         return site
 
+    @staticmethod
+    def email_values(emails, email_source='scraping'):
+        """Colonnes écrites par update_email (aussi pour BatchWriter.update)"""
+        values = {
+            'emails': emails,
+            'email_source': email_source,
+            'email_checked': True,
+            'updated_at': datetime.utcnow(),
+        }
+        if emails and emails != 'NO EMAIL FOUND':
+            values['email_found_at'] = datetime.utcnow()
+            values['status'] = SiteStatus.EMAIL_FOUND
+        else:
+            values['status'] = SiteStatus.EMAIL_NOT_FOUND
+        return values
+
     def update_siret(self, domain, siret, siret_type='SIRET'):
         """Mettre à jour le SIRET/SIREN d'un site"""
         site = self.session.query(Site).filter(Site.domain == domain).first()
@@ -178,8 +185,7 @@ class DBHelper:
         """Récupérer les sites sans SIRET"""
         query = self.session.query(Site).filter(
             (Site.siret_checked == False) |
-            (Site.siret.is_(None)) |
-            (Site.siret == '')
+            (Site.siret_state == LookupState.MISSING.value)
         )
 
         if limit:
@@ -190,12 +196,9 @@ class DBHelper:
     def get_sites_without_leaders(self, limit=None):
         """Récupérer les sites avec SIRET mais sans dirigeants"""
         query = self.session.query(Site).filter(
-            Site.siret.isnot(None),
-            Site.siret != '',
-            Site.siret != 'NON TROUVÉ',
+            Site.siret_state == LookupState.FOUND.value,
             (Site.leaders_checked == False) |
-            (Site.leaders.is_(None)) |
-            (Site.leaders == '')
+            (Site.leaders_state == LookupState.MISSING.value)
         )
 
         if limit:
@@ -253,19 +256,13 @@ class DBHelper:
         """Obtenir des statistiques rapides"""
         total = self.session.query(Site).count()
         with_email = self.session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
+            Site.has_email == True
         ).count()
         with_siret = self.session.query(Site).filter(
-            Site.siret.isnot(None),
-            Site.siret != '',
-            Site.siret != 'NON TROUVÉ'
+            Site.siret_state == LookupState.FOUND.value
         ).count()
         with_leaders = self.session.query(Site).filter(
-            Site.leaders.isnot(None),
-            Site.leaders != '',
-            Site.leaders != 'NON TROUVÉ'
+            Site.leaders_state == LookupState.FOUND.value
         ).count()
 
         return {
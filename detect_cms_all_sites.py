@@ -5,6 +5,7 @@ Script pour détecter le CMS de tous les sites existants dans la base de donnée
 
 import sys
 from datetime import datetime
+from batch_writer import BatchWriter
 from database import get_session, Site
 from cms_detector import CMSDetector
 import time
@@ -15,15 +16,15 @@ def detect_cms_for_all_sites(batch_size=100, max_sites=None, skip_existing=True)
     Détecte le CMS pour tous les sites de la base
 
     Args:
-        batch_size: Nombre de sites à traiter par batch
+        batch_size: Nombre de sites lus par requête et écrits par commit
         max_sites: Nombre maximum de sites à traiter (None = tous)
         skip_existing: Ignorer les sites avec CMS déjà détecté
     """
     session = get_session()
     detector = CMSDetector(timeout=8)
 
-    # Compter les sites à traiter
-    query = session.query(Site)
+    # Compter les sites à traiter (seuls id et domaine sont lus)
+    query = session.query(Site.id, Site.domain)
 
     if skip_existing:
         query = query.filter(Site.cms == None)
@@ -49,64 +50,69 @@ def detect_cms_for_all_sites(batch_size=100, max_sites=None, skip_existing=True)
 
     cms_stats = {}
 
-    offset = 0
-
-    while offset < total_sites:
-        # Récupérer un batch de sites
-        batch = query.limit(batch_size).offset(offset).all()
-
-        if not batch:
-            break
-
-        for site in batch:
-            processed += 1
-
-            # Progress
-            progress = (processed / total_sites) * 100
-            print(f"[{processed:5}/{total_sites}] ({progress:5.1f}%) {site.domain:<50}", end=" ", flush=True)
-
-            try:
-                # Détecter le CMS
-                result = detector.detect(site.domain)
-
-                if result['cms']:
-                    site.cms = result['cms']
-                    site.cms_version = result['version']
-                    site.cms_detected_at = datetime.utcnow()
-
-                    session.commit()
-
-                    # Statistiques
-                    cms_name = result['cms']
-                    cms_stats[cms_name] = cms_stats.get(cms_name, 0) + 1
-
-                    detected += 1
-
-                    # Affichage
-                    version_str = f"v{result['version']}" if result['version'] else ""
-                    print(f"✅ {result['cms']:<15} {version_str}")
+    last_id = 0
+
+    # Lecture keyset sur id: les sites mis à jour entretemps ne décalent pas les lots
+    # (OFFSET sur `cms IS NULL` sautait des sites à mesure qu'ils étaient détectés)
+    with BatchWriter(flush_every=batch_size) as writer:
+        while processed < total_sites:
+            # Récupérer un batch de sites
+            batch = query.filter(Site.id > last_id).order_by(Site.id).limit(
+                min(batch_size, total_sites - processed)
+            ).all()
+            session.rollback()  # pas de transaction de lecture ouverte pendant la détection
+
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for site_id, domain in batch:
+                processed += 1
+
+                # Progress
+                progress = (processed / total_sites) * 100
+                print(f"[{processed:5}/{total_sites}] ({progress:5.1f}%) {domain:<50}", end=" ", flush=True)
+
+                try:
+                    # Détecter le CMS
+                    result = detector.detect(domain)
+
+                    if result['cms']:
+                        writer.update(
+                            site_id,
+                            cms=result['cms'],
+                            cms_version=result['version'],
+                            cms_detected_at=datetime.utcnow(),
+                        )
+
+                        # Statistiques
+                        cms_name = result['cms']
+                        cms_stats[cms_name] = cms_stats.get(cms_name, 0) + 1
+
+                        detected += 1
+
+                        # Affichage
+                        version_str = f"v{result['version']}" if result['version'] else ""
+                        print(f"✅ {result['cms']:<15} {version_str}")
+                    else:
+                        skipped += 1
+                        print("⚠️  Non détecté")
+
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Erreur: {str(e)[:30]}")
+
+                # Pause pour ne pas surcharger
+                if processed % 10 == 0:
+                    time.sleep(1)
                 else:
-                    skipped += 1
-                    print("⚠️  Non détecté")
-
-            except Exception as e:
-                failed += 1
-                print(f"❌ Erreur: {str(e)[:30]}")
-                session.rollback()
-
-            # Pause pour ne pas surcharger
-            if processed % 10 == 0:
-                time.sleep(1)
-            else:
-                time.sleep(0.2)
-
-        offset += batch_size
-
-        # Afficher stats intermédiaires tous les 100 sites
-        if processed % 100 == 0:
-            print()
-            print(f"📊 Stats intermédiaires: {detected} CMS détectés, {skipped} non détectés, {failed} erreurs")
-            print()
+                    time.sleep(0.2)
+
+            # Afficher stats intermédiaires tous les 100 sites
+            if processed % 100 == 0:
+                print()
+                print(f"📊 Stats intermédiaires: {detected} CMS détectés, {skipped} non détectés, {failed} erreurs")
+                print()
 
     session.close()
 
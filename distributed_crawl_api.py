@@ -9,17 +9,35 @@ Endpoints:
 - GET /api/crawl/task : Obtenir un batch de sites à crawler
 - POST /api/crawl/result : Soumettre les résultats d'un crawl
 - POST /api/crawl/heartbeat : Signal de vie d'un worker
+- POST /api/crawl/channel : Heartbeats, acheteurs, résultats et tâches en un seul échange NDJSON
 - GET /api/crawl/workers : Liste des workers actifs
 - GET /api/crawl/stats : Statistiques globales du crawl distribué
+- GET /api/crawl/known-domains : Domaines déjà connus (snapshot ou delta) pour les workers
+- GET /api/crawl/domain-policy : Blacklist et patterns exclus pour les workers
+
+Les corps POST des workers peuvent être en JSON ou msgpack, compressés en
+gzip ou zstd (Content-Type / Content-Encoding, voir wire_format.py).
 """
 
 import json
 import logging
 import os
+import re
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from pathlib import Path
-from flask import Blueprint, jsonify, request
-from database import get_session, Site, safe_commit
+from typing import Dict, List, Optional, Tuple
+from flask import Blueprint, Response, jsonify, request
+from database import get_session, Site, SiteStatus, safe_commit
+import known_domains
+from worker_registry import WorkerRegistry
+from crawl_counters import DailyCounters
+from fleet_inventory import FleetInventory
+from crawl_queue import CrawlQueue
+from domain_policy import DomainPolicyFile
+import wire_format
+from language_queue import LanguageDetectionQueue
+from site_stats import daily_activity
 from sqlalchemy import func
 
 logger = logging.getLogger(__name__)
@@ -60,260 +78,336 @@ def get_anthropic_client():
         logger.warning(f"Impossible d'initialiser Anthropic: {e}")
         return None
 
-def detect_language_with_claude(text_sample: str) -> tuple:
+def detect_languages_with_claude(text_samples: List[str]) -> List[Tuple[Optional[str], Optional[float]]]:
     """
-    Utilise Claude pour détecter la langue d'un texte.
-    Retourne (language_code, confidence) ou (None, None) en cas d'erreur.
+    Détecter la langue de plusieurs textes en un seul appel Claude (file de
+    détection de langue). Retourne un (language_code, confidence) par texte,
+    (None, None) pour ceux sans réponse exploitable.
     """
-    if not text_sample or len(text_sample) < 20:
-        return None, None
-
+    results = [(None, None)] * len(text_samples)
     client = get_anthropic_client()
-    if not client:
-        return None, None
+    if not client or not text_samples:
+        return results
 
+    numbered = "\n".join(f"{i + 1}. {' '.join(sample[:300].split())}" for i, sample in enumerate(text_samples))
     try:
         response = client.messages.create(
             model="claude-3-5-haiku-20241022",
-            max_tokens=10,
+            max_tokens=10 * len(text_samples) + 20,
             messages=[{
                 "role": "user",
-                "content": f"Quelle est la langue de ce texte ? Réponds UNIQUEMENT par le code ISO 639-1 (ex: fr, en, es, de, it, pt, nl). Texte: {text_sample[:300]}"
+                "content": ("Quelle est la langue de chacun de ces textes numérotés ? Réponds UNIQUEMENT "
+                            "par une ligne par texte au format \"numéro: code\", avec le code ISO 639-1 "
+                            f"(ex: fr, en, es, de, it, pt, nl).\n\n{numbered}")
             }]
         )
-
-        lang_code = response.content[0].text.strip().lower()[:2]
-
-        # Valider le code langue (2 lettres alphabétiques)
-        if len(lang_code) == 2 and lang_code.isalpha():
-            return lang_code, 0.85  # Confiance 85% pour détection par Claude
-        return None, None
-
+        for match in re.finditer(r'^\s*(\d+)\s*[:.)-]\s*([a-zA-Z]{2})\b', response.content[0].text, re.MULTILINE):
+            index = int(match.group(1)) - 1
+            if 0 <= index < len(results):
+                results[index] = (match.group(2).lower(), 0.85)  # Confiance 85% pour détection par Claude
     except Exception as e:
-        logger.warning(f"Erreur détection langue Claude: {e}")
-        return None, None
+        logger.warning(f"Erreur détection langue Claude (lot de {len(text_samples)}): {e}")
+    return results
 
 # Blueprint Flask pour les routes de crawl distribué
 crawl_api = Blueprint('crawl_api', __name__)
 
-# Fichier de suivi des workers
+
+def request_payload(expected=dict):
+    """
+    Corps de la requête décodé selon Content-Type et Content-Encoding (JSON, NDJSON, msgpack; gzip, zstd).
+    Un corps vide donne `expected()` ({} ou []); un corps d'un autre type lève WireFormatError (400).
+    """
+    payload = wire_format.decode_body(request.get_data(cache=False),
+                                      request.headers.get('Content-Type'),
+                                      request.headers.get('Content-Encoding'))
+    if payload is None:
+        return expected()
+    if not isinstance(payload, expected):
+        raise wire_format.WireFormatError(f"Corps {expected.__name__} attendu, {type(payload).__name__} reçu")
+    return payload
+
+
+@crawl_api.errorhandler(wire_format.WireFormatError)
+def handle_wire_format_error(e):
+    status = 415 if isinstance(e, wire_format.UnsupportedWireFormat) else 400
+    return jsonify({'error': str(e)}), status
+
+
+@crawl_api.after_request
+def advertise_wire_formats(response):
+    """Annoncer aux workers les encodages de requête acceptés"""
+    response.headers.update(wire_format.advertised_headers())
+    return response
+
+# Suivi des workers (WORKERS_FILE: ancien format JSON, importé au premier démarrage)
 WORKERS_FILE = Path('/var/www/Scrap_Email/crawl_workers.json')
-DAILY_PAGES_FILE = Path('/var/www/Scrap_Email/crawl_daily_pages.json')
+WORKERS_DB = Path('/var/www/Scrap_Email/crawl_workers.db')
+DAILY_PAGES_FILE = Path('/var/www/Scrap_Email/crawl_daily_pages.json')  # Ancien format, repris au démarrage
+DAILY_EMAILS_FILE = Path('/var/www/Scrap_Email/crawl_daily_emails.json')  # Ancien format, repris au démarrage
+
+# Langue des sites sans attribut lang: pré-classifieur + cache, sinon file traitée par lots en arrière-plan
+language_queue = LanguageDetectionQueue(get_session, detect_languages_with_claude)
+
+# Compteurs journaliers (pages, vendeurs, emails): mémoire du process + deltas en base
+daily_counters = DailyCounters(get_session, legacy_pages_json=DAILY_PAGES_FILE,
+                               legacy_emails_json=DAILY_EMAILS_FILE)
+
 WORKER_TIMEOUT = 60  # 60 secondes sans heartbeat = worker considéré comme mort (heartbeat toutes les 30s)
 
 # Configuration centralisée des serveurs
 SERVERS_CONFIG = {
     'local': {
         'name': 'ns3132232 (local)',
+        'label': 'ns3132232 (local)',  # Affiché sur la page workers
         'ssh': None,  # Pas de SSH pour le serveur local
         'min_required': 1,
         'worker_path': '/var/www/Scrap_Email'
     },
     'remote': {
         'name': 'ns500898',
+        'label': 'ns500898 (192.99.44.191)',  # Affiché sur la page workers
         'ssh': 'debian@192.99.44.191',
         'min_required': 8,
         'worker_path': '/home/debian/crawl_worker'
     },
     'remote2': {
         'name': 'prestashop',
+        'label': 'prestashop (137.74.26.28)',  # Affiché sur la page workers
         'ssh': 'debian@137.74.26.28',
         'min_required': 4,
         'worker_path': '/home/debian/crawl_worker'
     },
     'remote3': {
         'name': 'betterweb',
+        'label': 'betterweb (51.178.78.138)',  # Affiché sur la page workers
         'ssh': 'datch@51.178.78.138',
         'min_required': 4,
         'worker_path': '/home/datch/crawl_worker'
     },
     'remote4': {
         'name': 'wordpress',
+        'label': 'wordpress (137.74.31.238)',  # Affiché sur la page workers
         'ssh': 'debian@137.74.31.238',
         'min_required': 2,
         'worker_path': '/home/debian/crawl_worker'
     },
     'remote5': {
         'name': 'ladd-prod3',
+        'label': 'ladd-prod3 (141.94.169.126)',  # Affiché sur la page workers
         'ssh': 'apps@server-prod3.ladd.guru',
         'min_required': 1,
         'worker_path': '/home/apps/crawl_worker'
     },
     'remote6': {
         'name': 'ladd-prod6',
+        'label': 'ladd-prod6 (51.77.13.24)',  # Affiché sur la page workers
         'ssh': 'apps@51.77.13.24',
         'min_required': 1,
         'worker_path': '/home/apps/crawl_worker'
     }
 }
 
+# Processus workers par serveur, sondés en parallèle et mis en cache
+fleet_inventory = FleetInventory(SERVERS_CONFIG)
 
-def load_daily_pages():
-    """Charger les stats de pages crawlées par jour (fusion fichier JSON + base de données)"""
-    data = {}
 
-    # Charger depuis la base de données d'abord (source de vérité pour l'historique)
+def load_daily_pages(days: int = 30):
+    """Charger les stats de pages crawlées par jour (format {date: {'total', 'workers'}})"""
+    data = {}
     try:
-        from sqlalchemy import text
-        session = get_session()
-        result = session.execute(text("""
-            SELECT date, pages_crawled, sellers_crawled, workers_data
-            FROM crawl_daily_stats
-            ORDER BY date DESC
-            LIMIT 30
-        """))
-        for row in result:
-            date_str = row[0].strftime('%Y-%m-%d') if hasattr(row[0], 'strftime') else str(row[0])
-            workers_raw = row[3]
-            if workers_raw:
-                if isinstance(workers_raw, str):
-                    workers = json.loads(workers_raw)
-                else:
-                    workers = workers_raw
-            else:
-                workers = {}
+        for date_str, day in daily_counters.load(days).items():
             data[date_str] = {
-                'total': row[1] or 0,
-                'workers': workers
+                'total': day['pages'],
+                'workers': {
+                    worker_id: {'pages': w['pages'], 'sellers': w['sellers']}
+                    for worker_id, w in day['workers'].items()
+                    if w['pages'] or w['sellers']
+                }
             }
-        session.close()
     except Exception as e:
-        logger.error(f"Erreur chargement BDD stats: {e}")
+        logger.error(f"Erreur chargement compteurs journaliers: {e}")
+    return data
 
-    # Fusionner avec le fichier JSON (peut avoir des données plus récentes pour aujourd'hui)
-    if DAILY_PAGES_FILE.exists():
-        try:
-            with open(DAILY_PAGES_FILE, 'r') as f:
-                json_data = json.load(f)
-                if json_data:
-                    # Fusionner: le JSON prend la priorité pour les données du jour
-                    for date_str, day_data in json_data.items():
-                        if date_str not in data or (isinstance(day_data, dict) and day_data.get('total', 0) > data.get(date_str, {}).get('total', 0)):
-                            data[date_str] = day_data
-        except:
-            pass
 
-    return data
+def add_pages_crawled(pages_count, worker_id='unknown'):
+    """Ajouter des pages au compteur du jour et par worker (écrit en base par lot)"""
+    daily_counters.add(worker_id, pages=pages_count, sellers=1)
 
+# Domaines blacklistés (BLACKLISTED_DOMAINS + blacklist.txt, recompilés quand le fichier change)
+BLACKLIST_FILE = Path('/var/www/Scrap_Email/blacklist.txt')
+domain_policy = DomainPolicyFile(BLACKLIST_FILE)
 
-def save_daily_pages(data):
-    """Sauvegarder les stats de pages crawlées par jour (fichier JSON + base de données)"""
-    # Sauvegarder dans le fichier JSON (compatibilité)
-    with open(DAILY_PAGES_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
 
-    # Sauvegarder aussi en base de données pour persistance
-    try:
-        from sqlalchemy import text
-        session = get_session()
-        today = datetime.utcnow().strftime('%Y-%m-%d')
-        if today in data:
-            day_data = data[today]
-            pages = day_data.get('total', 0) if isinstance(day_data, dict) else day_data
-            workers = day_data.get('workers', {}) if isinstance(day_data, dict) else {}
-            sellers = sum(w.get('sellers', 0) for w in workers.values()) if workers else 0
-
-            session.execute(text("""
-                INSERT INTO crawl_daily_stats (date, pages_crawled, sellers_crawled, workers_data, updated_at)
-                VALUES (:date, :pages, :sellers, :workers, CURRENT_TIMESTAMP)
-                ON CONFLICT (date) DO UPDATE SET
-                    pages_crawled = EXCLUDED.pages_crawled,
-                    sellers_crawled = EXCLUDED.sellers_crawled,
-                    workers_data = EXCLUDED.workers_data,
-                    updated_at = CURRENT_TIMESTAMP
-            """), {
-                'date': today,
-                'pages': pages,
-                'sellers': sellers,
-                'workers': json.dumps(workers)
-            })
-            session.commit()
-        session.close()
-    except Exception as e:
-        logger.error(f"Erreur sauvegarde BDD stats: {e}")
+def load_blacklist():
+    """Charger la blacklist (ensemble de domaines, suffixes inclus)"""
+    return domain_policy.current().blacklist
 
 
-def add_pages_crawled(pages_count, worker_id='unknown'):
-    """Ajouter des pages au compteur du jour et par worker"""
-    today = datetime.utcnow().strftime('%Y-%m-%d')
-    data = load_daily_pages()
+# Files de tâches (crawl, email, enrich) avec baux par worker (voir crawl_queue.py)
+crawl_queue = CrawlQueue(policy_loader=domain_policy.current)
 
-    # Structure: { "2025-12-02": { "total": 1000, "workers": { "worker_xxx": { "pages": 500, "sellers": 10 } } } }
-    if today not in data:
-        data[today] = {'total': 0, 'workers': {}}
 
-    # Migration: ancien format (juste un nombre) vers nouveau format
-    if isinstance(data[today], int):
-        data[today] = {'total': data[today], 'workers': {}}
+# ============================================================================
+# Ingestion des acheteurs par lot (INSERT ... ON CONFLICT)
+# ============================================================================
 
-    data[today]['total'] = data[today].get('total', 0) + pages_count
+UPSERT_CHUNK_SIZE = 500  # Domaines par requête IN / par executemany
 
-    if worker_id not in data[today]['workers']:
-        data[today]['workers'][worker_id] = {'pages': 0, 'sellers': 0}
 
-    data[today]['workers'][worker_id]['pages'] += pages_count
-    data[today]['workers'][worker_id]['sellers'] += 1
+def _is_empty(column):
+    return f"(sites.{column} IS NULL OR sites.{column} = '')"
 
-    save_daily_pages(data)
 
-# Domaines blacklistés (gouvernementaux, etc.)
-BLACKLISTED_DOMAINS = {
-    'cnil.fr', 'gouv.fr', 'diplomatie.gouv.fr', 'education.gouv.fr',
-    'economie.gouv.fr', 'interieur.gouv.fr', 'service-public.fr',
-    'legifrance.gouv.fr', 'senat.fr', 'assemblee-nationale.fr'
-}
+# Chaque groupe de colonnes n'est écrit que si la colonne "clé" est vide en base
+# (mêmes règles que les mises à jour champ par champ de l'ORM)
+UPSERT_GROUPS = [
+    (_is_empty('purchased_from'),
+     ['purchased_from', 'purchased_on_url', 'purchased_at']),
+    (f"excluded.emails IS NOT NULL AND {_is_empty('emails')}",
+     ['emails', 'email_source', 'email_found_at']),
+    (f"excluded.language IS NOT NULL AND {_is_empty('language')}",
+     ['language', 'language_confidence', 'language_detected_at']),
+    (f"excluded.cms IS NOT NULL AND {_is_empty('cms')}",
+     ['cms', 'cms_version', 'cms_detected_at']),
+    (f"(excluded.siret IS NOT NULL OR excluded.siren IS NOT NULL) AND {_is_empty('siret')} AND {_is_empty('siren')}",
+     ['siret', 'siren', 'siret_type', 'siret_found_at', 'siret_checked']),
+]
 
+UPSERT_COLUMNS = [
+    'domain', 'source_url', 'status', 'created_at', 'updated_at',
+    'email_checked', 'leaders_checked', 'email_validated', 'email_validation_score',
+    'email_deliverable', 'blacklisted', 'is_active', 'is_linkavista_seller',
+    'backlinks_crawled', 'retry_count',
+] + [column for _, columns in UPSERT_GROUPS for column in columns]
+
+
+def _build_upsert_sql() -> str:
+    assignments = [
+        f"{column} = CASE WHEN {condition} THEN excluded.{column} ELSE sites.{column} END"
+        for condition, columns in UPSERT_GROUPS
+        for column in columns
+    ]
+    any_change = ' OR '.join(f"({condition})" for condition, _ in UPSERT_GROUPS)
+    assignments.append(f"updated_at = CASE WHEN {any_change} THEN excluded.updated_at ELSE sites.updated_at END")
+    return (
+        f"INSERT INTO sites ({', '.join(UPSERT_COLUMNS)}) "
+        f"VALUES ({', '.join(':' + column for column in UPSERT_COLUMNS)}) "
+        f"ON CONFLICT (domain) DO UPDATE SET {', '.join(assignments)}"
+    )
+
+
+UPSERT_BUYERS_SQL = _build_upsert_sql()
 
-def load_blacklist():
-    """Charger la blacklist depuis le fichier"""
-    blacklist = set(BLACKLISTED_DOMAINS)
-    blacklist_file = Path('/var/www/Scrap_Email/blacklist.txt')
-    if blacklist_file.exists():
-        with open(blacklist_file, 'r') as f:
-            blacklist.update(line.strip() for line in f if line.strip())
-    return blacklist
+
+def upsert_buyers(session, buyers, seller_domain):
+    """
+    Insérer ou compléter un lot d'acheteurs en deux requêtes par tranche de
+    UPSERT_CHUNK_SIZE: un SELECT ... IN pour compter nouveaux acheteurs et
+    emails ajoutés, puis un INSERT ... ON CONFLICT DO UPDATE (executemany).
+
+    Returns:
+        (new_buyers, emails_added)
+    """
+    from sqlalchemy import text
+
+    now = datetime.utcnow()
+
+    # Un seul enregistrement par domaine (premières valeurs non vides gardées)
+    rows = {}
+    for buyer_data in buyers:
+        buyer_domain = buyer_data.get('domain')
+        if not buyer_domain:
+            continue
+        buyer_email = buyer_data.get('email') or None
+        detect_missing_language(session, buyer_data)
+        language = buyer_data.get('language') or None
+        cms = buyer_data.get('cms') or None
+        siret = buyer_data.get('siret') or None
+        siren = buyer_data.get('siren') or None
+        has_siret = bool(siret or siren)
+
+        row = {
+            'domain': buyer_domain,
+            'source_url': f"https://{seller_domain}",
+            'status': SiteStatus.DISCOVERED.name,
+            'created_at': now,
+            'updated_at': now,
+            'email_checked': False,
+            'leaders_checked': False,
+            'email_validated': False,
+            'email_validation_score': 0,
+            'email_deliverable': False,
+            'blacklisted': False,
+            'is_active': True,
+            'is_linkavista_seller': False,
+            'backlinks_crawled': False,
+            'retry_count': 0,
+            'purchased_from': seller_domain,
+            'purchased_on_url': buyer_data.get('found_on_url'),
+            'purchased_at': now,
+            'emails': buyer_email,
+            'email_source': 'distributed_crawl' if buyer_email else None,
+            'email_found_at': now if buyer_email else None,
+            'language': language,
+            'language_confidence': buyer_data.get('language_confidence') if language else None,
+            'language_detected_at': now if language else None,
+            'cms': cms,
+            'cms_version': buyer_data.get('cms_version') if cms else None,
+            'cms_detected_at': now if cms else None,
+            'siret': siret,
+            'siren': siren,
+            'siret_type': buyer_data.get('siret_type') if has_siret else None,
+            'siret_found_at': now if has_siret else None,
+            'siret_checked': has_siret,
+        }
+
+        previous = rows.get(buyer_domain)
+        if previous is None:
+            rows[buyer_domain] = row
+        else:
+            for _, columns in UPSERT_GROUPS:
+                if not previous[columns[0]] and row[columns[0]]:
+                    for column in columns:
+                        previous[column] = row[column]
+
+    new_buyers = 0
+    emails_added = 0
+    items = list(rows.values())
+    for start in range(0, len(items), UPSERT_CHUNK_SIZE):
+        chunk = items[start:start + UPSERT_CHUNK_SIZE]
+
+        existing = dict(
+            session.query(Site.domain, Site.emails)
+            .filter(Site.domain.in_([row['domain'] for row in chunk]))
+            .all()
+        )
+        for row in chunk:
+            if row['domain'] not in existing:
+                new_buyers += 1
+                if row['emails']:
+                    emails_added += 1
+            elif row['emails'] and not existing[row['domain']]:
+                emails_added += 1
+
+        session.execute(text(UPSERT_BUYERS_SQL), chunk)
+
+    return new_buyers, emails_added
+
+
+# Registre des workers: mémoire du process + SQLite partagé (voir worker_registry.py)
+worker_registry = WorkerRegistry(WORKERS_DB, worker_timeout=WORKER_TIMEOUT, legacy_json=WORKERS_FILE)
 
 
 def load_workers(clean_inactive: bool = True):
     """Charger les informations des workers et optionnellement nettoyer les inactifs"""
-    if WORKERS_FILE.exists():
-        try:
-            with open(WORKERS_FILE, 'r') as f:
-                data = json.load(f)
-
-            # Nettoyer automatiquement les workers inactifs
-            if clean_inactive and data.get('workers'):
-                now = datetime.utcnow()
-                active_workers = {}
-                for wid, w in data['workers'].items():
-                    if w.get('last_heartbeat'):
-                        try:
-                            last_hb = datetime.fromisoformat(w['last_heartbeat'].replace('Z', ''))
-                            if (now - last_hb).total_seconds() < WORKER_TIMEOUT:
-                                active_workers[wid] = w
-                        except:
-                            pass
-
-                # Si on a supprimé des workers, sauvegarder
-                if len(active_workers) < len(data['workers']):
-                    data['workers'] = active_workers
-                    data['last_update'] = now.isoformat()
-                    with open(WORKERS_FILE, 'w') as f:
-                        json.dump(data, f, indent=2)
-
-            return data
-        except:
-            pass
+    try:
+        return worker_registry.load(clean_inactive=clean_inactive)
+    except Exception as e:
+        logger.error(f"Erreur chargement registre workers: {e}")
     return {'workers': {}, 'last_update': None}
 
 
-def save_workers(data):
-    """Sauvegarder les informations des workers"""
-    data['last_update'] = datetime.utcnow().isoformat()
-    with open(WORKERS_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
-
-
 def is_worker_alive(worker_data):
     """Vérifier si un worker est encore actif"""
     if not worker_data.get('last_heartbeat'):
@@ -340,103 +434,25 @@ def get_crawl_task():
     # Limiter la taille du batch
     batch_size = min(batch_size, 50)
 
-    # Charger la blacklist
-    blacklist = load_blacklist()
-
     session = get_session()
     try:
-        # Utiliser FOR UPDATE SKIP LOCKED pour éviter les race conditions
-        # Chaque worker verrouille atomiquement les lignes qu'il sélectionne
-        from sqlalchemy import case, text
-
-        # Créer un ordre de priorité: .fr = 0 (prioritaire), autres = 1
-        priority_order = case(
-            (Site.domain.like('%.fr'), 0),
-            else_=1
-        )
-
-        # Sites assignés récemment (dans les 10 dernières minutes) sont exclus
-        lock_threshold = datetime.utcnow() - timedelta(minutes=10)
+        # Réservation atomique dans la file (bail prolongé par les heartbeats)
+        tasks = crawl_queue.claim(session, 'crawl', worker_id, batch_size)
+        safe_commit(session)
 
-        # FOR UPDATE SKIP LOCKED: verrouille les lignes et skip celles déjà verrouillées
-        # Cela évite les doublons entre workers même en cas de requêtes simultanées
-        # On exclut aussi les domaines gouvernementaux directement en SQL (plus efficace)
-        # Note: Un site peut être vendeur ET acheteur, donc on filtre sur is_link_seller, pas purchased_from
-        sites_raw = session.query(Site).filter(
-            Site.is_link_seller == True,
-            Site.backlinks_crawled == False,
-            Site.blacklisted == False,
-            Site.is_active == True,
-            ~Site.domain.like('%.gouv.fr'),  # Exclure les domaines gouvernementaux
-            ~Site.domain.like('%.senat.fr'),
-            ~Site.domain.like('%.assemblee-nationale.fr'),
-            (Site.updated_at.is_(None)) | (Site.updated_at < lock_threshold)
-        ).order_by(priority_order, Site.id).limit(batch_size * 3).with_for_update(skip_locked=True).all()
-
-        # Filtrer la blacklist côté Python (beaucoup plus rapide)
-        sites = []
-        for site in sites_raw:
-            if site.domain not in blacklist:
-                # Vérifier aussi les suffixes (ex: .gouv.fr)
-                is_blacklisted = False
-                for bl_domain in blacklist:
-                    if site.domain.endswith('.' + bl_domain):
-                        is_blacklisted = True
-                        break
-                if not is_blacklisted:
-                    sites.append(site)
-                    if len(sites) >= batch_size:
-                        break
-
-        if not sites:
-            session.commit()  # Libérer les locks
+        if not tasks:
             return jsonify({
                 'status': 'no_tasks',
                 'message': 'Aucun site à crawler',
                 'sites': []
             })
 
-        now = datetime.utcnow()
-
-        # Préparer les données à retourner ET marquer comme "en cours" atomiquement
-        tasks = []
-        for site in sites:
-            # Construire l'URL du site
-            if site.source_url and site.source_url.startswith('http'):
-                url = site.source_url
-            else:
-                url = f"https://{site.domain}"
-
-            tasks.append({
-                'id': site.id,
-                'domain': site.domain,
-                'url': url
-            })
-
-            # Mettre à jour updated_at pour indiquer qu'on travaille dessus
-            site.updated_at = now
-
-        safe_commit(session)  # Le commit libère les locks
-
         # Logger l'attribution
         logger.info(f"🚀 Worker {worker_id}: {len(tasks)} tâches attribuées")
 
         # Mettre à jour les stats du worker
-        workers_data = load_workers()
-        if worker_id not in workers_data['workers']:
-            workers_data['workers'][worker_id] = {
-                'first_seen': datetime.utcnow().isoformat(),
-                'tasks_assigned': 0,
-                'tasks_completed': 0,
-                'buyers_found': 0,
-                'emails_found': 0,
-                'errors': 0
-            }
-
-        workers_data['workers'][worker_id]['tasks_assigned'] += len(tasks)
-        workers_data['workers'][worker_id]['last_task_at'] = datetime.utcnow().isoformat()
-        workers_data['workers'][worker_id]['last_heartbeat'] = datetime.utcnow().isoformat()
-        save_workers(workers_data)
+        worker_registry.increment(worker_id, tasks_assigned=len(tasks))
+        worker_registry.update(worker_id, last_task_at=datetime.utcnow().isoformat())
 
         return jsonify({
             'status': 'ok',
@@ -453,27 +469,22 @@ def get_crawl_task():
         session.close()
 
 
-@crawl_api.route('/api/crawl/result', methods=['POST'])
-def submit_crawl_result():
+def detect_missing_language(session, data: Dict):
     """
-    Soumettre les résultats d'un crawl
+    Langue d'un site que le worker n'a pas détectée mais dont il a fourni un
+    text_sample: pré-classifieur ou cache tout de suite, sinon file de
+    détection (Claude par lots, hors du chemin de la requête)
+    """
+    if language_queue.resolve(session, data.get('domain'), data):
+        logger.debug(f"🌍 Langue déduite du texte pour {data.get('domain')}: {data['language']}")
 
-    Body JSON:
-    {
-        "worker_id": "worker_192.99.44.191",
-        "site_id": 12345,
-        "domain": "example.fr",
-        "buyers": [
-            {"domain": "buyer1.fr", "email": "contact@buyer1.fr"},
-            {"domain": "buyer2.fr", "email": null}
-        ],
-        "pages_crawled": 150,
-        "error": null
-    }
+
+def apply_crawl_result(session, worker_id: str, data: Dict, after_commit: List) -> Dict:
     """
-    data = request.get_json()
+    Enregistrer le résultat d'un crawl dans la transaction de `session` (sans commit).
 
-    worker_id = data.get('worker_id', 'unknown')
+    Les mises à jour des stats en mémoire sont ajoutées à `after_commit`.
+    """
     site_id = data.get('site_id')
     domain = data.get('domain')
     buyers = data.get('buyers', [])
@@ -486,115 +497,68 @@ def submit_crawl_result():
     # CMS et langue détectés pendant le crawl
     cms = data.get('cms')
     cms_version = data.get('cms_version')
-    language = data.get('language')
-    language_confidence = data.get('language_confidence')
-    text_sample = data.get('text_sample')  # Échantillon de texte pour détection langue par Claude
-
-    # Si pas de langue détectée mais un text_sample est fourni, utiliser Claude
-    if not language and text_sample:
-        claude_lang, claude_confidence = detect_language_with_claude(text_sample)
-        if claude_lang:
-            language = claude_lang
-            language_confidence = claude_confidence
-            logger.info(f"🤖 Langue détectée par Claude pour {domain}: {language}")
 
     if not site_id or not domain:
-        return jsonify({'error': 'site_id et domain requis'}), 400
+        raise ValueError('site_id et domain requis')
 
-    session = get_session()
-    try:
-        # Marquer le site vendeur comme crawlé (seulement si c'est le résultat final)
-        seller = session.query(Site).filter_by(id=site_id).first()
-        if seller:
-            # Toujours mettre à jour le nombre de pages (même pour les résultats intermédiaires)
-            seller.pages_crawled = max(seller.pages_crawled or 0, pages_crawled)
-
-            if not is_intermediate:
-                seller.backlinks_crawled = True
-                seller.backlinks_crawled_at = datetime.utcnow()
-                # Sauvegarder les infos sitemap
-                if sitemap_urls > 0:
-                    seller.sitemap_urls_count = sitemap_urls
-                    seller.sitemap_missed_interesting = missed_interesting
-                if error:
-                    seller.last_error = error
-                # Sauvegarder l'email du vendeur si extrait pendant le crawl (et pas déjà présent)
-                if seller_email and not seller.emails:
-                    seller.emails = seller_email
-                    seller.email_source = 'distributed_crawl'
-                    seller.email_found_at = datetime.utcnow()
-                    seller.email_crawl_at = datetime.utcnow()
-                    logger.info(f"📧 Email vendeur trouvé pour {domain}: {seller_email}")
-
-                # Sauvegarder le CMS si détecté (et pas déjà présent)
-                if cms and not seller.cms:
-                    seller.cms = cms
-                    seller.cms_version = cms_version
-                    seller.cms_detected_at = datetime.utcnow()
-                    logger.info(f"🔧 CMS détecté pour {domain}: {cms}" + (f" {cms_version}" if cms_version else ""))
-
-                # Sauvegarder la langue si détectée (et pas déjà présente)
-                if language and not seller.language:
-                    seller.language = language
-                    seller.language_confidence = language_confidence
-                    seller.language_detected_at = datetime.utcnow()
-                    logger.info(f"🌍 Langue détectée pour {domain}: {language} ({language_confidence})")
-
-        # Traiter les acheteurs trouvés
-        new_buyers = 0
-        emails_found = 0
-
-        for buyer_data in buyers:
-            buyer_domain = buyer_data.get('domain')
-            buyer_email = buyer_data.get('email')
-
-            if not buyer_domain:
-                continue
-
-            # Vérifier si le buyer existe déjà
-            existing = session.query(Site).filter_by(domain=buyer_domain).first()
-
-            if existing:
-                # Mettre à jour purchased_from si pas défini
-                if not existing.purchased_from:
-                    existing.purchased_from = domain
-                # Mettre à jour l'email si trouvé et pas déjà présent
-                if buyer_email and not existing.emails:
-                    existing.emails = buyer_email
-                    existing.email_source = 'distributed_crawl'
-                    existing.email_found_at = datetime.utcnow()
-                    emails_found += 1
-            else:
-                # Créer le nouveau site buyer
-                new_site = Site(
-                    domain=buyer_domain,
-                    source_url=f"https://{domain}",
-                    purchased_from=domain,
-                    purchased_at=datetime.utcnow(),
-                    emails=buyer_email,
-                    email_source='distributed_crawl' if buyer_email else None,
-                    email_found_at=datetime.utcnow() if buyer_email else None
-                )
-                session.add(new_site)
-                new_buyers += 1
-                if buyer_email:
-                    emails_found += 1
-
-        safe_commit(session)
+    detect_missing_language(session, data)
+    language = data.get('language')
+    language_confidence = data.get('language_confidence')
 
-        # Mettre à jour les stats du worker
-        workers_data = load_workers()
-        if worker_id in workers_data['workers']:
-            # tasks_completed seulement pour les résultats finaux
-            if not is_intermediate:
-                workers_data['workers'][worker_id]['tasks_completed'] += 1
-            workers_data['workers'][worker_id]['buyers_found'] += len(buyers)
-            workers_data['workers'][worker_id]['emails_found'] += emails_found
+    # Marquer le site vendeur comme crawlé (seulement si c'est le résultat final)
+    seller = session.query(Site).filter_by(id=site_id).first()
+    if seller:
+        # Toujours mettre à jour le nombre de pages (même pour les résultats intermédiaires)
+        seller.pages_crawled = max(seller.pages_crawled or 0, pages_crawled)
+
+        if not is_intermediate:
+            seller.backlinks_crawled = True
+            seller.backlinks_crawled_at = datetime.utcnow()
+            # Sauvegarder les infos sitemap
+            if sitemap_urls > 0:
+                seller.sitemap_urls_count = sitemap_urls
+                seller.sitemap_missed_interesting = missed_interesting
             if error:
-                workers_data['workers'][worker_id]['errors'] += 1
-            workers_data['workers'][worker_id]['last_result_at'] = datetime.utcnow().isoformat()
-            workers_data['workers'][worker_id]['last_heartbeat'] = datetime.utcnow().isoformat()
-            save_workers(workers_data)
+                seller.last_error = error
+            # Sauvegarder l'email du vendeur si extrait pendant le crawl (et pas déjà présent)
+            if seller_email and not seller.emails:
+                seller.emails = seller_email
+                seller.email_source = 'distributed_crawl'
+                seller.email_found_at = datetime.utcnow()
+                seller.email_crawl_at = datetime.utcnow()
+                logger.info(f"📧 Email vendeur trouvé pour {domain}: {seller_email}")
+
+            # Sauvegarder le CMS si détecté (et pas déjà présent)
+            if cms and not seller.cms:
+                seller.cms = cms
+                seller.cms_version = cms_version
+                seller.cms_detected_at = datetime.utcnow()
+                logger.info(f"🔧 CMS détecté pour {domain}: {cms}" + (f" {cms_version}" if cms_version else ""))
+
+            # Sauvegarder la langue si détectée (et pas déjà présente)
+            if language and not seller.language:
+                seller.language = language
+                seller.language_confidence = language_confidence
+                seller.language_detected_at = datetime.utcnow()
+                logger.info(f"🌍 Langue détectée pour {domain}: {language} ({language_confidence})")
+
+    # Traiter les acheteurs trouvés (upsert par lot)
+    new_buyers, emails_found = upsert_buyers(session, buyers, domain)
+
+    # Résultat final: le site quitte la file
+    if not is_intermediate:
+        crawl_queue.complete(session, 'crawl', [site_id])
+
+    def record_stats():
+        # Mettre à jour les stats du worker
+        worker_registry.increment(
+            worker_id,
+            tasks_completed=0 if is_intermediate else 1,  # seulement pour les résultats finaux
+            buyers_found=len(buyers),
+            emails_found=emails_found,
+            errors=1 if error else 0
+        )
+        worker_registry.update(worker_id, last_result_at=datetime.utcnow().isoformat())
 
         # Enregistrer les pages crawlées dans les stats journalières
         if pages_crawled > 0:
@@ -605,12 +569,48 @@ def submit_crawl_result():
         else:
             logger.info(f"✅ Worker {worker_id}: {domain} terminé - {pages_crawled} pages, {len(buyers)} buyers, {emails_found} emails")
 
-        return jsonify({
-            'status': 'ok',
-            'new_buyers': new_buyers,
-            'emails_found': emails_found,
-            'pages_crawled': pages_crawled
-        })
+    after_commit.append(record_stats)
+
+    return {
+        'new_buyers': new_buyers,
+        'emails_found': emails_found,
+        'pages_crawled': pages_crawled
+    }
+
+
+@crawl_api.route('/api/crawl/result', methods=['POST'])
+def submit_crawl_result():
+    """
+    Soumettre les résultats d'un crawl
+
+    Body JSON:
+    {
+        "worker_id": "worker_192.99.44.191",
+        "site_id": 12345,
+        "domain": "example.fr",
+        "buyers": [
+            {"domain": "buyer1.fr", "email": "contact@buyer1.fr"},
+            {"domain": "buyer2.fr", "email": null}
+        ],
+        "pages_crawled": 150,
+        "error": null
+    }
+    """
+    data = request_payload()
+    worker_id = data.get('worker_id', 'unknown')
+
+    if not data.get('site_id') or not data.get('domain'):
+        return jsonify({'error': 'site_id et domain requis'}), 400
+
+    session = get_session()
+    try:
+        after_commit = []
+        reply = apply_crawl_result(session, worker_id, data, after_commit)
+        safe_commit(session)
+        for callback in after_commit:
+            callback()
+
+        return jsonify({'status': 'ok', **reply})
 
     except Exception as e:
         logger.error(f"❌ Erreur submit_crawl_result: {e}")
@@ -637,7 +637,7 @@ def submit_buyer_incremental():
         "email": "contact@acheteur.fr"  // optionnel
     }
     """
-    data = request.get_json()
+    data = request_payload()
 
     worker_id = data.get('worker_id', 'unknown')
     site_id = data.get('site_id')
@@ -687,16 +687,8 @@ def submit_buyer_incremental():
 
         # Mettre à jour les stats du worker (si nouveau buyer ou email)
         if new_buyer or email_added:
-            workers_data = load_workers()
-            if worker_id in workers_data['workers']:
-                if new_buyer:
-                    workers_data['workers'][worker_id]['buyers_found'] = \
-                        workers_data['workers'][worker_id].get('buyers_found', 0) + 1
-                if email_added:
-                    workers_data['workers'][worker_id]['emails_found'] = \
-                        workers_data['workers'][worker_id].get('emails_found', 0) + 1
-                workers_data['workers'][worker_id]['last_heartbeat'] = datetime.utcnow().isoformat()
-                save_workers(workers_data)
+            worker_registry.increment(worker_id, buyers_found=int(new_buyer), emails_found=int(email_added))
+            worker_registry.update(worker_id)
 
         return jsonify({
             'status': 'ok',
@@ -712,6 +704,33 @@ def submit_buyer_incremental():
         session.close()
 
 
+def apply_buyers_batch(session, worker_id: str, data: Dict, after_commit: List) -> Dict:
+    """Enregistrer un batch d'acheteurs dans la transaction de `session` (sans commit)"""
+    seller_domain = data.get('seller_domain')
+    buyers = data.get('buyers', [])
+
+    if not seller_domain or not buyers:
+        raise ValueError('seller_domain et buyers requis')
+
+    new_buyers, emails_added = upsert_buyers(session, buyers, seller_domain)
+
+    def record_stats():
+        # Mettre à jour les stats du worker
+        if new_buyers > 0 or emails_added > 0:
+            worker_registry.increment(worker_id, buyers_found=new_buyers, emails_found=emails_added)
+            worker_registry.update(worker_id)
+
+        logger.info(f"📥 Worker {worker_id}: batch {seller_domain} - {new_buyers} nouveaux buyers, {emails_added} emails")
+
+    after_commit.append(record_stats)
+
+    return {
+        'new_buyers': new_buyers,
+        'emails_added': emails_added,
+        'total_processed': len(buyers)
+    }
+
+
 @crawl_api.route('/api/crawl/buyers_batch', methods=['POST'])
 def submit_buyers_batch():
     """
@@ -729,124 +748,21 @@ def submit_buyers_batch():
         ]
     }
     """
-    data = request.get_json()
-
+    data = request_payload()
     worker_id = data.get('worker_id', 'unknown')
-    seller_domain = data.get('seller_domain')
-    buyers = data.get('buyers', [])
 
-    if not seller_domain or not buyers:
+    if not data.get('seller_domain') or not data.get('buyers'):
         return jsonify({'error': 'seller_domain et buyers requis'}), 400
 
     session = get_session()
     try:
-        new_buyers = 0
-        emails_added = 0
-
-        for buyer_data in buyers:
-            buyer_domain = buyer_data.get('domain')
-            buyer_email = buyer_data.get('email')
-            found_on_url = buyer_data.get('found_on_url')  # URL où le backlink a été trouvé
-
-            # Nouvelles données enrichies
-            language = buyer_data.get('language')
-            language_confidence = buyer_data.get('language_confidence')
-            text_sample = buyer_data.get('text_sample')
-            cms = buyer_data.get('cms')
-            cms_version = buyer_data.get('cms_version')
-            siret = buyer_data.get('siret')
-            siren = buyer_data.get('siren')
-            siret_type = buyer_data.get('siret_type')
-
-            # Si pas de langue détectée mais text_sample fourni, utiliser Claude
-            if not language and text_sample:
-                claude_lang, claude_confidence = detect_language_with_claude(text_sample)
-                if claude_lang:
-                    language = claude_lang
-                    language_confidence = claude_confidence
-
-            if not buyer_domain:
-                continue
-
-            # Vérifier si le buyer existe déjà
-            existing = session.query(Site).filter_by(domain=buyer_domain).first()
-
-            if existing:
-                if not existing.purchased_from:
-                    existing.purchased_from = seller_domain
-                    existing.purchased_on_url = found_on_url
-                    existing.purchased_at = datetime.utcnow()
-                if buyer_email and not existing.emails:
-                    existing.emails = buyer_email
-                    existing.email_source = 'distributed_crawl'
-                    existing.email_found_at = datetime.utcnow()
-                    emails_added += 1
-                # Mettre à jour langue si pas encore définie
-                if language and not existing.language:
-                    existing.language = language
-                    existing.language_confidence = language_confidence
-                    existing.language_detected_at = datetime.utcnow()
-                # Mettre à jour CMS si pas encore défini
-                if cms and not existing.cms:
-                    existing.cms = cms
-                    existing.cms_version = cms_version
-                    existing.cms_detected_at = datetime.utcnow()
-                # Mettre à jour SIRET si pas encore défini
-                if (siret or siren) and not existing.siret and not existing.siren:
-                    existing.siret = siret
-                    existing.siren = siren
-                    existing.siret_type = siret_type
-                    existing.siret_found_at = datetime.utcnow()
-                    existing.siret_checked = True
-            else:
-                new_site = Site(
-                    domain=buyer_domain,
-                    source_url=f"https://{seller_domain}",
-                    purchased_from=seller_domain,
-                    purchased_on_url=found_on_url,
-                    purchased_at=datetime.utcnow(),
-                    emails=buyer_email,
-                    email_source='distributed_crawl' if buyer_email else None,
-                    email_found_at=datetime.utcnow() if buyer_email else None,
-                    # Données enrichies
-                    language=language,
-                    language_confidence=language_confidence,
-                    language_detected_at=datetime.utcnow() if language else None,
-                    cms=cms,
-                    cms_version=cms_version,
-                    cms_detected_at=datetime.utcnow() if cms else None,
-                    siret=siret,
-                    siren=siren,
-                    siret_type=siret_type,
-                    siret_checked=True if (siret or siren) else False,
-                    siret_found_at=datetime.utcnow() if (siret or siren) else None
-                )
-                session.add(new_site)
-                new_buyers += 1
-                if buyer_email:
-                    emails_added += 1
-
+        after_commit = []
+        reply = apply_buyers_batch(session, worker_id, data, after_commit)
         safe_commit(session)
+        for callback in after_commit:
+            callback()
 
-        # Mettre à jour les stats du worker
-        if new_buyers > 0 or emails_added > 0:
-            workers_data = load_workers()
-            if worker_id in workers_data['workers']:
-                workers_data['workers'][worker_id]['buyers_found'] = \
-                    workers_data['workers'][worker_id].get('buyers_found', 0) + new_buyers
-                workers_data['workers'][worker_id]['emails_found'] = \
-                    workers_data['workers'][worker_id].get('emails_found', 0) + emails_added
-                workers_data['workers'][worker_id]['last_heartbeat'] = datetime.utcnow().isoformat()
-                save_workers(workers_data)
-
-        logger.info(f"📥 Worker {worker_id}: batch {seller_domain} - {new_buyers} nouveaux buyers, {emails_added} emails")
-
-        return jsonify({
-            'status': 'ok',
-            'new_buyers': new_buyers,
-            'emails_added': emails_added,
-            'total_processed': len(buyers)
-        })
+        return jsonify({'status': 'ok', **reply})
 
     except Exception as e:
         logger.error(f"❌ Erreur submit_buyers_batch: {e}")
@@ -856,6 +772,38 @@ def submit_buyers_batch():
         session.close()
 
 
+def apply_heartbeat(worker_id: str, data: Dict):
+    """Mettre à jour les infos du worker (sans écraser les stats existantes)"""
+    fields = {}
+
+    # Mettre à jour seulement si présent dans le heartbeat
+    if data.get('hostname'):
+        fields['hostname'] = data.get('hostname')
+    if data.get('status'):
+        fields['status'] = data.get('status')
+    if data.get('current_task') is not None:
+        fields['current_task'] = data.get('current_task')
+    if data.get('cpu_usage') is not None:
+        fields['cpu_usage'] = data.get('cpu_usage')
+    if data.get('memory_usage') is not None:
+        fields['memory_usage'] = data.get('memory_usage')
+    if 'sites_in_progress' in data:
+        fields['sites_in_progress'] = data.get('sites_in_progress', [])
+    if data.get('scheduler') is not None:
+        fields['scheduler'] = data.get('scheduler')
+    worker_registry.update(worker_id, **fields)
+
+    # pages_crawled et stats du worker: prendre le max (ne jamais diminuer les compteurs)
+    stats = data.get('stats') or {}
+    worker_registry.maximum(
+        worker_id,
+        pages_crawled=data.get('pages_crawled'),
+        tasks_completed=stats.get('tasks_completed'),
+        buyers_found=stats.get('buyers_found'),
+        emails_found=stats.get('emails_found')
+    )
+
+
 @crawl_api.route('/api/crawl/heartbeat', methods=['POST'])
 def worker_heartbeat():
     """
@@ -872,53 +820,169 @@ def worker_heartbeat():
         "memory_usage": 1024
     }
     """
-    data = request.get_json()
+    data = request_payload()
     worker_id = data.get('worker_id', 'unknown')
 
-    workers_data = load_workers()
+    apply_heartbeat(worker_id, data)
 
-    if worker_id not in workers_data['workers']:
-        workers_data['workers'][worker_id] = {
-            'first_seen': datetime.utcnow().isoformat(),
-            'tasks_assigned': 0,
-            'tasks_completed': 0,
-            'buyers_found': 0,
-            'emails_found': 0,
-            'errors': 0
-        }
+    # Prolonger les baux des sites réservés par ce worker
+    session = get_session()
+    try:
+        if crawl_queue.renew(session, worker_id):
+            safe_commit(session)
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Erreur prolongation des baux de {worker_id}: {e}")
+    finally:
+        session.close()
 
-    # Mettre à jour les infos du worker (sans écraser les stats existantes)
-    worker = workers_data['workers'][worker_id]
-    worker['last_heartbeat'] = datetime.utcnow().isoformat()
+    return jsonify({'status': 'ok', 'worker_id': worker_id})
 
-    # Mettre à jour seulement si présent dans le heartbeat
-    if data.get('hostname'):
-        worker['hostname'] = data.get('hostname')
-    if data.get('status'):
-        worker['status'] = data.get('status')
-    if data.get('current_task') is not None:
-        worker['current_task'] = data.get('current_task')
-    if data.get('cpu_usage') is not None:
-        worker['cpu_usage'] = data.get('cpu_usage')
-    if data.get('memory_usage') is not None:
-        worker['memory_usage'] = data.get('memory_usage')
-    if 'sites_in_progress' in data:
-        worker['sites_in_progress'] = data.get('sites_in_progress', [])
 
-    # pages_crawled: prendre le max (ne jamais diminuer)
-    if data.get('pages_crawled') is not None:
-        worker['pages_crawled'] = max(worker.get('pages_crawled', 0), data.get('pages_crawled', 0))
+# Canal multiplexé: nombre max de messages et de tâches par échange
+CHANNEL_MAX_MESSAGES = 500
+CHANNEL_MAX_TASKS = 50
+CHANNEL_MESSAGE_TYPES = ('heartbeat', 'buyers', 'result')
+CHANNEL_INT_FIELDS = ('pages_crawled', 'sitemap_urls', 'missed_interesting')
 
-    # Extraire les stats du worker si présentes (ne jamais diminuer les compteurs)
-    stats = data.get('stats', {})
-    if stats:
-        worker['tasks_completed'] = max(worker.get('tasks_completed', 0), stats.get('tasks_completed', 0))
-        worker['buyers_found'] = max(worker.get('buyers_found', 0), stats.get('buyers_found', 0))
-        worker['emails_found'] = max(worker.get('emails_found', 0), stats.get('emails_found', 0))
 
-    save_workers(workers_data)
+def validate_channel_message(kind, data):
+    """
+    Rejeter (ValueError) un message mal formé avant toute écriture: sous
+    SQLite il n'y a pas de savepoint par message, une erreur pendant
+    l'application annule tout l'échange.
+    """
+    if kind not in CHANNEL_MESSAGE_TYPES:
+        raise ValueError(f"Type de message inconnu: {kind}")
+    if not isinstance(data, dict):
+        raise ValueError('data doit être un objet')
+    if kind == 'heartbeat':
+        return
+    if kind == 'buyers' and (not isinstance(data.get('seller_domain'), str) or not data.get('buyers')):
+        raise ValueError('seller_domain et buyers requis')
+    if kind == 'result':
+        if not isinstance(data.get('site_id'), int) or not isinstance(data.get('domain'), str) or not data['domain']:
+            raise ValueError('site_id et domain requis')
+        for field in CHANNEL_INT_FIELDS:
+            if not isinstance(data.get(field, 0), int):
+                raise ValueError(f"{field} doit être un entier")
+    buyers = data.get('buyers', [])
+    if not isinstance(buyers, list) or not all(
+            isinstance(buyer, dict) and isinstance(buyer.get('domain'), (str, type(None))) for buyer in buyers):
+        raise ValueError('buyers doit être une liste d\'objets {"domain": ...}')
 
-    return jsonify({'status': 'ok', 'worker_id': worker_id})
+
+@crawl_api.route('/api/crawl/channel', methods=['POST'])
+def worker_channel():
+    """
+    Canal multiplexé d'un worker: heartbeats, batches d'acheteurs, résultats
+    et demandes de tâches regroupés dans un seul POST NDJSON (une ligne par
+    message), sur une connexion keep-alive.
+
+    Tous les messages d'un échange sont appliqués dans une seule transaction
+    (group commit); les tâches demandées sont réservées après les résultats
+    du même échange et renvoyées dans la réponse.
+
+    Query params:
+    - worker_id: Identifiant unique du worker
+
+    Message: {"seq": 12, "type": "heartbeat" | "buyers" | "result" | "tasks", "data": {...}}
+    ("tasks": {"count": 3})
+
+    Réponse NDJSON: {"seq": 12, "ok": true, ...} par message, puis
+    {"type": "tasks", "sites": [...]} si des tâches ont été demandées.
+    Un message mal formé est rejeté ({"seq": 12, "ok": false, "error": "..."})
+    avant d'être appliqué. Sous PostgreSQL, un message en erreur pendant son
+    application est aussi annulé seul (savepoint). Sous SQLite (pas de
+    SAVEPOINT fiable avec pysqlite), une telle erreur annule tout l'échange
+    (500, rien n'est commité): le worker le renvoie.
+
+    Requête et réponse peuvent aussi être un tableau msgpack (Content-Type /
+    Accept: application/msgpack), la requête compressée en gzip ou zstd.
+    """
+    worker_id = request.args.get('worker_id', 'unknown')
+
+    messages = request_payload(list)
+    if len(messages) > CHANNEL_MAX_MESSAGES:
+        return jsonify({'error': f'Maximum {CHANNEL_MAX_MESSAGES} messages par échange'}), 400
+
+    replies = []
+    after_commit = []
+    tasks_wanted = 0
+    tasks = []
+    session = get_session()
+    savepoints = session.get_bind().dialect.name != 'sqlite'
+    try:
+        for message in messages:
+            if not isinstance(message, dict):
+                replies.append({'seq': None, 'ok': False, 'error': 'Message invalide'})
+                continue
+            seq = message.get('seq')
+            kind = message.get('type')
+            data = message.get('data') or {}
+            if kind == 'tasks':
+                try:
+                    tasks_wanted = max(tasks_wanted, int(data.get('count', 0)))
+                except (AttributeError, TypeError, ValueError):
+                    pass
+                continue
+            try:
+                validate_channel_message(kind, data)
+            except ValueError as e:
+                replies.append({'seq': seq, 'ok': False, 'error': str(e)})
+                continue
+            # PostgreSQL: un savepoint par message, un message en erreur (contrainte
+            # violée...) est annulé seul et signalé au worker, sans faire échouer
+            # les autres messages de l'échange
+            callbacks = len(after_commit)
+            try:
+                with session.begin_nested() if savepoints else nullcontext():
+                    if kind == 'heartbeat':
+                        after_commit.append(lambda data=data: apply_heartbeat(worker_id, data))
+                        crawl_queue.renew(session, worker_id)
+                        reply = {}
+                    elif kind == 'buyers':
+                        reply = apply_buyers_batch(session, worker_id, data, after_commit)
+                    else:
+                        reply = apply_crawl_result(session, worker_id, data, after_commit)
+                replies.append({'seq': seq, 'ok': True, **reply})
+            except Exception as e:
+                if not savepoints:
+                    raise  # Écritures partielles possibles: tout l'échange est annulé
+                del after_commit[callbacks:]
+                if not isinstance(e, ValueError):
+                    logger.error(f"❌ Message {kind} #{seq} du worker {worker_id} rejeté: {e}")
+                replies.append({'seq': seq, 'ok': False, 'error': str(e)})
+
+        # Réserver les tâches après les résultats du même échange
+        if tasks_wanted > 0:
+            tasks = crawl_queue.claim(session, 'crawl', worker_id, min(tasks_wanted, CHANNEL_MAX_TASKS))
+
+        safe_commit(session)
+
+    except Exception as e:
+        logger.error(f"❌ Erreur canal worker {worker_id}: {e}")
+        session.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        session.close()
+
+    for callback in after_commit:
+        callback()
+
+    if tasks:
+        logger.info(f"🚀 Worker {worker_id}: {len(tasks)} tâches attribuées")
+        worker_registry.increment(worker_id, tasks_assigned=len(tasks))
+        worker_registry.update(worker_id, last_task_at=datetime.utcnow().isoformat())
+    if tasks_wanted > 0:
+        replies.append({'type': 'tasks', 'sites': tasks})
+
+    # Réponse en msgpack si le worker le demande explicitement (pas via */*), sinon NDJSON
+    if wire_format.msgpack and wire_format.CONTENT_TYPE_MSGPACK in request.headers.get('Accept', ''):
+        content_type = wire_format.CONTENT_TYPE_MSGPACK
+    else:
+        content_type = wire_format.CONTENT_TYPE_NDJSON
+    return Response(wire_format.serialize(replies, content_type), mimetype=content_type)
 
 
 @crawl_api.route('/api/crawl/workers', methods=['GET'])
@@ -927,183 +991,19 @@ def get_workers():
     Liste des workers actifs - compte les processus réels via ps aux
     (même méthode que /api/scripts-status pour cohérence Home/Jobs)
 
+    Les serveurs sont sondés en parallèle et en arrière-plan (fleet_inventory):
+    la réponse vient du cache, avec checked_at / age_seconds / stale par serveur.
+
     Returns:
         Comptage des workers par serveur avec total
     """
-    import subprocess
-    from datetime import datetime
-
-    crawl_workers = {
-        'local': {'count': 0, 'workers': [], 'min_required': 1, 'host': 'ns3132232 (local)'},
-        'remote': {'count': 0, 'workers': [], 'min_required': 8, 'host': 'ns500898 (192.99.44.191)'},
-        'remote2': {'count': 0, 'workers': [], 'min_required': 4, 'host': 'prestashop (137.74.26.28)'},
-        'remote3': {'count': 0, 'workers': [], 'min_required': 4, 'host': 'betterweb (51.178.78.138)'},
-        'remote4': {'count': 0, 'workers': [], 'min_required': 2, 'host': 'wordpress (137.74.31.238)'},
-        'remote5': {'count': 0, 'workers': [], 'min_required': 1, 'host': 'ladd-prod3 (141.94.169.126)'},
-        'remote6': {'count': 0, 'workers': [], 'min_required': 1, 'host': 'ladd-prod6 (51.77.13.24)'}
-    }
-
     try:
-        # Workers locaux via ps aux (cherche crawl_worker.py ET crawl_worker_multi.py)
-        local_result = subprocess.run(
-            ['ps', 'aux'],
-            capture_output=True, text=True, timeout=10
-        )
-        for line in local_result.stdout.split('\n'):
-            if ('crawl_worker.py' in line or 'crawl_worker_multi.py' in line) and 'python3' in line and 'bash -c' not in line and 'ssh ' not in line and '@' not in line:
-                parts = line.split()
-                if len(parts) >= 11:
-                    crawl_workers['local']['workers'].append({
-                        'pid': parts[1],
-                        'cpu': parts[2],
-                        'memory': parts[3],
-                        'started': parts[8] if len(parts) > 8 else 'N/A'
-                    })
-        crawl_workers['local']['count'] = len(crawl_workers['local']['workers'])
-
-        # Workers distants ns500898 via SSH (cherche crawl_worker.py ET crawl_worker_multi.py)
-        try:
-            remote_result = subprocess.run(
-                ['ssh', '-o', 'ConnectTimeout=30', '-o', 'StrictHostKeyChecking=no', '-o', 'BatchMode=yes',
-                 'debian@192.99.44.191',
-                 "ps aux | grep -E 'python3.*(crawl_worker\\.py|crawl_worker_multi\\.py)' | grep -v grep | grep -v 'bash -c'"],
-                capture_output=True, text=True, timeout=60
-            )
-            for line in remote_result.stdout.strip().split('\n'):
-                if line.strip() and ('crawl_worker.py' in line or 'crawl_worker_multi.py' in line):
-                    parts = line.split()
-                    if len(parts) >= 11 and parts[1].isdigit():
-                        crawl_workers['remote']['workers'].append({
-                            'pid': parts[1],
-                            'cpu': parts[2],
-                            'memory': parts[3],
-                            'started': parts[8] if len(parts) > 8 else 'N/A'
-                        })
-            crawl_workers['remote']['count'] = len(crawl_workers['remote']['workers'])
-        except (subprocess.TimeoutExpired, Exception) as e:
-            crawl_workers['remote']['error'] = str(e)
-
-        # Workers distants prestashop via SSH (cherche crawl_worker.py ET crawl_worker_multi.py)
-        try:
-            remote2_result = subprocess.run(
-                ['ssh', '-o', 'ConnectTimeout=30', '-o', 'StrictHostKeyChecking=no', '-o', 'BatchMode=yes',
-                 'debian@137.74.26.28',
-                 "ps aux | grep -E 'python3.*(crawl_worker\\.py|crawl_worker_multi\\.py)' | grep -v grep | grep -v 'bash -c'"],
-                capture_output=True, text=True, timeout=60
-            )
-            for line in remote2_result.stdout.strip().split('\n'):
-                if line.strip() and ('crawl_worker.py' in line or 'crawl_worker_multi.py' in line):
-                    parts = line.split()
-                    if len(parts) >= 11 and parts[1].isdigit():
-                        crawl_workers['remote2']['workers'].append({
-                            'pid': parts[1],
-                            'cpu': parts[2],
-                            'memory': parts[3],
-                            'started': parts[8] if len(parts) > 8 else 'N/A'
-                        })
-            crawl_workers['remote2']['count'] = len(crawl_workers['remote2']['workers'])
-        except (subprocess.TimeoutExpired, Exception) as e:
-            crawl_workers['remote2']['error'] = str(e)
-
-        # Workers distants betterweb via SSH (cherche crawl_worker.py ET crawl_worker_multi.py)
-        try:
-            remote3_result = subprocess.run(
-                ['ssh', '-o', 'ConnectTimeout=30', '-o', 'StrictHostKeyChecking=no', '-o', 'BatchMode=yes',
-                 'datch@51.178.78.138',
-                 "ps aux | grep -E 'python3.*(crawl_worker\\.py|crawl_worker_multi\\.py)' | grep -v grep | grep -v 'bash -c'"],
-                capture_output=True, text=True, timeout=60
-            )
-            for line in remote3_result.stdout.strip().split('\n'):
-                if line.strip() and ('crawl_worker.py' in line or 'crawl_worker_multi.py' in line) and 'bash -c' not in line:
-                    parts = line.split()
-                    if len(parts) >= 11 and parts[1].isdigit():
-                        crawl_workers['remote3']['workers'].append({
-                            'pid': parts[1],
-                            'cpu': parts[2],
-                            'memory': parts[3],
-                            'started': parts[8] if len(parts) > 8 else 'N/A'
-                        })
-            crawl_workers['remote3']['count'] = len(crawl_workers['remote3']['workers'])
-        except (subprocess.TimeoutExpired, Exception) as e:
-            crawl_workers['remote3']['error'] = str(e)
-
-        # Workers distants wordpress via SSH (cherche crawl_worker.py ET crawl_worker_multi.py)
-        try:
-            remote4_result = subprocess.run(
-                ['ssh', '-o', 'ConnectTimeout=30', '-o', 'StrictHostKeyChecking=no', '-o', 'BatchMode=yes',
-                 'debian@137.74.31.238',
-                 "ps aux | grep -E 'python3.*(crawl_worker\\.py|crawl_worker_multi\\.py)' | grep -v grep | grep -v 'bash -c'"],
-                capture_output=True, text=True, timeout=60
-            )
-            for line in remote4_result.stdout.strip().split('\n'):
-                if line.strip() and ('crawl_worker.py' in line or 'crawl_worker_multi.py' in line):
-                    parts = line.split()
-                    if len(parts) >= 11 and parts[1].isdigit():
-                        crawl_workers['remote4']['workers'].append({
-                            'pid': parts[1],
-                            'cpu': parts[2],
-                            'memory': parts[3],
-                            'started': parts[8] if len(parts) > 8 else 'N/A'
-                        })
-            crawl_workers['remote4']['count'] = len(crawl_workers['remote4']['workers'])
-        except (subprocess.TimeoutExpired, Exception) as e:
-            crawl_workers['remote4']['error'] = str(e)
-
-        # Workers distants ladd-prod3 via SSH (cherche crawl_worker.py ET crawl_worker_multi.py)
-        try:
-            remote5_result = subprocess.run(
-                ['ssh', '-o', 'ConnectTimeout=30', '-o', 'StrictHostKeyChecking=no', '-o', 'BatchMode=yes',
-                 'apps@server-prod3.ladd.guru',
-                 "ps aux | grep -E 'python3.*(crawl_worker\\.py|crawl_worker_multi\\.py)' | grep -v grep | grep -v 'bash -c'"],
-                capture_output=True, text=True, timeout=60
-            )
-            for line in remote5_result.stdout.strip().split('\n'):
-                if line.strip() and ('crawl_worker.py' in line or 'crawl_worker_multi.py' in line):
-                    parts = line.split()
-                    if len(parts) >= 11 and parts[1].isdigit():
-                        crawl_workers['remote5']['workers'].append({
-                            'pid': parts[1],
-                            'cpu': parts[2],
-                            'memory': parts[3],
-                            'started': parts[8] if len(parts) > 8 else 'N/A'
-                        })
-            crawl_workers['remote5']['count'] = len(crawl_workers['remote5']['workers'])
-        except (subprocess.TimeoutExpired, Exception) as e:
-            crawl_workers['remote5']['error'] = str(e)
-
-        # Workers distants ladd-prod6 via SSH (cherche crawl_worker.py ET crawl_worker_multi.py)
-        try:
-            remote6_result = subprocess.run(
-                ['ssh', '-o', 'ConnectTimeout=5', '-o', 'StrictHostKeyChecking=no', '-o', 'BatchMode=yes',
-                 'apps@server-prod6.ladd.guru',
-                 "ps aux | grep -E 'python3.*(crawl_worker\\.py|crawl_worker_multi\\.py)' | grep -v grep | grep -v 'bash -c'"],
-                capture_output=True, text=True, timeout=10
-            )
-            for line in remote6_result.stdout.strip().split('\n'):
-                if line.strip() and ('crawl_worker.py' in line or 'crawl_worker_multi.py' in line):
-                    parts = line.split()
-                    if len(parts) >= 11 and parts[1].isdigit():
-                        crawl_workers['remote6']['workers'].append({
-                            'pid': parts[1],
-                            'cpu': parts[2],
-                            'memory': parts[3],
-                            'started': parts[8] if len(parts) > 8 else 'N/A'
-                        })
-            crawl_workers['remote6']['count'] = len(crawl_workers['remote6']['workers'])
-        except (subprocess.TimeoutExpired, Exception) as e:
-            crawl_workers['remote6']['error'] = str(e)
-
+        crawl_workers = fleet_inventory.snapshot()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
     # Calculer le total
-    total_count = (crawl_workers['local']['count'] +
-                   crawl_workers['remote']['count'] +
-                   crawl_workers['remote2']['count'] +
-                   crawl_workers['remote3']['count'] +
-                   crawl_workers['remote4']['count'] +
-                   crawl_workers['remote5']['count'] +
-                   crawl_workers['remote6']['count'])
+    total_count = sum(host['count'] for host in crawl_workers.values())
 
     # Charger les données détaillées des workers depuis crawl_workers.json
     active_workers = []
@@ -1144,6 +1044,7 @@ def get_workers():
         'remote2_count': crawl_workers['remote2']['count'],
         'remote3_count': crawl_workers['remote3']['count'],
         'remote4_count': crawl_workers['remote4']['count'],
+        'stale_hosts': [key for key, host in crawl_workers.items() if host['stale']],
         'timestamp': datetime.utcnow().isoformat()
     })
 
@@ -1423,9 +1324,7 @@ def get_crawl_stats():
         total_buyers = session.query(Site).filter(Site.purchased_from.isnot(None)).count()
         buyers_with_email = session.query(Site).filter(
             Site.purchased_from.isnot(None),
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
+            Site.has_email == True
         ).count()
 
         # Stats des workers
@@ -1484,7 +1383,9 @@ def get_crawl_stats():
             'speed': {
                 'sites_per_day': crawled_last_24h,
                 'days_remaining': round(days_remaining, 1) if days_remaining else None
-            }
+            },
+            'queues': crawl_queue.stats(session),
+            'language_queue': language_queue.stats(session)
         })
 
     except Exception as e:
@@ -1499,69 +1400,38 @@ def get_crawl_daily_stats():
     """
     Statistiques journalières du crawl (pages, acheteurs, emails par jour)
     """
-    from sqlalchemy import func
     session = get_session()
 
     try:
-        # Charger les stats de pages journalières
-        pages_data = load_daily_pages()
+        # Pages et sites email: compteurs des workers; le reste: site_daily_rollup
+        counters = daily_counters.load(14)
+        activity = daily_activity(session, days=14)
 
         # Stats des 14 derniers jours
         daily_stats = []
 
         for i in range(14):
             day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=i)
-            next_day = day + timedelta(days=1)
             day_str = day.strftime('%Y-%m-%d')
 
-            # Pages crawlées ce jour (depuis le fichier JSON backlinks + sites email)
-            day_data = pages_data.get(day_str, {})
-            # Support ancien format (int) et nouveau format (dict)
-            if isinstance(day_data, int):
-                pages_crawled = day_data
-                workers_stats = {}
-            else:
-                pages_crawled = day_data.get('total', 0)
-                workers_stats = day_data.get('workers', {})
-
-            # Ajouter les sites traités par l'extraction email
-            emails_day_data = load_daily_emails().get(day_str, {})
-            if isinstance(emails_day_data, dict):
-                sites_email_crawled = emails_day_data.get('sites', 0)
-                pages_crawled += sites_email_crawled  # Ajouter les sites email aux pages
-
-            # Sites crawlés ce jour (vendeurs ET acheteurs avec backlinks crawlés)
-            sellers_crawled = session.query(Site).filter(
-                Site.backlinks_crawled == True,
-                Site.backlinks_crawled_at >= day,
-                Site.backlinks_crawled_at < next_day
-            ).count()
-
-            # Acheteurs trouvés ce jour
-            buyers_found = session.query(Site).filter(
-                Site.purchased_from.isnot(None),
-                Site.created_at >= day,
-                Site.created_at < next_day
-            ).count()
-
-            # Emails trouvés ce jour - basé sur email_found_at (date réelle de découverte)
-            emails_found = session.query(Site).filter(
-                Site.emails.isnot(None),
-                Site.emails != '',
-                Site.emails != '[]',
-                Site.emails != 'NO EMAIL FOUND',
-                Site.email_found_at >= day,
-                Site.email_found_at < next_day
-            ).count()
+            # Pages crawlées ce jour (backlinks + sites traités par l'extraction email)
+            day_counters = counters.get(day_str)
+            pages_crawled = day_counters['pages'] + day_counters['email_sites'] if day_counters else 0
+            workers_stats = {
+                worker_id: {'pages': w['pages'], 'sellers': w['sellers']}
+                for worker_id, w in (day_counters['workers'].items() if day_counters else ())
+                if w['pages'] or w['sellers']
+            }
 
+            day_activity = activity[day_str]
             daily_stats.append({
                 'date': day_str,
                 'date_display': day.strftime('%d/%m'),
                 'day_name': ['Lun', 'Mar', 'Mer', 'Jeu', 'Ven', 'Sam', 'Dim'][day.weekday()],
                 'pages_crawled': pages_crawled,
-                'sellers_crawled': sellers_crawled,
-                'buyers_found': buyers_found,
-                'emails_found': emails_found,
+                'sellers_crawled': day_activity['sellers_crawled'],
+                'buyers_found': day_activity['buyers_found'],
+                'emails_found': day_activity['emails_found'],
                 'workers': workers_stats
             })
 
@@ -1585,58 +1455,103 @@ def get_crawl_daily_stats():
 @crawl_api.route('/api/crawl/worker/<worker_id>', methods=['DELETE'])
 def remove_worker(worker_id):
     """Supprimer un worker de la liste"""
-    workers_data = load_workers()
+    session = get_session()
+    try:
+        crawl_queue.release(session, worker_id)
+        safe_commit(session)
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Erreur libération des baux de {worker_id}: {e}")
+    finally:
+        session.close()
 
-    if worker_id in workers_data.get('workers', {}):
-        del workers_data['workers'][worker_id]
-        save_workers(workers_data)
+    if worker_registry.remove(worker_id):
         return jsonify({'status': 'ok', 'message': f'Worker {worker_id} supprimé'})
 
     return jsonify({'error': 'Worker non trouvé'}), 404
 
 
-# ============================================================
-# ENDPOINTS POUR EXTRACTION D'EMAILS DISTRIBUÉE
-# ============================================================
+# Snapshot complet des domaines connus, partagé entre les requêtes des workers
+KNOWN_DOMAINS_CACHE_TTL = 600  # secondes
+_known_domains_snapshot = {'payload': None, 'built_at': None}
 
-DAILY_EMAILS_FILE = Path('/var/www/Scrap_Email/crawl_daily_emails.json')
 
+@crawl_api.route('/api/crawl/known-domains', methods=['GET'])
+def get_known_domains():
+    """
+    Domaines déjà connus (email trouvé ou blacklistés), pour que les workers
+    ne cherchent ni n'uploadent ces acheteurs.
 
-def load_daily_emails():
-    """Charger les stats d'emails extraits par jour"""
-    if DAILY_EMAILS_FILE.exists():
-        try:
-            with open(DAILY_EMAILS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return {}
+    Query params:
+    - since: version reçue lors de la dernière synchronisation (sinon snapshot complet)
 
+    Retourne {"version", "full", "count", "hashes"}: hashes est un tableau trié
+    d'empreintes 64 bits compressé (voir known_domains.py).
+    """
+    since = request.args.get('since')
+    now = datetime.utcnow()
 
-def save_daily_emails(data):
-    """Sauvegarder les stats d'emails extraits par jour"""
-    with open(DAILY_EMAILS_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    cached = _known_domains_snapshot
+    if not since and cached['payload'] and (now - cached['built_at']).total_seconds() < KNOWN_DOMAINS_CACHE_TTL:
+        return jsonify(cached['payload'])
 
+    session = get_session()
+    try:
+        payload = known_domains.build_payload(session, since, load_blacklist())
+        if payload['full']:
+            cached['payload'] = payload
+            cached['built_at'] = now
+        return jsonify(payload)
+    except Exception as e:
+        logger.error(f"❌ Erreur known-domains: {e}")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        session.close()
 
-def add_emails_extracted(emails_count, sites_count, worker_id='unknown'):
-    """Ajouter des emails au compteur du jour"""
-    today = datetime.utcnow().strftime('%Y-%m-%d')
-    data = load_daily_emails()
 
-    if today not in data:
-        data[today] = {'emails': 0, 'sites': 0, 'workers': {}}
+@crawl_api.route('/api/crawl/domain-policy', methods=['GET'])
+def get_domain_policy():
+    """
+    Règles d'exclusion des domaines (blacklist + patterns exclus) pour les workers
+
+    Query params:
+    - version: version déjà détenue par le worker
 
-    data[today]['emails'] += emails_count
-    data[today]['sites'] += sites_count
+    Retourne {"version", "unchanged": true} si le worker est à jour, sinon
+    {"version", "blacklist", "excluded_patterns"} (voir domain_policy.py).
+    """
+    policy = domain_policy.current()
+    if request.args.get('version') == policy.version:
+        return jsonify({'version': policy.version, 'unchanged': True})
+    return jsonify(policy.to_payload())
 
-    if worker_id not in data[today]['workers']:
-        data[today]['workers'][worker_id] = {'emails': 0, 'sites': 0}
 
-    data[today]['workers'][worker_id]['emails'] += emails_count
-    data[today]['workers'][worker_id]['sites'] += sites_count
+# ============================================================
+# ENDPOINTS POUR EXTRACTION D'EMAILS DISTRIBUÉE
+# ============================================================
 
-    save_daily_emails(data)
+def load_daily_emails(days: int = 30):
+    """Charger les stats d'emails extraits par jour (format {date: {'emails', 'sites', 'workers'}})"""
+    data = {}
+    try:
+        for date_str, day in daily_counters.load(days).items():
+            data[date_str] = {
+                'emails': day['emails'],
+                'sites': day['email_sites'],
+                'workers': {
+                    worker_id: {'emails': w['emails'], 'sites': w['email_sites']}
+                    for worker_id, w in day['workers'].items()
+                    if w['emails'] or w['email_sites']
+                }
+            }
+    except Exception as e:
+        logger.error(f"Erreur chargement compteurs journaliers: {e}")
+    return data
+
+
+def add_emails_extracted(emails_count, sites_count, worker_id='unknown'):
+    """Ajouter des emails au compteur du jour (écrit en base par lot)"""
+    daily_counters.add(worker_id, emails=emails_count, email_sites=sites_count)
 
 
 @crawl_api.route('/api/crawl/email-task', methods=['GET'])
@@ -1652,8 +1567,6 @@ def get_email_extraction_task():
     - batch_size: Nombre de sites à récupérer (défaut: 20)
     - sellers_first: Prioriser les vendeurs LinkAvista (défaut: true)
     """
-    from sqlalchemy import or_, case, text
-
     worker_id = request.args.get('worker_id', 'unknown')
     batch_size = int(request.args.get('batch_size', 20))
     sellers_first = request.args.get('sellers_first', 'true').lower() == 'true'
@@ -1664,82 +1577,22 @@ def get_email_extraction_task():
     session = get_session()
     try:
         # Ordre de priorité: sellers d'abord, puis .fr
-        priority_order = case(
-            (Site.purchased_from.is_(None), 0),
-            (Site.domain.like('%.fr'), 1),
-            else_=2
-        )
-
-        # Sites sans email, pas traités récemment
-        lock_threshold = datetime.utcnow() - timedelta(minutes=30)
-
-        # FOR UPDATE SKIP LOCKED pour éviter les doublons
-        sites = session.query(Site).filter(
-            or_(
-                Site.emails.is_(None),
-                Site.emails == '',
-                Site.emails == 'NO EMAIL FOUND'
-            ),
-            Site.blacklisted == False,
-            # Pas traité récemment pour email
-            or_(
-                Site.email_crawl_at.is_(None),
-                Site.email_crawl_at < lock_threshold
-            )
-        ).order_by(
-            priority_order if sellers_first else Site.id,
-            Site.id
-        ).limit(batch_size * 2).with_for_update(skip_locked=True).all()
+        tasks = crawl_queue.claim(session, 'email', worker_id, batch_size,
+                                  order='priority' if sellers_first else 'site_id')
+        safe_commit(session)
 
-        if not sites:
-            session.commit()
+        if not tasks:
             return jsonify({
                 'status': 'no_tasks',
                 'message': 'Aucun site sans email à traiter',
                 'sites': []
             })
 
-        now = datetime.utcnow()
-        tasks = []
-
-        for site in sites[:batch_size]:
-            # Construire l'URL
-            if site.source_url and site.source_url.startswith('http'):
-                url = site.source_url
-            else:
-                url = f"https://{site.domain}"
-
-            tasks.append({
-                'id': site.id,
-                'domain': site.domain,
-                'url': url,
-                'is_seller': site.purchased_from is None or False
-            })
-
-            # Marquer comme en cours de traitement
-            site.email_crawl_at = now
-
-        safe_commit(session)
-
         logger.info(f"📧 Worker {worker_id}: {len(tasks)} sites pour extraction email")
 
         # Mettre à jour les stats du worker
-        workers_data = load_workers()
-        if worker_id not in workers_data['workers']:
-            workers_data['workers'][worker_id] = {
-                'first_seen': datetime.utcnow().isoformat(),
-                'tasks_assigned': 0,
-                'tasks_completed': 0,
-                'buyers_found': 0,
-                'emails_found': 0,
-                'errors': 0,
-                'email_extractions': 0
-            }
-
-        workers_data['workers'][worker_id]['email_tasks_assigned'] = \
-            workers_data['workers'][worker_id].get('email_tasks_assigned', 0) + len(tasks)
-        workers_data['workers'][worker_id]['last_heartbeat'] = datetime.utcnow().isoformat()
-        save_workers(workers_data)
+        worker_registry.increment(worker_id, email_tasks_assigned=len(tasks))
+        worker_registry.update(worker_id)
 
         return jsonify({
             'status': 'ok',
@@ -1772,7 +1625,7 @@ def submit_email_result():
         "error": null
     }
     """
-    data = request.get_json()
+    data = request_payload()
 
     worker_id = data.get('worker_id', 'unknown')
     site_id = data.get('site_id')
@@ -1791,10 +1644,12 @@ def submit_email_result():
         if site:
             site.email_crawl_at = datetime.utcnow()
 
+            # Email trouvé entretemps (autre file, crawl vendeur...): conservé
             if emails and emails.strip():
-                site.emails = emails.strip()
-                site.email_found_at = datetime.utcnow()
-                site.email_source = 'distributed_email_extraction'
+                if not site.has_email:
+                    site.emails = emails.strip()
+                    site.email_found_at = datetime.utcnow()
+                    site.email_source = 'distributed_email_extraction'
 
                 # Compter le nombre d'emails
                 email_count = len([e for e in emails.split(';') if e.strip()])
@@ -1802,25 +1657,22 @@ def submit_email_result():
 
                 logger.info(f"✅ Worker {worker_id}: {domain} - {email_count} email(s) trouvé(s)")
             else:
-                site.emails = 'NO EMAIL FOUND'
+                if not site.emails:
+                    site.emails = 'NO EMAIL FOUND'
                 add_emails_extracted(0, 1, worker_id)
 
             if error:
                 site.last_error = error
 
+        crawl_queue.complete(session, 'email', [site_id])
         safe_commit(session)
 
         # Mettre à jour les stats du worker
-        workers_data = load_workers()
-        if worker_id in workers_data['workers']:
-            workers_data['workers'][worker_id]['email_extractions'] = \
-                workers_data['workers'][worker_id].get('email_extractions', 0) + 1
-            if emails and emails.strip():
-                email_count = len([e for e in emails.split(';') if e.strip()])
-                workers_data['workers'][worker_id]['emails_found'] = \
-                    workers_data['workers'][worker_id].get('emails_found', 0) + email_count
-            workers_data['workers'][worker_id]['last_heartbeat'] = datetime.utcnow().isoformat()
-            save_workers(workers_data)
+        email_count = 0
+        if emails and emails.strip():
+            email_count = len([e for e in emails.split(';') if e.strip()])
+        worker_registry.increment(worker_id, email_extractions=1, emails_found=email_count)
+        worker_registry.update(worker_id)
 
         return jsonify({
             'status': 'ok',
@@ -1851,7 +1703,7 @@ def submit_email_results_batch():
         ]
     }
     """
-    data = request.get_json()
+    data = request_payload()
 
     worker_id = data.get('worker_id', 'unknown')
     results = data.get('results', [])
@@ -1872,30 +1724,27 @@ def submit_email_results_batch():
             if site:
                 site.email_crawl_at = datetime.utcnow()
 
+                # Email trouvé entretemps (autre file, crawl vendeur...): conservé
                 if emails and emails.strip():
-                    site.emails = emails.strip()
-                    site.email_found_at = datetime.utcnow()
-                    site.email_source = 'distributed_email_extraction'
+                    if not site.has_email:
+                        site.emails = emails.strip()
+                        site.email_found_at = datetime.utcnow()
+                        site.email_source = 'distributed_email_extraction'
                     total_emails += len([e for e in emails.split(';') if e.strip()])
-                else:
+                elif not site.emails:
                     site.emails = 'NO EMAIL FOUND'
 
                 sites_processed += 1
 
+        crawl_queue.complete(session, 'email', [result.get('site_id') for result in results])
         safe_commit(session)
 
         # Stats journalières
         add_emails_extracted(total_emails, sites_processed, worker_id)
 
         # Mettre à jour les stats du worker
-        workers_data = load_workers()
-        if worker_id in workers_data['workers']:
-            workers_data['workers'][worker_id]['email_extractions'] = \
-                workers_data['workers'][worker_id].get('email_extractions', 0) + sites_processed
-            workers_data['workers'][worker_id]['emails_found'] = \
-                workers_data['workers'][worker_id].get('emails_found', 0) + total_emails
-            workers_data['workers'][worker_id]['last_heartbeat'] = datetime.utcnow().isoformat()
-            save_workers(workers_data)
+        worker_registry.increment(worker_id, email_extractions=sites_processed, emails_found=total_emails)
+        worker_registry.update(worker_id)
 
         logger.info(f"📧 Worker {worker_id}: batch {sites_processed} sites, {total_emails} emails")
 
@@ -1933,9 +1782,7 @@ def get_email_extraction_stats():
 
         # Sites avec email
         sites_with_email = session.query(Site).filter(
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
+            Site.has_email == True
         ).count()
 
         # Sellers sans email
@@ -1949,7 +1796,7 @@ def get_email_extraction_stats():
         ).count()
 
         # Emails extraits aujourd'hui
-        daily_data = load_daily_emails()
+        daily_data = load_daily_emails(days=7)
         today = datetime.utcnow().strftime('%Y-%m-%d')
         today_stats = daily_data.get(today, {'emails': 0, 'sites': 0, 'workers': {}})
 
@@ -2004,8 +1851,6 @@ def get_enrich_buyers_task():
     - batch_size: Nombre d'acheteurs à récupérer (défaut: 30)
     - priority: 'email' pour prioriser ceux sans email, 'language' pour ceux sans langue
     """
-    from sqlalchemy import or_, case, and_
-
     worker_id = request.args.get('worker_id', 'unknown')
     batch_size = int(request.args.get('batch_size', 30))
     priority = request.args.get('priority', 'email')  # email ou language
@@ -2015,80 +1860,18 @@ def get_enrich_buyers_task():
 
     session = get_session()
     try:
-        # Ordre de priorité selon le paramètre
-        if priority == 'language':
-            priority_order = case(
-                (Site.language.is_(None), 0),
-                (or_(Site.emails.is_(None), Site.emails == ''), 1),
-                else_=2
-            )
-        else:
-            priority_order = case(
-                (or_(Site.emails.is_(None), Site.emails == ''), 0),
-                (Site.language.is_(None), 1),
-                else_=2
-            )
-
-        # Acheteurs non blacklistés, pas traités récemment
-        lock_threshold = datetime.utcnow() - timedelta(minutes=30)
-
-        # Critères: est acheteur (purchased_from NOT NULL) ET manque des données
-        buyers = session.query(Site).filter(
-            Site.purchased_from.isnot(None),  # C'est un acheteur
-            Site.blacklisted == False,
-            Site.is_active == True,
-            # Manque au moins une donnée importante
-            or_(
-                Site.emails.is_(None),
-                Site.emails == '',
-                Site.language.is_(None),
-                Site.cms.is_(None)
-            ),
-            # Pas traité récemment
-            or_(
-                Site.email_crawl_at.is_(None),
-                Site.email_crawl_at < lock_threshold
-            )
-        ).order_by(
-            priority_order,
-            Site.id
-        ).limit(batch_size * 2).with_for_update(skip_locked=True).all()
+        # Ordre de priorité selon le paramètre (email ou langue manquante d'abord)
+        tasks = crawl_queue.claim(session, 'enrich', worker_id, batch_size,
+                                  order='alt_priority' if priority == 'language' else 'priority')
+        safe_commit(session)
 
-        if not buyers:
-            session.commit()
+        if not tasks:
             return jsonify({
                 'status': 'no_tasks',
                 'message': 'Aucun acheteur à enrichir',
                 'sites': []
             })
 
-        now = datetime.utcnow()
-        tasks = []
-
-        for buyer in buyers[:batch_size]:
-            # Indiquer ce qui manque
-            missing = []
-            if not buyer.emails:
-                missing.append('email')
-            if not buyer.language:
-                missing.append('language')
-            if not buyer.cms:
-                missing.append('cms')
-            if buyer.domain.endswith('.fr') and not buyer.siret:
-                missing.append('siret')
-
-            tasks.append({
-                'id': buyer.id,
-                'domain': buyer.domain,
-                'purchased_from': buyer.purchased_from,
-                'missing': missing
-            })
-
-            # Marquer comme en cours de traitement
-            buyer.email_crawl_at = now
-
-        safe_commit(session)
-
         logger.info(f"🔄 Worker {worker_id}: {len(tasks)} acheteurs à enrichir")
 
         return jsonify({
@@ -2130,7 +1913,7 @@ def submit_enrich_buyers_results():
         ]
     }
     """
-    data = request.get_json()
+    data = request_payload()
     if not data:
         return jsonify({'error': 'No JSON data'}), 400
 
@@ -2169,11 +1952,10 @@ def submit_enrich_buyers_results():
             # Langue
             language = result.get('language')
             language_confidence = result.get('language_confidence')
-            text_sample = result.get('text_sample')
 
-            # Si pas de langue détectée mais texte fourni, utiliser Claude
-            if not language and text_sample:
-                language, language_confidence = detect_language_with_claude(text_sample)
+            # Si pas de langue détectée mais texte fourni: pré-classifieur/cache, sinon file de détection
+            if not language and language_queue.resolve(session, site.domain, result):
+                language, language_confidence = result['language'], result['language_confidence']
 
             if language and not site.language:
                 site.language = language
@@ -2205,8 +1987,10 @@ def submit_enrich_buyers_results():
                     site.siret_checked = True
 
             site.updated_at = now
+            site.email_crawl_at = now  # Pas de nouvel enrichissement avant 30 min
             updated_count += 1
 
+        crawl_queue.complete(session, 'enrich', [result.get('site_id') for result in results])
         safe_commit(session)
 
         logger.info(f"🔄 Worker {worker_id}: {updated_count} acheteurs enrichis "
@@ -2246,9 +2030,7 @@ def get_enrich_buyers_stats():
         with_email = session.query(func.count(Site.id)).filter(
             Site.purchased_from.isnot(None),
             Site.blacklisted == False,
-            Site.emails.isnot(None),
-            Site.emails != '',
-            Site.emails != 'NO EMAIL FOUND'
+            Site.has_email == True
         ).scalar() or 0
 
         # Avec langue
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Règles d'exclusion des domaines (blacklist + patterns exclus), partagées
+entre le coordinateur et les workers
+
+La blacklist (BLACKLISTED_DOMAINS + blacklist.txt) est un ensemble de
+suffixes: un domaine est blacklisté si lui-même ou un de ses domaines
+parents y figure, vérifié en O(nombre de labels) au lieu de parcourir toute
+la liste. Les patterns exclus (EXCLUDED_PATTERNS, SOCIAL_DOMAINS) gardent
+leur sémantique de sous-chaîne, compilés en une seule expression régulière.
+
+Le coordinateur publie la politique via GET /api/crawl/domain-policy; les
+workers la téléchargent (à déployer avec eux dans le dossier du worker).
+
+Usage:
+    policy = DomainPolicyFile('/var/www/Scrap_Email/blacklist.txt').current()
+    policy.is_blacklisted('www.impots.gouv.fr')  # True
+    policy.is_valid_fr_domain('acheteur.fr')
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# Domaines à JAMAIS scraper (vendeurs ou acheteurs) - base hardcodée
+BLACKLISTED_DOMAINS = {
+    'cnil.fr', 'gouv.fr', 'diplomatie.gouv.fr', 'education.gouv.fr',
+    'economie.gouv.fr', 'interieur.gouv.fr', 'service-public.fr',
+    'legifrance.gouv.fr', 'senat.fr', 'assemblee-nationale.fr'
+}
+
+SOCIAL_DOMAINS = {
+    'facebook.com', 'twitter.com', 'instagram.com', 'linkedin.com',
+    'youtube.com', 'tiktok.com', 'pinterest.com', 'google.com',
+    'apple.com', 'microsoft.com', 'amazon.com', 'amazon.fr'
+}
+
+EXCLUDED_PATTERNS = {
+    'google.com', 'apple.com', 'microsoft.com', 'mozilla.org',
+    'amazon.com', 'amazon.es', 'amazon.fr', 'amzn.to',
+    'uecdn.es', 'cloudflare.com', 'akamai.net'
+}
+
+POLICY_CHECK_INTERVAL = 2  # secondes min entre deux vérifications du mtime de blacklist.txt
+
+
+class DomainPolicy:
+    """Politique compilée: ensemble de suffixes blacklistés + patterns exclus"""
+
+    def __init__(self, blacklist: Iterable[str] = (), excluded_patterns: Iterable[str] = (),
+                 version: Optional[str] = None):
+        self.blacklist = frozenset(d.strip().lower() for d in blacklist if d and d.strip())
+        self.excluded_patterns = tuple(sorted({p for p in excluded_patterns if p}))
+        self._excluded = (re.compile('|'.join(re.escape(p) for p in self.excluded_patterns))
+                          if self.excluded_patterns else None)
+        self.version = version or self._compute_version()
+
+    def __len__(self) -> int:
+        return len(self.blacklist)
+
+    def is_blacklisted(self, domain: Optional[str]) -> bool:
+        """Domaine blacklisté lui-même ou sous-domaine d'un domaine blacklisté"""
+        if not domain:
+            return True
+        blacklist = self.blacklist
+        if domain in blacklist:
+            return True
+        dot = domain.find('.')
+        while dot != -1:
+            if domain[dot + 1:] in blacklist:
+                return True
+            dot = domain.find('.', dot + 1)
+        return False
+
+    def is_excluded(self, domain: str) -> bool:
+        """Domaine contenant un pattern exclu (google.com, cloudflare.com, réseaux sociaux...)"""
+        return self._excluded is not None and self._excluded.search(domain) is not None
+
+    def is_valid_fr_domain(self, domain: Optional[str]) -> bool:
+        if not domain or not domain.endswith('.fr'):
+            return False
+        return not self.is_blacklisted(domain) and not self.is_excluded(domain)
+
+    def to_payload(self) -> Dict:
+        """Réponse de /api/crawl/domain-policy"""
+        return {
+            'version': self.version,
+            'blacklist': sorted(self.blacklist),
+            'excluded_patterns': list(self.excluded_patterns),
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> 'DomainPolicy':
+        return cls(payload.get('blacklist', []), payload.get('excluded_patterns', []),
+                   version=payload.get('version'))
+
+    def _compute_version(self) -> str:
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update('\n'.join(sorted(self.blacklist)).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update('\n'.join(self.excluded_patterns).encode('utf-8'))
+        return digest.hexdigest()
+
+
+class DomainPolicyFile:
+    """Politique construite depuis blacklist.txt, recompilée quand le fichier change (mtime)"""
+
+    def __init__(self, path, base_blacklist: Iterable[str] = BLACKLISTED_DOMAINS,
+                 excluded_patterns: Iterable[str] = EXCLUDED_PATTERNS | SOCIAL_DOMAINS,
+                 check_interval: float = POLICY_CHECK_INTERVAL):
+        self.path = Path(path)
+        self.base_blacklist = set(base_blacklist)
+        self.excluded_patterns = set(excluded_patterns)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._policy: Optional[DomainPolicy] = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def current(self) -> DomainPolicy:
+        now = time.monotonic()
+        if self._policy is not None and now - self._checked_at < self.check_interval:
+            return self._policy
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if self._policy is None or mtime != self._mtime:
+                self._policy = DomainPolicy(self.base_blacklist | self._read_file(),
+                                            self.excluded_patterns)
+                self._mtime = mtime
+        return self._policy
+
+    def _read_file(self) -> set:
+        try:
+            with open(self.path, 'r') as f:
+                return {line.strip() for line in f if line.strip()}
+        except OSError:
+            return set()
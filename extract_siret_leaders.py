@@ -5,13 +5,11 @@ Script pour extraire SIRET et dirigeants pour tous les sites de la base
 
 import sys
 from datetime import datetime
+from batch_writer import BatchWriter
 from database import get_session, Site
 from siret_extractor import SiretExtractor
 from leaders_extractor import LeadersExtractor
 import time
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
 
 
 def extract_siret_and_leaders(batch_size=50, max_sites=None, skip_existing_siret=True, skip_existing_leaders=True, delay=2):
@@ -19,7 +17,7 @@ def extract_siret_and_leaders(batch_size=50, max_sites=None, skip_existing_siret
     Extrait SIRET et dirigeants pour tous les sites
 
     Args:
-        batch_size: Nombre de sites à traiter par batch
+        batch_size: Nombre de sites écrits par commit (BatchWriter)
         max_sites: Nombre maximum de sites à traiter (None = tous)
         skip_existing_siret: Ignorer les sites avec SIRET déjà trouvé
         skip_existing_leaders: Ignorer les sites avec dirigeants déjà trouvés
@@ -29,7 +27,7 @@ def extract_siret_and_leaders(batch_size=50, max_sites=None, skip_existing_siret
     temp_session = get_session()
 
     # Construire la requête
-    query = temp_session.query(Site.id, Site.domain, Site.siret_checked, Site.leaders_checked)
+    query = temp_session.query(Site.id, Site.domain, Site.siret_checked, Site.siren, Site.leaders_checked)
 
     if skip_existing_siret:
         query = query.filter(Site.siret_checked == False)
@@ -62,106 +60,77 @@ def extract_siret_and_leaders(batch_size=50, max_sites=None, skip_existing_siret
     leaders_found = 0
     errors = 0
 
-    for site_id, site_domain, siret_checked, leaders_checked in sites_to_process:
-        processed += 1
-        progress = (processed / total_sites) * 100
-
-        print(f"[{processed:5}/{total_sites}] ({progress:5.1f}%) {site_domain:<50}", end=" ", flush=True)
-
-        # CRÉER UNE SESSION DÉDIÉE pour ce site (évite les locks)
-        engine = create_engine(
-            'sqlite:///scrap_email.db',
-            connect_args={'timeout': 30, 'check_same_thread': False},
-            poolclass=NullPool
-        )
-        Session = sessionmaker(bind=engine)
-        session = Session()
-
-        try:
-            # Charger le site avec cette session dédiée
-            site = session.query(Site).filter_by(id=site_id).first()
-
-            if not site:
-                print("❌ Site introuvable")
-                continue
-
-            # ÉTAPE 1 : Extraire SIRET si nécessaire
-            if not site.siret_checked or not skip_existing_siret:
-                result = siret_extractor.extract_from_domain(site_domain)
-
-                if result:
-                    site.siret = result.get('siret')
-                    site.siren = result.get('siren')
-                    site.siret_type = result.get('type')
-                    site.siret_found_at = datetime.utcnow()
-                    siret_found += 1
-                    print(f"✅ SIRET:{result.get('siret') or result.get('siren')[:14]}", end=" ")
-                else:
-                    site.siret = 'NON TROUVÉ'
-                    print("⚠️  Pas de SIRET", end=" ")
-
-                site.siret_checked = True
-
-            # ÉTAPE 2: Extraire dirigeants si on a un SIREN
-            if site.siren and site.siren != 'NON TROUVÉ':
-                if not site.leaders_checked or not skip_existing_leaders:
-                    leaders_result = leaders_extractor.extract_from_siren(site.siren)
-
-                    if leaders_result['status'] == 'rate_limited':
-                        print("⏸  Rate limit - pause 60s...")
-                        time.sleep(60)
-                        # Réessayer
-                        leaders_result = leaders_extractor.extract_from_siren(site.siren)
-
-                    if leaders_result['leaders']:
-                        site.leaders = '; '.join(leaders_result['leaders'])
-                        site.leaders_found_at = datetime.utcnow()
-                        leaders_found += 1
-                        print(f"👤 {len(leaders_result['leaders'])} dir.")
-                    else:
-                        site.leaders = 'NON TROUVÉ'
-                        print("👤 Pas de dir.")
+    # Résultats écrits par lots de batch_size sites (une session et un commit par lot)
+    with BatchWriter(flush_every=batch_size) as writer:
+        for site_id, site_domain, siret_checked, siren, leaders_checked in sites_to_process:
+            processed += 1
+            progress = (processed / total_sites) * 100
 
-                    site.leaders_checked = True
-            else:
-                print()
+            print(f"[{processed:5}/{total_sites}] ({progress:5.1f}%) {site_domain:<50}", end=" ", flush=True)
 
-            # Commit avec retry
-            for retry in range(3):
-                try:
-                    session.commit()
-                    break
-                except Exception as e:
-                    if "locked" in str(e).lower() and retry < 2:
-                        time.sleep(2)
-                        session.rollback()
-                    else:
-                        raise
+            values = {}
 
-        except Exception as e:
-            print(f"❌ Erreur: {str(e)[:30]}")
             try:
-                session.rollback()
-            except:
-                pass
-            errors += 1
-
-        finally:
-            # IMPORTANT : Fermer la session et disposer de l'engine
-            session.close()
-            engine.dispose()
-
-        # Pause pour éviter rate limiting
-        if processed % 10 == 0:
-            time.sleep(delay * 2)
-        else:
-            time.sleep(delay)
-
-        # Stats intermédiaires
-        if processed % 100 == 0:
-            print()
-            print(f"📊 Stats: {siret_found} SIRET, {leaders_found} dirigeants, {errors} erreurs")
-            print()
+                # ÉTAPE 1 : Extraire SIRET si nécessaire
+                if not siret_checked or not skip_existing_siret:
+                    result = siret_extractor.extract_from_domain(site_domain)
+
+                    if result:
+                        values['siret'] = result.get('siret')
+                        values['siren'] = siren = result.get('siren')
+                        values['siret_type'] = result.get('type')
+                        values['siret_found_at'] = datetime.utcnow()
+                        siret_found += 1
+                        print(f"✅ SIRET:{result.get('siret') or result.get('siren')[:14]}", end=" ")
+                    else:
+                        values['siret'] = 'NON TROUVÉ'
+                        print("⚠️  Pas de SIRET", end=" ")
+
+                    values['siret_checked'] = True
+
+                # ÉTAPE 2: Extraire dirigeants si on a un SIREN
+                if siren and siren != 'NON TROUVÉ':
+                    if not leaders_checked or not skip_existing_leaders:
+                        leaders_result = leaders_extractor.extract_from_siren(siren)
+
+                        if leaders_result['status'] == 'rate_limited':
+                            print("⏸  Rate limit - pause 60s...")
+                            time.sleep(60)
+                            # Réessayer
+                            leaders_result = leaders_extractor.extract_from_siren(siren)
+
+                        if leaders_result['leaders']:
+                            values['leaders'] = '; '.join(leaders_result['leaders'])
+                            values['leaders_found_at'] = datetime.utcnow()
+                            leaders_found += 1
+                            print(f"👤 {len(leaders_result['leaders'])} dir.")
+                        else:
+                            values['leaders'] = 'NON TROUVÉ'
+                            print("👤 Pas de dir.")
+
+                        values['leaders_checked'] = True
+                else:
+                    print()
+
+            except Exception as e:
+                # Rien n'est écrit: le site sera repris au prochain passage
+                print(f"❌ Erreur: {str(e)[:30]}")
+                values = {}
+                errors += 1
+
+            writer.update(site_id, **values)
+
+            # Pause pour éviter rate limiting
+            if processed % 10 == 0:
+                time.sleep(delay * 2)
+            else:
+                time.sleep(delay)
+
+            # Stats intermédiaires
+            if processed % 100 == 0:
+                print()
+                print(f"📊 Stats: {siret_found} SIRET, {leaders_found} dirigeants, {errors} erreurs")
+                print()
 
     # Résumé final
     print()
@@ -5,6 +5,7 @@ Script pour récupérer les emails via l'API Pappers en utilisant les SIRET
 
 import requests
 import time
+from batch_writer import BatchWriter
 from db_helper import DBHelper
 from database import get_session, Site
 
@@ -15,6 +16,7 @@ PAPPERS_API_URL = 'https://api.pappers.fr/v2/entreprise'
 # Paramètres
 DELAY_BETWEEN_REQUESTS = 0.5  # Délai en secondes entre chaque requête
 MAX_SITES = None  # None = tous les sites, sinon nombre limite
+WRITE_BATCH_SIZE = 50  # Emails écrits par commit
 
 
 def get_email_from_pappers(siret):
@@ -86,7 +88,7 @@ def fetch_emails_from_pappers(limit=None, dry_run=False):
 
     try:
         # Récupérer les sites avec SIRET mais sans email (ou email depuis scraping uniquement)
-        query = session.query(Site).filter(
+        query = session.query(Site.id, Site.domain, Site.siret).filter(
             Site.siret.isnot(None),
             Site.siret != '',
             Site.siret != 'NON TROUVÉ'
@@ -100,6 +102,7 @@ def fetch_emails_from_pappers(limit=None, dry_run=False):
             query = query.limit(limit)
 
         sites = query.all()
+        session.close()  # liste lue: pas de session ouverte pendant les appels API
 
         print(f"\n📊 Sites à traiter: {len(sites)}")
         print("=" * 70)
@@ -112,7 +115,7 @@ def fetch_emails_from_pappers(limit=None, dry_run=False):
             'skipped': 0
         }
 
-        with DBHelper() as db:
+        with BatchWriter(flush_every=WRITE_BATCH_SIZE) as writer:
             for i, site in enumerate(sites, 1):
                 print(f"\n[{i}/{len(sites)}] {site.domain}")
                 print(f"    SIRET: {site.siret}")
@@ -124,8 +127,8 @@ def fetch_emails_from_pappers(limit=None, dry_run=False):
                     print(f"    ✅ Email trouvé: {email}")
 
                     if not dry_run:
-                        # Mettre à jour avec source 'siret'
-                        db.update_email(site.domain, email, email_source='siret')
+                        # Mettre à jour avec source 'siret' (mêmes colonnes que DBHelper.update_email)
+                        writer.update(site.id, **DBHelper.email_values(email, email_source='siret'))
 
                     stats['success'] += 1
                 else:
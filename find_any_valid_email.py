@@ -388,9 +388,9 @@ class AnyValidEmailFinder:
                 site.updated_at = datetime.utcnow()
                 site.retry_count += 1
 
-                # Commit immédiat avec retry
+                # Commit immédiat
                 try:
-                    safe_commit(session, max_retries=10)
+                    safe_commit(session)
                 except Exception as e:
                     logger.error(f"Erreur commit: {e}")
                     session.rollback()
@@ -437,9 +437,9 @@ class AnyValidEmailFinder:
             site.updated_at = datetime.utcnow()
             site.retry_count += 1
 
-            # Commit immédiat avec retry
+            # Commit immédiat
             try:
-                safe_commit(session, max_retries=10)
+                safe_commit(session)
                 logger.info(f"✅ Email enregistré pour {site_domain}")
             except Exception as e:
                 logger.error(f"Erreur commit: {e}")
@@ -463,7 +463,7 @@ class AnyValidEmailFinder:
                     site.last_error = str(e)[:500]
                     site.updated_at = datetime.utcnow()
                     site.retry_count += 1
-                    safe_commit(session, max_retries=5)
+                    safe_commit(session)
             except:
                 pass
             stats['errors'] += 1
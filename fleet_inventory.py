@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Inventaire des processus workers sur tous les serveurs (local + SSH)
+
+Utilisé par /api/crawl/workers. Les serveurs de SERVERS_CONFIG sont
+interrogés en parallèle (un thread par serveur) sur des connexions SSH
+multiplexées (ControlMaster/ControlPersist: pas de nouvelle poignée de main
+à chaque sondage). Le résultat de chaque serveur est mis en cache; un thread
+le rafraîchit en arrière-plan tant que la page workers est consultée, et
+l'endpoint répond immédiatement depuis le cache avec l'âge de chaque entrée.
+
+Usage:
+    inventory = FleetInventory(SERVERS_CONFIG)
+    hosts = inventory.snapshot()  # {server_key: {'count', 'workers', 'age_seconds', 'stale', ...}}
+"""
+
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_REFRESH_INTERVAL = 15  # secondes entre deux sondages d'un serveur
+INVENTORY_STALE_AFTER = 60  # au-delà, l'entrée est marquée stale
+INVENTORY_IDLE_STOP = 300  # plus de sondage si personne n'a consulté depuis 5 min
+INITIAL_WAIT = 5  # attente max du premier sondage après le démarrage du process
+PROBE_TIMEOUT = 60  # secondes max par serveur (un serveur lent ne bloque que son entrée)
+
+SSH_CONTROL_DIR = '/tmp/scrap_email_ssh'
+SSH_OPTIONS = [
+    '-o', 'ConnectTimeout=30',
+    '-o', 'StrictHostKeyChecking=no',
+    '-o', 'BatchMode=yes',
+    # Connexion maître partagée entre les sondages
+    '-o', 'ControlMaster=auto',
+    '-o', f'ControlPath={SSH_CONTROL_DIR}/%r@%h:%p',
+    '-o', 'ControlPersist=10m',
+]
+
+WORKER_SCRIPTS = ('crawl_worker.py', 'crawl_worker_multi.py')
+REMOTE_PS_COMMAND = "ps aux | grep -E 'python3.*(crawl_worker\\.py|crawl_worker_multi\\.py)' | grep -v grep | grep -v 'bash -c'"
+
+
+def parse_worker_processes(ps_output: str, local: bool = False) -> List[Dict]:
+    """Extraire les processus workers d'une sortie `ps aux`"""
+    workers = []
+    for line in ps_output.split('\n'):
+        if not any(script in line for script in WORKER_SCRIPTS):
+            continue
+        if 'python3' not in line or 'bash -c' in line or 'ssh ' in line:
+            continue
+        if local and '@' in line:
+            # Commandes lancées vers un serveur distant depuis la machine locale
+            continue
+        parts = line.split()
+        if len(parts) >= 11 and parts[1].isdigit():
+            workers.append({
+                'pid': parts[1],
+                'cpu': parts[2],
+                'memory': parts[3],
+                'started': parts[8] if len(parts) > 8 else 'N/A'
+            })
+    return workers
+
+
+class FleetInventory:
+    """Cache des processus workers par serveur, rafraîchi en arrière-plan"""
+
+    def __init__(self, servers: Dict[str, Dict], refresh_interval: int = INVENTORY_REFRESH_INTERVAL):
+        self.servers = servers
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict] = {}
+        self._probing = set()
+        self._last_access = 0.0
+        self._last_refresh = 0.0  # dernier lancement de sondages (monotonic)
+        self._wake = threading.Event()
+        self._ready = threading.Event()  # Tous les serveurs sondés au moins une fois
+        self._pid = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """État de chaque serveur depuis le cache (ne bloque jamais sur SSH)"""
+        self._last_access = time.monotonic()
+        self._ensure_refresher()
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            # Cache plus vieux qu'un intervalle (thread en veille faute de consultations): sonder tout de suite
+            self._wake.set()
+        if not self._ready.is_set():
+            self._ready.wait(INITIAL_WAIT)
+
+        now = time.time()
+        result = {}
+        with self._lock:
+            for key, server in self.servers.items():
+                entry = self._cache.get(key)
+                host = {
+                    'count': 0,
+                    'workers': [],
+                    'min_required': server.get('min_required', 0),
+                    'host': server.get('label', server['name']),
+                    'checked_at': None,
+                    'age_seconds': None,
+                    'stale': True,
+                    'refreshing': key in self._probing,
+                }
+                if entry:
+                    host['count'] = len(entry['workers'])
+                    host['workers'] = entry['workers']
+                    host['checked_at'] = entry['checked_at']
+                    host['age_seconds'] = round(now - entry['checked_ts'], 1)
+                    host['stale'] = host['age_seconds'] > INVENTORY_STALE_AFTER
+                    if entry.get('error'):
+                        host['error'] = entry['error']
+                result[key] = host
+        return result
+
+    def refresh(self, wait: bool = False):
+        """Lancer un sondage de tous les serveurs qui ne sont pas déjà en cours"""
+        futures = []
+        with self._lock:
+            self._last_refresh = time.monotonic()
+            for key in self.servers:
+                if key in self._probing:
+                    continue
+                self._probing.add(key)
+                futures.append(self._executor.submit(self._probe, key))
+        if wait:
+            for future in futures:
+                future.result()
+
+    def _probe(self, key: str):
+        server = self.servers[key]
+        workers = []
+        error = None
+        try:
+            if server.get('ssh') is None:
+                output = subprocess.run(['ps', 'aux'], capture_output=True, text=True, timeout=PROBE_TIMEOUT).stdout
+            else:
+                result = subprocess.run(
+                    ['ssh', *SSH_OPTIONS, server['ssh'], REMOTE_PS_COMMAND],
+                    capture_output=True, text=True, timeout=PROBE_TIMEOUT
+                )
+                if result.returncode == 255:
+                    # Code de ssh lui-même (connexion impossible), pas de grep
+                    raise RuntimeError(result.stderr.strip() or 'connexion SSH impossible')
+                output = result.stdout
+            workers = parse_worker_processes(output, local=server.get('ssh') is None)
+        except Exception as e:
+            error = str(e)
+
+        with self._lock:
+            previous = self._cache.get(key)
+            if error and previous:
+                # Garder le dernier résultat connu, qui vieillit (stale) avec l'erreur
+                previous['error'] = error
+            else:
+                self._cache[key] = {
+                    'workers': workers,
+                    'checked_at': datetime.utcnow().isoformat(),
+                    'checked_ts': time.time(),
+                    'error': error,
+                }
+            self._probing.discard(key)
+            if len(self._cache) == len(self.servers):
+                self._ready.set()
+
+    def _ensure_refresher(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._probing = set()
+            self._executor = ThreadPoolExecutor(max_workers=len(self.servers), thread_name_prefix='fleet-probe')
+        os.makedirs(SSH_CONTROL_DIR, mode=0o700, exist_ok=True)
+        threading.Thread(target=self._refresh_loop, name='fleet-inventory', daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            if time.monotonic() - self._last_access < INVENTORY_IDLE_STOP:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"❌ Erreur inventaire workers: {e}")
+                self._wake.wait(self.refresh_interval)
+            else:
+                # Personne ne consulte: attendre la prochaine requête
+                self._wake.wait()
+            self._wake.clear()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Domaines déjà connus (avec email ou blacklistés), partagés entre workers
+
+Le coordinateur publie via GET /api/crawl/known-domains un tableau trié
+d'empreintes 64 bits (8 octets par domaine, compressé en base64) des
+domaines qui ont déjà un email ou sont blacklistés. Les workers le
+téléchargent au démarrage puis récupèrent seulement les ajouts depuis leur
+version (`?since=<version>`), et ne cherchent ni n'uploadent ces acheteurs.
+
+Utilisé par distributed_crawl_api.py (construction) et crawl_worker_multi.py
+(à déployer avec lui dans le dossier du worker).
+
+Usage côté worker:
+    known = KnownDomainsSet()
+    known.apply(payload)  # Réponse JSON de /api/crawl/known-domains
+    if 'acheteur.fr' in known:
+        ...
+"""
+
+import base64
+import hashlib
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+# Au-delà, le worker refait une synchronisation complète (emails ajoutés sans
+# email_found_at, blacklist modifiée hors API...)
+FULL_SYNC_INTERVAL = 6 * 3600
+# Les deltas démarrent un peu avant la version: une transaction en cours au
+# moment de la construction du snapshot ne doit pas être perdue
+DELTA_OVERLAP = timedelta(seconds=60)
+# Au-delà de ce nombre d'ajouts en attente, ils sont fusionnés dans le tableau trié
+MERGE_THRESHOLD = 10000
+
+
+def domain_hash(domain: str) -> int:
+    """Empreinte 64 bits d'un domaine (blake2b, insensible à la casse et au www.)"""
+    domain = domain.strip().lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return int.from_bytes(hashlib.blake2b(domain.encode('utf-8', 'replace'), digest_size=8).digest(), 'big')
+
+
+def encode_hashes(hashes: Iterable[int]) -> str:
+    """Tableau trié d'empreintes -> base64 (uint64 little-endian compressé)"""
+    values = array('Q', sorted(set(hashes)))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return base64.b64encode(zlib.compress(values.tobytes())).decode('ascii')
+
+
+def decode_hashes(data: str) -> array:
+    """Inverse de encode_hashes"""
+    values = array('Q')
+    if data:
+        values.frombytes(zlib.decompress(base64.b64decode(data)))
+        if sys.byteorder == 'big':
+            values.byteswap()
+    return values
+
+
+def make_version(built_at: datetime) -> str:
+    return built_at.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def parse_version(version: Optional[str]) -> Optional[datetime]:
+    if not version:
+        return None
+    try:
+        return datetime.strptime(version, '%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        return None
+
+
+class KnownDomainsSet:
+    """Ensemble des domaines connus côté worker: tableau trié + ajouts récents"""
+
+    def __init__(self):
+        self.hashes = array('Q')
+        self.recent = set()
+        self.version: Optional[str] = None
+        self.synced_at: Optional[datetime] = None  # Dernière synchronisation complète
+
+    def __len__(self) -> int:
+        return len(self.hashes) + len(self.recent)
+
+    def __contains__(self, domain: str) -> bool:
+        if not self.version:
+            return False
+        fp = domain_hash(domain)
+        if fp in self.recent:
+            return True
+        i = bisect_left(self.hashes, fp)
+        return i < len(self.hashes) and self.hashes[i] == fp
+
+    def needs_full_sync(self) -> bool:
+        return (self.synced_at is None or
+                (datetime.utcnow() - self.synced_at).total_seconds() > FULL_SYNC_INTERVAL)
+
+    def apply(self, payload: Dict):
+        """Appliquer une réponse de /api/crawl/known-domains (snapshot complet ou delta)"""
+        values = decode_hashes(payload.get('hashes', ''))
+        if payload.get('full'):
+            self.hashes = values
+            self.recent = set()
+            self.synced_at = datetime.utcnow()
+        else:
+            self.recent.update(values)
+            if len(self.recent) > MERGE_THRESHOLD:
+                self.hashes = array('Q', sorted(set(self.hashes) | self.recent))
+                self.recent = set()
+        self.version = payload.get('version')
+
+
+# ============================================================================
+# Construction côté coordinateur
+# ============================================================================
+
+def query_known_hashes(session, since: Optional[datetime] = None) -> set:
+    """
+    Empreintes des domaines avec email ou blacklistés.
+
+    Sans `since`: tous les domaines. Avec `since`: seulement ceux dont
+    l'email a été trouvé ou qui ont été blacklistés depuis.
+    """
+    from sqlalchemy import or_
+    from database import Site
+
+    has_email = Site.has_email == True  # Colonne calculée: index partiel ix_sites_with_email
+    query = session.query(Site.domain)
+    if since is None:
+        query = query.filter(or_(has_email, Site.blacklisted == True))
+    else:
+        query = query.filter(or_(
+            has_email & (Site.email_found_at >= since),
+            (Site.blacklisted == True) & (Site.blacklisted_at >= since)
+        ))
+    return {domain_hash(domain) for (domain,) in query.yield_per(10000) if domain}
+
+
+def build_payload(session, since: Optional[str] = None, blacklist: Iterable[str] = ()) -> Dict:
+    """
+    Réponse de /api/crawl/known-domains.
+
+    Un `since` absent, illisible ou trop ancien donne un snapshot complet.
+    """
+    built_at = datetime.utcnow()
+    since_dt = parse_version(since)
+    full = since_dt is None or (built_at - since_dt).total_seconds() > FULL_SYNC_INTERVAL
+
+    if full:
+        hashes = query_known_hashes(session)
+        hashes.update(domain_hash(domain) for domain in blacklist)
+    else:
+        hashes = query_known_hashes(session, since_dt - DELTA_OVERLAP)
+
+    return {
+        'version': make_version(built_at),
+        'full': full,
+        'count': len(hashes),
+        'hashes': encode_hashes(hashes),
+    }
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Identification de langue hors ligne par n-grammes de caractères
+
+Utilisé par crawl_worker_multi.py sur les pages d'accueil déjà téléchargées
+(vendeur et acheteurs) quand l'attribut HTML lang manque: seule une langue
+incertaine fait encore remonter un text_sample au coordinateur (et donc un
+appel Claude). À déployer avec les workers, comme domain_policy.py.
+
+Les profils (fr, en, es, de, it, nl, pt) sont les PROFILE_SIZE trigrammes
+les plus fréquents de courts textes de référence, calculés une fois au
+chargement du module. Le score d'une langue est la log-vraisemblance des
+trigrammes du texte (bayésien naïf, lissage de Laplace); la confiance est la
+probabilité a posteriori de la meilleure langue, l'évidence étant plafonnée
+à EVIDENCE_TRIGRAMS trigrammes pour qu'un texte long ne sature pas à 1.0.
+Quelques centaines de microsecondes par page (texte borné à MAX_TEXT_CHARS).
+
+Usage:
+    page_language('<html lang="fr">...')  # {'language': 'fr', 'language_confidence': 0.95}
+    identify_language('Livraison offerte dès 50€ ...')  # ('fr', 0.99)
+"""
+
+import html
+import math
+import re
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+PROFILE_SIZE = 400  # trigrammes gardés par langue
+MAX_TEXT_CHARS = 1500  # texte visible analysé par page
+MIN_TRIGRAMS = 20  # en dessous, pas de décision
+EVIDENCE_TRIGRAMS = 20  # plafond de l'évidence pour la confiance
+LANGUAGE_MIN_CONFIDENCE = 0.8  # en dessous, le text_sample part au coordinateur
+HTML_LANG_CONFIDENCE = 0.95  # attribut lang déclaré par le site
+TEXT_SAMPLE_LENGTH = 300  # caractères envoyés au coordinateur (détection par Claude)
+MAX_HEAD_CHARS = 64 * 1024  # début de page conservé pour la détection (PageSample)
+
+# Textes de référence: vocabulaire courant des sites (accueil, boutique, contact, mentions légales, blog)
+_CORPORA = {
+    'fr': """
+        Bienvenue sur notre site. Découvrez nos produits et nos services pour la maison, le jardin et
+        la décoration. Livraison gratuite dès cinquante euros d'achat et retour offert pendant trente jours.
+        Notre équipe est à votre écoute du lundi au vendredi pour répondre à toutes vos questions.
+        Contactez-nous par téléphone ou par email, nous vous répondrons dans les plus brefs délais.
+        Mentions légales: ce site est édité par une société à responsabilité limitée au capital social de
+        dix mille euros, immatriculée au registre du commerce et des sociétés. Directeur de la publication.
+        Politique de confidentialité et gestion des cookies. Nous utilisons des cookies pour améliorer votre
+        expérience de navigation et réaliser des statistiques de visites. Accepter ou refuser.
+        Nos derniers articles du blog: comment choisir votre matériel, les conseils de nos experts, les
+        tendances de la saison et les nouveautés de l'année. Inscrivez-vous à notre newsletter pour recevoir
+        nos offres exclusives. Panier, mon compte, connexion, créer un compte, mot de passe oublié.
+        Qui sommes-nous ? Une entreprise familiale française qui travaille avec des artisans depuis vingt ans.
+        Paiement sécurisé par carte bancaire. Avis de nos clients. Ajouter au panier. En savoir plus.
+    """,
+    'en': """
+        Welcome to our website. Discover our products and services for your home, garden and decoration.
+        Free shipping on orders over fifty dollars and free returns within thirty days. Our team is here
+        to help you Monday to Friday and will answer all of your questions. Contact us by phone or email
+        and we will get back to you as soon as possible. Terms and conditions: this website is operated by
+        a limited company registered in England and Wales. Privacy policy and cookie settings. We use
+        cookies to improve your browsing experience and to analyse our traffic. Accept all or manage
+        preferences. Latest posts from our blog: how to choose the right equipment, advice from our
+        experts, the trends of the season and what is new this year. Subscribe to our newsletter to get
+        exclusive offers. Shopping cart, my account, sign in, create an account, forgot your password.
+        About us: a family business that has been working with local craftsmen for twenty years.
+        Secure payment by credit card. Customer reviews. Add to cart. Read more. Learn more about us.
+    """,
+    'es': """
+        Bienvenido a nuestra página web. Descubre nuestros productos y servicios para la casa, el jardín y
+        la decoración. Envío gratuito en pedidos superiores a cincuenta euros y devolución gratuita durante
+        treinta días. Nuestro equipo está a tu disposición de lunes a viernes para responder a todas tus
+        preguntas. Contáctanos por teléfono o por correo electrónico y te responderemos lo antes posible.
+        Aviso legal: este sitio web pertenece a una sociedad limitada inscrita en el registro mercantil.
+        Política de privacidad y configuración de cookies. Utilizamos cookies propias y de terceros para
+        mejorar tu experiencia de navegación y analizar el tráfico. Aceptar o rechazar. Últimas entradas
+        del blog: cómo elegir el equipo adecuado, los consejos de nuestros expertos, las tendencias de la
+        temporada y las novedades del año. Suscríbete a nuestro boletín para recibir ofertas exclusivas.
+        Carrito, mi cuenta, iniciar sesión, crear una cuenta, has olvidado tu contraseña. Quiénes somos:
+        una empresa familiar que trabaja con artesanos desde hace veinte años. Pago seguro con tarjeta.
+        Opiniones de nuestros clientes. Añadir al carrito. Leer más. Más información sobre nosotros.
+    """,
+    'de': """
+        Willkommen auf unserer Webseite. Entdecken Sie unsere Produkte und Dienstleistungen für Haus, Garten
+        und Dekoration. Kostenloser Versand ab fünfzig Euro Bestellwert und kostenlose Rücksendung innerhalb
+        von dreißig Tagen. Unser Team ist von Montag bis Freitag für Sie da und beantwortet gerne alle Ihre
+        Fragen. Kontaktieren Sie uns per Telefon oder per E-Mail, wir melden uns so schnell wie möglich bei
+        Ihnen. Impressum: Diese Webseite wird von einer Gesellschaft mit beschränkter Haftung betrieben,
+        eingetragen im Handelsregister. Datenschutzerklärung und Cookie-Einstellungen. Wir verwenden Cookies,
+        um Ihr Nutzererlebnis zu verbessern und die Zugriffe auf unsere Webseite zu analysieren. Alle
+        akzeptieren oder ablehnen. Neueste Beiträge aus unserem Blog: wie Sie die richtige Ausrüstung wählen,
+        Tipps unserer Experten, die Trends der Saison und die Neuheiten des Jahres. Melden Sie sich für
+        unseren Newsletter an und erhalten Sie exklusive Angebote. Warenkorb, mein Konto, anmelden, Konto
+        erstellen, Passwort vergessen. Über uns: ein Familienunternehmen, das seit zwanzig Jahren mit
+        Handwerkern zusammenarbeitet. Sichere Zahlung mit Kreditkarte. Kundenbewertungen. In den Warenkorb.
+    """,
+    'it': """
+        Benvenuti sul nostro sito. Scopri i nostri prodotti e servizi per la casa, il giardino e
+        l'arredamento. Spedizione gratuita per ordini superiori a cinquanta euro e reso gratuito entro trenta
+        giorni. Il nostro team è a tua disposizione dal lunedì al venerdì per rispondere a tutte le tue
+        domande. Contattaci per telefono o via email e ti risponderemo il prima possibile. Note legali:
+        questo sito è gestito da una società a responsabilità limitata iscritta al registro delle imprese.
+        Informativa sulla privacy e gestione dei cookie. Utilizziamo i cookie per migliorare la tua
+        esperienza di navigazione e per analizzare il traffico. Accetta tutti o rifiuta. Ultimi articoli
+        del blog: come scegliere l'attrezzatura giusta, i consigli dei nostri esperti, le tendenze della
+        stagione e le novità dell'anno. Iscriviti alla nostra newsletter per ricevere offerte esclusive.
+        Carrello, il mio account, accedi, crea un account, hai dimenticato la password. Chi siamo: un'azienda
+        di famiglia che lavora con gli artigiani da vent'anni. Pagamento sicuro con carta di credito.
+        Recensioni dei nostri clienti. Aggiungi al carrello. Leggi di più. Scopri di più su di noi.
+    """,
+    'nl': """
+        Welkom op onze website. Ontdek onze producten en diensten voor het huis, de tuin en de decoratie.
+        Gratis verzending vanaf vijftig euro en gratis retourneren binnen dertig dagen. Ons team staat van
+        maandag tot en met vrijdag voor u klaar en beantwoordt graag al uw vragen. Neem contact met ons op
+        via telefoon of e-mail, wij reageren zo snel mogelijk. Algemene voorwaarden: deze website wordt
+        beheerd door een besloten vennootschap ingeschreven bij de Kamer van Koophandel. Privacybeleid en
+        cookie-instellingen. Wij gebruiken cookies om uw surfervaring te verbeteren en het verkeer op onze
+        website te analyseren. Alles accepteren of weigeren. Laatste berichten op onze blog: hoe kiest u de
+        juiste uitrusting, tips van onze experts, de trends van het seizoen en de nieuwigheden van het jaar.
+        Schrijf je in voor onze nieuwsbrief en ontvang exclusieve aanbiedingen. Winkelwagen, mijn account,
+        inloggen, account aanmaken, wachtwoord vergeten. Over ons: een familiebedrijf dat al twintig jaar
+        samenwerkt met ambachtslieden. Veilig betalen met creditcard. Beoordelingen van onze klanten.
+        In winkelwagen. Lees meer. Meer informatie over ons bedrijf en onze medewerkers.
+    """,
+    'pt': """
+        Bem-vindo ao nosso site. Descubra os nossos produtos e serviços para a casa, o jardim e a decoração.
+        Envio gratuito em encomendas acima de cinquenta euros e devolução gratuita durante trinta dias. A
+        nossa equipa está ao seu dispor de segunda a sexta-feira para responder a todas as suas perguntas.
+        Contacte-nos por telefone ou por email e responderemos o mais rapidamente possível. Informações
+        legais: este site é gerido por uma sociedade por quotas registada na conservatória do registo
+        comercial. Política de privacidade e gestão de cookies. Utilizamos cookies para melhorar a sua
+        experiência de navegação e analisar o tráfego. Aceitar todos ou recusar. Últimos artigos do blog:
+        como escolher o equipamento certo, os conselhos dos nossos especialistas, as tendências da estação e
+        as novidades do ano. Subscreva a nossa newsletter para receber ofertas exclusivas. Carrinho, a minha
+        conta, iniciar sessão, criar conta, esqueceu a sua palavra-passe. Quem somos: uma empresa familiar
+        que trabalha com artesãos há vinte anos. Pagamento seguro com cartão de crédito. Opiniões dos
+        nossos clientes. Adicionar ao carrinho. Ler mais. Saiba mais sobre nós e sobre a nossa história.
+    """,
+}
+
+NON_LETTERS_RE = re.compile(r"[^a-zàâäáãåçéèêëíìîïñóòôöõøœúùûüÿß]+")
+HTML_LANG_RE = re.compile(r'<html\b[^>]*?\blang\s*=\s*["\']?\s*([a-zA-Z]{2,3})(?:[-_][a-zA-Z0-9]+)?', re.IGNORECASE)
+INVISIBLE_RE = re.compile(r'<(script|style|noscript|svg|template)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r'<[^>]*>')
+BODY_START_RE = re.compile(r'<body\b[^>]*>', re.IGNORECASE)
+
+
+def _trigrams(text: str):
+    """Trigrammes de caractères des mots (bornés par des espaces), lettres uniquement"""
+    padded = ' ' + NON_LETTERS_RE.sub(' ', text.lower()).strip() + ' '
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _build_models():
+    """Log-probabilité de chaque trigramme connu, par langue (ordre de LANGUAGES)"""
+    profiles = {}
+    for lang, corpus in _CORPORA.items():
+        counts = Counter(g for g in _trigrams(corpus) if g != '   ')
+        profiles[lang] = dict(counts.most_common(PROFILE_SIZE))
+    languages = tuple(profiles)
+    vocabulary = set().union(*profiles.values())
+    unseen = []
+    log_probs = {}
+    for index, lang in enumerate(languages):
+        profile = profiles[lang]
+        denominator = sum(profile.values()) + len(vocabulary)
+        unseen.append(math.log(1 / denominator))
+        for gram in vocabulary:
+            log_probs.setdefault(gram, [0.0] * len(languages))[index] = math.log((profile.get(gram, 0) + 1) / denominator)
+    return languages, {gram: tuple(values) for gram, values in log_probs.items()}, tuple(unseen)
+
+
+LANGUAGES, _LOG_PROBS, _UNSEEN = _build_models()
+
+
+def identify_language(text: str) -> Tuple[Optional[str], float]:
+    """(code ISO 639-1, confiance entre 0 et 1), ou (None, 0.0) si le texte est trop court"""
+    scores = [0.0] * len(LANGUAGES)
+    known = 0
+    for gram, count in Counter(_trigrams(text[:MAX_TEXT_CHARS])).items():
+        values = _LOG_PROBS.get(gram)
+        if values is None:
+            continue
+        known += count
+        for index, value in enumerate(values):
+            scores[index] += value * count
+    if known < MIN_TRIGRAMS:
+        return None, 0.0
+
+    # Évidence plafonnée: log-vraisemblances moyennes x min(n, EVIDENCE_TRIGRAMS)
+    scale = min(known, EVIDENCE_TRIGRAMS) / known
+    best = max(scores)
+    weights = [math.exp((score - best) * scale) for score in scores]
+    index = scores.index(best)
+    return LANGUAGES[index], round(weights[index] / sum(weights), 3)
+
+
+def html_lang(page: str) -> Optional[str]:
+    """Langue déclarée par <html lang="fr-FR"> (code à 2 lettres), ou None"""
+    match = HTML_LANG_RE.search(page[:MAX_HEAD_CHARS])
+    if match and len(match.group(1)) == 2:
+        return match.group(1).lower()
+    return None
+
+
+def visible_text(page: str) -> str:
+    """Texte visible approximatif d'une page (sans scripts, styles ni balises)"""
+    body = BODY_START_RE.search(page)
+    if body:
+        page = page[body.end():]
+    page = INVISIBLE_RE.sub(' ', page)
+    return ' '.join(html.unescape(TAG_RE.sub(' ', page)).split())
+
+
+def page_language(page: Optional[str]) -> Dict:
+    """
+    Champs à joindre au résultat envoyé au coordinateur:
+    {'language', 'language_confidence'} si la langue est sûre, sinon
+    {'text_sample'} (détection côté coordinateur), {} si rien d'exploitable.
+    """
+    if not page:
+        return {}
+    declared = html_lang(page)
+    if declared:
+        return {'language': declared, 'language_confidence': HTML_LANG_CONFIDENCE}
+    text = visible_text(page)
+    language, confidence = identify_language(text)
+    if language and confidence >= LANGUAGE_MIN_CONFIDENCE:
+        return {'language': language, 'language_confidence': confidence}
+    if len(text) >= 20:
+        return {'text_sample': text[:TEXT_SAMPLE_LENGTH]}
+    return {}
+
+
+class PageSample:
+    """Début d'une page lue en streaming (décodé), gardé pour page_language()"""
+
+    def __init__(self, limit: int = MAX_HEAD_CHARS):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.limit
+
+    def feed(self, text: str):
+        if self.full or not text:
+            return
+        text = text[:self.limit - self.size]
+        self.parts.append(text)
+        self.size += len(text)
+
+    def text(self) -> str:
+        return ''.join(self.parts)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Détection de langue hors du chemin des requêtes (sites sans attribut HTML lang)
+
+Avant, /api/crawl/result et /api/crawl/buyers_batch appelaient Claude de
+façon synchrone pour chaque acheteur sans langue: un batch de 20 acheteurs
+bloquait un worker gunicorn pendant 20 appels API. Désormais, pour chaque
+text_sample reçu:
+
+1. pré-classifieur local par mots-outils (fr, en, es, de, it, pt, nl): la
+   plupart des échantillons sont résolus sans aucun appel;
+2. cache language_cache par hash de l'échantillon: un texte déjà classé
+   (page de parking, template partagé...) n'est jamais renvoyé à Claude;
+3. sinon l'échantillon est mis en file (table language_detection_queue)
+   dans la transaction du résultat.
+
+Un thread par process vide la file par lots: jusqu'à LANGUAGE_BATCH_SIZE
+échantillons en un seul appel Claude, résultats écrits dans le cache et
+dans `sites` (uniquement si la langue est encore vide). Les lots sont
+réservés par bail (UPDATE ... RETURNING), comme crawl_queue: plusieurs
+process gunicorn ne traitent jamais le même échantillon.
+
+Les tables (language_detection_queue, language_cache) sont créées par
+migrate_add_language_queue.py: tant qu'elles manquent, seul le
+pré-classifieur est utilisé (la langue reste vide sinon).
+
+Usage:
+    languages = LanguageDetectionQueue(get_session, detect_languages_with_claude)
+    languages.resolve(session, domain, buyer_data)  # remplit language si connue, sinon met en file
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, inspect, text
+
+logger = logging.getLogger(__name__)
+
+LANGUAGE_BATCH_SIZE = 25  # échantillons par appel Claude
+LANGUAGE_BATCH_INTERVAL = 5  # secondes entre deux vidages de la file (par process)
+LANGUAGE_LEASE = timedelta(minutes=5)  # bail d'un lot (et délai avant nouvel essai après un échec)
+LANGUAGE_MAX_ATTEMPTS = 5  # au-delà, l'échantillon est abandonné
+SAMPLE_LENGTH = 300  # caractères envoyés à Claude (et hashés pour le cache)
+
+# Pré-classifieur: mots-outils fréquents par langue
+STOPWORDS = {
+    'fr': 'le la les de des du un une et est à en pour dans que qui sur avec pas vous nous sont au aux ce cette par plus ou d l notre nos votre vos tous chez',
+    'en': 'the and of to is in that for with on are you this be at by from your have not we our it as',
+    'es': 'el la los las de del y en es que por para con una un se su al lo como más pero sus le',
+    'de': 'der die das und ist nicht mit den von zu ein eine auf für sich dem des im auch wir sie',
+    'it': 'il lo la gli a e della delle di che è per con una un non sono del al nel alla anche più come questo',
+    'pt': 'o a os as de do da dos das e em que para com uma um não são ao na no pelo mais como seu sua você',
+    'nl': 'de het een en van is dat op te voor met niet zijn ook aan bij om als wij u er naar',
+}
+# Seuils vérifiés sur des échantillons courts (accroches de pages d'accueil):
+# les mots partagés ('de', 'la', 'a'...) pèsent peu, d'où un score et une part modestes
+PREFILTER_MIN_SCORE = 3  # mots-outils (pondérés) min de la langue gagnante
+PREFILTER_MIN_SHARE = 0.45  # part min du score total
+PREFILTER_MIN_MARGIN = 2.0  # gagnante >= 2x la deuxième
+
+WORD_RE = re.compile(r"[a-zàâäáãçéèêëíìîïñóòôöõœúùûüß]+")
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS language_detection_queue (
+        domain VARCHAR(255) PRIMARY KEY,
+        sample_hash VARCHAR(32) NOT NULL,
+        text_sample TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        lease_expires_at TIMESTAMP,
+        enqueued_at TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_language_detection_queue_lease ON language_detection_queue (lease_expires_at, enqueued_at)",
+    """
+    CREATE TABLE IF NOT EXISTS language_cache (
+        sample_hash VARCHAR(32) PRIMARY KEY,
+        language VARCHAR(10) NOT NULL,
+        confidence FLOAT,
+        source VARCHAR(20),
+        detected_at TIMESTAMP
+    )
+    """,
+]
+
+ENQUEUE_SQL = text("""
+    INSERT INTO language_detection_queue (domain, sample_hash, text_sample, attempts, enqueued_at)
+    VALUES (:domain, :sample_hash, :text_sample, 0, :now)
+    ON CONFLICT (domain) DO NOTHING
+""")
+
+WRITE_BACK_SQL = text("""
+    UPDATE sites
+    SET language = :language, language_confidence = :confidence, language_detected_at = :now
+    WHERE domain = :domain AND (language IS NULL OR language = '')
+""")
+
+_STOPWORD_WEIGHTS: Dict[str, Dict[str, float]] = {}
+for _lang, _words in STOPWORDS.items():
+    for _word in _words.split():
+        _STOPWORD_WEIGHTS.setdefault(_word, {})[_lang] = 1.0
+# Un mot partagé par plusieurs langues ('de', 'que', 'la'...) compte moins
+for _weights in _STOPWORD_WEIGHTS.values():
+    for _lang in _weights:
+        _weights[_lang] = 1.0 / len(_weights)
+
+
+def normalize_sample(text_sample: str) -> str:
+    return ' '.join(text_sample[:SAMPLE_LENGTH].split()).lower()
+
+
+def sample_hash(text_sample: str) -> str:
+    return hashlib.blake2b(normalize_sample(text_sample).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def prefilter_language(text_sample: str) -> Tuple[Optional[str], Optional[float]]:
+    """Langue par mots-outils, ou (None, None) si le texte est ambigu ou trop court"""
+    scores = Counter()
+    for word in WORD_RE.findall(text_sample.lower()):
+        for lang, weight in _STOPWORD_WEIGHTS.get(word, {}).items():
+            scores[lang] += weight
+    if not scores:
+        return None, None
+    ranked = scores.most_common(2)
+    best_lang, best = ranked[0]
+    second = ranked[1][1] if len(ranked) > 1 else 0.0
+    share = best / sum(scores.values())
+    if best < PREFILTER_MIN_SCORE or share < PREFILTER_MIN_SHARE or best < PREFILTER_MIN_MARGIN * second:
+        return None, None
+    return best_lang, round(min(0.95, 0.5 + share / 2), 2)
+
+
+class LanguageDetectionQueue:
+    """Pré-classifieur + cache + file d'échantillons traitée par lots en arrière-plan"""
+
+    def __init__(self, session_factory: Callable,
+                 batch_detector: Callable[[List[str]], List[Tuple[Optional[str], Optional[float]]]]):
+        self.session_factory = session_factory
+        self.batch_detector = batch_detector
+        self._lock = threading.Lock()
+        self._pid = None
+        self._installed = None  # tables présentes (vérifié une fois par process)
+
+    def resolve(self, session, domain: Optional[str], data: Dict) -> bool:
+        """
+        Remplir data['language'] / data['language_confidence'] depuis le
+        pré-classifieur ou le cache; sinon mettre l'échantillon en file dans
+        la transaction de `session` (sans commit). Retourne True si la langue
+        est connue tout de suite.
+        """
+        text_sample = data.get('text_sample')
+        if data.get('language') or not text_sample or len(text_sample) < 20 or not domain:
+            return False
+
+        language, confidence = prefilter_language(text_sample)
+        if language:
+            data['language'], data['language_confidence'] = language, confidence
+            return True
+
+        if not self._check_installed(session.connection()):
+            return False
+        digest = sample_hash(text_sample)
+        cached = session.execute(text(
+            "SELECT language, confidence FROM language_cache WHERE sample_hash = :sample_hash"
+        ), {'sample_hash': digest}).first()
+        if cached:
+            data['language'], data['language_confidence'] = cached.language, cached.confidence
+            return True
+
+        session.execute(ENQUEUE_SQL, {
+            'domain': domain,
+            'sample_hash': digest,
+            'text_sample': text_sample[:SAMPLE_LENGTH],
+            'now': datetime.utcnow(),
+        })
+        self._ensure_worker()
+        return False
+
+    def stats(self, session) -> Dict[str, int]:
+        if not self._check_installed(session.connection()):
+            return {'pending': 0, 'cached': 0}
+        self._ensure_worker()
+        pending, cached = session.execute(text("""
+            SELECT (SELECT COUNT(*) FROM language_detection_queue),
+                   (SELECT COUNT(*) FROM language_cache)
+        """)).first()
+        return {'pending': pending or 0, 'cached': cached or 0}
+
+    def drain(self, limit: int = LANGUAGE_BATCH_SIZE) -> int:
+        """Traiter un lot de la file; retourne le nombre d'échantillons réservés"""
+        session = self.session_factory()
+        try:
+            if not self._check_installed(session.connection()):
+                return 0
+            now = datetime.utcnow()
+            rows = session.execute(text("""
+                UPDATE language_detection_queue
+                SET lease_expires_at = :expires_at, attempts = attempts + 1
+                WHERE domain IN (
+                    SELECT domain FROM language_detection_queue
+                    WHERE lease_expires_at IS NULL OR lease_expires_at < :now
+                    ORDER BY enqueued_at
+                    LIMIT :limit
+                )
+                RETURNING domain, sample_hash, text_sample, attempts
+            """), {'now': now, 'expires_at': now + LANGUAGE_LEASE, 'limit': limit}).fetchall()
+            session.commit()
+            if not rows:
+                return 0
+
+            # Un seul appel par texte distinct du lot (cache compris)
+            samples = {row.sample_hash: row.text_sample for row in rows}
+            known = {}
+            for cached in session.execute(text(
+                "SELECT sample_hash, language, confidence FROM language_cache WHERE sample_hash IN :hashes"
+            ).bindparams(bindparam('hashes', expanding=True)), {'hashes': list(samples)}):
+                known[cached.sample_hash] = (cached.language, cached.confidence)
+
+            missing = [digest for digest in samples if digest not in known]
+            if missing:
+                detected = self.batch_detector([samples[digest] for digest in missing])
+                new_entries = []
+                for digest, (language, confidence) in zip(missing, detected):
+                    if language:
+                        known[digest] = (language, confidence)
+                        new_entries.append({'sample_hash': digest, 'language': language,
+                                            'confidence': confidence, 'now': now})
+                if new_entries:
+                    session.execute(text("""
+                        INSERT INTO language_cache (sample_hash, language, confidence, source, detected_at)
+                        VALUES (:sample_hash, :language, :confidence, 'claude', :now)
+                        ON CONFLICT (sample_hash) DO NOTHING
+                    """), new_entries)
+
+            resolved = [row for row in rows if row.sample_hash in known]
+            if resolved:
+                session.execute(WRITE_BACK_SQL, [{
+                    'domain': row.domain,
+                    'language': known[row.sample_hash][0],
+                    'confidence': known[row.sample_hash][1],
+                    'now': now,
+                } for row in resolved])
+
+            # Retirer les résolus et les abandonnés; les autres réessaient à l'expiration du bail
+            done = [{'domain': row.domain} for row in rows
+                    if row.sample_hash in known or row.attempts >= LANGUAGE_MAX_ATTEMPTS]
+            if done:
+                session.execute(text("DELETE FROM language_detection_queue WHERE domain = :domain"), done)
+            session.commit()
+            logger.info(f"🤖 Langues: {len(resolved)}/{len(rows)} échantillons résolus "
+                        f"({len(missing)} envoyés à Claude)")
+            return len(rows)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"❌ Erreur file détection de langue: {e}")
+            return 0
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------
+    # Thread de traitement (un par process, recréé après un fork gunicorn)
+    # ------------------------------------------------------------------
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._drain_loop, name='language-detection', daemon=True).start()
+
+    def _drain_loop(self):
+        while True:
+            time.sleep(LANGUAGE_BATCH_INTERVAL)
+            try:
+                # Vider la file par lots tant que des lots pleins arrivent
+                while self.drain() >= LANGUAGE_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logger.error(f"❌ Erreur thread détection de langue: {e}")
+
+    def _check_installed(self, connection) -> bool:
+        """
+        Tables créées par migrate_add_language_queue.py? Lecture seule sur la
+        connexion de l'appelant: pas de DDL pendant sa transaction d'écriture
+        (sous SQLite, une autre connexion attendrait le verrou qu'il tient).
+        """
+        if self._installed is None:
+            tables = inspect(connection)
+            self._installed = (tables.has_table('language_detection_queue')
+                               and tables.has_table('language_cache'))
+            if not self._installed:
+                logger.warning("⚠️  Tables de détection de langue absentes: "
+                               "lancer migrate_add_language_queue.py (pré-classifieur seul)")
+        return self._installed
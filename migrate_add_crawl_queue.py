@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Script de migration pour la file de tâches du crawl distribué (crawl_queue.py)
+
+Crée la table crawl_queue et ses index partiels (lignes réservables, baux
+en cours). L'API ne crée plus la table elle-même: le DDL lancé depuis une
+requête commitait la transaction de l'appelant au premier appel.
+
+À lancer avant de (re)démarrer l'API. Les index sur `sites` utilisés par
+les remplissages sont dans migrate_add_crawl_queue_indexes.py.
+"""
+
+import sqlite3
+from pathlib import Path
+
+from crawl_queue import SCHEMA
+
+DB_PATH = 'scrap_email.db'
+
+
+def migrate():
+    """Créer la table et ses index s'ils n'existent pas"""
+
+    if not Path(DB_PATH).exists():
+        print(f"❌ Base de données non trouvée: {DB_PATH}")
+        return False
+
+    conn = sqlite3.connect(DB_PATH, timeout=60)
+    cursor = conn.cursor()
+
+    try:
+        print("Création de la table 'crawl_queue' et de ses index...")
+        for sql in SCHEMA:
+            cursor.execute(sql)
+        conn.commit()
+        count = cursor.execute("SELECT COUNT(*) FROM crawl_queue").fetchone()[0]
+        print(f"✓ Table crawl_queue prête ({count} lignes)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        conn.rollback()
+        return False
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("MIGRATION: File de tâches du crawl distribué (crawl_queue)")
+    print("=" * 70)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 70)
+    if success:
+        print("✓ Migration terminée avec succès")
+    else:
+        print("❌ Migration échouée")
+    print("=" * 70)
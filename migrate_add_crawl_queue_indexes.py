@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Script de migration pour les index partiels utilisés par crawl_queue.py
+
+La table crawl_queue est créée par migrate_add_crawl_queue.py. Ces index
+accélèrent les remplissages de la file 'crawl' (vendeurs pas encore
+crawlés) et des files 'email' / 'enrich' (sites sans email).
+"""
+
+import sqlite3
+from pathlib import Path
+
+DB_PATH = 'scrap_email.db'
+
+INDEXES = {
+    'ix_sites_crawl_pending': (
+        'CREATE INDEX IF NOT EXISTS ix_sites_crawl_pending ON sites (id) '
+        'WHERE is_link_seller = 1 AND backlinks_crawled = 0 AND blacklisted = 0 AND is_active = 1'
+    ),
+    'ix_sites_email_pending': (
+        'CREATE INDEX IF NOT EXISTS ix_sites_email_pending ON sites (email_crawl_at) '
+        "WHERE blacklisted = 0 AND (emails IS NULL OR emails = '' OR emails = 'NO EMAIL FOUND')"
+    ),
+}
+
+
+def migrate():
+    """Créer les index s'ils n'existent pas"""
+
+    if not Path(DB_PATH).exists():
+        print(f"❌ Base de données non trouvée: {DB_PATH}")
+        return False
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        for name, sql in INDEXES.items():
+            print(f"Création de l'index '{name}'...")
+            cursor.execute(sql)
+        conn.commit()
+        print("✓ Index créés")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        conn.rollback()
+        return False
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("MIGRATION: Index pour la file de tâches du crawl distribué")
+    print("=" * 70)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 70)
+    if success:
+        print("✓ Migration terminée avec succès")
+    else:
+        print("❌ Migration échouée")
+    print("=" * 70)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Script de migration pour indexer email_found_at et blacklisted_at
+
+Utilisés par les deltas de /api/crawl/known-domains (domaines dont l'email
+a été trouvé ou qui ont été blacklistés depuis la version du worker).
+"""
+
+import sqlite3
+from pathlib import Path
+
+DB_PATH = 'scrap_email.db'
+
+INDEXES = {
+    'ix_sites_email_found_at': 'CREATE INDEX IF NOT EXISTS ix_sites_email_found_at ON sites (email_found_at)',
+    'ix_sites_blacklisted_at': 'CREATE INDEX IF NOT EXISTS ix_sites_blacklisted_at ON sites (blacklisted_at)',
+}
+
+
+def migrate():
+    """Créer les index s'ils n'existent pas"""
+
+    if not Path(DB_PATH).exists():
+        print(f"❌ Base de données non trouvée: {DB_PATH}")
+        return False
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        for name, sql in INDEXES.items():
+            print(f"Création de l'index '{name}'...")
+            cursor.execute(sql)
+        conn.commit()
+        print("✓ Index créés")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        conn.rollback()
+        return False
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("MIGRATION: Index pour la synchronisation des domaines connus")
+    print("=" * 70)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 70)
+    if success:
+        print("✓ Migration terminée avec succès")
+    else:
+        print("❌ Migration échouée")
+    print("=" * 70)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Script de migration pour la détection de langue en arrière-plan (language_queue.py)
+
+Crée la file des échantillons à envoyer à Claude (language_detection_queue)
+et le cache des langues par hash d'échantillon (language_cache). L'API ne
+crée plus ces tables au premier résultat reçu: le DDL attendait le verrou
+d'écriture tenu par la transaction du résultat ("database is locked").
+
+À lancer avant de (re)démarrer l'API.
+"""
+
+import sqlite3
+from pathlib import Path
+
+from language_queue import SCHEMA
+
+DB_PATH = 'scrap_email.db'
+
+
+def migrate():
+    """Créer les tables et l'index s'ils n'existent pas"""
+
+    if not Path(DB_PATH).exists():
+        print(f"❌ Base de données non trouvée: {DB_PATH}")
+        return False
+
+    conn = sqlite3.connect(DB_PATH, timeout=60)
+    cursor = conn.cursor()
+
+    try:
+        print("Création des tables 'language_detection_queue' et 'language_cache'...")
+        for sql in SCHEMA:
+            cursor.execute(sql)
+        conn.commit()
+        print("✓ Tables créées")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        conn.rollback()
+        return False
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("MIGRATION: File de détection de langue et cache")
+    print("=" * 70)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 70)
+    if success:
+        print("✓ Migration terminée avec succès")
+    else:
+        print("❌ Migration échouée")
+    print("=" * 70)
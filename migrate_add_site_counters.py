@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Script de migration pour les compteurs de /api/stats (site_stats.py)
+
+Crée la table site_counters, ses triggers sur `sites` et l'index sur
+created_at, puis calcule les compteurs en un parcours de `sites`, le tout
+dans une seule transaction (aucune écriture perdue entre le calcul et
+l'activation des triggers).
+
+Avec DATABASE_URL PostgreSQL (db_engine.py), installe la variante PL/pgSQL
+(triggers à deltas, voir site_stats.py) dans la base PostgreSQL.
+
+Usage:
+    python3 migrate_add_site_counters.py            # installation (ou réinstallation)
+    python3 migrate_add_site_counters.py --rebuild  # recalcul seul (cron de nuit)
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+from db_engine import create_database_engine, database_url, is_postgres
+from site_stats import (INSTALL_STATEMENTS, POSTGRES_INSTALL_STATEMENTS, POSTGRES_REBUILD_STATEMENTS,
+                        REBUILD_STATEMENTS)
+
+DB_PATH = 'scrap_email.db'
+DATABASE_URL = database_url('DATABASE_URL', DB_PATH)
+
+
+def migrate_postgres(rebuild_only: bool = False):
+    """Même installation sous PostgreSQL, en une transaction"""
+    engine = create_database_engine(DATABASE_URL)
+    try:
+        started = time.monotonic()
+        with engine.begin() as conn:
+            if not rebuild_only:
+                print("Création de la table site_counters et des triggers PL/pgSQL...")
+                for sql in POSTGRES_INSTALL_STATEMENTS:
+                    conn.execute(text(sql))
+            print("Calcul des compteurs (un parcours de sites)...")
+            for sql in POSTGRES_REBUILD_STATEMENTS:
+                conn.execute(text(sql))
+            total = conn.execute(text("SELECT COALESCE(SUM(total), 0) FROM site_counters")).scalar()
+        print(f"✓ {total} sites comptés en {time.monotonic() - started:.1f}s")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        return False
+
+    finally:
+        engine.dispose()
+
+
+def migrate(rebuild_only: bool = False):
+    """Installer les compteurs et les recalculer"""
+
+    if is_postgres(DATABASE_URL):
+        return migrate_postgres(rebuild_only)
+
+    if not Path(DB_PATH).exists():
+        print(f"❌ Base de données non trouvée: {DB_PATH}")
+        return False
+
+    conn = sqlite3.connect(DB_PATH, timeout=60, isolation_level=None)
+    cursor = conn.cursor()
+
+    try:
+        started = time.monotonic()
+        cursor.execute("BEGIN IMMEDIATE")
+        if not rebuild_only:
+            print("Création de la table site_counters et des triggers...")
+            for sql in INSTALL_STATEMENTS:
+                cursor.execute(sql)
+        print("Calcul des compteurs (un parcours de sites)...")
+        for sql in REBUILD_STATEMENTS:
+            cursor.execute(sql)
+        cursor.execute("COMMIT")
+        total = cursor.execute("SELECT COALESCE(SUM(total), 0) FROM site_counters").fetchone()[0]
+        print(f"✓ {total} sites comptés en {time.monotonic() - started:.1f}s")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        cursor.execute("ROLLBACK")
+        return False
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("MIGRATION: Compteurs de sites pour /api/stats")
+    print("=" * 70)
+    print()
+
+    success = migrate(rebuild_only='--rebuild' in sys.argv)
+
+    print()
+    print("=" * 70)
+    if success:
+        print("✓ Migration terminée avec succès")
+    else:
+        print("❌ Migration échouée")
+    print("=" * 70)
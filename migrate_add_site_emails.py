@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Script de migration pour la table normalisée des emails (site_emails.py)
+
+Crée la table site_emails, ses index, la vue site_emails_joined et les
+triggers qui la synchronisent avec sites.emails, puis découpe les emails
+existants (la validation actuelle d'un site est reportée sur son premier
+email), le tout dans une seule transaction.
+
+Avec DATABASE_URL PostgreSQL (db_engine.py), installe la variante PL/pgSQL
+(regexp_split_to_table à la place de json_each, voir site_emails.py).
+
+Usage:
+    python3 migrate_add_site_emails.py            # installation (ou réinstallation)
+    python3 migrate_add_site_emails.py --rebuild  # réconciliation seule avec sites.emails (cron de nuit)
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+from db_engine import create_database_engine, database_url, is_postgres
+from site_emails import (INSTALL_STATEMENTS, POSTGRES_INSTALL_STATEMENTS, POSTGRES_REBUILD_STATEMENTS,
+                         REBUILD_STATEMENTS)
+
+DB_PATH = 'scrap_email.db'
+DATABASE_URL = database_url('DATABASE_URL', DB_PATH)
+
+
+def migrate_postgres(rebuild_only: bool = False):
+    """Même installation sous PostgreSQL, en une transaction"""
+    engine = create_database_engine(DATABASE_URL)
+    try:
+        started = time.monotonic()
+        with engine.begin() as conn:
+            if not rebuild_only:
+                print("Création de la table site_emails, de la vue et des triggers PL/pgSQL...")
+                for sql in POSTGRES_INSTALL_STATEMENTS:
+                    conn.execute(text(sql))
+            print("Découpage des emails de sites.emails...")
+            for sql in POSTGRES_REBUILD_STATEMENTS:
+                conn.execute(text(sql))
+            emails, sites = conn.execute(text("SELECT COUNT(*), COUNT(DISTINCT site_id) FROM site_emails")).one()
+        print(f"✓ {emails} emails pour {sites} sites en {time.monotonic() - started:.1f}s")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        return False
+
+    finally:
+        engine.dispose()
+
+
+def migrate(rebuild_only: bool = False):
+    """Installer site_emails et la remplir depuis sites.emails"""
+
+    if is_postgres(DATABASE_URL):
+        return migrate_postgres(rebuild_only)
+
+    if not Path(DB_PATH).exists():
+        print(f"❌ Base de données non trouvée: {DB_PATH}")
+        return False
+
+    conn = sqlite3.connect(DB_PATH, timeout=60, isolation_level=None)
+    cursor = conn.cursor()
+
+    try:
+        if sqlite3.sqlite_version_info < (3, 33, 0):
+            print(f"❌ SQLite {sqlite3.sqlite_version}: 3.33 minimum (UPDATE ... FROM)")
+            return False
+
+        started = time.monotonic()
+        cursor.execute("BEGIN IMMEDIATE")
+        if not rebuild_only:
+            print("Création de la table site_emails, de la vue et des triggers...")
+            for sql in INSTALL_STATEMENTS:
+                cursor.execute(sql)
+        print("Découpage des emails de sites.emails...")
+        for sql in REBUILD_STATEMENTS:
+            cursor.execute(sql)
+        cursor.execute("COMMIT")
+        emails, sites = cursor.execute("SELECT COUNT(*), COUNT(DISTINCT site_id) FROM site_emails").fetchone()
+        print(f"✓ {emails} emails pour {sites} sites en {time.monotonic() - started:.1f}s")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        cursor.execute("ROLLBACK")
+        return False
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("MIGRATION: Table normalisée site_emails")
+    print("=" * 70)
+    print()
+
+    success = migrate(rebuild_only='--rebuild' in sys.argv)
+
+    print()
+    print("=" * 70)
+    if success:
+        print("✓ Migration terminée avec succès")
+    else:
+        print("❌ Migration échouée")
+    print("=" * 70)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Script de migration pour la liste paginée de /api/sites (site_listing.py)
+
+Crée l'index ix_sites_listing (clé de la pagination par curseur) et
+l'index FTS5 trigram sites_search avec ses triggers sur `sites`, puis
+indexe les domaines et emails existants, le tout dans une seule
+transaction.
+
+Usage:
+    python3 migrate_add_site_listing.py            # installation (ou réinstallation)
+    python3 migrate_add_site_listing.py --rebuild  # réindexation seule de sites_search
+"""
+
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from site_listing import INSTALL_STATEMENTS, REBUILD_STATEMENTS
+
+DB_PATH = 'scrap_email.db'
+
+
+def migrate(rebuild_only: bool = False):
+    """Installer les index de la liste des sites et remplir l'index de recherche"""
+
+    if not Path(DB_PATH).exists():
+        print(f"❌ Base de données non trouvée: {DB_PATH}")
+        return False
+
+    conn = sqlite3.connect(DB_PATH, timeout=60, isolation_level=None)
+    cursor = conn.cursor()
+
+    try:
+        fts_options = cursor.execute("PRAGMA compile_options").fetchall()
+        if not any(option[0] == 'ENABLE_FTS5' for option in fts_options):
+            print(f"❌ SQLite {sqlite3.sqlite_version} compilé sans FTS5")
+            return False
+
+        started = time.monotonic()
+        cursor.execute("BEGIN IMMEDIATE")
+        if not rebuild_only:
+            print("Création de l'index ix_sites_listing, de sites_search et des triggers...")
+            for sql in INSTALL_STATEMENTS:
+                cursor.execute(sql)
+        print("Indexation des domaines et emails (trigrammes)...")
+        for sql in REBUILD_STATEMENTS:
+            cursor.execute(sql)
+        cursor.execute("COMMIT")
+        total = cursor.execute("SELECT COUNT(*) FROM sites").fetchone()[0]
+        print(f"✓ {total} sites indexés en {time.monotonic() - started:.1f}s")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        cursor.execute("ROLLBACK")
+        return False
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("MIGRATION: Pagination et recherche de /api/sites")
+    print("=" * 70)
+    print()
+
+    success = migrate(rebuild_only='--rebuild' in sys.argv)
+
+    print()
+    print("=" * 70)
+    if success:
+        print("✓ Migration terminée avec succès")
+    else:
+        print("❌ Migration échouée")
+    print("=" * 70)
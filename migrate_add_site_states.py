@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Script de migration pour les états calculés de sites (has_email,
+siret_state, leaders_state) et leurs index partiels
+
+Les colonnes sont générées par SQLite (VIRTUAL, expressions de database.py):
+aucune donnée à recopier et rien à synchroniser dans les scripts qui
+écrivent emails / siret / leaders. Les index servent les prédicats les plus
+fréquents du dashboard et de la distribution des tâches.
+
+Usage:
+    python3 migrate_add_site_states.py
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+
+from database import HAS_EMAIL_SQL, SIRET_STATE_SQL, LEADERS_STATE_SQL
+
+DB_PATH = 'scrap_email.db'
+
+COLUMNS = {
+    'has_email': f"BOOLEAN GENERATED ALWAYS AS ({HAS_EMAIL_SQL}) VIRTUAL",
+    'siret_state': f"VARCHAR(10) GENERATED ALWAYS AS ({SIRET_STATE_SQL}) VIRTUAL",
+    'leaders_state': f"VARCHAR(10) GENERATED ALWAYS AS ({LEADERS_STATE_SQL}) VIRTUAL",
+}
+
+INDEXES = [
+    # Compteurs et filtres du dashboard: lus dans l'index seul
+    "CREATE INDEX IF NOT EXISTS ix_sites_states ON sites (has_email, siret_state, leaders_state)",
+    # File email (crawl_queue): sites sans email, non blacklistés
+    "CREATE INDEX IF NOT EXISTS ix_sites_email_missing ON sites (id) WHERE has_email = 0 AND blacklisted = 0",
+    # Segments et validation: sites avec email
+    "CREATE INDEX IF NOT EXISTS ix_sites_with_email ON sites (email_validation_score) WHERE has_email = 1",
+    # Extraction des dirigeants (DBHelper.get_sites_without_leaders): sites avec SIRET
+    "CREATE INDEX IF NOT EXISTS ix_sites_siret_found ON sites (leaders_state, leaders_checked) WHERE siret_state = 'found'",
+]
+
+
+def migrate():
+    """Ajouter les colonnes calculées et les index"""
+
+    if not Path(DB_PATH).exists():
+        print(f"❌ Base de données non trouvée: {DB_PATH}")
+        return False
+
+    if sqlite3.sqlite_version_info < (3, 31, 0):
+        print(f"❌ SQLite {sqlite3.sqlite_version}: 3.31 minimum (colonnes générées)")
+        return False
+
+    conn = sqlite3.connect(DB_PATH, timeout=60)
+    cursor = conn.cursor()
+
+    try:
+        started = time.monotonic()
+
+        # table_xinfo: inclut les colonnes générées
+        cursor.execute("PRAGMA table_xinfo(sites)")
+        existing = {row[1] for row in cursor.fetchall()}
+
+        for name, definition in COLUMNS.items():
+            if name in existing:
+                print(f"✓ La colonne '{name}' existe déjà")
+                continue
+            print(f"Ajout de la colonne calculée '{name}'...")
+            cursor.execute(f"ALTER TABLE sites ADD COLUMN {name} {definition}")
+
+        print("Création des index partiels...")
+        for sql in INDEXES:
+            cursor.execute(sql)
+        conn.commit()
+
+        cursor.execute("SELECT has_email, COUNT(*) FROM sites GROUP BY has_email")
+        counts = dict(cursor.fetchall())
+        print(f"✓ {counts.get(1, 0)} sites avec email, {counts.get(0, 0)} sans "
+              f"({time.monotonic() - started:.1f}s)")
+        return True
+
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration: {e}")
+        conn.rollback()
+        return False
+
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("MIGRATION: États calculés des sites (has_email, siret_state, leaders_state)")
+    print("=" * 70)
+    print()
+
+    success = migrate()
+
+    print()
+    print("=" * 70)
+    if success:
+        print("✓ Migration terminée avec succès")
+    else:
+        print("❌ Migration échouée")
+    print("=" * 70)
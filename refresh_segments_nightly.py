@@ -8,7 +8,8 @@ import sys
 import logging
 from datetime import datetime
 from campaign_database import get_campaign_session, ContactSegment
-from database import get_session, Site
+from database import get_session, Site, LookupState
+from site_emails import emails_in, emails_with_domains, emails_without_domains
 import json
 
 # Configuration du logging
@@ -25,20 +26,14 @@ def build_segment_query(segment, db_session):
 
     # Base: contacts avec email
     query = db_session.query(Site).filter(
-        Site.emails.isnot(None),
-        Site.emails != '',
-        Site.emails != 'NO EMAIL FOUND'
+        Site.has_email == True
     )
 
     # Filtre: liste manuelle d'emails
     if 'manual_emails' in filters and filters['manual_emails']:
-        from sqlalchemy import or_
         manual_emails = filters['manual_emails']
         if isinstance(manual_emails, list) and len(manual_emails) > 0:
-            email_conditions = []
-            for email in manual_emails:
-                email_conditions.append(Site.emails.like(f'%{email}%'))
-            query = query.filter(or_(*email_conditions))
+            query = query.filter(emails_in(db_session, manual_emails))
             # Pour les segments manuels, on retourne directement
             return query
 
@@ -61,33 +56,24 @@ def build_segment_query(segment, db_session):
     if 'has_siret' in filters:
         if filters['has_siret']:
             query = query.filter(
-                Site.siret.isnot(None),
-                Site.siret != '',
-                Site.siret != 'NON TROUVÉ'
+                Site.siret_state == LookupState.FOUND.value
             )
         else:
             query = query.filter(
-                (Site.siret.is_(None)) |
-                (Site.siret == '') |
-                (Site.siret == 'NON TROUVÉ')
+                Site.siret_state != LookupState.FOUND.value
             )
 
     # Filtre: domaines à inclure
     if 'domains_include' in filters and filters['domains_include']:
-        from sqlalchemy import or_
         domains = filters['domains_include']
         if isinstance(domains, list) and len(domains) > 0:
-            domain_conditions = []
-            for domain in domains:
-                domain_conditions.append(Site.emails.like(f'%{domain}%'))
-            query = query.filter(or_(*domain_conditions))
+            query = query.filter(emails_with_domains(db_session, domains))
 
     # Filtre: domaines à exclure
     if 'domains_exclude' in filters and filters['domains_exclude']:
         domains = filters['domains_exclude']
         if isinstance(domains, list):
-            for domain in domains:
-                query = query.filter(~Site.emails.like(f'%{domain}%'))
+            query = query.filter(emails_without_domains(db_session, domains))
 
     return query
 
@@ -11,6 +11,7 @@ import asyncio
 import aiohttp
 import argparse
 import time
+from batch_writer import BatchWriter
 from database import get_session, Site, SiteStatus
 from datetime import datetime
 from email_finder_async import AsyncEmailFinder
@@ -52,31 +53,36 @@ class AsyncEmailRescraper:
         if self.session:
             await self.session.close()
 
-    async def rescrape_site(self, site: Site, stats: dict) -> None:
-        """Re-scraper un site pour trouver des emails"""
+    async def rescrape_site(self, site, writer: BatchWriter, stats: dict) -> None:
+        """Re-scraper un site (id, domain, retry_count) pour trouver des emails"""
 
         # Chercher des emails avec le finder avancé
         emails = await self.finder.search_emails_on_domain(site.domain, max_pages=10)
 
+        values = {
+            'updated_at': datetime.utcnow(),
+            'retry_count': (site.retry_count or 0) + 1,
+        }
+
         if emails:
             # Email trouvé !
-            site.emails = emails
-            site.email_found_at = datetime.utcnow()
-            site.email_source = "async_rescraping"
-            site.status = SiteStatus.EMAIL_FOUND
-            site.updated_at = datetime.utcnow()
+            values.update(
+                emails=emails,
+                email_found_at=datetime.utcnow(),
+                email_source="async_rescraping",
+                status=SiteStatus.EMAIL_FOUND,
+            )
 
             stats['emails_found'] += 1
             print(f"✅ {site.domain[:50]:50} → {emails[:60]}")
         else:
             # Toujours pas d'email
-            site.updated_at = datetime.utcnow()
             stats['still_no_email'] += 1
             print(f"❌ {site.domain[:50]:50} → Toujours aucun email")
 
-        site.retry_count += 1
+        writer.update(site.id, **values)
 
-    async def rescrape_batch(self, sites: List[Site], db_session, stats: dict) -> None:
+    async def rescrape_batch(self, sites: List, writer: BatchWriter, stats: dict) -> None:
         """Re-scraper un lot de sites"""
 
         tasks = []
@@ -84,17 +90,16 @@ class AsyncEmailRescraper:
 
         for site in sites:
             async with semaphore:
-                task = self.rescrape_site(site, stats)
+                task = self.rescrape_site(site, writer, stats)
                 tasks.append(task)
 
         await asyncio.gather(*tasks, return_exceptions=True)
 
-        # Commit tous les changements en une fois
+        # Écrire tous les changements du lot en une fois
         try:
-            db_session.commit()
+            writer.flush()
         except Exception as e:
-            print(f"⚠️  Erreur commit: {e}")
-            db_session.rollback()
+            print(f"⚠️  Erreur commit (lot gardé pour la prochaine écriture): {e}")
 
     async def rescrape_all(self, limit: int = None, batch_size: int = 50):
         """
@@ -119,11 +124,11 @@ class AsyncEmailRescraper:
         await self.init_session()
 
         try:
-            # Récupérer les sites sans emails
+            # Récupérer les sites sans emails (colonnes utiles seulement)
             db_session = get_session()
 
             # Sites avec "NO EMAIL FOUND" ou email_found = False et actifs
-            query = db_session.query(Site).filter(
+            query = db_session.query(Site.id, Site.domain, Site.retry_count).filter(
                 Site.is_active == True,
                 Site.blacklisted == False,
                 (
@@ -138,6 +143,7 @@ class AsyncEmailRescraper:
             else:
                 sites = query.all()
 
+            db_session.close()
             total_sites = len(sites)
 
             print(f"\n📊 Sites à re-scraper: {total_sites:,}")
@@ -151,7 +157,8 @@ class AsyncEmailRescraper:
                 'still_no_email': 0,
             }
 
-            # Traiter par lots
+            # Traiter par lots (écrits à la fin de chaque lot, ou toutes les 30 s)
+            writer = BatchWriter(flush_every=batch_size)
             for i in range(0, total_sites, batch_size):
                 batch = sites[i:i+batch_size]
                 batch_num = i // batch_size + 1
@@ -162,7 +169,7 @@ class AsyncEmailRescraper:
 
                 batch_start = time.time()
 
-                await self.rescrape_batch(batch, db_session, stats)
+                await self.rescrape_batch(batch, writer, stats)
 
                 batch_time = time.time() - batch_start
                 speed = len(batch) / batch_time if batch_time > 0 else 0
@@ -174,7 +181,7 @@ class AsyncEmailRescraper:
                 if i + batch_size < total_sites:
                     await asyncio.sleep(1)
 
-            db_session.close()
+            writer.flush()
 
             # Résumé final
             total_time = time.time() - start_time
@@ -27,6 +27,7 @@ from collections import deque
 from db_helper import DBHelper
 from database import Site
 from email_finder_async import AsyncEmailFinder
+from domain_policy import DomainPolicyFile
 import threading
 
 # Timezone France (UTC+1)
@@ -45,52 +46,20 @@ MAX_SELLERS_PARALLEL = 10  # Nombre de sites vendeurs à traiter en parallèle (
 STATE_FILE = Path(__file__).parent / 'scraping_state.json'
 state_lock = threading.Lock()
 
-# Patterns
-SOCIAL_DOMAINS = {
-    'facebook.com', 'twitter.com', 'instagram.com', 'linkedin.com',
-    'youtube.com', 'tiktok.com', 'pinterest.com', 'google.com',
-    'apple.com', 'microsoft.com', 'amazon.com', 'amazon.fr'
-}
-
-EXCLUDED_PATTERNS = {
-    'google.com', 'apple.com', 'microsoft.com', 'mozilla.org',
-    'amazon.com', 'amazon.es', 'amazon.fr', 'amzn.to',
-    'uecdn.es', 'cloudflare.com', 'akamai.net'
-}
-
-# Domaines à JAMAIS scraper (vendeurs ou acheteurs) - base hardcodée
-BLACKLISTED_DOMAINS = {
-    'cnil.fr',
-    'gouv.fr',
-    'diplomatie.gouv.fr',
-    'education.gouv.fr',
-    'economie.gouv.fr',
-    'interieur.gouv.fr',
-    'service-public.fr',
-    'legifrance.gouv.fr',
-    'senat.fr',
-    'assemblee-nationale.fr'
-}
+# Blacklist: BLACKLISTED_DOMAINS + SOCIAL_DOMAINS/EXCLUDED_PATTERNS (domain_policy.py)
+# + blacklist.txt, recompilée quand le fichier change (annulation via dashboard)
+BLACKLIST_FILE = Path(__file__).parent / 'blacklist.txt'
+domain_policy = DomainPolicyFile(BLACKLIST_FILE)
+
 
 def load_blacklist_file():
     """
     Charger les domaines du fichier blacklist.txt et les fusionner avec BLACKLISTED_DOMAINS
     Retourne l'ensemble complet des domaines à blacklister
     """
-    blacklist_file = Path(__file__).parent / 'blacklist.txt'
-    combined_blacklist = set(BLACKLISTED_DOMAINS)
-
-    if blacklist_file.exists():
-        try:
-            with open(blacklist_file, 'r') as f:
-                file_domains = {line.strip() for line in f if line.strip()}
-                combined_blacklist.update(file_domains)
-                if file_domains:
-                    print(f"🚫 {len(file_domains)} domaines chargés depuis blacklist.txt")
-        except Exception as e:
-            print(f"⚠️  Erreur lors de la lecture de blacklist.txt: {e}")
-
-    return combined_blacklist
+    blacklist = domain_policy.current().blacklist
+    print(f"🚫 {len(blacklist)} domaines blacklistés (BLACKLISTED_DOMAINS + blacklist.txt)")
+    return blacklist
 
 DEFAULT_USER_AGENT = (
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) '
@@ -120,38 +89,13 @@ def extract_domain(url):
 
 
 def is_blacklisted_domain(domain):
-    """Vérifier si un domaine est blacklisté"""
-    if not domain:
-        return True
-
-    # Vérifier les domaines exacts
-    if domain in BLACKLISTED_DOMAINS:
-        return True
-
-    # Vérifier si le domaine se termine par un domaine blacklisté (ex: *.gouv.fr)
-    for blacklisted in BLACKLISTED_DOMAINS:
-        if domain.endswith('.' + blacklisted) or domain == blacklisted:
-            return True
-
-    return False
+    """Vérifier si un domaine (ou un de ses domaines parents, ex: *.gouv.fr) est blacklisté"""
+    return domain_policy.current().is_blacklisted(domain)
 
 
 def is_valid_fr_domain(domain):
-    """Vérifier si c'est un domaine .fr valide"""
-    if not domain or not domain.endswith('.fr'):
-        return False
-
-    # Vérifier si blacklisté
-    if is_blacklisted_domain(domain):
-        return False
-
-    for excluded in EXCLUDED_PATTERNS:
-        if excluded in domain:
-            return False
-    for social in SOCIAL_DOMAINS:
-        if social in domain:
-            return False
-    return True
+    """Vérifier si c'est un domaine .fr valide (ni blacklisté, ni exclu)"""
+    return domain_policy.current().is_valid_fr_domain(domain)
 
 
 def normalize_url(base, url):
@@ -179,14 +123,10 @@ def update_scraping_state(seller_domain, pages_crawled, current_url, buyers_foun
     try:
         with state_lock:
             # Vérifier d'abord si le domaine est blacklisté
-            blacklist_file = Path(__file__).parent / 'blacklist.txt'
-            if blacklist_file.exists():
-                with open(blacklist_file, 'r') as f:
-                    blacklisted = {line.strip() for line in f if line.strip()}
-                    if seller_domain in blacklisted:
-                        # Domaine blacklisté, ne pas l'ajouter/mettre à jour dans le state
-                        print(f"    🚫 {seller_domain} blacklisté, pas de mise à jour du state")
-                        return
+            if is_blacklisted_domain(seller_domain):
+                # Domaine blacklisté, ne pas l'ajouter/mettre à jour dans le state
+                print(f"    🚫 {seller_domain} blacklisté, pas de mise à jour du state")
+                return
 
             # Lire l'état actuel
             if STATE_FILE.exists():
@@ -305,16 +245,11 @@ class BacklinksCrawler:
 
         while to_visit:
             # Vérifier si le domaine a été blacklisté (annulé via dashboard)
-            # Optimisation: vérifier toutes les 10 pages seulement
-            if len(visited) % 10 == 0:
-                blacklist_file = Path(__file__).parent / 'blacklist.txt'
-                if blacklist_file.exists():
-                    with open(blacklist_file, 'r') as f:
-                        blacklisted = {line.strip() for line in f if line.strip()}
-                        if seller_domain in blacklisted:
-                            print(f"    🚫 {seller_domain} blacklisté, arrêt immédiat du crawl")
-                            remove_seller_from_state(seller_domain)
-                            return buyer_domains
+            # (blacklist recompilée dès que blacklist.txt change)
+            if is_blacklisted_domain(seller_domain):
+                print(f"    🚫 {seller_domain} blacklisté, arrêt immédiat du crawl")
+                remove_seller_from_state(seller_domain)
+                return buyer_domains
 
             url = to_visit.popleft()
 
@@ -398,7 +333,7 @@ class BacklinksCrawler:
             return
 
         # Skip si le domaine est blacklisté (gouv.fr, cnil.fr, ou annulé via dashboard)
-        if is_blacklisted_domain(seller_domain) or seller_domain in blacklist:
+        if is_blacklisted_domain(seller_domain):
             print(f"  🚫 Domaine blacklisté ignoré: {seller_domain}")
             # Marquer comme crawlé pour ne plus le retraiter
             db.session.query(Site).filter_by(id=seller_site.id).update({
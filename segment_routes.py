@@ -5,7 +5,8 @@ Routes API pour la gestion des segments de contacts
 
 from flask import request, jsonify, render_template
 from campaign_database import get_campaign_session, ContactSegment
-from database import get_session, Site
+from database import get_session, Site, LookupState
+from site_emails import emails_in, emails_with_domains, emails_without_domains
 import logging
 import json
 from datetime import datetime, timedelta
@@ -90,7 +91,7 @@ def register_segment_routes(app):
                 for email in manual_emails:
                     # Vérifier si un site avec cet email existe déjà
                     existing_site = db_session.query(Site).filter(
-                        Site.emails.like(f'%{email}%')
+                        emails_in(db_session, [email])
                     ).first()
 
                     if existing_site:
@@ -520,21 +521,15 @@ def build_segment_query(segment, db_session):
 
     # Requête de base
     query = db_session.query(Site).filter(
-        Site.emails.isnot(None),
-        Site.emails != '',
-        Site.emails != 'NO EMAIL FOUND'
+        Site.has_email == True
     )
 
     # Liste manuelle d'emails
     if 'manual_emails' in filters and filters['manual_emails']:
-        from sqlalchemy import or_
         manual_emails = filters['manual_emails']
         if isinstance(manual_emails, list) and len(manual_emails) > 0:
             # Filtrer pour inclure uniquement les sites dont l'email correspond à la liste
-            email_conditions = []
-            for email in manual_emails:
-                email_conditions.append(Site.emails.like(f'%{email}%'))
-            query = query.filter(or_(*email_conditions))
+            query = query.filter(emails_in(db_session, manual_emails))
             # Pour les segments manuels, on retourne directement sans appliquer d'autres filtres
             return query
 
@@ -554,23 +549,20 @@ def build_segment_query(segment, db_session):
         domains = filters['domains_include']
         if isinstance(domains, list) and len(domains) > 0:
             # Au moins un domaine doit correspondre
-            from sqlalchemy import or_
-            domain_conditions = [Site.emails.like(f'%{domain}%') for domain in domains]
-            query = query.filter(or_(*domain_conditions))
+            query = query.filter(emails_with_domains(db_session, domains))
 
     # Domaines exclus (exclure si l'email contient un de ces domaines)
     if 'domains_exclude' in filters and filters['domains_exclude']:
         domains = filters['domains_exclude']
         if isinstance(domains, list) and len(domains) > 0:
-            for domain in domains:
-                query = query.filter(~Site.emails.like(f'%{domain}%'))
+            query = query.filter(emails_without_domains(db_session, domains))
 
     # SIRET
     if 'has_siret' in filters:
         if filters['has_siret']:
-            query = query.filter(Site.siret.isnot(None), Site.siret != '')
+            query = query.filter(Site.siret_state == LookupState.FOUND.value)
         else:
-            query = query.filter(Site.siret.is_(None) | (Site.siret == ''))
+            query = query.filter(Site.siret_state != LookupState.FOUND.value)
 
     return query
 
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Table normalisée des emails de sites (site_emails, modèle SiteEmail)
+
+Site.emails stocke les emails d'un site dans un seul texte ("a@x; b@y",
+parfois séparés par des virgules ou en liste JSON). Chaque consommateur
+redécoupait la chaîne, les segments filtraient par LIKE '%domaine%' (un
+parcours complet de sites) et la validation ne notait que le premier email.
+
+site_emails contient une ligne par (site, email), indexée sur l'email, le
+domaine de l'email et le site, avec la source, la date de découverte et la
+validation de chaque email. Des triggers (SQLite, ou PL/pgSQL sous
+PostgreSQL) la tiennent à jour à chaque INSERT/UPDATE/DELETE de
+sites.emails: les scripts qui écrivent Site.emails n'ont rien à changer,
+et la validation d'un email qui reste dans la liste est conservée.
+
+La vue site_emails_joined redonne la forme de l'ancienne colonne
+("a@x; b@y" dans l'ordre d'origine) depuis la table normalisée.
+
+Table, triggers et vue sont installés par migrate_add_site_emails.py
+(`--rebuild`: réconciliation complète avec sites.emails), ou par
+migrate_sqlite_to_postgres.py. Tant que les triggers ne sont pas
+installés (init_db() crée la table vide), installed() est faux et les
+filtres retombent sur sites.emails.
+
+Usage:
+    split_emails(site.emails)  # ['a@x', 'b@y'] (même découpage que les triggers)
+    query.filter(emails_with_domains(session, ['gmail.com']))
+"""
+
+import logging
+import re
+from typing import List, Optional
+
+from sqlalchemy import func, or_, select, text
+
+from database import Site, SiteEmail
+
+logger = logging.getLogger(__name__)
+
+EMAIL_RE = re.compile(r'^\S+@\S+$')  # comme LIKE '%_@_%' sans espace des triggers
+
+# Séparateurs acceptés dans Site.emails (en plus de ';'), et caractères retirés
+_SEPARATORS = [',', '\n', '\r', '\t']
+_STRIPPED = ['"', '\\', '[', ']', "'"]
+
+
+def _split_sql(column: str) -> str:
+    """
+    Expression SQL: Site.emails -> tableau JSON des morceaux (pour json_each).
+    Un texte inattendu donne '[]' plutôt qu'une erreur dans le trigger.
+    """
+    expression = column
+    for char in _STRIPPED:
+        expression = f"replace({expression}, '{char.replace(chr(39), chr(39) * 2)}', '')"
+    for char in _SEPARATORS:
+        expression = f"replace({expression}, {_sql_char(char)}, ';')"
+    array = f"""('["' || replace({expression}, ';', '","') || '"]')"""
+    return f"(CASE WHEN json_valid({array}) THEN {array} ELSE '[]' END)"
+
+
+def _sql_char(char: str) -> str:
+    return f"char({ord(char)})" if char in '\n\r\t' else f"'{char}'"
+
+
+def _parts_sql(row: str) -> str:
+    """Morceaux de la colonne emails de `row` (key: rang, value: texte)"""
+    return f"json_each({_split_sql(f'{row}.emails')})"
+
+
+_EMAIL = "lower(trim(value))"
+_IS_EMAIL = "trim(value) LIKE '%_@_%' AND trim(value) NOT LIKE '% %'"
+
+
+def _insert_sql(row: str, source: str) -> str:
+    """Emails de `row` absents de site_emails (`source`: `row` suivi de json_each)"""
+    return f"""
+        INSERT INTO site_emails (site_id, email, email_domain, position, source, found_at)
+        SELECT {row}.id, {_EMAIL}, substr({_EMAIL}, instr({_EMAIL}, '@') + 1), MIN(key),
+               {row}.email_source, COALESCE({row}.email_found_at, CURRENT_TIMESTAMP)
+        FROM {source}
+        WHERE {row}.emails IS NOT NULL AND {_IS_EMAIL}
+        GROUP BY {row}.id, {_EMAIL}
+        ON CONFLICT (site_id, email) DO NOTHING;"""
+
+
+INSTALL_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS site_emails (
+        id INTEGER PRIMARY KEY,
+        site_id INTEGER NOT NULL REFERENCES sites (id) ON DELETE CASCADE,
+        email VARCHAR(255) NOT NULL,
+        email_domain VARCHAR(255) NOT NULL,
+        position INTEGER,
+        source VARCHAR(20),
+        found_at DATETIME,
+        validation_status VARCHAR(20),
+        validation_score INTEGER,
+        deliverable BOOLEAN,
+        validated_at DATETIME,
+        CONSTRAINT uq_site_emails_site_email UNIQUE (site_id, email)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_site_emails_site_id ON site_emails (site_id)",
+    "CREATE INDEX IF NOT EXISTS ix_site_emails_email ON site_emails (email)",
+    "CREATE INDEX IF NOT EXISTS ix_site_emails_email_domain ON site_emails (email_domain)",
+    # Emails à valider (daemon de validation)
+    "CREATE INDEX IF NOT EXISTS ix_site_emails_pending ON site_emails (id) WHERE validated_at IS NULL",
+    "DROP VIEW IF EXISTS site_emails_joined",
+    """
+    CREATE VIEW site_emails_joined AS
+    SELECT site_id, group_concat(email, '; ') AS emails, COUNT(*) AS email_count
+    FROM (SELECT site_id, email FROM site_emails ORDER BY site_id, position)
+    GROUP BY site_id
+    """,
+    "DROP TRIGGER IF EXISTS trg_site_emails_insert",
+    "DROP TRIGGER IF EXISTS trg_site_emails_delete",
+    "DROP TRIGGER IF EXISTS trg_site_emails_update",
+    f"""
+    CREATE TRIGGER trg_site_emails_insert AFTER INSERT ON sites
+    WHEN NEW.emails IS NOT NULL
+    BEGIN
+        {_insert_sql('NEW', _parts_sql('NEW'))}
+    END
+    """,
+    """
+    CREATE TRIGGER trg_site_emails_delete AFTER DELETE ON sites
+    BEGIN
+        DELETE FROM site_emails WHERE site_id = OLD.id;
+    END
+    """,
+    # Emails retirés supprimés, nouveaux ajoutés, rangs recalculés (validations conservées)
+    f"""
+    CREATE TRIGGER trg_site_emails_update AFTER UPDATE OF emails ON sites
+    WHEN OLD.emails IS NOT NEW.emails
+    BEGIN
+        DELETE FROM site_emails
+        WHERE site_id = NEW.id AND email NOT IN (SELECT {_EMAIL} FROM {_parts_sql('NEW')});
+        {_insert_sql('NEW', _parts_sql('NEW'))}
+        UPDATE site_emails
+        SET position = (SELECT MIN(key) FROM {_parts_sql('NEW')} WHERE {_EMAIL} = site_emails.email)
+        WHERE site_id = NEW.id;
+    END
+    """,
+]
+
+# Réconciliation complète avec sites.emails (installation, cron de nuit)
+REBUILD_STATEMENTS = [
+    f"""
+    DELETE FROM site_emails
+    WHERE NOT EXISTS (
+        SELECT 1 FROM sites
+        WHERE sites.id = site_emails.site_id
+          AND site_emails.email IN (SELECT {_EMAIL} FROM {_parts_sql('sites')})
+    )
+    """,
+    _insert_sql('sites', f"sites, {_parts_sql('sites')}"),
+    # Les validations existantes portaient sur le premier email du site
+    """
+    UPDATE site_emails
+    SET validation_status = sites.email_validation_status,
+        validation_score = sites.email_validation_score,
+        deliverable = sites.email_deliverable,
+        validated_at = COALESCE(sites.email_validation_date, CURRENT_TIMESTAMP)
+    FROM sites
+    WHERE sites.id = site_emails.site_id
+      AND site_emails.position = (SELECT MIN(position) FROM site_emails AS e WHERE e.site_id = site_emails.site_id)
+      AND site_emails.validated_at IS NULL
+      AND sites.email_validated IS TRUE
+    """,
+]
+
+
+# ----------------------------------------------------------------------
+# PostgreSQL: même table, trigger PL/pgSQL (regexp_split_to_table à la
+# place de json_each). Installé par migrate_add_site_emails.py avec
+# DATABASE_URL, ou par la copie migrate_sqlite_to_postgres.py
+# ----------------------------------------------------------------------
+
+_STRIPPED_PG = ''.join(_STRIPPED).replace("'", "''")
+
+POSTGRES_INSTALL_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS site_emails (
+        id SERIAL PRIMARY KEY,
+        site_id INTEGER NOT NULL REFERENCES sites (id) ON DELETE CASCADE,
+        email VARCHAR(255) NOT NULL,
+        email_domain VARCHAR(255) NOT NULL,
+        position INTEGER,
+        source VARCHAR(20),
+        found_at TIMESTAMP,
+        validation_status VARCHAR(20),
+        validation_score INTEGER,
+        deliverable BOOLEAN,
+        validated_at TIMESTAMP,
+        CONSTRAINT uq_site_emails_site_email UNIQUE (site_id, email)
+    )
+    """,
+    *INSTALL_STATEMENTS[1:6],
+    """
+    CREATE VIEW site_emails_joined AS
+    SELECT site_id, string_agg(email, '; ' ORDER BY position) AS emails, COUNT(*) AS email_count
+    FROM site_emails
+    GROUP BY site_id
+    """,
+    # Emails de Site.emails (rang, email): même découpage que split_emails()
+    f"""
+    CREATE OR REPLACE FUNCTION site_emails_split(value TEXT)
+    RETURNS TABLE (rank INTEGER, email TEXT) LANGUAGE sql IMMUTABLE AS $$
+        SELECT (MIN(n) - 1)::INTEGER, lower(trim(part))
+        FROM regexp_split_to_table(translate(value, '{_STRIPPED_PG}', ''), '[;,\\n\\r\\t]')
+             WITH ORDINALITY AS parts (part, n)
+        WHERE trim(part) LIKE '%_@_%' AND trim(part) NOT LIKE '% %'
+        GROUP BY lower(trim(part))
+    $$
+    """,
+    # Emails retirés supprimés, nouveaux ajoutés, rangs recalculés (validations conservées);
+    # la suppression d'un site passe par ON DELETE CASCADE
+    """
+    CREATE OR REPLACE FUNCTION site_emails_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' THEN
+            IF OLD.emails IS NOT DISTINCT FROM NEW.emails THEN
+                RETURN NULL;
+            END IF;
+            DELETE FROM site_emails
+            WHERE site_emails.site_id = NEW.id
+              AND site_emails.email NOT IN (SELECT parts.email FROM site_emails_split(NEW.emails) AS parts);
+        END IF;
+        INSERT INTO site_emails (site_id, email, email_domain, position, source, found_at)
+        SELECT NEW.id, parts.email, substr(parts.email, strpos(parts.email, '@') + 1), parts.rank,
+               NEW.email_source, COALESCE(NEW.email_found_at, CURRENT_TIMESTAMP)
+        FROM site_emails_split(NEW.emails) AS parts
+        ON CONFLICT (site_id, email) DO UPDATE SET position = excluded.position;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_site_emails ON sites",
+    """
+    CREATE TRIGGER trg_site_emails AFTER INSERT OR UPDATE OF emails ON sites
+    FOR EACH ROW EXECUTE FUNCTION site_emails_sync()
+    """,
+]
+
+# Le verrou bloque les triggers (donc les écritures de sites.emails) le temps
+# de la réconciliation, comme BEGIN IMMEDIATE sous SQLite
+POSTGRES_REBUILD_STATEMENTS = [
+    "LOCK TABLE site_emails IN EXCLUSIVE MODE",
+    """
+    DELETE FROM site_emails
+    WHERE NOT EXISTS (
+        SELECT 1 FROM sites
+        WHERE sites.id = site_emails.site_id
+          AND site_emails.email IN (SELECT parts.email FROM site_emails_split(sites.emails) AS parts)
+    )
+    """,
+    """
+    INSERT INTO site_emails (site_id, email, email_domain, position, source, found_at)
+    SELECT sites.id, parts.email, substr(parts.email, strpos(parts.email, '@') + 1), parts.rank,
+           sites.email_source, COALESCE(sites.email_found_at, CURRENT_TIMESTAMP)
+    FROM sites CROSS JOIN LATERAL site_emails_split(sites.emails) AS parts
+    ON CONFLICT (site_id, email) DO NOTHING
+    """,
+    REBUILD_STATEMENTS[-1],
+]
+
+
+def split_emails(value: Optional[str]) -> List[str]:
+    """Emails de Site.emails, en minuscules, dans l'ordre, sans doublon (même découpage que les triggers)"""
+    if not value or value == 'NO EMAIL FOUND':
+        return []
+    for char in _STRIPPED:
+        value = value.replace(char, '')
+    for char in _SEPARATORS:
+        value = value.replace(char, ';')
+    emails = []
+    for part in value.split(';'):
+        email = part.strip().lower()
+        if EMAIL_RE.match(email) and email not in emails:
+            emails.append(email)
+    return emails
+
+
+def primary_email(value: Optional[str]) -> Optional[str]:
+    emails = split_emails(value)
+    return emails[0] if emails else None
+
+
+def installed(session) -> bool:
+    """Triggers de site_emails installés (sinon la table peut être vide ou en retard)"""
+    if session.bind.dialect.name == 'postgresql':
+        return session.execute(text(
+            "SELECT 1 FROM pg_trigger WHERE tgname = 'trg_site_emails' AND NOT tgisinternal"
+        )).first() is not None
+    return session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_site_emails_update'"
+    )).first() is not None
+
+
+def _normalize_domains(domains) -> List[str]:
+    return [domain.strip().lower().lstrip('@') for domain in domains if domain and domain.strip()]
+
+
+def emails_in(session, emails):
+    """Condition sur Site: un des emails du site est dans `emails` (égalité indexée)"""
+    emails = [email.strip().lower() for email in emails if email and email.strip()]
+    if not installed(session):
+        return or_(*[Site.emails.like(f'%{email}%') for email in emails])
+    return Site.id.in_(select(SiteEmail.site_id).where(SiteEmail.email.in_(emails)))
+
+
+def emails_with_domains(session, domains):
+    """Condition sur Site: un des emails du site est sur un des `domains`"""
+    domains = _normalize_domains(domains)
+    if not installed(session):
+        return or_(*[Site.emails.like(f'%{domain}%') for domain in domains])
+    return Site.id.in_(select(SiteEmail.site_id).where(SiteEmail.email_domain.in_(domains)))
+
+
+def emails_without_domains(session, domains):
+    """Condition sur Site: aucun email du site n'est sur un des `domains`"""
+    domains = _normalize_domains(domains)
+    if not installed(session):
+        return ~or_(*[Site.emails.like(f'%{domain}%') for domain in domains])
+    return ~Site.id.in_(select(SiteEmail.site_id).where(SiteEmail.email_domain.in_(domains)))
+
+
+def pending_validation(session, limit: int, after_id: int = 0):
+    """Emails jamais validés: lignes (id, site_id, email, position), par id croissant"""
+    return session.query(SiteEmail.id, SiteEmail.site_id, SiteEmail.email, SiteEmail.position).filter(
+        SiteEmail.validated_at.is_(None),
+        SiteEmail.id > after_id
+    ).order_by(SiteEmail.id).limit(limit).all()
+
+
+def primary_positions(session, site_ids) -> dict:
+    """{site_id: rang de l'email principal (le plus petit)}"""
+    if not site_ids:
+        return {}
+    return dict(session.query(SiteEmail.site_id, func.min(SiteEmail.position)).filter(
+        SiteEmail.site_id.in_(list(site_ids))
+    ).group_by(SiteEmail.site_id).all())
+
+
+def count_pending_validation(session) -> int:
+    return session.query(func.count(SiteEmail.id)).filter(SiteEmail.validated_at.is_(None)).scalar() or 0
+
+
+def record_validation(session, email_id: int, result: Optional[dict], now):
+    """Écrire le résultat d'un email (sans résultat: 'unknown', pour ne pas le reprendre en boucle)"""
+    result = result or {'status': 'unknown', 'score': 0, 'deliverable': False}
+    session.query(SiteEmail).filter(SiteEmail.id == email_id).update({
+        SiteEmail.validation_status: result['status'],
+        SiteEmail.validation_score: result['score'],
+        SiteEmail.deliverable: result['deliverable'],
+        SiteEmail.validated_at: now,
+    }, synchronize_session=False)
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Liste des sites pour /api/sites (tableau de la page Sites)
+
+get_sites() faisait un query.count() à chaque requête, triait avec OFFSET
+(les pages profondes relisaient tout ce qui précède) et sérialisait des
+lignes ORM complètes. Ici:
+
+- pagination par curseur (keyset) sur la clé de tri (email_found_at,
+  updated_at, id), lue dans l'ordre par l'index ix_sites_listing: une page
+  profonde coûte autant que la première;
+- seules les colonnes affichées par le tableau sont lues (LISTING_COLUMNS);
+- le total est estimé depuis site_counters (site_stats.py), exact quand un
+  seul filtre s'applique; avec une recherche, compté sur les résultats
+  (jusqu'à SEARCH_COUNT_LIMIT);
+- recherche par domaine et par email via l'index FTS5 trigram sites_search
+  (sous-chaîne, insensible à la casse) au lieu d'un LIKE '%...%' qui
+  parcourt toute la table. Les termes de moins de 3 caractères, ou une base
+  sans l'index, retombent sur LIKE.
+
+L'index, la table FTS5 et ses triggers sont installés par
+migrate_add_site_listing.py. Sous PostgreSQL (DATABASE_URL), la recherche
+est un ILIKE servi par les index pg_trgm de POSTGRES_INSTALL_STATEMENTS
+(créés par migrate_sqlite_to_postgres.py).
+
+L'export CSV (/api/export/csv) reprend les mêmes filtres: iter_csv() lit
+les colonnes exportées par lots de EXPORT_BATCH_SIZE (keyset sur id, une
+requête courte par lot) et produit le CSV au fil de l'eau, compressé en
+gzip à la volée si demandé. Rien n'est gardé en mémoire d'un lot à l'autre.
+
+Usage:
+    filters = ListingFilters.from_args(request.args)
+    page = list_sites(session, filters, cursor=request.args.get('cursor'), per_page=50)
+    page['sites'], page['next_cursor'], page['total']
+
+    Response(iter_csv(get_session, filters, gzip=True), mimetype='application/gzip')
+"""
+
+import base64
+import csv
+import io
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from database import SiteStatus
+from site_stats import COUNTERS, NULL_KEY, counter_rows
+
+logger = logging.getLogger(__name__)
+
+MAX_PER_PAGE = 200
+EXPORT_BATCH_SIZE = 5000  # lignes lues par requête pendant un export
+GZIP_LEVEL = 6
+SEARCH_COUNT_LIMIT = 10000  # au-delà, le total d'une recherche est affiché comme estimation
+TRIGRAM_MIN_LENGTH = 3  # le tokenizer trigram ne trouve rien sous 3 caractères
+
+# Colonnes lues pour le tableau (le détail d'un site passe par /api/sites/<id>)
+LISTING_COLUMNS = [
+    'id', 'domain', 'status', 'emails', 'siret', 'leaders', 'language',
+    'email_found_at', 'updated_at', 'is_active',
+]
+
+# Date NULL dans la clé de tri: inférieure à toute date, donc en dernier en ordre décroissant
+# ('' sous SQLite où les dates sont du texte, une date ancienne sous PostgreSQL)
+_NULL_DATE = {'sqlite': "''", 'postgresql': "TIMESTAMP '1970-01-01'"}
+
+
+def sort_key(dialect: str = 'sqlite') -> List[str]:
+    """Clé de tri: emails récents d'abord (sans email en dernier), puis mise à jour, puis id"""
+    null_date = _NULL_DATE.get(dialect, _NULL_DATE['sqlite'])
+    return [f"COALESCE(email_found_at, {null_date})", f"COALESCE(updated_at, {null_date})", "id"]
+
+
+SORT_KEY = sort_key()
+
+INSTALL_STATEMENTS = [
+    f"CREATE INDEX IF NOT EXISTS ix_sites_listing ON sites ({', '.join(SORT_KEY)})",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS sites_search USING fts5(
+        domain, emails, content='sites', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    "DROP TRIGGER IF EXISTS trg_sites_search_insert",
+    "DROP TRIGGER IF EXISTS trg_sites_search_delete",
+    "DROP TRIGGER IF EXISTS trg_sites_search_update",
+    """
+    CREATE TRIGGER trg_sites_search_insert AFTER INSERT ON sites
+    BEGIN
+        INSERT INTO sites_search (rowid, domain, emails) VALUES (NEW.id, NEW.domain, NEW.emails);
+    END
+    """,
+    """
+    CREATE TRIGGER trg_sites_search_delete AFTER DELETE ON sites
+    BEGIN
+        INSERT INTO sites_search (sites_search, rowid, domain, emails) VALUES ('delete', OLD.id, OLD.domain, OLD.emails);
+    END
+    """,
+    """
+    CREATE TRIGGER trg_sites_search_update AFTER UPDATE OF domain, emails ON sites
+    BEGIN
+        INSERT INTO sites_search (sites_search, rowid, domain, emails) VALUES ('delete', OLD.id, OLD.domain, OLD.emails);
+        INSERT INTO sites_search (rowid, domain, emails) VALUES (NEW.id, NEW.domain, NEW.emails);
+    END
+    """,
+]
+
+REBUILD_STATEMENTS = [
+    "INSERT INTO sites_search (sites_search) VALUES ('rebuild')",
+]
+
+# PostgreSQL: même index de tri; la sous-chaîne (ILIKE '%...%') est servie par pg_trgm
+POSTGRES_INSTALL_STATEMENTS = [
+    f"CREATE INDEX IF NOT EXISTS ix_sites_listing ON sites ({', '.join(sort_key('postgresql'))})",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_sites_domain_trgm ON sites USING gin (domain gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_sites_emails_trgm ON sites USING gin (emails gin_trgm_ops)",
+]
+
+# Filtre oui/non -> (condition 'true' sur les colonnes calculées de database.py, compteur de site_counters)
+PRESENCE_FILTERS = {
+    'has_email': ("has_email", 'with_email'),
+    'has_siret': ("siret_state = 'found'", 'with_siret'),
+    'has_leaders': ("leaders_state = 'found'", 'with_leaders'),
+}
+
+
+class InvalidListingRequest(ValueError):
+    """Curseur ou filtre invalide (HTTP 400)"""
+
+
+@dataclass
+class ListingFilters:
+    status: Optional[str] = None  # nom de SiteStatus (valeur stockée)
+    search: str = ''
+    email_search: str = ''
+    has_email: Optional[str] = None
+    has_siret: Optional[str] = None
+    has_leaders: Optional[str] = None
+    cms: Optional[str] = None
+    include_blacklisted: bool = False
+
+    @classmethod
+    def from_args(cls, args) -> 'ListingFilters':
+        status = args.get('status')
+        if status:
+            try:
+                status = SiteStatus(status).name
+            except ValueError:
+                raise InvalidListingRequest(f"Statut inconnu: {status}")
+        return cls(
+            status=status or None,
+            search=args.get('search', '').strip(),
+            email_search=args.get('email_search', '').strip(),
+            has_email=args.get('has_email'),
+            has_siret=args.get('has_siret'),
+            has_leaders=args.get('has_leaders'),
+            cms=args.get('cms') or None,
+            include_blacklisted=args.get('include_blacklisted', 'false').lower() == 'true',
+        )
+
+    @property
+    def searching(self) -> bool:
+        return bool(self.search or self.email_search)
+
+
+def encode_cursor(row) -> str:
+    """Curseur après `row` (valeurs de la clé de tri, lues par list_sites)"""
+    key = [str(row.key_email), str(row.key_updated), row.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(key) != 3 or not isinstance(key[2], int):
+            raise ValueError(key)
+        return [str(key[0]), str(key[1]), key[2]]
+    except Exception:
+        raise InvalidListingRequest("Curseur invalide")
+
+
+def search_index_installed(session) -> bool:
+    if session.bind.dialect.name != 'sqlite':
+        return False
+    return session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sites_search'"
+    )).first() is not None
+
+
+def _fts_phrase(column: str, term: str) -> str:
+    """Requête FTS5: la sous-chaîne `term` dans `column` (guillemets doublés)"""
+    return f'{column} : "{term.replace(chr(34), chr(34) * 2)}"'
+
+
+def _where(session, filters: ListingFilters) -> Tuple[List[str], Dict]:
+    conditions, params = [], {}
+
+    if not filters.include_blacklisted:
+        # Même condition que le compteur 'blacklisted' (IS TRUE) de l'estimation: NULL = non blacklisté
+        conditions.append("blacklisted IS NOT TRUE")
+    if filters.status:
+        conditions.append("status = :status")
+        params['status'] = filters.status
+
+    # Recherche: index trigram si possible, sinon LIKE
+    searches = [('domain', filters.search), ('emails', filters.email_search)]
+    use_index = any(len(term) >= TRIGRAM_MIN_LENGTH for _, term in searches) and search_index_installed(session)
+    like = 'ILIKE' if session.bind.dialect.name == 'postgresql' else 'LIKE'  # LIKE SQLite: insensible à la casse
+    phrases = []
+    for column, term in searches:
+        if not term:
+            continue
+        if use_index and len(term) >= TRIGRAM_MIN_LENGTH:
+            phrases.append(_fts_phrase(column, term))
+        else:
+            conditions.append(f"{column} {like} :like_{column} ESCAPE '\\'")
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params[f'like_{column}'] = f'%{escaped}%'
+    if phrases:
+        conditions.append("id IN (SELECT rowid FROM sites_search WHERE sites_search MATCH :match)")
+        params['match'] = ' AND '.join(phrases)
+
+    for name, (present, _) in PRESENCE_FILTERS.items():
+        value = getattr(filters, name)
+        if value == 'true':
+            conditions.append(present)
+        elif value == 'false':
+            conditions.append(f"NOT ({present})")
+
+    if filters.cms == 'no_cms':
+        conditions.append("(cms IS NULL OR cms = '')")
+    elif filters.cms:
+        conditions.append("cms = :cms")
+        params['cms'] = filters.cms
+
+    return conditions, params
+
+
+def estimate_total(session, filters: ListingFilters) -> Tuple[int, bool]:
+    """
+    Total des sites du filtre d'après site_counters: (total, estimation?).
+    Par groupe (status, cms), chaque filtre oui/non et l'exclusion des
+    blacklistés appliquent leur proportion; exact quand un seul s'applique.
+    """
+    indexes = {name: 3 + i for i, name in enumerate(COUNTERS)}
+    factors = [(indexes[counter], value == 'true')
+               for name, (_, counter) in PRESENCE_FILTERS.items()
+               for value in [getattr(filters, name)] if value in ('true', 'false')]
+    if not filters.include_blacklisted:
+        factors.append((indexes['blacklisted'], False))
+
+    total = 0.0
+    for row in counter_rows(session):
+        status, cms, count = row[0], row[1], row[2]
+        if not count:
+            continue
+        if filters.status and status != filters.status:
+            continue
+        if filters.cms == 'no_cms' and cms not in (NULL_KEY, ''):
+            continue
+        if filters.cms and filters.cms != 'no_cms' and cms != filters.cms:
+            continue
+        estimate = float(count)
+        for index, present in factors:
+            share = (row[index] or 0) / count
+            estimate *= share if present else 1 - share
+        total += estimate
+    return int(round(total)), len(factors) > 1
+
+
+def _count_matches(session, conditions: List[str], params: Dict) -> Tuple[int, bool]:
+    """Nombre de résultats d'une recherche, compté jusqu'à SEARCH_COUNT_LIMIT"""
+    count = session.execute(text(f"""
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM sites WHERE {' AND '.join(conditions)} LIMIT :count_limit
+        ) AS matches
+    """), {**params, 'count_limit': SEARCH_COUNT_LIMIT}).scalar() or 0
+    return count, count >= SEARCH_COUNT_LIMIT
+
+
+def _serialize(row) -> Dict:
+    site = {column: row._mapping[column] for column in LISTING_COLUMNS}
+    try:
+        site['status'] = SiteStatus[site['status']].value if site['status'] else None
+    except KeyError:
+        pass
+    for column in ('email_found_at', 'updated_at'):
+        if site[column]:
+            site[column] = str(site[column]).replace(' ', 'T', 1)
+    site['is_active'] = site['is_active'] if site['is_active'] is not None else True
+    return site
+
+
+def list_sites(session, filters: ListingFilters, cursor: Optional[str] = None,
+               per_page: int = 50, offset: int = 0) -> Dict:
+    """
+    Une page de sites après `cursor` (ou après `offset` lignes, pour les
+    anciens clients qui paginent par numéro de page)
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    key = sort_key(session.bind.dialect.name)
+    conditions, params = _where(session, filters)
+    filter_conditions, filter_params = list(conditions) or ['TRUE'], dict(params)
+
+    if cursor:
+        conditions.append(f"({', '.join(key)}) < (:after_email, :after_updated, :after_id)")
+        params['after_email'], params['after_updated'], params['after_id'] = decode_cursor(cursor)
+        offset = 0
+
+    rows = session.execute(text(f"""
+        SELECT {', '.join(LISTING_COLUMNS)}, {key[0]} AS key_email, {key[1]} AS key_updated
+        FROM sites
+        WHERE {' AND '.join(conditions) or 'TRUE'}
+        ORDER BY {', '.join(f'{column} DESC' for column in key)}
+        LIMIT :limit OFFSET :offset
+    """), {**params, 'limit': per_page + 1, 'offset': max(0, offset)}).fetchall()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if filters.searching:
+        total, estimated = _count_matches(session, filter_conditions, filter_params)
+    else:
+        total, estimated = estimate_total(session, filters)
+
+    return {
+        'sites': [_serialize(row) for row in rows],
+        'next_cursor': encode_cursor(rows[-1]) if has_more and rows else None,
+        'has_more': has_more,
+        'total': total,
+        'total_is_estimate': estimated,
+    }
+
+
+# ----------------------------------------------------------------------
+# Export CSV en flux
+# ----------------------------------------------------------------------
+
+# En-tête CSV -> colonne de sites
+EXPORT_COLUMNS = {
+    'ID': 'id',
+    'Domaine': 'domain',
+    'Statut': 'status',
+    'Emails': 'emails',
+    'SIRET': 'siret',
+    'SIREN': 'siren',
+    'Dirigeants': 'leaders',
+    'Source': 'source_url',
+    'Créé le': 'created_at',
+    'Mis à jour le': 'updated_at',
+}
+_EXPORT_DATES = {'created_at', 'updated_at'}
+
+
+def _export_value(column: str, value) -> str:
+    if value is None:
+        return ''
+    if column == 'status':
+        try:
+            return SiteStatus[value].value
+        except KeyError:
+            return value
+    if column in _EXPORT_DATES:
+        return str(value).replace('T', ' ')[:19]  # '%Y-%m-%d %H:%M:%S'
+    return value
+
+
+def iter_export_rows(session_factory: Callable, filters: ListingFilters,
+                     batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List]:
+    """Lignes exportées (valeurs dans l'ordre de EXPORT_COLUMNS), lues par lots keyset sur id"""
+    session = session_factory()
+    try:
+        conditions, params = _where(session, filters)
+        conditions.append("id > :after_id")
+        sql = text(f"""
+            SELECT {', '.join(EXPORT_COLUMNS.values())}
+            FROM sites
+            WHERE {' AND '.join(conditions)}
+            ORDER BY id
+            LIMIT :limit
+        """)
+        after_id = 0
+        while True:
+            rows = session.execute(sql, {**params, 'after_id': after_id, 'limit': batch_size}).fetchall()
+            # Pas de transaction de lecture ouverte pendant que le client télécharge
+            session.rollback()
+            for row in rows:
+                yield [_export_value(column, value) for column, value in zip(EXPORT_COLUMNS.values(), row)]
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+    finally:
+        session.close()
+
+
+def iter_csv(session_factory: Callable, filters: ListingFilters, gzip: bool = False,
+             batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """CSV (UTF-8) par morceaux d'environ un lot, compressé en gzip si demandé"""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if gzip else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def chunk(final: bool = False) -> bytes:
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor:
+            # Z_SYNC_FLUSH: chaque lot part tout de suite (pas de silence côté proxy)
+            data = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        return data
+
+    writer.writerow(list(EXPORT_COLUMNS))
+    exported = 0
+    for exported, row in enumerate(iter_export_rows(session_factory, filters, batch_size), 1):
+        writer.writerow(row)
+        if exported % batch_size == 0:
+            data = chunk()
+            if data:
+                yield data
+    yield chunk(final=True)
+    logger.info(f"📤 Export CSV: {exported} sites")
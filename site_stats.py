@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Compteurs de la table sites pour /api/stats
+
+compute_stats_data() faisait une trentaine de COUNT(*) sur `sites` (par
+statut, source d'email, validation, CMS, blacklist, vendeurs, acheteurs...),
+chacun un parcours complet ou presque. Ici:
+
+- count_sites(): tous les compteurs en un seul parcours, SUM(CASE ...)
+  groupés par (status, cms);
+- table site_counters: les mêmes lignes (status, cms) tenues à jour par des
+  triggers SQLite à chaque INSERT/UPDATE/DELETE de `sites`, quel que soit le
+  script qui écrit. La lire coûte quelques dizaines de lignes.
+
+Même principe pour l'activité journalière (/api/stats/daily et
+/api/crawl/daily-stats): la table site_daily_rollup compte par jour les
+vendeurs crawlés, acheteurs trouvés, emails, SIRET, dirigeants et
+validations (DAILY_METRICS); la lire est une lecture d'intervalle sur sa clé.
+
+Les tables et les triggers sont installés par migrate_add_site_counters.py
+et migrate_add_site_daily_rollup.py (qui les recalculent aussi: `--rebuild`,
+à lancer la nuit pour corriger une éventuelle dérive). Sans eux,
+site_counters() retombe sur count_sites() et daily_activity() sur une
+requête groupée par métrique.
+
+Sous PostgreSQL (DATABASE_URL), les triggers sont en PL/pgSQL et
+n'écrivent que des deltas en ajout seul (site_counters_delta,
+site_daily_rollup_delta): des upserts sur les mêmes lignes de compteurs
+sérialiseraient les écritures concurrentes de `sites` (voire
+s'interbloqueraient). Les lectures reportent les deltas dans les tables
+(fold, transaction courte) et lisent tables + deltas restants.
+
+Usage:
+    counters = site_counters(session)
+    counters['with_email'], counters['status_counts'], counters['cms_counts']
+    daily_activity(session, days=31)  # {'2025-12-02': {'buyers_found': ..., ...}, ...}
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+NULL_KEY = '(null)'  # status / cms NULL dans la clé de site_counters
+
+# Compteurs: nom -> condition sur une ligne de sites ({r}: alias, NEW ou OLD dans les triggers)
+_WITH_EMAIL = "{r}.emails IS NOT NULL AND {r}.emails NOT IN ('', 'NO EMAIL FOUND')"
+_WITH_SIRET = "{r}.siret IS NOT NULL AND {r}.siret NOT IN ('', 'NON TROUVÉ')"
+_WITH_LEADERS = "{r}.leaders IS NOT NULL AND {r}.leaders NOT IN ('', 'NON TROUVÉ')"
+_SELLER = "{r}.is_link_seller IS TRUE"
+COUNTERS = {
+    'with_email': _WITH_EMAIL,
+    'with_siret': _WITH_SIRET,
+    'with_leaders': f"{_WITH_LEADERS} AND {{r}}.leaders != '[]'",
+    'complete': f"{_WITH_EMAIL} AND {_WITH_SIRET} AND {_WITH_LEADERS}",
+    'emails_from_scraping': f"{_WITH_EMAIL} AND {{r}}.email_source = 'scraping'",
+    'emails_from_siret': f"{_WITH_EMAIL} AND {{r}}.email_source = 'siret'",
+    'emails_validated': "{r}.email_validated IS TRUE",
+    'emails_valid': "{r}.email_validation_status = 'valid'",
+    'emails_invalid': "{r}.email_validation_status = 'invalid'",
+    'emails_risky': "{r}.email_validation_status = 'risky'",
+    'emails_deliverable': "{r}.email_deliverable IS TRUE",
+    'blacklisted': "{r}.blacklisted IS TRUE",
+    'sellers': _SELLER,
+    'buyers': "{r}.purchased_from IS NOT NULL",
+    'sellers_scraped': f"{_SELLER} AND {{r}}.backlinks_crawled IS TRUE",
+    'sellers_not_scraped': f"{_SELLER} AND ({{r}}.backlinks_crawled IS NOT TRUE)",
+    'with_contacts': "{r}.contact_firstname IS NOT NULL AND {r}.contact_lastname IS NOT NULL",
+}
+
+# Colonnes lues par les conditions (UPDATE OF des triggers)
+WATCHED_COLUMNS = [
+    'status', 'cms', 'emails', 'email_source', 'siret', 'leaders', 'email_validated',
+    'email_validation_status', 'email_deliverable', 'blacklisted', 'is_link_seller',
+    'purchased_from', 'backlinks_crawled', 'contact_firstname', 'contact_lastname',
+]
+
+
+def _case_columns(row: str, sign: str = '', aggregate: str = '') -> str:
+    return ',\n        '.join(
+        f"{sign}{aggregate}(CASE WHEN {condition.format(r=row)} THEN 1 ELSE 0 END)" for condition in COUNTERS.values()
+    )
+
+
+def _keys(row: str) -> str:
+    # CAST: status est un type ENUM sous PostgreSQL
+    return f"COALESCE(CAST({row}.status AS VARCHAR(50)), '{NULL_KEY}'), COALESCE({row}.cms, '{NULL_KEY}')"
+
+
+COUNTER_COLUMNS = ', '.join(COUNTERS)
+
+# Un seul parcours de sites: une ligne par (status, cms)
+COUNT_SQL = f"""
+    SELECT {_keys('sites')}, COUNT(*),
+        {_case_columns('sites', aggregate='SUM')}
+    FROM sites
+    GROUP BY 1, 2
+"""
+
+_UPSERT_TEMPLATE = f"""
+    INSERT INTO site_counters (status, cms, total, {COUNTER_COLUMNS})
+    VALUES ({{keys}}, {{sign}}1,
+        {{values}})
+    ON CONFLICT (status, cms) DO UPDATE SET
+        total = site_counters.total + excluded.total,
+        {', '.join(f'{name} = site_counters.{name} + excluded.{name}' for name in COUNTERS)};
+"""
+
+
+def _upsert(row: str, sign: str) -> str:
+    return _UPSERT_TEMPLATE.format(keys=_keys(row), sign=sign, values=_case_columns(row, sign))
+
+
+INSTALL_STATEMENTS = [
+    f"""
+    CREATE TABLE IF NOT EXISTS site_counters (
+        status VARCHAR(50) NOT NULL,
+        cms VARCHAR(50) NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        {', '.join(f'{name} INTEGER NOT NULL DEFAULT 0' for name in COUNTERS)},
+        PRIMARY KEY (status, cms)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS site_counters_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        rebuilt_at TIMESTAMP
+    )
+    """,
+    # Activité récente (created_at >= hier): intervalle glissant, lu par index
+    "CREATE INDEX IF NOT EXISTS ix_sites_created_at ON sites (created_at)",
+    "DROP TRIGGER IF EXISTS trg_site_counters_insert",
+    "DROP TRIGGER IF EXISTS trg_site_counters_delete",
+    "DROP TRIGGER IF EXISTS trg_site_counters_update",
+    f"""
+    CREATE TRIGGER trg_site_counters_insert AFTER INSERT ON sites
+    BEGIN
+        {_upsert('NEW', '')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER trg_site_counters_delete AFTER DELETE ON sites
+    BEGIN
+        {_upsert('OLD', '-')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER trg_site_counters_update AFTER UPDATE OF {', '.join(WATCHED_COLUMNS)} ON sites
+    BEGIN
+        {_upsert('OLD', '-')}
+        {_upsert('NEW', '')}
+    END
+    """,
+]
+
+# Recalcul complet (même transaction que l'installation: aucune écriture perdue entre les deux)
+REBUILD_STATEMENTS = [
+    "DELETE FROM site_counters",
+    f"INSERT INTO site_counters (status, cms, total, {COUNTER_COLUMNS}) {COUNT_SQL}",
+    "INSERT INTO site_counters_state (id, rebuilt_at) VALUES (1, CURRENT_TIMESTAMP) "
+    "ON CONFLICT (id) DO UPDATE SET rebuilt_at = excluded.rebuilt_at",
+]
+
+
+def _aggregate(rows) -> Dict:
+    """Lignes (status, cms, total, compteurs...) -> totaux + répartitions par statut et CMS"""
+    counters = dict.fromkeys(['total', *COUNTERS], 0)
+    counters['status_counts'] = {}
+    counters['cms_counts'] = {}
+    for status, cms, total, *values in rows:
+        if not total:
+            continue
+        counters['total'] += total
+        for name, value in zip(COUNTERS, values):
+            counters[name] += value or 0
+        counters['status_counts'][status] = counters['status_counts'].get(status, 0) + total
+        if cms != NULL_KEY:
+            counters['cms_counts'][cms] = counters['cms_counts'].get(cms, 0) + total
+    counters['with_cms'] = sum(n for cms, n in counters['cms_counts'].items() if cms not in ('', 'NONE'))
+    return counters
+
+
+def count_sites(session) -> Dict:
+    """Tous les compteurs en un seul parcours de sites"""
+    return _aggregate(session.execute(text(COUNT_SQL)))
+
+
+def load_counter_rows(session) -> Optional[List]:
+    """Lignes (status, cms, total, compteurs...) tenues à jour par les triggers, ou None sans la table"""
+    try:
+        installed = session.execute(text("SELECT rebuilt_at FROM site_counters_state WHERE id = 1")).first()
+    except Exception:
+        session.rollback()
+        return None
+    if not installed:
+        return None
+    if _is_postgres(session):
+        _fold(session, POSTGRES_FOLD_SQL)
+        return session.execute(text(POSTGRES_COUNTERS_SQL)).fetchall()
+    return session.execute(text(f"SELECT status, cms, total, {COUNTER_COLUMNS} FROM site_counters")).fetchall()
+
+
+def load_counters(session) -> Optional[Dict]:
+    """Compteurs tenus à jour par les triggers, ou None s'ils ne sont pas installés"""
+    rows = load_counter_rows(session)
+    return None if rows is None else _aggregate(rows)
+
+
+def counter_rows(session) -> List:
+    """Lignes (status, cms, total, compteurs...): table site_counters, ou un parcours de sites"""
+    rows = load_counter_rows(session)
+    if rows is None:
+        logger.info("📊 Table site_counters absente: comptage en un parcours de sites")
+        rows = session.execute(text(COUNT_SQL)).fetchall()
+    return rows
+
+
+def site_counters(session) -> Dict:
+    return _aggregate(counter_rows(session))
+
+
+# ----------------------------------------------------------------------
+# Activité journalière (site_daily_rollup)
+# ----------------------------------------------------------------------
+
+# Métrique -> (colonne qui date l'événement, condition sur la ligne)
+DAILY_METRICS = {
+    'sellers_crawled': ('backlinks_crawled_at', "{r}.backlinks_crawled IS TRUE"),
+    'buyers_found': ('created_at', "{r}.purchased_from IS NOT NULL"),
+    'emails_found': ('email_found_at', "{r}.emails IS NOT NULL AND {r}.emails NOT IN ('', '[]', 'NO EMAIL FOUND')"),
+    'siret_found': ('updated_at', _WITH_SIRET),
+    'leaders_found': ('leaders_found_at', "{r}.leaders IS NOT NULL AND {r}.leaders != ''"),
+    'emails_validated': ('email_validation_date', "{r}.email_validated IS TRUE"),
+}
+
+
+def _day_bucket(metric: str, row: str, postgres: bool = False) -> str:
+    """Jour compté pour la ligne (NULL si elle ne compte pas pour la métrique)"""
+    column, condition = DAILY_METRICS[metric]
+    day = f"to_char({row}.{column}, 'YYYY-MM-DD')" if postgres else f"date({row}.{column})"
+    return f"(CASE WHEN {condition.format(r=row)} THEN {day} END)"
+
+
+def _daily_upsert(metric: str, row: str, delta: int) -> str:
+    bucket = _day_bucket(metric, row)
+    return f"""
+        INSERT INTO site_daily_rollup (day, metric, count)
+        SELECT {bucket}, '{metric}', {delta} WHERE {bucket} IS NOT NULL
+        ON CONFLICT (day, metric) DO UPDATE SET count = site_daily_rollup.count + excluded.count;"""
+
+
+def _daily_triggers(metric: str):
+    column, condition = DAILY_METRICS[metric]
+    watched = sorted({column, *re.findall(r'\{r\}\.(\w+)', condition)})
+    name = f"trg_site_daily_{metric}"
+    return [
+        f"DROP TRIGGER IF EXISTS {name}_insert",
+        f"DROP TRIGGER IF EXISTS {name}_delete",
+        f"DROP TRIGGER IF EXISTS {name}_update",
+        f"CREATE TRIGGER {name}_insert AFTER INSERT ON sites BEGIN {_daily_upsert(metric, 'NEW', 1)} END",
+        f"CREATE TRIGGER {name}_delete AFTER DELETE ON sites BEGIN {_daily_upsert(metric, 'OLD', -1)} END",
+        # Seulement quand la ligne change de jour (ou entre/sort de la métrique)
+        f"""
+        CREATE TRIGGER {name}_update AFTER UPDATE OF {', '.join(watched)} ON sites
+        WHEN {_day_bucket(metric, 'OLD')} IS NOT {_day_bucket(metric, 'NEW')}
+        BEGIN {_daily_upsert(metric, 'OLD', -1)} {_daily_upsert(metric, 'NEW', 1)} END
+        """,
+    ]
+
+
+def _daily_count_sql(metric: str, postgres: bool = False) -> str:
+    bucket = _day_bucket(metric, 'sites', postgres)
+    return f"SELECT {bucket} AS day, '{metric}', COUNT(*) FROM sites WHERE {bucket} IS NOT NULL GROUP BY 1"
+
+
+DAILY_INSTALL_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS site_daily_rollup (
+        day VARCHAR(10) NOT NULL,
+        metric VARCHAR(30) NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, metric)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS site_daily_rollup_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        rebuilt_at TIMESTAMP
+    )
+    """,
+] + [statement for metric in DAILY_METRICS for statement in _daily_triggers(metric)]
+
+DAILY_REBUILD_STATEMENTS = [
+    "DELETE FROM site_daily_rollup",
+] + [
+    f"INSERT INTO site_daily_rollup (day, metric, count) {_daily_count_sql(metric)}" for metric in DAILY_METRICS
+] + [
+    "INSERT INTO site_daily_rollup_state (id, rebuilt_at) VALUES (1, CURRENT_TIMESTAMP) "
+    "ON CONFLICT (id) DO UPDATE SET rebuilt_at = excluded.rebuilt_at",
+]
+
+
+def daily_activity(session, days: int = 31) -> Dict[str, Dict[str, int]]:
+    """
+    Compteurs des `days` derniers jours (aujourd'hui compris, UTC):
+    {'YYYY-MM-DD': {métrique: nombre}}, chaque jour et chaque métrique présents
+    """
+    today = datetime.utcnow().date()
+    since = (today - timedelta(days=days - 1)).isoformat()
+    result = {(today - timedelta(days=i)).isoformat(): dict.fromkeys(DAILY_METRICS, 0) for i in range(days)}
+
+    try:
+        installed = session.execute(text("SELECT rebuilt_at FROM site_daily_rollup_state WHERE id = 1")).first()
+    except Exception:
+        session.rollback()
+        installed = None
+
+    if installed and _is_postgres(session):
+        _fold(session, POSTGRES_DAILY_FOLD_SQL)
+        rows = session.execute(text("""
+            SELECT day, metric, count FROM site_daily_rollup WHERE day >= :since
+            UNION ALL
+            SELECT day, metric, count FROM site_daily_rollup_delta WHERE day >= :since
+        """), {'since': since})
+    elif installed:
+        rows = session.execute(text(
+            "SELECT day, metric, count FROM site_daily_rollup WHERE day >= :since"
+        ), {'since': since})
+    else:
+        logger.info("📊 Table site_daily_rollup absente: une requête groupée par métrique")
+        rows = []
+        for metric, (column, _) in DAILY_METRICS.items():
+            rows.extend(session.execute(text(
+                f"{_daily_count_sql(metric).replace(' GROUP BY', f' AND sites.{column} >= :since GROUP BY')}"
+            ), {'since': since}))
+
+    for day, metric, count in rows:
+        day = str(day)  # date() renvoie un objet date sous PostgreSQL
+        if day in result and metric in DAILY_METRICS:
+            result[day][metric] += count or 0
+    return result
+
+
+# ----------------------------------------------------------------------
+# PostgreSQL: triggers PL/pgSQL à deltas (migrate_add_site_counters.py et
+# migrate_add_site_daily_rollup.py avec DATABASE_URL, ou la copie
+# migrate_sqlite_to_postgres.py)
+# ----------------------------------------------------------------------
+
+def _is_postgres(session) -> bool:
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def _fold(session, statement: str):
+    """Reporter les deltas dans la table (transaction à part, sans verrou gardé par l'appelant)"""
+    try:
+        with session.get_bind().begin() as conn:
+            conn.execute(text(statement))
+    except Exception as e:
+        # Lecture toujours exacte (table + deltas), le prochain fold reprendra
+        logger.warning(f"⚠️  Report des deltas de compteurs impossible: {e}")
+
+
+def _delta_insert(row: str, sign: str) -> str:
+    return (f"INSERT INTO site_counters_delta (status, cms, total, {COUNTER_COLUMNS}) "
+            f"VALUES ({_keys(row)}, {sign}1, {_case_columns(row, sign)});")
+
+
+_WATCHED_ROW = ', '.join(f'{{r}}.{column}' for column in WATCHED_COLUMNS)
+_COUNTER_SUMS = ', '.join(f'SUM({name})' for name in COUNTERS)
+
+POSTGRES_INSTALL_STATEMENTS = INSTALL_STATEMENTS[:3] + [
+    f"""
+    CREATE TABLE IF NOT EXISTS site_counters_delta (
+        status VARCHAR(50) NOT NULL,
+        cms VARCHAR(50) NOT NULL,
+        total INTEGER NOT NULL,
+        {', '.join(f'{name} INTEGER NOT NULL' for name in COUNTERS)}
+    )
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION site_counters_delta() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND ROW({_WATCHED_ROW.format(r='OLD')})
+                IS NOT DISTINCT FROM ROW({_WATCHED_ROW.format(r='NEW')}) THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP <> 'INSERT' THEN
+            {_delta_insert('OLD', '-')}
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            {_delta_insert('NEW', '')}
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_site_counters ON sites",
+    f"""
+    CREATE TRIGGER trg_site_counters AFTER INSERT OR DELETE OR UPDATE OF {', '.join(WATCHED_COLUMNS)} ON sites
+    FOR EACH ROW EXECUTE FUNCTION site_counters_delta()
+    """,
+]
+
+# Deltas -> site_counters; deux folds concurrents ne reportent jamais la même ligne
+POSTGRES_FOLD_SQL = f"""
+    WITH moved AS (DELETE FROM site_counters_delta RETURNING *)
+    INSERT INTO site_counters (status, cms, total, {COUNTER_COLUMNS})
+    SELECT status, cms, SUM(total), {_COUNTER_SUMS} FROM moved GROUP BY status, cms
+    ON CONFLICT (status, cms) DO UPDATE SET
+        total = site_counters.total + excluded.total,
+        {', '.join(f'{name} = site_counters.{name} + excluded.{name}' for name in COUNTERS)}
+"""
+
+POSTGRES_COUNTERS_SQL = f"""
+    SELECT status, cms, SUM(total), {_COUNTER_SUMS} FROM (
+        SELECT status, cms, total, {COUNTER_COLUMNS} FROM site_counters
+        UNION ALL
+        SELECT status, cms, total, {COUNTER_COLUMNS} FROM site_counters_delta
+    ) AS counters
+    GROUP BY status, cms
+"""
+
+# Le verrou bloque les triggers (donc les écritures de sites) le temps du recalcul,
+# comme BEGIN IMMEDIATE sous SQLite: aucun delta compté deux fois ou perdu
+POSTGRES_REBUILD_STATEMENTS = [
+    "LOCK TABLE site_counters_delta IN EXCLUSIVE MODE",
+    "DELETE FROM site_counters_delta",
+] + REBUILD_STATEMENTS
+
+
+def _daily_delta_sql(metric: str) -> str:
+    return f"""
+        old_day := NULL;
+        new_day := NULL;
+        IF TG_OP <> 'INSERT' THEN
+            old_day := {_day_bucket(metric, 'OLD', postgres=True)};
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            new_day := {_day_bucket(metric, 'NEW', postgres=True)};
+        END IF;
+        IF old_day IS DISTINCT FROM new_day THEN
+            INSERT INTO site_daily_rollup_delta (day, metric, count)
+            SELECT day, '{metric}', delta FROM (VALUES (old_day, -1), (new_day, 1)) AS changes (day, delta)
+            WHERE day IS NOT NULL;
+        END IF;"""
+
+
+_DAILY_WATCHED = sorted({
+    column
+    for metric, (day_column, condition) in DAILY_METRICS.items()
+    for column in (day_column, *re.findall(r'\{r\}\.(\w+)', condition))
+})
+
+POSTGRES_DAILY_INSTALL_STATEMENTS = DAILY_INSTALL_STATEMENTS[:2] + [
+    """
+    CREATE TABLE IF NOT EXISTS site_daily_rollup_delta (
+        day VARCHAR(10) NOT NULL,
+        metric VARCHAR(30) NOT NULL,
+        count INTEGER NOT NULL
+    )
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION site_daily_rollup_delta() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        old_day VARCHAR(10);
+        new_day VARCHAR(10);
+    BEGIN
+        {''.join(_daily_delta_sql(metric) for metric in DAILY_METRICS)}
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_site_daily_rollup ON sites",
+    f"""
+    CREATE TRIGGER trg_site_daily_rollup AFTER INSERT OR DELETE OR UPDATE OF {', '.join(_DAILY_WATCHED)} ON sites
+    FOR EACH ROW EXECUTE FUNCTION site_daily_rollup_delta()
+    """,
+]
+
+POSTGRES_DAILY_FOLD_SQL = """
+    WITH moved AS (DELETE FROM site_daily_rollup_delta RETURNING day, metric, count)
+    INSERT INTO site_daily_rollup (day, metric, count)
+    SELECT day, metric, SUM(count) FROM moved GROUP BY day, metric
+    ON CONFLICT (day, metric) DO UPDATE SET count = site_daily_rollup.count + excluded.count
+"""
+
+POSTGRES_DAILY_REBUILD_STATEMENTS = [
+    "LOCK TABLE site_daily_rollup_delta IN EXCLUSIVE MODE",
+    "DELETE FROM site_daily_rollup_delta",
+    "DELETE FROM site_daily_rollup",
+] + [
+    f"INSERT INTO site_daily_rollup (day, metric, count) {_daily_count_sql(metric, postgres=True)}"
+    for metric in DAILY_METRICS
+] + DAILY_REBUILD_STATEMENTS[-1:]
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Tests du backend PostgreSQL (db_engine.py, migrate_sqlite_to_postgres.py,
+triggers PL/pgSQL de site_stats.py et site_emails.py, listing de
+site_listing.py)
+
+Une base SQLite de test est copiée vers une base PostgreSQL jetable, puis
+les compteurs, l'activité journalière, site_emails et le listing sont
+comparés aux mêmes calculs faits directement sur `sites`.
+
+PostgreSQL utilisé:
+- TEST_POSTGRES_URL (base d'administration, ex:
+  postgresql+psycopg2://postgres@/postgres?host=/tmp&port=55432);
+- sinon un cluster temporaire (initdb / pg_ctl dans le PATH ou PG_BIN,
+  utilisateur non root), arrêté et supprimé à la fin.
+Sans l'un ni l'autre, les tests sont ignorés.
+
+Usage:
+    python3 test_postgres_backend.py
+    python3 -m pytest -q test_postgres_backend.py
+"""
+
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+import database
+import site_emails
+import site_stats
+from database import Site, SiteStatus
+from db_engine import create_database_engine, pool_status
+from migrate_sqlite_to_postgres import TRIGGER_STATEMENTS, migrate_database
+from site_listing import ListingFilters, list_sites
+
+SITES = 400
+PORT = 55433
+
+_state = {}
+
+
+# ============================================================================
+# Base PostgreSQL jetable
+# ============================================================================
+
+def _start_cluster():
+    """Cluster temporaire; retourne l'URL d'administration ou None"""
+    bin_dir = os.environ.get('PG_BIN')
+    initdb = os.path.join(bin_dir, 'initdb') if bin_dir else shutil.which('initdb')
+    pg_ctl = os.path.join(bin_dir, 'pg_ctl') if bin_dir else shutil.which('pg_ctl')
+    if not initdb or not pg_ctl or not os.path.exists(initdb) or os.geteuid() == 0:
+        return None
+
+    data_dir = tempfile.mkdtemp(prefix='pgtest_')
+    try:
+        subprocess.run([initdb, '-D', data_dir, '-U', 'postgres', '--auth=trust'],
+                       check=True, capture_output=True)
+        subprocess.run([pg_ctl, '-D', data_dir, '-w', '-l', os.path.join(data_dir, 'server.log'),
+                        '-o', f"-k {data_dir} -p {PORT} -c listen_addresses=''", 'start'],
+                       check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"⚠️  Cluster PostgreSQL temporaire impossible: {e}")
+        shutil.rmtree(data_dir, ignore_errors=True)
+        return None
+
+    _state['cluster'] = (pg_ctl, data_dir)
+    return f'postgresql+psycopg2://postgres@/postgres?host={data_dir}&port={PORT}'
+
+
+def _stop_cluster():
+    cluster = _state.pop('cluster', None)
+    if cluster:
+        pg_ctl, data_dir = cluster
+        subprocess.run([pg_ctl, '-D', data_dir, '-m', 'fast', 'stop'], capture_output=True)
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _create_database(admin_url: str) -> str:
+    """Base vide dédiée au test; retourne son URL"""
+    name = f'scrap_email_test_{os.getpid()}'
+    admin = create_engine(admin_url, isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS {name}'))
+        conn.execute(text(f'CREATE DATABASE {name}'))
+    admin.dispose()
+    _state['database'] = (admin_url, name)
+    return make_url(admin_url).set(database=name).render_as_string(hide_password=False)
+
+
+def _drop_database():
+    created = _state.pop('database', None)
+    if created:
+        admin_url, name = created
+        admin = create_engine(admin_url, isolation_level='AUTOCOMMIT')
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)'))
+        admin.dispose()
+
+
+# ============================================================================
+# Base SQLite source
+# ============================================================================
+
+def _build_sqlite(path: Path):
+    """Base SQLite de test: modèles + colonnes ajoutées par les scripts migrate_add_*"""
+    engine = create_engine(f'sqlite:///{path}')
+    database.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for column in ('is_link_seller BOOLEAN DEFAULT 0', 'contact_firstname TEXT',
+                       'contact_lastname TEXT', 'language VARCHAR(10)'):
+            conn.execute(text(f'ALTER TABLE sites ADD COLUMN {column}'))
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    session = sessionmaker(bind=engine)()
+    for i in range(SITES):
+        day = now - timedelta(days=rng.randint(0, 12), hours=rng.randint(0, 23))
+        email = rng.random() < 0.5
+        session.add(Site(
+            domain=f'site{i}.{rng.choice(["fr", "com", "be"])}',
+            status=rng.choice(list(SiteStatus)),
+            cms=rng.choice([None, '', 'wordpress', 'shopify']),
+            emails=f'contact@site{i}.fr; info@site{i}.fr' if email else rng.choice([None, '', 'NO EMAIL FOUND']),
+            email_source=rng.choice(['scraping', 'siret']) if email else None,
+            email_found_at=day if email else None,
+            siret=rng.choice([None, '', 'NON TROUVÉ', f'{i:014d}']),
+            leaders=rng.choice([None, '', 'NON TROUVÉ', '[]', 'Jean Dupont']),
+            blacklisted=rng.choice([True, False, False]),
+            purchased_from=rng.choice([None, 'vendeur.fr']),
+            backlinks_crawled=rng.random() < 0.3,
+            backlinks_crawled_at=day,
+            email_validated=rng.random() < 0.2,
+            email_validation_status=rng.choice([None, 'valid', 'invalid', 'risky']),
+            email_validation_date=day,
+            created_at=day,
+            updated_at=day,
+        ))
+    session.commit()
+    session.close()
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE sites SET is_link_seller = (id % 3 = 0), "
+                          "contact_firstname = CASE WHEN id % 4 = 0 THEN 'Jean' END, "
+                          "contact_lastname = CASE WHEN id % 8 = 0 THEN 'Dupont' END"))
+        # Lignes anciennes sans valeur (l'ORM applique default=False)
+        conn.execute(text("UPDATE sites SET blacklisted = NULL WHERE id % 10 = 0"))
+    return engine
+
+
+# ============================================================================
+# Mise en place (pytest: setup_module / teardown_module)
+# ============================================================================
+
+def setup_module(module=None):
+    admin_url = os.environ.get('TEST_POSTGRES_URL') or _start_cluster()
+    if not admin_url:
+        message = "PostgreSQL indisponible (TEST_POSTGRES_URL, ou initdb/pg_ctl hors root)"
+        if module is not None:
+            import pytest
+            pytest.skip(message, allow_module_level=True)
+        raise RuntimeError(message)
+
+    work_dir = Path(tempfile.mkdtemp(prefix='scrap_email_test_'))
+    sqlite_path = work_dir / 'scrap_email.db'
+    _state['work_dir'] = work_dir
+    _state['sqlite'] = _build_sqlite(sqlite_path)
+
+    url = _create_database(admin_url)
+    assert migrate_database('scrap_email', sqlite_path, url, database.Base.metadata,
+                            batch_size=64, truncate=False, trigger_statements=TRIGGER_STATEMENTS)
+    _state['postgres'] = create_database_engine(url)
+
+
+def teardown_module(module=None):
+    for name in ('sqlite', 'postgres'):
+        engine = _state.pop(name, None)
+        if engine is not None:
+            engine.dispose()
+    _drop_database()
+    _stop_cluster()
+    shutil.rmtree(_state.pop('work_dir', ''), ignore_errors=True)
+
+
+def _session(name: str):
+    return sessionmaker(bind=_state[name])()
+
+
+def _site_emails_rows(session) -> set:
+    return set(session.execute(text("SELECT site_id, email, position FROM site_emails")).fetchall())
+
+
+def _split_rows(session) -> set:
+    """(site, email, rang) attendus d'après split_emails() sur sites.emails"""
+    rows = set()
+    for site_id, emails in session.execute(text("SELECT id, emails FROM sites")).fetchall():
+        stripped = re.sub(r'["\\\[\]\']', '', emails or '')
+        parts = [part.strip().lower() for part in re.split(r'[;,\n\r\t]', stripped)]
+        for email in site_emails.split_emails(emails):
+            rows.add((site_id, email, parts.index(email)))
+    return rows
+
+
+def _comparable(counters: dict) -> dict:
+    return {name: value for name, value in counters.items() if name != 'with_cms'}
+
+
+# ============================================================================
+# Tests
+# ============================================================================
+
+def test_copy():
+    """Toutes les lignes copiées, séquences recalées, site_emails remplie par la réconciliation"""
+    pg = _session('postgres')
+    try:
+        assert pg.query(Site).count() == SITES
+        assert 'sites_search' not in inspect(_state['postgres']).get_table_names()
+        assert site_emails.installed(pg)
+        assert _site_emails_rows(pg) == _split_rows(pg)
+
+        site = Site(domain='nouveau.fr', status=SiteStatus.DISCOVERED)
+        pg.add(site)
+        pg.commit()
+        assert site.id > SITES
+        pg.delete(site)
+        pg.commit()
+    finally:
+        pg.close()
+
+
+def test_listing_matches_sqlite():
+    """Mêmes pages (ordre, curseurs) et mêmes totaux sous SQLite et PostgreSQL (avant toute écriture)"""
+    pg, lite = _session('postgres'), _session('sqlite')
+    try:
+        for filters in (ListingFilters(), ListingFilters(has_email='true'), ListingFilters(cms='no_cms'),
+                        ListingFilters(search='site1'), ListingFilters(include_blacklisted=True)):
+            pages = []
+            for session in (pg, lite):
+                ids, cursor, totals = [], None, set()
+                while True:
+                    page = list_sites(session, filters, cursor=cursor, per_page=37)
+                    ids += [site['id'] for site in page['sites']]
+                    totals.add((page['total'], page['total_is_estimate']))
+                    cursor = page['next_cursor']
+                    if not cursor:
+                        break
+                pages.append((ids, totals))
+                if totals == {(len(ids), False)} or filters.searching:
+                    continue
+                # Total annoncé exact: il doit correspondre aux lignes listées
+                assert any(estimated for _, estimated in totals), (filters, totals, len(ids))
+            assert pages[0] == pages[1], filters
+    finally:
+        pg.close()
+        lite.close()
+
+
+def test_counters_follow_writes():
+    """site_counters (table + deltas des triggers) == un parcours de sites, après écritures"""
+    pg = _session('postgres')
+    try:
+        assert _comparable(site_stats.site_counters(pg)) == _comparable(site_stats.count_sites(pg))
+
+        pg.execute(text("UPDATE sites SET emails = 'a@b.fr', status = 'EMAIL_FOUND' WHERE id % 5 = 0"))
+        pg.execute(text("UPDATE sites SET blacklisted = TRUE, cms = 'wix' WHERE id % 7 = 0"))
+        pg.execute(text("UPDATE sites SET updated_at = updated_at WHERE id % 2 = 0"))  # colonne non suivie
+        pg.execute(text("DELETE FROM sites WHERE id % 11 = 0"))
+        pg.add(Site(domain='ajout.fr', status=SiteStatus.COMPLETED, emails='x@ajout.fr', siret='12345678901234'))
+        pg.commit()
+
+        pending = pg.execute(text("SELECT COUNT(*) FROM site_counters_delta")).scalar()
+        assert pending > 0
+        assert _comparable(site_stats.site_counters(pg)) == _comparable(site_stats.count_sites(pg))
+        # Deltas reportés dans site_counters par la lecture
+        assert pg.execute(text("SELECT COUNT(*) FROM site_counters_delta")).scalar() == 0
+    finally:
+        pg.rollback()
+        pg.close()
+
+
+def test_daily_activity_follows_writes():
+    """site_daily_rollup (table + deltas) == une requête groupée par métrique"""
+    pg = _session('postgres')
+    try:
+        pg.execute(text("UPDATE sites SET backlinks_crawled = TRUE, backlinks_crawled_at = NOW() WHERE id % 6 = 0"))
+        pg.execute(text("UPDATE sites SET emails = NULL WHERE id % 9 = 0"))
+        pg.commit()
+
+        from_rollup = site_stats.daily_activity(pg, days=14)
+        pg.execute(text("UPDATE site_daily_rollup_state SET rebuilt_at = NULL"))
+        pg.execute(text("DELETE FROM site_daily_rollup_state"))
+        from_sites = site_stats.daily_activity(pg, days=14)
+        pg.rollback()
+
+        assert from_rollup == from_sites
+        assert any(day['sellers_crawled'] for day in from_rollup.values())
+    finally:
+        pg.rollback()
+        pg.close()
+
+
+def test_site_emails_follow_writes():
+    """Trigger PL/pgSQL: site_emails suit sites.emails (même découpage que split_emails)"""
+    pg = _session('postgres')
+    try:
+        pg.execute(text("UPDATE site_emails SET validated_at = NOW() WHERE site_id = 2"))
+        kept = pg.execute(text("SELECT email FROM site_emails WHERE site_id = 2")).scalars().all()
+        pg.execute(text("UPDATE sites SET emails = :emails WHERE id = 2"),
+                   {'emails': f"['Nouveau@Gmail.com', {', '.join(kept)}, pas un email]"})
+        pg.execute(text("UPDATE sites SET emails = 'NO EMAIL FOUND' WHERE id = 3"))
+        pg.execute(text("UPDATE sites SET status = status WHERE id % 4 = 0"))  # colonne non suivie
+        pg.execute(text("DELETE FROM sites WHERE id % 13 = 0"))
+        pg.add(Site(domain='ajout-emails.fr', status=SiteStatus.EMAIL_FOUND, emails='a@ajout.fr,\tb@ajout.fr'))
+        pg.commit()
+
+        assert _site_emails_rows(pg) == _split_rows(pg)
+        # Validation conservée pour les emails restés dans la liste
+        assert pg.execute(text(
+            "SELECT COUNT(*) FROM site_emails WHERE site_id = 2 AND validated_at IS NOT NULL"
+        )).scalar() == len(kept)
+        joined = pg.execute(text("SELECT emails FROM site_emails_joined WHERE site_id = 2")).scalar()
+        assert joined.split('; ') == ['nouveau@gmail.com', *kept]
+        assert pg.query(Site).filter(site_emails.emails_with_domains(pg, ['gmail.com'])).count() == 1
+    finally:
+        pg.rollback()
+        pg.close()
+
+
+def test_concurrent_writers_do_not_block():
+    """Deux transactions qui modifient des sites du même groupe (status, cms) ne s'attendent pas"""
+    engine = _state['postgres']
+    first, second = engine.connect(), engine.connect()
+    try:
+        first.begin()
+        first.execute(text("UPDATE sites SET emails = 'un@a.fr' WHERE id = 1"))
+        status, cms = first.execute(text("SELECT status, cms FROM sites WHERE id = 1")).one()
+        other = first.execute(text(
+            "SELECT id FROM sites WHERE status = :status AND cms IS NOT DISTINCT FROM :cms AND id > 1 LIMIT 1"
+        ), {'status': status, 'cms': cms}).scalar()
+
+        errors = []
+
+        def write():
+            try:
+                second.begin()
+                second.execute(text("SET LOCAL lock_timeout = '2s'"))
+                second.execute(text("UPDATE sites SET emails = 'deux@a.fr' WHERE id = :id"), {'id': other or 2})
+                second.commit()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join(10)
+        assert not thread.is_alive() and not errors, errors
+        first.commit()
+    finally:
+        first.close()
+        second.close()
+
+
+def test_pool_status():
+    engine = _state['postgres']
+    with engine.connect():
+        status = pool_status(engine)
+    assert status['backend'] == 'postgresql'
+    assert status['checked_out'] >= 1 and status['limit'] >= status['size']
+
+
+if __name__ == '__main__':
+    print("=" * 70)
+    print("TESTS: Backend PostgreSQL")
+    print("=" * 70)
+    try:
+        setup_module()
+    except RuntimeError as e:
+        print(f"⏭️  {e}")
+        sys.exit(0)
+
+    failures = 0
+    try:
+        for name, test in list(globals().items()):
+            if name.startswith('test_') and callable(test):
+                try:
+                    test()
+                    print(f"✓ {name}")
+                except Exception as e:
+                    failures += 1
+                    print(f"❌ {name}: {e.__class__.__name__}: {e}")
+    finally:
+        teardown_module()
+
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
@@ -4,6 +4,8 @@ Daemon de validation automatique des emails - VERSION ASYNC OPTIMISÉE
 - Utilise asyncio pour 100+ validations simultanées
 - Valide tous les emails existants au démarrage
 - Surveille en continu les nouveaux emails
+- Avec la table site_emails (migrate_add_site_emails.py): valide chaque
+  email d'un site, pas seulement le premier
 """
 
 import asyncio
@@ -13,6 +15,7 @@ import os
 import fcntl
 from datetime import datetime
 from database import get_session, get_engine, Site, safe_commit
+import site_emails
 from validate_emails_async import AsyncEmailValidator
 import json
 import logging
@@ -126,24 +129,9 @@ class AsyncEmailValidationDaemon:
                 continue
 
             try:
-                site = db_session.query(Site).filter_by(id=site_id).first()
-                if site:
-                    site.email_validated = True
-                    site.email_validation_score = result['score']
-                    site.email_validation_status = result['status']
-                    site.email_validation_details = json.dumps(result['details'])
-                    site.email_validation_date = datetime.utcnow()
-                    site.email_deliverable = result['deliverable']
-
+                if self._update_site(db_session, site_id, result):
                     validated_count += 1
-                    self.stats['total_validated'] += 1
-
-                    if result['status'] == 'valid':
-                        self.stats['valid'] += 1
-                    elif result['status'] == 'invalid':
-                        self.stats['invalid'] += 1
-                    elif result['status'] == 'risky':
-                        self.stats['risky'] += 1
+                    self._count_result(result)
 
             except Exception as e:
                 logger.error(f"Erreur update site {site_id}: {e}")
@@ -151,13 +139,82 @@ class AsyncEmailValidationDaemon:
 
         # Commit le batch
         try:
-            safe_commit(db_session, max_retries=5)
+            safe_commit(db_session)
+        except Exception as e:
+            logger.error(f"Erreur commit batch: {e}")
+            db_session.rollback()
+
+        return validated_count
+
+    async def validate_email_batch(self, rows: list, db_session) -> int:
+        """
+        Valider un batch d'emails de site_emails (chaque email d'un site)
+
+        Args:
+            rows: Liste de tuples (email_id, site_id, email, position)
+            db_session: Session SQLAlchemy
+
+        Returns:
+            Nombre d'emails validés
+        """
+        if not rows:
+            return 0
+
+        emails = list({email for _, _, email, _ in rows})
+        results = await self.validator.validate_emails_batch(emails, self.max_concurrent)
+        email_to_result = {r['email']: r for r in results}
+
+        # Le premier email de chaque site garde aussi les champs de validation de Site
+        primary = site_emails.primary_positions(db_session, {site_id for _, site_id, _, _ in rows})
+
+        now = datetime.utcnow()
+        validated_count = 0
+        for email_id, site_id, email, position in rows:
+            result = email_to_result.get(email)
+            try:
+                # Sans résultat: noté 'unknown' pour ne pas être repris en boucle
+                site_emails.record_validation(db_session, email_id, result, now)
+                if not result:
+                    continue
+                validated_count += 1
+                self._count_result(result)
+                if position == primary.get(site_id):
+                    self._update_site(db_session, site_id, result)
+
+            except Exception as e:
+                logger.error(f"Erreur update email {email_id} (site {site_id}): {e}")
+                self.stats['errors'] += 1
+
+        try:
+            safe_commit(db_session)
         except Exception as e:
             logger.error(f"Erreur commit batch: {e}")
             db_session.rollback()
 
         return validated_count
 
+    def _update_site(self, db_session, site_id: int, result: dict) -> bool:
+        """Champs de validation de Site (email principal)"""
+        site = db_session.query(Site).filter_by(id=site_id).first()
+        if not site:
+            return False
+        site.email_validated = True
+        site.email_validation_score = result['score']
+        site.email_validation_status = result['status']
+        site.email_validation_details = json.dumps(result['details'])
+        site.email_validation_date = datetime.utcnow()
+        site.email_deliverable = result['deliverable']
+        return True
+
+    def _count_result(self, result: dict):
+        self.stats['total_validated'] += 1
+        if result['status'] == 'valid':
+            self.stats['valid'] += 1
+        elif result['status'] == 'invalid':
+            self.stats['invalid'] += 1
+        elif result['status'] == 'risky':
+            self.stats['risky'] += 1
+
     async def validate_all_existing(self):
         """Phase 1: Valider tous les emails existants non validés"""
         global running
@@ -166,13 +223,16 @@ class AsyncEmailValidationDaemon:
         session = Session()
 
         try:
+            use_site_emails = site_emails.installed(session)
+
             # Compter les emails à valider
-            initial_count = session.query(Site).filter(
-                Site.emails.isnot(None),
-                Site.emails != '',
-                Site.emails != 'NO EMAIL FOUND',
-                (Site.email_validated.is_(None)) | (Site.email_validated == False)
-            ).count()
+            if use_site_emails:
+                initial_count = site_emails.count_pending_validation(session)
+            else:
+                initial_count = session.query(Site).filter(
+                    Site.has_email == True,
+                    (Site.email_validated.is_(None)) | (Site.email_validated == False)
+                ).count()
 
             if initial_count == 0:
                 logger.info("✅ Tous les emails existants sont déjà validés")
@@ -184,13 +244,31 @@ class AsyncEmailValidationDaemon:
             batch_number = 0
             total_processed = 0
             start_time = datetime.utcnow()
+            last_email_id = 0
 
             while running:
+                if use_site_emails:
+                    # Batch d'emails non validés (tous les emails de chaque site)
+                    rows = site_emails.pending_validation(session, self.batch_size, after_id=last_email_id)
+                    if not rows:
+                        break
+                    last_email_id = rows[-1][0]
+
+                    batch_number += 1
+                    batch_start = datetime.utcnow()
+                    validated = await self.validate_email_batch(rows, session)
+                    total_processed += validated
+                    batch_duration = (datetime.utcnow() - batch_start).total_seconds()
+                    logger.info(
+                        f"📦 Batch {batch_number}: {validated}/{len(rows)} emails validés en {batch_duration:.1f}s | "
+                        f"✅{self.stats['valid']} ❌{self.stats['invalid']} ⚠️{self.stats['risky']} | "
+                        f"Restants: ~{max(0, initial_count - total_processed):,}"
+                    )
+                    continue
+
                 # Récupérer un batch de sites
                 sites_query = session.query(Site.id, Site.emails, Site.domain).filter(
-                    Site.emails.isnot(None),
-                    Site.emails != '',
-                    Site.emails != 'NO EMAIL FOUND',
+                    Site.has_email == True,
                     (Site.email_validated.is_(None)) | (Site.email_validated == False)
                 ).limit(self.batch_size).all()
 
@@ -200,8 +278,7 @@ class AsyncEmailValidationDaemon:
                 # Extraire le premier email de chaque site
                 sites_data = []
                 for site_id, emails_str, domain in sites_query:
-                    emails_list = emails_str.replace(';', ',').split(',')
-                    primary_email = emails_list[0].strip()
+                    primary_email = site_emails.primary_email(emails_str)
                     if primary_email:
                         sites_data.append((site_id, primary_email, domain))
 
@@ -266,20 +343,28 @@ class AsyncEmailValidationDaemon:
             session = Session()
 
             try:
-                # Chercher les nouveaux emails
-                new_sites_query = session.query(Site.id, Site.emails, Site.domain).filter(
-                    Site.id > self.last_check_id,
-                    Site.emails.isnot(None),
-                    Site.emails != '',
-                    Site.emails != 'NO EMAIL FOUND',
-                    (Site.email_validated.is_(None)) | (Site.email_validated == False)
-                ).all()
+                if site_emails.installed(session):
+                    # Emails non validés (nouveaux sites et emails ajoutés à un site existant)
+                    rows = site_emails.pending_validation(session, self.batch_size)
+                    while rows and running:
+                        logger.info(f"🆕 {len(rows)} nouveaux emails détectés!")
+                        await self.validate_email_batch(rows, session)
+                        if len(rows) < self.batch_size:
+                            break
+                        rows = site_emails.pending_validation(session, self.batch_size, after_id=rows[-1][0])
+                    new_sites_query = []
+                else:
+                    # Chercher les nouveaux emails
+                    new_sites_query = session.query(Site.id, Site.emails, Site.domain).filter(
+                        Site.id > self.last_check_id,
+                        Site.has_email == True,
+                        (Site.email_validated.is_(None)) | (Site.email_validated == False)
+                    ).all()
 
                 if new_sites_query:
                     sites_data = []
                     for site_id, emails_str, domain in new_sites_query:
-                        emails_list = emails_str.replace(';', ',').split(',')
-                        primary_email = emails_list[0].strip()
+                        primary_email = site_emails.primary_email(emails_str)
                         if primary_email:
                             sites_data.append((site_id, primary_email, domain))
 
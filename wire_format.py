@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Encodage des échanges worker ↔ coordinateur (JSON/NDJSON ou msgpack,
+corps compressés en gzip ou zstd)
+
+Négociation par en-têtes: le coordinateur annonce dans chaque réponse de
+/api/crawl/* ce qu'il sait décoder (`Accept-Encoding: zstd, gzip` et
+`Accept-Post: application/msgpack, ...`). Le worker commence en JSON non
+compressé, puis adopte le meilleur format commun dès la première réponse;
+un 415 le ramène au JSON non compressé. Les workers sans ce module
+continuent d'envoyer du JSON, toujours accepté.
+
+msgpack et zstandard sont optionnels (pip install msgpack zstandard): sans
+eux, le format correspondant n'est ni annoncé ni utilisé. À déployer avec
+les workers, comme domain_policy.py.
+
+Usage:
+    negotiation = WireNegotiation()
+    body, headers = negotiation.encode({'buyers': [...]})
+    negotiation.update(response.headers)
+
+    data = decode_body(request.get_data(), request.headers.get('Content-Type'),
+                       request.headers.get('Content-Encoding'))
+"""
+
+import gzip
+import io
+import json
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_NDJSON = 'application/x-ndjson'
+CONTENT_TYPE_MSGPACK = 'application/msgpack'
+
+COMPRESS_MIN_SIZE = 1024  # octets: en dessous, la compression ne vaut pas l'en-tête
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+MAX_DECODED_SIZE = 64 * 1024 * 1024  # 64 Mo décompressés max par requête
+NEGOTIATION_RETRY_AFTER = 600  # secondes en JSON non compressé après un 415
+
+
+class WireFormatError(ValueError):
+    """Corps illisible (JSON invalide, flux compressé corrompu ou trop gros)"""
+
+
+class UnsupportedWireFormat(WireFormatError):
+    """Content-Type ou Content-Encoding non supporté par ce process (HTTP 415)"""
+
+
+def supported_encodings() -> List[str]:
+    """Content-Encoding acceptés en requête, du préféré au moins bon"""
+    return (['zstd'] if zstandard else []) + ['gzip']
+
+
+def supported_content_types() -> List[str]:
+    return ([CONTENT_TYPE_MSGPACK] if msgpack else []) + [CONTENT_TYPE_JSON, CONTENT_TYPE_NDJSON]
+
+
+def advertised_headers() -> Dict[str, str]:
+    """En-têtes ajoutés par le coordinateur à ses réponses"""
+    return {
+        'Accept-Encoding': ', '.join(supported_encodings()),
+        'Accept-Post': ', '.join(supported_content_types()),
+    }
+
+
+# ----------------------------------------------------------------------
+# Compression
+# ----------------------------------------------------------------------
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if not encoding or encoding == 'identity':
+        return body
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding == 'zstd' and zstandard:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    raise UnsupportedWireFormat(f"Content-Encoding non supporté: {encoding}")
+
+
+def decompress(body: bytes, encoding: Optional[str], max_size: int = MAX_DECODED_SIZE) -> bytes:
+    """Décompresser un corps de requête, en refusant ce qui dépasse max_size une fois décompressé"""
+    encoding = (encoding or '').strip().lower()
+    if not encoding or encoding == 'identity':
+        return body
+    try:
+        if encoding in ('gzip', 'x-gzip'):
+            # wbits=31: en-tête gzip; max_length borne la sortie (bombe de décompression)
+            decompressor = zlib.decompressobj(wbits=31)
+            data = decompressor.decompress(body, max_size + 1)
+        elif encoding == 'zstd' and zstandard:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                data = reader.read(max_size + 1)
+        else:
+            raise UnsupportedWireFormat(f"Content-Encoding non supporté: {encoding}")
+    except UnsupportedWireFormat:
+        raise
+    except Exception as e:
+        raise WireFormatError(f"Corps {encoding} invalide: {e}")
+    if len(data) > max_size:
+        raise WireFormatError(f"Corps décompressé trop gros (> {max_size} octets)")
+    return data
+
+
+# ----------------------------------------------------------------------
+# Sérialisation
+# ----------------------------------------------------------------------
+
+def _media_type(content_type: Optional[str]) -> str:
+    return (content_type or CONTENT_TYPE_JSON).split(';')[0].strip().lower()
+
+
+def serialize(obj: Any, content_type: str = CONTENT_TYPE_JSON) -> bytes:
+    """
+    Sérialiser un objet. En NDJSON, obj est la liste des messages (une
+    ligne chacun); en msgpack, une liste de messages est un tableau.
+    """
+    content_type = _media_type(content_type)
+    if content_type == CONTENT_TYPE_MSGPACK and msgpack:
+        return msgpack.packb(obj, use_bin_type=True)
+    if content_type == CONTENT_TYPE_NDJSON:
+        return ''.join(json.dumps(item) + '\n' for item in obj).encode('utf-8')
+    if content_type == CONTENT_TYPE_JSON:
+        return json.dumps(obj).encode('utf-8')
+    raise UnsupportedWireFormat(f"Content-Type non supporté: {content_type}")
+
+
+def deserialize(body: bytes, content_type: Optional[str]) -> Any:
+    """Inverse de serialize(); un corps vide donne None"""
+    content_type = _media_type(content_type)
+    if not body:
+        return None
+    try:
+        if content_type == CONTENT_TYPE_MSGPACK:
+            if not msgpack:
+                raise UnsupportedWireFormat("msgpack non installé")
+            return msgpack.unpackb(body, raw=False)
+        if content_type == CONTENT_TYPE_NDJSON:
+            return [json.loads(line) for line in body.decode('utf-8').splitlines() if line.strip()]
+        if content_type in (CONTENT_TYPE_JSON, 'text/plain', 'application/octet-stream'):
+            return json.loads(body)
+    except UnsupportedWireFormat:
+        raise
+    except Exception as e:
+        raise WireFormatError(f"Corps {content_type} invalide: {e}")
+    raise UnsupportedWireFormat(f"Content-Type non supporté: {content_type}")
+
+
+def decode_body(body: bytes, content_type: Optional[str], content_encoding: Optional[str]) -> Any:
+    """Corps de requête brut -> objet Python, selon Content-Type et Content-Encoding"""
+    return deserialize(decompress(body, content_encoding), content_type)
+
+
+# ----------------------------------------------------------------------
+# Côté worker: format choisi d'après les en-têtes du coordinateur
+# ----------------------------------------------------------------------
+
+class WireNegotiation:
+    """Meilleur format commun au worker et au coordinateur (JSON non compressé par défaut)"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.encoding: Optional[str] = None
+        self.msgpack = False
+        self.retry_at = 0.0
+
+    @property
+    def negotiated(self) -> bool:
+        return bool(self.encoding or self.msgpack)
+
+    def update(self, headers):
+        """Relire Accept-Encoding / Accept-Post d'une réponse du coordinateur"""
+        if not self.enabled or time.monotonic() < self.retry_at:
+            return
+        accepted = _header_tokens(headers.get('Accept-Encoding'))
+        post_types = _header_tokens(headers.get('Accept-Post'))
+        if not accepted and not post_types:
+            return
+        self.encoding = next((e for e in supported_encodings() if e in accepted), None)
+        self.msgpack = bool(msgpack) and CONTENT_TYPE_MSGPACK in post_types
+
+    def reset(self):
+        """Le coordinateur a refusé le format (415): retour au JSON non compressé"""
+        self.encoding = None
+        self.msgpack = False
+        self.retry_at = time.monotonic() + NEGOTIATION_RETRY_AFTER
+
+    def encode(self, obj: Any, stream: bool = False) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Corps et en-têtes d'une requête. stream=True: obj est une liste de
+        messages (NDJSON, ou tableau msgpack).
+        """
+        if self.msgpack:
+            content_type = CONTENT_TYPE_MSGPACK
+        else:
+            content_type = CONTENT_TYPE_NDJSON if stream else CONTENT_TYPE_JSON
+        body = serialize(obj, content_type)
+        headers = {'Content-Type': content_type}
+        if stream:
+            headers['Accept'] = ', '.join(
+                ([CONTENT_TYPE_MSGPACK] if self.msgpack else []) + [CONTENT_TYPE_NDJSON])
+        if self.encoding and len(body) >= COMPRESS_MIN_SIZE:
+            body = compress(body, self.encoding)
+            headers['Content-Encoding'] = self.encoding
+        return body, headers
+
+
+def _header_tokens(value: Optional[str]) -> List[str]:
+    return [token.split(';')[0].strip().lower() for token in (value or '').split(',') if token.strip()]
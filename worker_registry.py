@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Registre des workers de crawl (remplace crawl_workers.json)
+
+Chaque process gunicorn garde en mémoire les mises à jour reçues (heartbeats,
+compteurs) et les écrit par lot, toutes les REGISTRY_FLUSH_INTERVAL secondes,
+dans une petite base SQLite partagée. L'écriture se fait dans une transaction
+BEGIN IMMEDIATE: les process ne s'écrasent plus mutuellement comme avec la
+réécriture complète du fichier JSON.
+
+- Champs d'information (hostname, status, sites_in_progress...): dernier écrit gagne
+- Compteurs: incréments (`value = value + delta`) ou maximum (`MAX(value, v)`),
+  jamais de retour en arrière
+
+Usage:
+    registry = WorkerRegistry(Path('/var/www/Scrap_Email/crawl_workers.db'))
+    registry.update(worker_id, hostname='ns500898', status='running')
+    registry.increment(worker_id, tasks_completed=1, buyers_found=12)
+    registry.maximum(worker_id, pages_crawled=450)
+    data = registry.load()  # {'workers': {...}, 'last_update': ...} comme avant
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FLUSH_INTERVAL = 2  # secondes entre deux écritures
+REGISTRY_PRUNE_INTERVAL = 60  # secondes entre deux nettoyages des workers inactifs
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_workers (
+    worker_id TEXT PRIMARY KEY,
+    first_seen TEXT NOT NULL,
+    last_heartbeat TEXT,
+    info TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS crawl_worker_counters (
+    worker_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (worker_id, name)
+);
+CREATE TABLE IF NOT EXISTS crawl_registry_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Compteurs créés à zéro pour tout nouveau worker (forme historique de crawl_workers.json)
+DEFAULT_COUNTERS = ('tasks_assigned', 'tasks_completed', 'buyers_found', 'emails_found', 'errors')
+
+
+class WorkerRegistry:
+    """État des workers: mémoire du process + base SQLite partagée"""
+
+    def __init__(self, db_path: Path, worker_timeout: int = 60,
+                 legacy_json: Optional[Path] = None):
+        self.db_path = Path(db_path)
+        self.worker_timeout = worker_timeout
+        self.legacy_json = legacy_json
+        self._lock = threading.Lock()
+        self._info: Dict[str, Dict] = defaultdict(dict)
+        self._increments: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._maximums: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._pid = None
+        self._last_prune = 0.0
+        self._initialized = False
+
+    # ------------------------------------------------------------------
+    # Écritures (mémoire uniquement, appel depuis les requêtes)
+    # ------------------------------------------------------------------
+
+    def update(self, worker_id: str, heartbeat: bool = True, **fields):
+        """Mettre à jour des champs d'information (et le heartbeat)"""
+        with self._lock:
+            info = self._info[worker_id]
+            info.update(fields)
+            if heartbeat:
+                info['last_heartbeat'] = datetime.utcnow().isoformat()
+        self._ensure_flusher()
+
+    def increment(self, worker_id: str, **deltas):
+        """Ajouter des deltas à des compteurs"""
+        with self._lock:
+            counters = self._increments[worker_id]
+            for name, delta in deltas.items():
+                if delta:
+                    counters[name] += int(delta)
+            self._info[worker_id]  # Le worker existe même sans champ modifié
+        self._ensure_flusher()
+
+    def maximum(self, worker_id: str, **values):
+        """Porter des compteurs à au moins `value` (ne diminuent jamais)"""
+        with self._lock:
+            maximums = self._maximums[worker_id]
+            for name, value in values.items():
+                if value is not None:
+                    maximums[name] = max(maximums.get(name, 0), int(value))
+            self._info[worker_id]
+        self._ensure_flusher()
+
+    def remove(self, worker_id: str) -> bool:
+        """Supprimer un worker. Retourne False s'il était inconnu"""
+        self.flush()
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM crawl_workers WHERE worker_id = ?", (worker_id,))
+            conn.execute("DELETE FROM crawl_worker_counters WHERE worker_id = ?", (worker_id,))
+            return cursor.rowcount > 0
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def load(self, clean_inactive: bool = True) -> Dict:
+        """État de tous les workers, au format historique de crawl_workers.json"""
+        self.flush()
+        if clean_inactive:
+            self.prune()
+
+        workers = {}
+        with self._connect() as conn:
+            for worker_id, first_seen, last_heartbeat, info in conn.execute(
+                "SELECT worker_id, first_seen, last_heartbeat, info FROM crawl_workers"
+            ):
+                worker = {name: 0 for name in DEFAULT_COUNTERS}
+                worker.update(json.loads(info or '{}'))
+                worker['first_seen'] = first_seen
+                if last_heartbeat:
+                    worker['last_heartbeat'] = last_heartbeat
+                workers[worker_id] = worker
+            for worker_id, name, value in conn.execute(
+                "SELECT worker_id, name, value FROM crawl_worker_counters"
+            ):
+                if worker_id in workers:
+                    workers[worker_id][name] = value
+            row = conn.execute("SELECT value FROM crawl_registry_meta WHERE key = 'last_update'").fetchone()
+
+        return {'workers': workers, 'last_update': row[0] if row else None}
+
+    # ------------------------------------------------------------------
+    # Écriture en base
+    # ------------------------------------------------------------------
+
+    def flush(self):
+        """Écrire les mises à jour en attente de ce process en une transaction"""
+        with self._lock:
+            if not self._info:
+                return
+            info, self._info = self._info, defaultdict(dict)
+            increments, self._increments = self._increments, defaultdict(lambda: defaultdict(int))
+            maximums, self._maximums = self._maximums, defaultdict(dict)
+
+        now = datetime.utcnow().isoformat()
+        try:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                existing = {}
+                worker_ids = list(info)
+                for start in range(0, len(worker_ids), 500):
+                    chunk = worker_ids[start:start + 500]
+                    existing.update(conn.execute(
+                        f"SELECT worker_id, info FROM crawl_workers WHERE worker_id IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchall())
+
+                rows = []
+                for worker_id, fields in info.items():
+                    merged = json.loads(existing.get(worker_id) or '{}')
+                    merged.update(fields)
+                    last_heartbeat = merged.pop('last_heartbeat', None)
+                    rows.append((worker_id, now, last_heartbeat, json.dumps(merged)))
+                conn.executemany("""
+                    INSERT INTO crawl_workers (worker_id, first_seen, last_heartbeat, info)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (worker_id) DO UPDATE SET
+                        last_heartbeat = COALESCE(excluded.last_heartbeat, crawl_workers.last_heartbeat),
+                        info = excluded.info
+                """, rows)
+
+                conn.executemany("""
+                    INSERT INTO crawl_worker_counters (worker_id, name, value) VALUES (?, ?, ?)
+                    ON CONFLICT (worker_id, name) DO UPDATE SET value = value + excluded.value
+                """, [(w, name, delta) for w, counters in increments.items() for name, delta in counters.items()])
+                conn.executemany("""
+                    INSERT INTO crawl_worker_counters (worker_id, name, value) VALUES (?, ?, ?)
+                    ON CONFLICT (worker_id, name) DO UPDATE SET value = MAX(value, excluded.value)
+                """, [(w, name, value) for w, values in maximums.items() for name, value in values.items()])
+
+                conn.execute("""
+                    INSERT INTO crawl_registry_meta (key, value) VALUES ('last_update', ?)
+                    ON CONFLICT (key) DO UPDATE SET value = excluded.value
+                """, (now,))
+                conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"❌ Erreur flush registre workers: {e}")
+            # Remettre les mises à jour pour le prochain flush (les plus récentes gagnent)
+            with self._lock:
+                for worker_id, fields in info.items():
+                    self._info[worker_id] = {**fields, **self._info.get(worker_id, {})}
+                for worker_id, counters in increments.items():
+                    for name, delta in counters.items():
+                        self._increments[worker_id][name] += delta
+                for worker_id, values in maximums.items():
+                    for name, value in values.items():
+                        self._maximums[worker_id][name] = max(self._maximums[worker_id].get(name, 0), value)
+
+    def prune(self):
+        """Supprimer les workers sans heartbeat depuis worker_timeout (au plus une fois par minute)"""
+        if time.monotonic() - self._last_prune < REGISTRY_PRUNE_INTERVAL:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = (datetime.utcnow() - timedelta(seconds=self.worker_timeout)).isoformat()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM crawl_workers WHERE last_heartbeat IS NULL OR last_heartbeat < ?", (cutoff,))
+            conn.execute("DELETE FROM crawl_worker_counters WHERE worker_id NOT IN (SELECT worker_id FROM crawl_workers)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            if not self._initialized:
+                self._initialize(conn)
+            yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self, conn: sqlite3.Connection):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._initialized = True
+        self._import_legacy_json(conn)
+
+    def _import_legacy_json(self, conn: sqlite3.Connection):
+        """Reprendre crawl_workers.json au premier démarrage"""
+        if not self.legacy_json or not Path(self.legacy_json).exists():
+            return
+        if conn.execute("SELECT 1 FROM crawl_registry_meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        try:
+            with open(self.legacy_json, 'r') as f:
+                data = json.load(f)
+            conn.execute("BEGIN IMMEDIATE")
+            for worker_id, worker in data.get('workers', {}).items():
+                worker = dict(worker)
+                first_seen = worker.pop('first_seen', None) or datetime.utcnow().isoformat()
+                last_heartbeat = worker.pop('last_heartbeat', None)
+                counters = {k: v for k, v in worker.items() if isinstance(v, int) and not isinstance(v, bool)}
+                info = {k: v for k, v in worker.items() if k not in counters}
+                conn.execute(
+                    "INSERT OR IGNORE INTO crawl_workers (worker_id, first_seen, last_heartbeat, info) VALUES (?, ?, ?, ?)",
+                    (worker_id, first_seen, last_heartbeat, json.dumps(info))
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO crawl_worker_counters (worker_id, name, value) VALUES (?, ?, ?)",
+                    [(worker_id, name, value) for name, value in counters.items()]
+                )
+            conn.execute("INSERT OR REPLACE INTO crawl_registry_meta (key, value) VALUES ('legacy_imported', ?)",
+                         (datetime.utcnow().isoformat(),))
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.warning(f"Import {self.legacy_json} impossible: {e}")
+
+    # ------------------------------------------------------------------
+    # Thread de flush (un par process, recréé après un fork gunicorn)
+    # ------------------------------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='worker-registry-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(REGISTRY_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Erreur thread registre workers: {e}")